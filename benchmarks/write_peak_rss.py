@@ -0,0 +1,145 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark of the memory usage of the alignment writers.
+
+Generates a synthetic DNA alignment (1000 taxa x 1M sites by default),
+loads it into an AlignmentList and writes it in the phylip, nexus and
+fasta formats, in both sequential and interleave layouts. For each output,
+the elapsed time and the peak resident set size (RSS) above the RSS before
+the write are reported. The RSS is sampled from /proc/self/statm, so the
+benchmark requires Linux.
+
+Usage::
+
+    python benchmarks/write_peak_rss.py [--taxa 1000] [--sites 1000000]
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+from os.path import join, dirname, abspath
+
+import numpy as np
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from trifusion.process.sequence import AlignmentList
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def current_rss():
+    """Returns the current RSS of the process, in bytes."""
+
+    with open("/proc/self/statm") as fh:
+        return int(fh.read().split()[1]) * PAGE_SIZE
+
+
+class RssSampler(threading.Thread):
+    """Thread that records the peak RSS of the process."""
+
+    def __init__(self, interval=0.01):
+
+        super(RssSampler, self).__init__()
+        self.daemon = True
+        self.interval = interval
+        self.peak = current_rss()
+        self._stop_event = threading.Event()
+
+    def run(self):
+
+        while not self._stop_event.is_set():
+            self.peak = max(self.peak, current_rss())
+            time.sleep(self.interval)
+
+    def stop(self):
+
+        self._stop_event.set()
+        self.join()
+        self.peak = max(self.peak, current_rss())
+
+
+def generate_fasta(path, ntaxa, nsites, chunk_size=2 ** 20):
+    """Writes a random DNA alignment in fasta format, one chunk at a time.
+    """
+
+    rng = np.random.RandomState(1)
+    alphabet = np.frombuffer(b"acgt-n", dtype=np.uint8)
+
+    with open(path, "w") as fh:
+        for i in xrange(ntaxa):
+            fh.write(">taxon{}\n".format(i))
+            for start in xrange(0, nsites, chunk_size):
+                size = min(chunk_size, nsites - start)
+                fh.write(alphabet[rng.randint(
+                    0, len(alphabet), size)].tostring())
+            fh.write("\n")
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--taxa", type=int, default=1000)
+    parser.add_argument("--sites", type=int, default=1000000)
+    parser.add_argument("--formats", nargs="+",
+                        default=["phylip", "nexus", "fasta"])
+    parser.add_argument("--backend", default="sql",
+                        choices=["sql", "matrix", "memmap"])
+    parser.add_argument("--work-dir", default=None,
+                        help="Directory for the temporary files. Defaults to "
+                             "a new temporary directory")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="trifusion-bench")
+    if not os.path.exists(work_dir):
+        os.makedirs(work_dir)
+
+    try:
+        fasta = join(work_dir, "synthetic.fas")
+
+        print("Generating {} taxa x {} sites alignment".format(
+            args.taxa, args.sites))
+        generate_fasta(fasta, args.taxa, args.sites)
+
+        print("Loading alignment")
+        start = time.time()
+        aln_list = AlignmentList([fasta], sql_db=join(work_dir, "bench.db"),
+                                 backend=args.backend, batch_size=1)
+        print("Loaded in {:.1f}s\n".format(time.time() - start))
+
+        print("{:<8} {:<12} {:>10} {:>16}".format(
+            "format", "layout", "time (s)", "peak RSS (MB)"))
+
+        for fmt in args.formats:
+            for interleave in [False, True]:
+
+                sampler = RssSampler()
+                baseline = current_rss()
+                sampler.start()
+
+                start = time.time()
+                aln_list.write_to_file([fmt], output_file=join(
+                    work_dir, "output"), interleave=interleave)
+                elapsed = time.time() - start
+
+                sampler.stop()
+
+                print("{:<8} {:<12} {:>10.1f} {:>16.1f}".format(
+                    fmt, "interleave" if interleave else "sequential",
+                    elapsed, (sampler.peak - baseline) / 2.0 ** 20))
+
+        aln_list.con.close()
+
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -143,7 +143,8 @@ def main_parser(arg, alignment_list):
     print_col("Parsing %s alignments" % len(alignment_list), GREEN,
               quiet=arg.quiet)
     alignments = seqset.AlignmentList(alignment_list, sql_db=sql_db,
-                                      pbar=pbar)
+                                      pbar=pbar, workers=arg.processes,
+                                      cache_dir=arg.cache_dir)
 
     # If a partitions file was provided, and there is only a single input file,
     # try to associate the partitions.
@@ -224,19 +225,25 @@ def main_parser(arg, alignment_list):
                   quiet=arg.quiet)
         alignments.filter_by_taxa(arg.exclude_filter, "Exclude", pbar=pbar)
 
+    # Operations that modify the sequence data of each alignment are
+    # executed in a single pass over the data
+    pipeline = alignments.pipeline()
+
     # Filter by codon position
     if arg.codon_filter:
         print_col("Filtering by codon positions", GREEN, quiet=arg.quiet)
         if alignments.sequence_code[0] == "DNA":
             codon_settings = [True if str(x) in arg.codon_filter else False
                               for x in range(1, 4)]
-            alignments.filter_codon_positions(codon_settings, pbar=pbar)
+            pipeline.filter_codon_positions(codon_settings)
 
     # Filter by missing data
     if arg.m_filter:
         print_col("Filtering by missing data", GREEN, quiet=arg.quiet)
-        alignments.filter_missing_data(arg.m_filter[0], arg.m_filter[1],
-                                       pbar=pbar, use_main_table=True)
+        pipeline.filter_missing_data(arg.m_filter[0], arg.m_filter[1])
+
+    if pipeline:
+        pipeline.run(pbar=pbar)
 
     # Filtering by variable sites
     if arg.var_filter:
@@ -262,17 +269,21 @@ def main_parser(arg, alignment_list):
             zorro = data.Zorro(alignment_list, arg.zorro)
             zorro.write_to_file(outfile)
 
+    pipeline = alignments.pipeline()
+
     # Collapsing
     if arg.collapse:
         print_col("Collapsing", GREEN, quiet=arg.quiet)
-        alignments.collapse(use_main_table=True, pbar=pbar,
-                            haplotypes_file=outfile)
+        pipeline.collapse(haplotypes_file=outfile)
 
     # Gcoder
     if arg.gcoder:
         print_col("Coding gaps", GREEN, quiet=arg.quiet)
         if output_format == ["nexus"]:
-            alignments.code_gaps(use_main_table=True, pbar=pbar)
+            pipeline.code_gaps()
+
+    if pipeline:
+        pipeline.run(pbar=pbar)
 
     # Consensus
     if arg.consensus:
@@ -483,6 +494,15 @@ def get_args(arg_list=None, unittest=False):
                            " .csv file")
 
     miscellaneous = parser.add_argument_group("Miscellaneous")
+    miscellaneous.add_argument("-np", dest="processes", type=int, default=1,
+                               help="Number of processes used to parse the "
+                               "input files and, in conversion mode, to write "
+                               "the output files (default is 1)")
+    miscellaneous.add_argument("--cache-dir", dest="cache_dir",
+                               help="Directory used to cache the parsed "
+                               "input files between runs. Unchanged files "
+                               "are loaded from the cache instead of being "
+                               "parsed again")
     miscellaneous.add_argument("-quiet", dest="quiet", action="store_const",
                                const=True, default=False, help="Removes all "
                                "terminal output")
@@ -128,6 +128,14 @@ def main():
     main_exec.add_argument("--generate-cfg", dest="generate_cfg",
                            action="store_const", const=True,
                            help="Generates a configuration template file")
+    main_exec.add_argument("-np", dest="processes", type=int, default=1,
+                           help="Number of processes used to parse the "
+                                "input files (default is 1)")
+    main_exec.add_argument("--cache-dir", dest="cache_dir",
+                           help="Directory used to cache the parsed input "
+                                "files between runs. Unchanged files are "
+                                "loaded from the cache instead of being "
+                                "parsed again")
     main_exec.add_argument("-quiet", dest="quiet", action="store_const",
                            const=True, default=False, help="Removes all"
                            " terminal output")
@@ -187,7 +195,9 @@ def stats_main(args):
         input_files = fl
 
     print_col("Parsing %s alignments" % len(input_files), GREEN, 2)
-    alignments = AlignmentList(input_files, sql_db=sql_db)
+    alignments = AlignmentList(input_files, sql_db=sql_db,
+                               workers=args.processes,
+                               cache_dir=args.cache_dir)
 
     # Create output dir
     if not os.path.exists(output_dir):
@@ -1643,7 +1643,7 @@ class TriFusionApp(App):
         self.terminate_background = True
 
         self.run_in_background(remove_tmp, self.stop,
-                               [self.temp_dir, self.alignment_list.con],
+                               [self.temp_dir, self.alignment_list.db],
                                no_arg2=True, cancel=False,
                                msg="Cleaning temporary files and "
                                    "exiting...")
@@ -163,25 +163,26 @@ import os
 os.environ["KIVY_NO_ARGS"] = "1"
 
 
-def remove_tmp(temp_dir, sql_con):
-    """Removes TriFusion's temporary directory and closes sqlite connection.
+def remove_tmp(temp_dir, db):
+    """Removes TriFusion's temporary directory and closes sqlite connections.
 
     Removes the temporary directory and all its contents and closes
-    the connection to the sqlite database.
+    the connections to the sqlite database.
 
     Parameters
     ----------
     temp_dir : str
         Path to the temporary directory
-    sql_con : sqlite3.Connection
-        Sqlite3 connection object
+    db : trifusion.process.sequence.ConnectionManager
+        Connection manager of the sqlite database. Its pending writes are
+        committed and its writer and reader connections are closed.
     """
 
     # Give some time to child threads to exit
     time.sleep(1)
 
-    # Close database connection
-    sql_con.close()
+    # Close database connections
+    db.close()
 
     # Remove temporary files
     if os.path.exists(temp_dir):
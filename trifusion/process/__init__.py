@@ -24,6 +24,13 @@ Contains several methods and function that are inherited or used by
 :class:`~trifusion.process.sequence.AlignmentList` objects, as well as by
 the TriSeq and TriStats CLI programs.
 
+:mod:`~trifusion.process.cache`
+~~~~~
+Contains the :class:`~trifusion.process.cache.ParseCache` class, an
+optional on-disk cache of parsed alignment files that allows
+:class:`~trifusion.process.sequence.AlignmentList` to skip the parsing of
+files that have not changed since a previous run.
+
 :mod:`~trifusion.process.data`
 ~~~~
 Contains the :class:`~trifusion.process.data.Partitions`  class, used by
@@ -35,6 +42,30 @@ classes to handle partitions in the alignments.
 ~~~~~~~~~~~~~~
 Contains custom made Exception sub-classes.
 
+:mod:`~trifusion.process.matrix`
+~~~~~~
+Contains the :class:`~trifusion.process.matrix.MatrixStore` class, a
+columnar storage backend that keeps the alignment data as NumPy uint8
+matrices (optionally packed with 4 or 5 bits per character, or
+compressed in blocks of columns), used by
+:class:`~trifusion.process.sequence.AlignmentList` when created with any
+backend other than "sql".
+
+:mod:`~trifusion.process.pipeline`
+~~~~~~~~
+Contains the :class:`~trifusion.process.pipeline.AlignmentPipeline` class,
+which executes several operations that modify the sequence data of each
+alignment (e.g., filters, collapse and gap coding) in a single pass over
+the data.
+
+:mod:`~trifusion.process.project`
+~~~~~~~
+Contains the :class:`~trifusion.process.project.ProjectFile` class and the
+:func:`~trifusion.process.project.write_project` function, which read and
+write the versioned binary project files used by
+:class:`~trifusion.process.sequence.AlignmentList` to save and reopen a
+set of alignments without parsing the original files.
+
 :mod:`~trifusion.process.sequence`
 ~~~~~~~~
 Contains the :class:`~trifusion.process.sequence.Alignment`  and
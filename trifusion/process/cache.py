@@ -0,0 +1,610 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+#
+#  Copyright 2012 Unknown <diogo@arch>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+
+"""
+The `cache` module provides an optional on-disk cache of parsed alignment
+files. Parsing is the most expensive step of loading alignments into an
+:class:`~trifusion.process.sequence.AlignmentList`, and pipelines that
+repeatedly process the same input files pay that cost on every run.
+
+The :class:`.ParseCache` class stores the result of parsing an alignment
+file (the :class:`~trifusion.process.sequence.Alignment` object, stripped
+of its database handles, and its sequence rows) in a pickle file. Entries
+are keyed by the path, size, modification time and content digest of the
+input file, so that any change to the file results in a cache miss. The
+total size of the cache is bounded, and the least recently used entries
+are evicted first.
+
+The :class:`.StatsMemo` class memoizes the results of the statistics
+methods (e.g., the pairwise similarity matrices of each alignment). Entries
+are keyed by a digest of the alignment data and of the parameters of the
+computation, and are kept in a size-bounded, least recently used, in-memory
+cache. Optionally, entries are also saved in a sqlite database that can be
+shared by several processes and reused by later runs.
+"""
+
+import os
+import time
+import hashlib
+import pickle
+import sqlite3
+from os.path import join, exists, abspath, getsize
+from collections import OrderedDict
+
+import numpy as np
+
+
+class ParseCache(object):
+    """On-disk cache of parsed alignment files.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Path to the directory where the cache entries are stored. It is
+        created if it does not exist.
+    max_size : int, optional
+        Maximum size, in bytes, of the cache directory (default is 1GB).
+        When exceeded, the least recently used entries are removed.
+
+    Attributes
+    ----------
+    cache_dir : str
+        Path to the cache directory.
+    max_size : int
+        Maximum size, in bytes, of the cache directory.
+    entries : collections.OrderedDict
+        Maps the key of each entry to its size in bytes, ordered from the
+        least to the most recently used.
+    size : int
+        Current size, in bytes, of the cache entries.
+    """
+
+    extension = ".pickle"
+
+    def __init__(self, cache_dir, max_size=2 ** 30):
+
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+        self.entries = OrderedDict()
+        self.size = 0
+
+        if not exists(cache_dir):
+            os.makedirs(cache_dir)
+
+        self._scan()
+
+    def _scan(self):
+        """Populates `entries` from the files in the cache directory."""
+
+        files = []
+        for fl in os.listdir(self.cache_dir):
+            if fl.endswith(self.extension):
+                st = os.stat(join(self.cache_dir, fl))
+                files.append((st.st_mtime, fl[:-len(self.extension)],
+                              st.st_size))
+
+        for _, key, size in sorted(files):
+            self.entries[key] = size
+            self.size += size
+
+    def _entry_path(self, key):
+        return join(self.cache_dir, key + self.extension)
+
+    @staticmethod
+    def get_key(file_path, block_size=2 ** 20):
+        """Returns the cache key of an alignment file.
+
+        The key is the SHA-1 digest of the absolute path, size,
+        modification time and SHA-1 digest of the contents of the file.
+
+        Parameters
+        ----------
+        file_path : str
+            Path to the alignment file.
+        block_size : int, optional
+            Size of the blocks read from the file to compute the content
+            digest.
+
+        Returns
+        -------
+        key : str
+            Hexadecimal digest.
+        """
+
+        st = os.stat(file_path)
+
+        content = hashlib.sha1()
+        with open(file_path, "rb") as fh:
+            for block in iter(lambda: fh.read(block_size), b""):
+                content.update(block)
+
+        return hashlib.sha1("\0".join([
+            abspath(file_path), str(st.st_size), repr(st.st_mtime),
+            content.hexdigest()])).hexdigest()
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key):
+        """Retrieves a cache entry.
+
+        Parameters
+        ----------
+        key : str
+            Cache key, as returned by `get_key`.
+
+        Returns
+        -------
+        payload : object
+            The cached object, or None if there is no valid entry for `key`.
+        """
+
+        if key not in self.entries:
+            return None
+
+        path = self._entry_path(key)
+
+        try:
+            with open(path, "rb") as fh:
+                payload = pickle.load(fh)
+        except (IOError, EOFError, pickle.UnpicklingError):
+            # Corrupted or missing entry
+            self._remove(key)
+            return None
+
+        # Mark entry as the most recently used
+        self.entries[key] = self.entries.pop(key)
+        os.utime(path, None)
+
+        return payload
+
+    def set(self, key, payload, keep=()):
+        """Stores an object in the cache.
+
+        After the entry is written, the least recently used entries are
+        evicted until the cache size is below `max_size`. The new entry
+        and the entries in `keep` are never evicted, so the cache may
+        remain above `max_size` if they do not fit.
+
+        Parameters
+        ----------
+        key : str
+            Cache key, as returned by `get_key`.
+        payload : object
+            Picklable object.
+        keep : container, optional
+            Keys of the entries that must not be evicted.
+        """
+
+        if key in self.entries:
+            self._remove(key)
+
+        path = self._entry_path(key)
+        temp_path = path + ".tmp"
+
+        # Write to a temporary file first, so that an interrupted write
+        # never leaves a truncated entry
+        with open(temp_path, "wb") as fh:
+            pickle.dump(payload, fh, pickle.HIGHEST_PROTOCOL)
+        os.rename(temp_path, path)
+
+        self.entries[key] = getsize(path)
+        self.size += self.entries[key]
+
+        for old_key in [x for x in self.entries
+                        if x != key and x not in keep]:
+            if self.size <= self.max_size:
+                break
+            self._remove(old_key)
+
+    def _remove(self, key):
+        """Removes a cache entry.
+
+        Parameters
+        ----------
+        key : str
+            Cache key.
+        """
+
+        self.size -= self.entries.pop(key)
+
+        try:
+            os.remove(self._entry_path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        """Removes all cache entries."""
+
+        for key in list(self.entries):
+            self._remove(key)
+
+
+class StatsMemo(object):
+    """Memo of the results of the statistics methods.
+
+    Results are kept in memory, up to a total of `max_size` bytes, and the
+    least recently used entries are evicted first. If `store_path` is
+    provided, results are also saved in a sqlite database, so that they
+    are available to other processes and to later runs. Since keys are
+    digests of the data used in the computation, the same key always
+    refers to the same result.
+
+    Changes to the persistent store, including the access times of the
+    entries that are read, are committed at most once every
+    `commit_interval` seconds, and when `flush` or `close` are called.
+
+    Parameters
+    ----------
+    max_size : int, optional
+        Maximum size, in bytes, of the in-memory entries (default is
+        128MB).
+    store_path : str, optional
+        Path to the sqlite database used as persistent store. By default,
+        entries are only kept in memory.
+    max_store_size : int, optional
+        Maximum size, in bytes, of the entries in the persistent store
+        (default is 1GB).
+    commit_interval : float, optional
+        Minimum time, in seconds, between commits to the persistent store
+        (default is 1).
+
+    Attributes
+    ----------
+    max_size : int
+        Maximum size, in bytes, of the in-memory entries.
+    store_path : str
+        Path to the sqlite database used as persistent store.
+    max_store_size : int
+        Maximum size, in bytes, of the entries in the persistent store.
+    commit_interval : float
+        Minimum time, in seconds, between commits to the persistent store.
+    entries : collections.OrderedDict
+        Maps the key of each in-memory entry to a (value, size) tuple,
+        ordered from the least to the most recently used.
+    size : int
+        Current size, in bytes, of the in-memory entries.
+    hits : int
+        Number of requests that were found in the memo.
+    misses : int
+        Number of requests that were not found in the memo.
+    """
+
+    def __init__(self, max_size=2 ** 27, store_path=None,
+                 max_store_size=2 ** 30, commit_interval=1):
+
+        self.max_size = max_size
+        self.store_path = store_path
+        self.max_store_size = max_store_size
+        self.commit_interval = commit_interval
+
+        self.entries = OrderedDict()
+        self.size = 0
+
+        self.hits = 0
+        self.misses = 0
+
+        self._con = None
+        """
+        Connection to the persistent store. It is opened when first needed.
+        """
+
+        self._store_size = 0
+        """
+        Size, in bytes, of the entries in the persistent store. It is
+        computed when the store is opened and then updated with the
+        entries added by this object, so it does not account for entries
+        added or removed by other processes until it exceeds
+        `max_store_size` and is computed again.
+        """
+
+        self._atimes = {}
+        """
+        Maps the keys of the entries read from the persistent store to
+        their access time, until they are written to the store.
+        """
+
+        self._pending = False
+        """
+        Whether there are uncommitted changes in the persistent store.
+        """
+
+        self._last_commit = 0
+        """
+        Time of the last commit to the persistent store.
+        """
+
+    def __eq__(self, other):
+        return isinstance(other, StatsMemo) and \
+            (self.store_path, list(self.entries)) == \
+            (other.store_path, list(other.entries))
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __getstate__(self):
+
+        # The connection and the in-memory entries are not carried over
+        # when the object is pickled
+        state = self.__dict__.copy()
+        state["_con"] = None
+        state["entries"] = OrderedDict()
+        state["size"] = 0
+        state["_store_size"] = 0
+        state["_atimes"] = {}
+        state["_pending"] = False
+
+        return state
+
+    @staticmethod
+    def get_key(*args):
+        """Returns the memo key of a computation.
+
+        The key is the SHA-1 digest of the arguments of the computation.
+        Arrays contribute their shape, dtype and contents, and any other
+        argument its representation.
+
+        Parameters
+        ----------
+        args : list
+            Arguments that determine the result of the computation, such
+            as the name of the statistic, the alignment matrix and the gap
+            and missing data symbols.
+
+        Returns
+        -------
+        key : str
+            Hexadecimal digest.
+        """
+
+        digest = hashlib.sha1()
+
+        for arg in args:
+            if hasattr(arg, "dtype"):
+                digest.update(repr((arg.shape, arg.dtype.str)))
+                digest.update(np.ascontiguousarray(arg).data)
+            else:
+                digest.update(repr(arg))
+            digest.update("\0")
+
+        return digest.hexdigest()
+
+    @staticmethod
+    def _get_size(value):
+        """Estimates the size, in bytes, of a memo entry.
+
+        Parameters
+        ----------
+        value : object
+            Memo entry.
+
+        Returns
+        -------
+        _ : int
+            Size in bytes.
+        """
+
+        if hasattr(value, "nbytes"):
+            return value.nbytes
+        elif isinstance(value, (tuple, list)):
+            return sum(StatsMemo._get_size(x) for x in value)
+        else:
+            return len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+    def _get_con(self):
+        """Returns the connection to the persistent store.
+
+        Returns
+        -------
+        _ : sqlite3.Connection
+        """
+
+        if self._con is None:
+            self._con = sqlite3.connect(self.store_path, timeout=60)
+            self._con.execute("CREATE TABLE IF NOT EXISTS memo ("
+                              "key TEXT PRIMARY KEY, value BLOB, "
+                              "size INTEGER, atime REAL)")
+            self._con.execute("CREATE INDEX IF NOT EXISTS memo_atime ON "
+                              "memo(atime)")
+            self._con.commit()
+            self._last_commit = time.time()
+
+            self._store_size = self._con.execute(
+                "SELECT SUM(size) FROM memo").fetchone()[0] or 0
+
+        return self._con
+
+    def get(self, key):
+        """Retrieves a memo entry.
+
+        Parameters
+        ----------
+        key : str
+            Memo key, as returned by `get_key`.
+
+        Returns
+        -------
+        value : object
+            The memoized result, or None if there is no entry for `key`.
+        """
+
+        if key in self.entries:
+            # Mark entry as the most recently used
+            self.entries[key] = self.entries.pop(key)
+            self.hits += 1
+            return self.entries[key][0]
+
+        if self.store_path:
+            con = self._get_con()
+            row = con.execute("SELECT value FROM memo WHERE key=?",
+                              (key,)).fetchone()
+            if row:
+                self._atimes[key] = time.time()
+                self._commit()
+                value = pickle.loads(str(row[0]))
+                self._set_entry(key, value)
+                self.hits += 1
+                return value
+
+        self.misses += 1
+
+        return None
+
+    def set(self, key, value):
+        """Stores a result in the memo.
+
+        Parameters
+        ----------
+        key : str
+            Memo key, as returned by `get_key`.
+        value : object
+            Picklable result.
+        """
+
+        self._set_entry(key, value)
+
+        if self.store_path:
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            con = self._get_con()
+            con.execute("INSERT OR REPLACE INTO memo VALUES (?, ?, ?, ?)",
+                        (key, sqlite3.Binary(data), len(data), time.time()))
+            self._atimes.pop(key, None)
+            self._store_size += len(data)
+            self._pending = True
+
+            if self._store_size > self.max_store_size:
+                self._evict(key)
+
+            self._commit()
+
+    def _evict(self, key, batch_size=64):
+        """Evicts the least recently used entries of the persistent store.
+
+        Entries are removed until the size of the store is below
+        `max_store_size`.
+
+        Parameters
+        ----------
+        key : str
+            Key of the entry that was just stored, which is never evicted.
+        batch_size : int, optional
+            Number of entries fetched from the store at a time.
+        """
+
+        con = self._get_con()
+
+        # The access order must include the entries read since the last
+        # commit
+        self._write_atimes()
+
+        total = con.execute("SELECT SUM(size) FROM memo").fetchone()[0] or 0
+
+        while total > self.max_store_size:
+            rows = con.execute("SELECT key, size FROM memo WHERE key!=? "
+                               "ORDER BY atime LIMIT ?",
+                               (key, batch_size)).fetchall()
+            if not rows:
+                break
+
+            for old_key, size in rows:
+                if total <= self.max_store_size:
+                    break
+                con.execute("DELETE FROM memo WHERE key=?", (old_key,))
+                total -= size
+
+        self._store_size = total
+        self._pending = True
+
+    def _write_atimes(self):
+        """Writes the access times of the entries read from the store."""
+
+        if self._atimes:
+            self._con.executemany("UPDATE memo SET atime=? WHERE key=?",
+                                  [(v, k) for k, v in self._atimes.items()])
+            self._atimes = {}
+            self._pending = True
+
+    def _commit(self):
+        """Commits the persistent store if `commit_interval` has passed
+        since the last commit."""
+
+        if time.time() - self._last_commit >= self.commit_interval:
+            self.flush()
+
+    def flush(self):
+        """Commits all pending changes to the persistent store."""
+
+        if self._con is None:
+            return
+
+        self._write_atimes()
+
+        if self._pending:
+            self._con.commit()
+            self._pending = False
+
+        self._last_commit = time.time()
+
+    def _set_entry(self, key, value):
+        """Stores a result in the in-memory entries.
+
+        After the entry is stored, the least recently used entries are
+        evicted until the size of the in-memory entries is below
+        `max_size`.
+
+        Parameters
+        ----------
+        key : str
+            Memo key.
+        value : object
+            Result.
+        """
+
+        if key in self.entries:
+            self.size -= self.entries.pop(key)[1]
+
+        size = self._get_size(value)
+
+        self.entries[key] = (value, size)
+        self.size += size
+
+        while self.size > self.max_size and len(self.entries) > 1:
+            self.size -= self.entries.popitem(last=False)[1][1]
+
+    def clear(self):
+        """Removes all in-memory entries and resets the counters.
+
+        The persistent store, which may be shared with other processes, is
+        not modified.
+        """
+
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        """Closes the connection to the persistent store."""
+
+        if self._con is not None:
+            self.flush()
+            self._con.close()
+            self._con = None
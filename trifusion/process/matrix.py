@@ -0,0 +1,2510 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+#
+#  Copyright 2012 Unknown <diogo@arch>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+
+"""
+The `matrix` module provides a columnar representation of the alignment
+data that is stored in the sqlite database. Each alignment is kept as a
+contiguous (ntaxa, nsites) `numpy.uint8` matrix, where each element is the
+byte value of the sequence character. With this representation, column-wise
+operations become simple array slices instead of per-character python
+tuples.
+
+The :class:`.AlignmentMatrix` class wraps a single alignment matrix together
+with the txId and taxon of each row. The :class:`.MatrixStore` class is the
+storage backend used by :class:`~trifusion.process.sequence.AlignmentList`
+and :class:`~trifusion.process.sequence.Alignment` when they are created
+with any backend other than "sql". It lazily loads the matrices from the
+database, keeps them in memory (or spilled to `.npy` memory maps in a
+temporary directory) and discards them whenever the database is modified.
+
+Matrices can also be kept packed by a :class:`.SequenceCodec`, with 4
+bits per character for nucleotides (:data:`.dna_codec`) or 5 bits per
+character for proteins (:data:`.protein_codec`). The :class:`.PackedMatrix`
+class unpacks rows and matrices on demand, and provides the matrix of
+character codes, from which the column statistics are computed without
+decoding the characters.
+
+Alternatively, the :class:`.CompressedMatrix` class keeps the matrix in
+memory as separately compressed blocks of rows and columns, so that a
+sequence or a range of columns only decompresses the blocks that overlap
+it.
+
+The sequences can also be packed or compressed in the sqlite database
+itself by :func:`.pack_sequence`, which stores each one as a BLOB whose
+first bytes identify how it was encoded. The :func:`.unpack_sequence` function
+restores the sequence string, leaving the sequences stored as TEXT
+unchanged, and is registered as the `unpack_seq` SQL function by
+:func:`.register_sequence_functions` for queries that operate on the
+sequences themselves.
+
+The :func:`.column_stats` function is the vectorized kernel that computes
+the per-column gap, missing data and character state counts of an
+alignment matrix, which are the basis of the summary statistics and of
+several filters and plots. Likewise, the :func:`.pairwise_similarity`
+function computes the number of identical and comparable sites between
+all pairs of rows of an alignment matrix at once, which are the basis of
+the sequence similarity and segregation plots. The sliding window plots of
+single alignments are built from the per-column character counts of
+:func:`.column_counts`, aggregated over each window by :func:`.window_sums`.
+The :func:`.count_sites` function counts the variable or informative sites
+of an alignment in blocks of columns, stopping as soon as a limit is
+exceeded.
+
+The :class:`.TaxaPresence` class keeps a bitmap with the presence of each
+taxon in each alignment, which answers the queries on the taxa composition
+of the alignments without retrieving their taxa from the database.
+
+For large alignments, the data can also be processed in blocks of columns.
+The :class:`.ColumnBlocks` class keeps the column blocks of an alignment
+so that its rows can be read several times (e.g., once for each taxon
+when writing sequential output formats), spilling them to a temporary file
+when they do not fit in a single block. The :func:`.iter_row_lines`
+function splits a sequence given in chunks into lines of fixed width.
+"""
+
+import os
+import bz2
+import zlib
+import struct
+import tempfile
+import itertools
+from os.path import join, exists
+from collections import OrderedDict
+from fractions import gcd
+
+import numpy as np
+
+
+def encode_sequences(seqs):
+    """Converts a list of sequence strings into a uint8 matrix.
+
+    Parameters
+    ----------
+    seqs : list
+        List of sequence strings.
+
+    Returns
+    -------
+    matrix : numpy.ndarray
+        Array with (len(seqs), max sequence length) shape and uint8 dtype.
+        Sequences shorter than the longest sequence are padded with zeros.
+    """
+
+    length = max(len(x) for x in seqs) if seqs else 0
+
+    if not length:
+        return np.zeros((len(seqs), 0), dtype=np.uint8)
+
+    return np.array(seqs, dtype="S{}".format(length)).view(
+        np.uint8).reshape(len(seqs), length)
+
+
+def decode_sequence(row):
+    """Converts a row of a uint8 matrix back into a sequence string.
+
+    Parameters
+    ----------
+    row : numpy.ndarray
+        One dimensional array with uint8 dtype.
+
+    Returns
+    -------
+    _ : str
+        Sequence string.
+    """
+
+    return np.ascontiguousarray(row).tostring()
+
+
+class SequenceCodec(object):
+    """Packs uint8 sequence matrices into a few bits per character.
+
+    Each character is replaced by its index (code) in `symbols`, and the
+    codes of each row are packed with `bits` bits each, in groups of
+    characters that fill a whole number of bytes (e.g., two 4-bit codes
+    per byte, or eight 5-bit codes per five bytes). Packing and unpacking
+    are vectorized over blocks of columns.
+
+    Parameters
+    ----------
+    symbols : str
+        Characters that can be encoded. Their position in the string is
+        their code. The first symbol should be the gap, whose code (0)
+        matches the padding of the last group of each row.
+    bits : int
+        Number of bits of each code. Must hold `len(symbols) - 1`.
+    block_size : int
+        Maximum number of packed groups processed at once.
+
+    Attributes
+    ----------
+    symbols : numpy.ndarray
+        Byte value of the character of each code.
+    lookup : numpy.ndarray
+        Maps each byte value to its code, or to 255 if the character
+        cannot be encoded.
+    group : int
+        Number of characters of each packed group.
+    group_bytes : int
+        Number of bytes of each packed group.
+    """
+
+    def __init__(self, symbols, bits, block_size=2 ** 20):
+
+        assert len(symbols) <= 2 ** bits
+
+        self.symbols = np.frombuffer(symbols, dtype=np.uint8).copy()
+        self.bits = bits
+        self.block_size = block_size
+
+        self.lookup = np.empty(256, dtype=np.uint8)
+        self.lookup.fill(255)
+        self.lookup[self.symbols] = np.arange(len(symbols))
+
+        self.group = 8 // gcd(8, bits)
+        self.group_bytes = self.group * bits // 8
+
+    def encode(self, matrix):
+        """Packs a matrix of characters.
+
+        Parameters
+        ----------
+        matrix : numpy.ndarray
+            (ntaxa, nsites) array with uint8 dtype.
+
+        Returns
+        -------
+        packed : numpy.ndarray or None
+            (ntaxa, ngroups * group_bytes) array with uint8 dtype, or None
+            if the matrix has characters that cannot be encoded.
+        """
+
+        codes = self.lookup[matrix]
+
+        if codes.size and codes.max() == 255:
+            return None
+
+        ntaxa, nsites = codes.shape
+        ngroups = -(-nsites // self.group)
+        packed = np.empty((ntaxa, ngroups * self.group_bytes),
+                          dtype=np.uint8)
+
+        bits = np.uint64(self.bits)
+        step = max(1, self.block_size // max(ntaxa, 1))
+
+        for start in xrange(0, ngroups, step):
+
+            end = min(start + step, ngroups)
+            block = codes[:, start * self.group:end * self.group]
+
+            # The last group is padded with the gap code
+            groups = np.zeros((ntaxa, (end - start) * self.group),
+                              dtype=np.uint64)
+            groups[:, :block.shape[1]] = block
+            groups = groups.reshape(ntaxa, end - start, self.group)
+
+            value = np.zeros((ntaxa, end - start), dtype=np.uint64)
+            for i in xrange(self.group):
+                value = (value << bits) | groups[:, :, i]
+
+            out = np.empty((ntaxa, end - start, self.group_bytes),
+                           dtype=np.uint8)
+            for j in xrange(self.group_bytes - 1, -1, -1):
+                out[:, :, j] = value & np.uint64(255)
+                value >>= np.uint64(8)
+
+            packed[:, start * self.group_bytes:end * self.group_bytes] = \
+                out.reshape(ntaxa, -1)
+
+        return packed
+
+    def codes(self, packed, nsites):
+        """Unpacks the character codes of a packed matrix.
+
+        Parameters
+        ----------
+        packed : numpy.ndarray
+            Packed matrix, as returned by `encode`.
+        nsites : int
+            Number of columns of the original matrix.
+
+        Returns
+        -------
+        codes : numpy.ndarray
+            (ntaxa, nsites) array with the uint8 code of each character.
+        """
+
+        ntaxa = packed.shape[0]
+        ngroups = packed.shape[1] // self.group_bytes
+        codes = np.empty((ntaxa, ngroups * self.group), dtype=np.uint8)
+
+        bits = np.uint64(self.bits)
+        mask = np.uint64(2 ** self.bits - 1)
+        step = max(1, self.block_size // max(ntaxa, 1))
+
+        for start in xrange(0, ngroups, step):
+
+            end = min(start + step, ngroups)
+            block = np.asarray(packed[:, start * self.group_bytes:
+                                      end * self.group_bytes]).reshape(
+                ntaxa, end - start, self.group_bytes).astype(np.uint64)
+
+            value = np.zeros((ntaxa, end - start), dtype=np.uint64)
+            for j in xrange(self.group_bytes):
+                value = (value << np.uint64(8)) | block[:, :, j]
+
+            out = np.empty((ntaxa, end - start, self.group), dtype=np.uint8)
+            for i in xrange(self.group - 1, -1, -1):
+                out[:, :, i] = value & mask
+                value >>= bits
+
+            codes[:, start * self.group:end * self.group] = \
+                out.reshape(ntaxa, -1)
+
+        return codes[:, :nsites]
+
+    def decode(self, packed, nsites):
+        """Unpacks the matrix of characters of a packed matrix.
+
+        Parameters
+        ----------
+        packed : numpy.ndarray
+            Packed matrix, as returned by `encode`.
+        nsites : int
+            Number of columns of the original matrix.
+
+        Returns
+        -------
+        matrix : numpy.ndarray
+            (ntaxa, nsites) array with uint8 dtype.
+        """
+
+        return self.symbols[self.codes(packed, nsites)]
+
+
+dna_codec = SequenceCodec("-acgtnrykmswbdhv", 4)
+"""4-bit codec for nucleotide sequences, including the IUPAC ambiguity
+codes, gaps and missing data."""
+
+protein_codec = SequenceCodec("-acdefghiklmnpqrstvwyxbzjuo*?.", 5)
+"""5-bit codec for protein sequences, including the ambiguity codes,
+stop codons, gaps and missing data."""
+
+stored_codecs = {"\x01": dna_codec, "\x02": protein_codec}
+"""Maps the marker of the sequences packed in the database to their
+codec."""
+
+stored_compressors = {"\x03": (lambda x: zlib.compress(x, 1),
+                               zlib.decompress),
+                      "\x04": (bz2.compress, bz2.decompress)}
+"""Maps the marker of the sequences compressed in the database to their
+(compress, decompress) functions. Each sequence is compressed as it is
+written, so zlib uses its fastest level, which compresses sequences
+almost as much as the default level in a fraction of the time."""
+
+storage_markers = {"dna": "\x01", "protein": "\x02", "zlib": "\x03",
+                   "bz2": "\x04"}
+"""Maps the name of each storage format to its marker."""
+
+
+def pack_sequence(seq, method="packed"):
+    """Encodes a sequence string to be stored in the database.
+
+    The encoded sequence is a BLOB that starts with a null byte, which
+    never occurs in sequence strings, followed by a marker byte that
+    identifies its format (see `storage_markers`). Sequences packed by a
+    :class:`.SequenceCodec` then have their number of sites, as a 4-byte
+    little-endian integer, and the packed codes of their characters.
+    Compressed sequences have the compressed string.
+
+    Parameters
+    ----------
+    seq : str
+        Sequence string.
+    method : {"packed", "zlib", "bz2"}
+        Storage format. With "packed", the 4-bit nucleotide codec is used
+        or, when the sequence has other characters, the 5-bit protein
+        codec.
+
+    Returns
+    -------
+    _ : buffer or str
+        Encoded sequence, or `seq` if it is empty or cannot be packed.
+    """
+
+    if not seq:
+        return seq
+
+    try:
+        data = str(seq)
+    except UnicodeEncodeError:
+        return seq
+
+    if method != "packed":
+        marker = storage_markers[method]
+        return buffer("\x00" + marker + stored_compressors[marker][0](data))
+
+    row = np.frombuffer(data, dtype=np.uint8).reshape(1, -1)
+
+    for name in ["dna", "protein"]:
+        marker = storage_markers[name]
+        packed = stored_codecs[marker].encode(row)
+        if packed is not None:
+            return buffer("\x00" + marker + struct.pack("<I", len(data)) +
+                          packed.tostring())
+
+    return seq
+
+
+def _split_packed(value):
+    """Returns the codec, number of sites and codes of a packed sequence.
+
+    Parameters
+    ----------
+    value : buffer
+        Sequence value retrieved from the database.
+
+    Returns
+    -------
+    _ : tuple or None
+        (marker, nsites, data) tuple, where `data` is the string after
+        the header, or None if `value` was not packed by
+        :func:`.pack_sequence`.
+    """
+
+    if not isinstance(value, buffer) or value[:1] != "\x00":
+        return None
+
+    marker = value[1:2]
+
+    if marker in stored_codecs:
+        return marker, struct.unpack("<I", value[2:6])[0], value[6:]
+
+    return marker, None, value[2:]
+
+
+def unpack_sequence(value):
+    """Restores a sequence stored in the database.
+
+    Parameters
+    ----------
+    value : buffer or str
+        Sequence value retrieved from the database.
+
+    Returns
+    -------
+    _ : str
+        Sequence string. Values that were not encoded by
+        :func:`.pack_sequence` are returned unchanged.
+    """
+
+    header = _split_packed(value)
+
+    if header is None:
+        return value
+
+    marker, nsites, data = header
+
+    if nsites is None:
+        return stored_compressors[marker][1](data)
+
+    packed = np.frombuffer(data, dtype=np.uint8).reshape(1, -1)
+
+    return decode_sequence(stored_codecs[marker].decode(packed, nsites)[0])
+
+
+def join_packed_sequences(values):
+    """Joins sequences packed with the same codec into a packed matrix.
+
+    Parameters
+    ----------
+    values : list
+        List of sequence values retrieved from the database.
+
+    Returns
+    -------
+    _ : tuple or None
+        (codec, nsites, packed) tuple, where `packed` is the matrix with
+        the packed codes of each sequence, as returned by
+        :meth:`.SequenceCodec.encode`. None if any of the values was not
+        packed with the same codec and number of sites as the others.
+    """
+
+    headers = [_split_packed(x) for x in values]
+
+    if not headers or None in headers or \
+            len(set(x[:2] for x in headers)) != 1:
+        return None
+
+    marker, nsites, _ = headers[0]
+
+    if nsites is None:
+        return None
+
+    packed = np.frombuffer("".join(x[2] for x in headers),
+                           dtype=np.uint8).reshape(len(headers), -1)
+
+    return stored_codecs[marker], nsites, packed
+
+
+def register_sequence_functions(con):
+    """Registers the SQL functions that encode the stored sequences.
+
+    Registers `pack_seq(seq, method)` (see :func:`.pack_sequence`) and
+    `unpack_seq(seq)` (see :func:`.unpack_sequence`), so that queries
+    can operate on the sequence strings regardless of how they are
+    stored.
+
+    Parameters
+    ----------
+    con : sqlite3.Connection
+        Database Connection object.
+    """
+
+    con.create_function("pack_seq", 2, pack_sequence)
+    con.create_function("unpack_seq", 1, unpack_sequence)
+
+
+def column_stats(matrix, gap="-", missing="n", block_size=2 ** 20):
+    """Computes per-column statistics of an alignment matrix.
+
+    All statistics are computed in a single pass over the matrix, using a
+    histogram of the characters of each column. To keep memory bounded,
+    the matrix is processed in blocks of columns, so that each histogram
+    has at most `block_size` elements.
+
+    Parameters
+    ----------
+    matrix : numpy.ndarray
+        (ntaxa, nsites) array with uint8 dtype.
+    gap : str
+        Gap symbol.
+    missing : str
+        Missing data symbol.
+    block_size : int
+        Maximum number of elements of the histogram of each block.
+
+    Returns
+    -------
+    _ : ColumnStats
+        Object with the per-column statistics.
+    """
+
+    nsites = matrix.shape[1]
+
+    gaps = np.zeros(nsites, dtype=np.int64)
+    missing_data = np.zeros(nsites, dtype=np.int64)
+    states = np.zeros(nsites, dtype=np.int64)
+    inf_states = np.zeros(nsites, dtype=np.int64)
+
+    if not matrix.size:
+        return ColumnStats(gaps, missing_data, states, inf_states)
+
+    # Map the characters present in the matrix into a compact alphabet,
+    # so that the histogram of each column is as small as possible
+    present = np.bincount(np.asarray(matrix).ravel(), minlength=256)
+    alphabet = np.flatnonzero(present)
+    lookup = np.zeros(256, dtype=np.intp)
+    lookup[alphabet] = np.arange(alphabet.size)
+    k = alphabet.size
+
+    # Characters that count as sequence states. The zero byte is used
+    # as padding for sequences of unequal length
+    valid = np.ones(k, dtype=bool)
+    for sym in [gap, missing, "\x00"]:
+        if present[ord(sym)]:
+            valid[lookup[ord(sym)]] = False
+
+    step = max(1, block_size // k)
+
+    for start in xrange(0, nsites, step):
+
+        block = lookup[matrix[:, start:start + step]]
+        ncols = block.shape[1]
+
+        # Histogram of each column. Each column is offset by k so that
+        # a single bincount call computes all histograms
+        counts = np.bincount((block + np.arange(ncols) * k).ravel(),
+                             minlength=ncols * k).reshape(ncols, k)
+
+        if present[ord(gap)]:
+            gaps[start:start + ncols] = counts[:, lookup[ord(gap)]]
+        if present[ord(missing)]:
+            missing_data[start:start + ncols] = \
+                counts[:, lookup[ord(missing)]]
+
+        counts = counts[:, valid]
+        states[start:start + ncols] = (counts > 0).sum(axis=1)
+        inf_states[start:start + ncols] = (counts >= 2).sum(axis=1)
+
+    return ColumnStats(gaps, missing_data, states, inf_states)
+
+
+class ColumnStats(object):
+    """Per-column statistics of an alignment.
+
+    Parameters
+    ----------
+    gaps : numpy.ndarray
+        Number of gaps in each column.
+    missing : numpy.ndarray
+        Number of missing data characters in each column.
+    states : numpy.ndarray
+        Number of distinct character states in each column, excluding
+        gaps and missing data.
+    inf_states : numpy.ndarray
+        Number of character states present in at least two taxa in each
+        column, excluding gaps and missing data.
+    """
+
+    def __init__(self, gaps, missing, states, inf_states):
+
+        self.gaps = gaps
+        self.missing = missing
+        self.states = states
+        self.inf_states = inf_states
+
+    def __len__(self):
+        return len(self.gaps)
+
+    @property
+    def variable(self):
+        """Boolean array with the variable (segregating) columns."""
+        return self.states > 1
+
+    @property
+    def informative(self):
+        """Boolean array with the parsimony informative columns."""
+        return self.inf_states >= 2
+
+    @property
+    def variable_sites(self):
+        return int(np.count_nonzero(self.variable))
+
+    @property
+    def informative_sites(self):
+        return int(np.count_nonzero(self.informative))
+
+    @property
+    def gap_sites(self):
+        """Number of columns with at least one gap."""
+        return int(np.count_nonzero(self.gaps))
+
+    @property
+    def missing_sites(self):
+        """Number of columns with at least one missing data character."""
+        return int(np.count_nonzero(self.missing))
+
+
+def count_sites(matrix, gap="-", missing="n", informative=False,
+                limit=None, block_size=2 ** 20):
+    """Counts the variable or informative sites of an alignment matrix.
+
+    The matrix is processed in blocks of columns with the
+    :func:`.column_stats` kernel, and counting stops as soon as the count
+    exceeds `limit`, so that range tests (e.g., a maximum number of
+    variable sites) can be decided without scanning the whole alignment.
+
+    Parameters
+    ----------
+    matrix : numpy.ndarray
+        (ntaxa, nsites) array with uint8 dtype.
+    gap : str
+        Gap symbol.
+    missing : str
+        Missing data symbol.
+    informative : bool
+        If True, the parsimony informative sites are counted. Otherwise,
+        the variable sites are counted.
+    limit : int, optional
+        If provided, counting stops once the count is higher than this
+        value.
+    block_size : int
+        Approximate number of elements of each block of columns.
+
+    Returns
+    -------
+    count : int
+        Number of variable or informative sites. When counting stopped
+        early, this is the number of sites found until then, which is
+        higher than `limit`.
+    """
+
+    nsites = matrix.shape[1]
+    step = max(1, block_size // max(1, matrix.shape[0]))
+
+    count = 0
+
+    for start in xrange(0, nsites, step):
+
+        stats = column_stats(matrix[:, start:start + step], gap, missing,
+                             block_size)
+
+        if informative:
+            count += stats.informative_sites
+        else:
+            count += stats.variable_sites
+
+        if limit is not None and count > limit:
+            break
+
+    return count
+
+
+def column_counts(matrix, block_size=2 ** 20):
+    """Counts the characters of each column of an alignment matrix.
+
+    Parameters
+    ----------
+    matrix : numpy.ndarray
+        (ntaxa, nsites) array with uint8 dtype.
+    block_size : int
+        Maximum number of elements of the histogram of each block of
+        columns.
+
+    Returns
+    -------
+    alphabet : numpy.ndarray
+        Byte values of the characters present in the matrix, in ascending
+        order.
+    counts : numpy.ndarray
+        (len(alphabet), nsites) array with the number of occurrences of
+        each character in each column.
+    """
+
+    nsites = matrix.shape[1]
+
+    present = np.bincount(np.asarray(matrix).ravel(), minlength=256)
+    alphabet = np.flatnonzero(present).astype(np.uint8)
+    lookup = np.zeros(256, dtype=np.intp)
+    lookup[alphabet] = np.arange(alphabet.size)
+    k = alphabet.size
+
+    counts = np.zeros((k, nsites), dtype=np.int32)
+
+    step = max(1, block_size // max(k, 1))
+
+    for start in xrange(0, nsites, step):
+
+        block = lookup[matrix[:, start:start + step]]
+        ncols = block.shape[1]
+
+        # Each column is offset by k so that a single bincount call
+        # computes all histograms
+        counts[:, start:start + ncols] = np.bincount(
+            (block + np.arange(ncols) * k).ravel(),
+            minlength=ncols * k).reshape(ncols, k).T
+
+    return alphabet, counts
+
+
+def window_sums(values, window, step=None):
+    """Sums per-column values over sliding windows of columns.
+
+    Windows start at every `step` columns from the first column and span
+    `window` columns, except at the end of the alignment, where they are
+    truncated. The sums are obtained from the cumulative sum of the
+    values, so that the cost does not depend on the window size or on
+    the overlap between windows.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        Array with the per-column values along the last axis.
+    window : int
+        Number of columns of each window.
+    step : int, optional
+        Number of columns between the start of consecutive windows.
+        Defaults to `window`, i.e., non-overlapping windows.
+
+    Returns
+    -------
+    starts : numpy.ndarray
+        Index of the first column of each window.
+    ends : numpy.ndarray
+        Index after the last column of each window.
+    sums : numpy.ndarray
+        Array with the same shape as `values`, except for the last axis,
+        which has the sum of each window.
+    """
+
+    step = step if step else window
+    ncols = values.shape[-1]
+
+    prefix = np.zeros(values.shape[:-1] + (ncols + 1,),
+                      dtype=np.result_type(values.dtype, np.int64))
+    np.cumsum(values, axis=-1, out=prefix[..., 1:])
+
+    starts = np.arange(0, ncols, step)
+    ends = np.minimum(starts + window, ncols)
+
+    return starts, ends, prefix[..., ends] - prefix[..., starts]
+
+
+def pairwise_similarity(matrix, gap="-", missing="n", block_size=2 ** 20):
+    """Computes the pairwise similarity between all rows of a matrix.
+
+    For each pair of rows, counts the number of columns where both rows
+    have the same character (similarity) and the number of columns where
+    neither row has a gap or missing data (effective length). Instead of
+    comparing each pair of rows separately, both counts are obtained with
+    matrix products of the one-hot encoding of each character state. To
+    keep memory bounded, the matrix is processed in blocks of columns, so
+    that each block has at most `block_size` elements.
+
+    Parameters
+    ----------
+    matrix : numpy.ndarray
+        (ntaxa, nsites) array with uint8 dtype.
+    gap : str
+        Gap symbol.
+    missing : str
+        Missing data symbol.
+    block_size : int
+        Maximum number of elements of each block.
+
+    Returns
+    -------
+    sim : numpy.ndarray
+        (ntaxa, ntaxa) array with the number of identical sites between
+        each pair of rows.
+    ef_len : numpy.ndarray
+        (ntaxa, ntaxa) array with the effective length of each pair of
+        rows, excluding columns with gaps or missing data in either row.
+    """
+
+    ntaxa, nsites = matrix.shape
+
+    sim = np.zeros((ntaxa, ntaxa))
+    ef_len = np.zeros((ntaxa, ntaxa))
+
+    if not matrix.size:
+        return sim, ef_len
+
+    # Characters that count as sequence states. The zero byte is used
+    # as padding for sequences of unequal length
+    present = np.bincount(np.asarray(matrix).ravel(), minlength=256)
+    present[[ord(gap), ord(missing), 0]] = 0
+    alphabet = np.flatnonzero(present)
+
+    step = max(1, block_size // ntaxa)
+
+    for start in xrange(0, nsites, step):
+
+        block = matrix[:, start:start + step]
+        valid = np.zeros(block.shape, dtype=np.float32)
+
+        # Counts within a block are exact in single precision, since
+        # they cannot be larger than the number of columns of the block
+        for char in alphabet:
+            onehot = (block == char).astype(np.float32)
+            sim += onehot.dot(onehot.T)
+            valid += onehot
+
+        ef_len += valid.dot(valid.T)
+
+    return sim, ef_len
+
+
+class AlignmentMatrix(object):
+    """uint8 matrix representation of a single alignment.
+
+    Parameters
+    ----------
+    txids : list
+        List with the txId of each row.
+    taxa : list
+        List with the taxon name of each row.
+    matrix : numpy.ndarray
+        (ntaxa, nsites) array with uint8 dtype.
+
+    Attributes
+    ----------
+    txids : list
+        List with the txId of each row.
+    taxa : list
+        List with the taxon name of each row.
+    matrix : numpy.ndarray
+        (ntaxa, nsites) array with uint8 dtype.
+    taxa_pos : dict
+        Maps each taxon name to its row index in `matrix`.
+    codec : SequenceCodec
+        Codec of packed matrices. None for unpacked matrices.
+    """
+
+    codec = None
+
+    def __init__(self, txids, taxa, matrix):
+
+        self.txids = txids
+        self.taxa = taxa
+        self.matrix = matrix
+        self.taxa_pos = dict((tx, p) for p, tx in enumerate(taxa))
+
+    def __len__(self):
+        return len(self.taxa)
+
+    @property
+    def nsites(self):
+        return self.matrix.shape[1]
+
+    def get_sequence(self, taxon):
+        """Returns the sequence string of a given taxon.
+
+        Parameters
+        ----------
+        taxon : str
+            Name of the taxon.
+
+        Returns
+        -------
+        _ : str
+            Sequence string.
+
+        Raises
+        ------
+        KeyError
+            If the taxon is not present in the matrix.
+        """
+
+        return decode_sequence(self.matrix[self.taxa_pos[taxon]])
+
+    def get_columns(self, start, end, shelved_taxa=None):
+        """Returns a range of columns of the active rows.
+
+        Parameters
+        ----------
+        start : int
+            Index of the first column.
+        end : int
+            Index after the last column.
+        shelved_taxa : list, optional
+            List of taxa names that should be ignored.
+
+        Returns
+        -------
+        _ : numpy.ndarray
+            (ntaxa, ncolumns) array with uint8 dtype. When no taxa are
+            shelved, this is a view of the `matrix` attribute.
+        """
+
+        if not shelved_taxa:
+            return self.matrix[:, start:end]
+
+        return self.matrix[self.row_mask(shelved_taxa), start:end]
+
+    def row_mask(self, shelved_taxa=None):
+        """Returns a boolean array with the active rows of the matrix.
+
+        Parameters
+        ----------
+        shelved_taxa : list, optional
+            List of taxa names that should be ignored.
+
+        Returns
+        -------
+        mask : numpy.ndarray
+            Boolean array with True for the rows that are active.
+        """
+
+        mask = np.ones(len(self.taxa), dtype=bool)
+
+        for tx in shelved_taxa or []:
+            try:
+                mask[self.taxa_pos[tx]] = False
+            except KeyError:
+                pass
+
+        return mask
+
+    def active(self, shelved_taxa=None, codes=False):
+        """Returns the taxa list and matrix of the active rows.
+
+        Parameters
+        ----------
+        shelved_taxa : list, optional
+            List of taxa names that should be ignored.
+        codes : bool
+            If True, packed matrices return the matrix of character codes
+            instead of characters (see `code_symbols`). Has no effect on
+            unpacked matrices.
+
+        Returns
+        -------
+        taxa : list
+            Taxa names of the active rows.
+        matrix : numpy.ndarray
+            Matrix with the active rows. When no taxa are shelved, this is
+            the `matrix` attribute itself and no copy is made.
+        """
+
+        if not shelved_taxa:
+            return self.taxa, self.matrix
+
+        mask = self.row_mask(shelved_taxa)
+
+        return [tx for tx, m in zip(self.taxa, mask) if m], self.matrix[mask]
+
+    def code_symbols(self, *symbols):
+        """Returns the symbols as they appear in the matrix of codes.
+
+        Parameters
+        ----------
+        symbols : str
+            Characters, such as the gap and missing data symbols.
+
+        Returns
+        -------
+        _ : list
+            The symbols as represented in the matrix returned by `active`
+            with `codes=True`. For unpacked matrices, these are the
+            symbols themselves.
+        """
+
+        return list(symbols)
+
+    def symbol_values(self, alphabet):
+        """Converts values of the matrix of codes into byte values.
+
+        Parameters
+        ----------
+        alphabet : numpy.ndarray
+            Array with values of the matrix returned by `active` with
+            `codes=True`.
+
+        Returns
+        -------
+        _ : numpy.ndarray
+            Byte values of the corresponding characters.
+        """
+
+        return alphabet
+
+    def iter_rows(self, shelved_taxa=None):
+        """Generator over the (txId, taxon, sequence) of the active rows.
+
+        Parameters
+        ----------
+        shelved_taxa : list, optional
+            List of taxa names that should be ignored.
+
+        Yields
+        ------
+        txid : int
+            txId of the row.
+        taxon : str
+            Taxon name.
+        seq : str
+            Sequence string.
+        """
+
+        shelved = set(shelved_taxa or [])
+
+        for p, (txid, tx) in enumerate(zip(self.txids, self.taxa)):
+            if tx not in shelved:
+                yield txid, tx, decode_sequence(self.matrix[p])
+
+    def iter_columns(self, shelved_taxa=None):
+        """Generator over the columns of the active rows.
+
+        Parameters
+        ----------
+        shelved_taxa : list, optional
+            List of taxa names that should be ignored.
+
+        Yields
+        ------
+        col : tuple
+            Tuple with the characters of each active row for a given
+            column.
+        """
+
+        _, matrix = self.active(shelved_taxa)
+
+        for col in np.ascontiguousarray(matrix.T):
+            yield tuple(col.tostring())
+
+
+class PackedMatrix(AlignmentMatrix):
+    """Packed representation of a single alignment.
+
+    Works as :class:`.AlignmentMatrix`, but the matrix is kept packed by a
+    :class:`.SequenceCodec` with 4 or 5 bits per character and is only
+    unpacked when requested. The `matrix` attribute unpacks the complete
+    matrix of characters. The column statistics can be computed directly
+    from the character codes (see `active` and `code_symbols`), which are
+    cheaper to unpack. With the "packed" backend, the sequences in the
+    sqlite database are packed by the same codecs (see
+    :func:`.pack_sequence`), and the matrix is built from them without
+    unpacking.
+
+    Parameters
+    ----------
+    txids : list
+        List with the txId of each row.
+    taxa : list
+        List with the taxon name of each row.
+    packed : numpy.ndarray
+        Packed matrix, as returned by :meth:`.SequenceCodec.encode`.
+    codec : SequenceCodec
+        Codec used to pack the matrix.
+    nsites : int
+        Number of columns of the alignment.
+    """
+
+    def __init__(self, txids, taxa, packed, codec, nsites):
+
+        self.txids = txids
+        self.taxa = taxa
+        self.packed = packed
+        self.codec = codec
+        self._nsites = nsites
+        self.taxa_pos = dict((tx, p) for p, tx in enumerate(taxa))
+
+    @property
+    def matrix(self):
+        return self.codec.decode(self.packed, self._nsites)
+
+    @property
+    def nsites(self):
+        return self._nsites
+
+    def get_sequence(self, taxon):
+
+        p = self.taxa_pos[taxon]
+
+        return decode_sequence(
+            self.codec.decode(self.packed[p:p + 1], self._nsites)[0])
+
+    def get_columns(self, start, end, shelved_taxa=None):
+
+        start, end, _ = slice(start, end).indices(self._nsites)
+        end = max(start, end)
+
+        # Only the packed groups that overlap the range are decoded
+        g, gb = self.codec.group, self.codec.group_bytes
+        first, last = start // g, -(-end // g)
+
+        packed = self.packed[:, first * gb:last * gb]
+        if shelved_taxa:
+            packed = packed[self.row_mask(shelved_taxa)]
+
+        return self.codec.decode(packed, (last - first) * g)[
+            :, start - first * g:end - first * g]
+
+    def active(self, shelved_taxa=None, codes=False):
+
+        taxa, packed = self.taxa, self.packed
+
+        if shelved_taxa:
+            mask = self.row_mask(shelved_taxa)
+            taxa = [tx for tx, m in zip(taxa, mask) if m]
+            packed = packed[mask]
+
+        if codes:
+            return taxa, self.codec.codes(packed, self._nsites)
+
+        return taxa, self.codec.decode(packed, self._nsites)
+
+    def code_symbols(self, *symbols):
+
+        # Symbols that cannot be encoded are mapped to a value that is
+        # never used by the codes
+        return [chr(self.codec.lookup[ord(x)]) for x in symbols]
+
+    def symbol_values(self, alphabet):
+
+        return self.codec.symbols[alphabet]
+
+    def iter_rows(self, shelved_taxa=None):
+
+        shelved = set(shelved_taxa or [])
+
+        for p, (txid, tx) in enumerate(zip(self.txids, self.taxa)):
+            if tx not in shelved:
+                yield txid, tx, self.get_sequence(tx)
+
+
+class CompressedMatrix(AlignmentMatrix):
+    """Compressed in-memory representation of a single alignment.
+
+    Works as :class:`.AlignmentMatrix`, but the matrix is split into blocks
+    that are compressed separately with zlib or bz2. The rows are first
+    split into groups of at most `block_rows` taxa, and the columns of each
+    group are then split into blocks of at most `block_size` characters.
+    The index of the first row of each group is kept in `row_offsets` and
+    the index of the first column of each block in `offsets`, so that a
+    sequence (see `get_sequence`) only decompresses the blocks of its row
+    group, and a range of columns (see `get_columns`) only decompresses the
+    blocks that overlap it. Repeated haplotypes and long runs of gaps or
+    missing data within a row group are compressed together. The blocks
+    are built from the rows of the database, where each sequence is
+    compressed on its own (see :func:`.pack_sequence`).
+
+    Parameters
+    ----------
+    txids : list
+        List with the txId of each row.
+    taxa : list
+        List with the taxon name of each row.
+    matrix : numpy.ndarray
+        (ntaxa, nsites) array with uint8 dtype.
+    method : {"zlib", "bz2"}
+        Compression method.
+    block_size : int
+        Maximum number of characters (taxa x columns) of each block.
+    block_rows : int
+        Maximum number of rows of each row group.
+
+    Attributes
+    ----------
+    blocks : list
+        List with the compressed strings of the blocks of each row group.
+    row_offsets : numpy.ndarray
+        Index of the first row of each row group, followed by the number of
+        rows of the alignment.
+    offsets : numpy.ndarray
+        Index of the first column of each block, followed by the number of
+        columns of the alignment.
+    """
+
+    compressors = {"zlib": (zlib.compress, zlib.decompress),
+                   "bz2": (bz2.compress, bz2.decompress)}
+
+    def __init__(self, txids, taxa, matrix, method="zlib",
+                 block_size=2 ** 20, block_rows=64):
+
+        self.txids = txids
+        self.taxa = taxa
+        self.taxa_pos = dict((tx, p) for p, tx in enumerate(taxa))
+        self.method = method
+
+        compress = self.compressors[method][0]
+        ntaxa, self._nsites = matrix.shape
+        rows = max(1, min(block_rows, ntaxa))
+        step = max(1, block_size // rows)
+
+        self.row_offsets = np.append(np.arange(0, ntaxa, rows), ntaxa)
+        self.offsets = np.append(np.arange(0, self._nsites, step),
+                                 self._nsites)
+        self.blocks = [[compress(np.ascontiguousarray(
+            matrix[r0:r1, a:b]).tostring())
+            for a, b in zip(self.offsets[:-1], self.offsets[1:])]
+            for r0, r1 in zip(self.row_offsets[:-1], self.row_offsets[1:])]
+
+    @property
+    def matrix(self):
+        return self.get_columns(0, self._nsites)
+
+    @property
+    def nsites(self):
+        return self._nsites
+
+    def _get_block(self, g, i):
+        """Decompresses a block.
+
+        Parameters
+        ----------
+        g : int
+            Index of the row group.
+        i : int
+            Index of the block of columns.
+
+        Returns
+        -------
+        _ : numpy.ndarray
+            (nrows, ncolumns) array with uint8 dtype.
+        """
+
+        return np.frombuffer(self.compressors[self.method][1](
+            self.blocks[g][i]), dtype=np.uint8).reshape(
+            self.row_offsets[g + 1] - self.row_offsets[g], -1)
+
+    def _get_rows(self, g, start, end):
+        """Decompresses a range of columns of a row group.
+
+        Parameters
+        ----------
+        g : int
+            Index of the row group.
+        start : int
+            Index of the first column.
+        end : int
+            Index after the last column. Must not be lower than `start`.
+
+        Returns
+        -------
+        _ : numpy.ndarray
+            (nrows, ncolumns) array with uint8 dtype.
+        """
+
+        # Blocks that overlap the [start, end) range
+        first = max(np.searchsorted(self.offsets, start, "right") - 1, 0)
+        last = np.searchsorted(self.offsets, end, "left")
+
+        if last <= first:
+            return np.zeros((self.row_offsets[g + 1] - self.row_offsets[g],
+                             0), dtype=np.uint8)
+
+        offset = self.offsets[first]
+
+        return np.hstack([self._get_block(g, i) for i in
+                          xrange(first, last)])[:, start - offset:
+                                                end - offset]
+
+    def get_columns(self, start, end, shelved_taxa=None):
+
+        start, end, _ = slice(start, end).indices(self._nsites)
+        end = max(start, end)
+        mask = self.row_mask(shelved_taxa)
+
+        groups = []
+        for g, (r0, r1) in enumerate(zip(self.row_offsets[:-1],
+                                         self.row_offsets[1:])):
+            # Row groups with only shelved taxa are not decompressed
+            if mask[r0:r1].any():
+                groups.append(self._get_rows(g, start, end)[mask[r0:r1]])
+
+        if not groups:
+            return np.zeros((0, end - start), dtype=np.uint8)
+
+        return np.vstack(groups)
+
+    def get_sequence(self, taxon):
+
+        p = self.taxa_pos[taxon]
+        g = np.searchsorted(self.row_offsets, p, "right") - 1
+
+        return decode_sequence(self._get_rows(g, 0, self._nsites)[
+            p - self.row_offsets[g]])
+
+    def active(self, shelved_taxa=None, codes=False):
+
+        mask = self.row_mask(shelved_taxa)
+
+        return [tx for tx, m in zip(self.taxa, mask) if m], \
+            self.get_columns(0, self._nsites, shelved_taxa)
+
+    def iter_rows(self, shelved_taxa=None):
+
+        shelved = set(shelved_taxa or [])
+
+        # Each row group is decompressed once for all of its rows
+        for g, (r0, r1) in enumerate(zip(self.row_offsets[:-1],
+                                         self.row_offsets[1:])):
+
+            rows = None
+            for p in xrange(r0, r1):
+                if self.taxa[p] not in shelved:
+                    if rows is None:
+                        rows = self._get_rows(g, 0, self._nsites)
+                    yield self.txids[p], self.taxa[p], \
+                        decode_sequence(rows[p - r0])
+
+
+class MatrixStore(object):
+    """Columnar storage backend for the alignment data.
+
+    Stores :class:`.AlignmentMatrix` objects for each (table name, aln_idx)
+    pair that is requested. Matrices are loaded lazily from the sqlite
+    database with a single query per table and are kept in memory or, if
+    `memmap_dir` is provided, saved as `.npy` files in that directory and
+    accessed through read-only memory maps.
+
+    The sqlite tables remain the single source of truth, and the store
+    only keeps derived copies of their data. With packed or compressed
+    matrices, the sequences written to the database are packed or
+    compressed as well (see `storage` and :func:`.pack_sequence`), and
+    packed matrices are built directly from the packed rows.
+
+    Whenever the database connection reports changes to the database (via
+    `sqlite3.Connection.total_changes`), the matrices that may be outdated
+    are discarded. For tables registered with `track`, temporary triggers
+    log the aln_idx of every inserted, updated or deleted row in the
+    `matrix_changes` temporary table, so that only the matrices of those
+    alignments are discarded. The matrices of other tables are discarded
+    on any change.
+
+    Alignments can also be read from another source than the database,
+    such as the memory map of a project file (see `add_source`), until
+    they are copied into the database. Their matrices are built from the
+    source without querying the database.
+
+    Parameters
+    ----------
+    memmap_dir : str, optional
+        Path to the directory where the `.npy` memory maps are stored. If
+        not provided, matrices are kept in memory.
+    packed : bool, optional
+        If True, matrices are stored as :class:`.PackedMatrix` objects,
+        using the 4-bit nucleotide codec or, when the alignment has other
+        characters, the 5-bit protein codec. Alignments with characters
+        that neither codec supports are stored unpacked. The sequences
+        are also packed in the database.
+    compress : {None, "zlib", "bz2"}, optional
+        If provided, matrices are stored as :class:`.CompressedMatrix`
+        objects, using this compression method. Compressed matrices are
+        always kept in memory. The sequences are also compressed in the
+        database, each one on its own.
+
+    Attributes
+    ----------
+    memmap_dir : str
+        Path to the directory where the `.npy` memory maps are stored.
+    packed : bool
+        Whether matrices are stored packed.
+    compress : str
+        Compression method of the matrices, or None.
+    matrices : dict
+        Maps (table name, aln_idx) tuples to :class:`.AlignmentMatrix`
+        objects.
+    sources : dict
+        Maps (table name, aln_idx) tuples to the (project, index) tuple
+        of the alignments that are read from a
+        :class:`~trifusion.process.project.ProjectFile` instead of the
+        database.
+    """
+
+    def __init__(self, memmap_dir=None, packed=False, compress=None):
+
+        self.memmap_dir = memmap_dir
+
+        self.packed = packed
+
+        self.compress = compress
+
+        self.matrices = {}
+
+        self.sources = {}
+
+        self._files = {}
+        """
+        Maps (table name, aln_idx) tuples to the path of the `.npy` file
+        of their matrix.
+        """
+
+        self._version = None
+        """
+        Tuple with the identity and number of total changes of the database
+        connection when the store was last used.
+        """
+
+        self._counter = 0
+
+        self._last_change = 0
+        """
+        Last entry of the `matrix_changes` table that was checked.
+        """
+
+    @property
+    def storage(self):
+        """Format of the sequences written to the database.
+
+        Returns
+        -------
+        _ : str or None
+            `method` argument of :func:`.pack_sequence`, or None if the
+            sequences are stored as TEXT.
+        """
+
+        if self.compress:
+            return self.compress
+
+        return "packed" if self.packed else None
+
+    def __getstate__(self):
+
+        # Matrices and memory maps are not carried over when the object is
+        # pickled. They will be reloaded from the database when needed.
+        self.clear()
+        return self.__dict__
+
+    def _check_version(self, con):
+        """Discards the stored matrices that may be outdated.
+
+        All matrices are discarded when a different database connection is
+        used. Otherwise, if the database has changed, only the matrices of
+        the alignments logged in the `matrix_changes` table and those of
+        untracked tables are discarded.
+
+        Parameters
+        ----------
+        con : sqlite3.Connection
+            Database Connection object.
+        """
+
+        if self._version is None or self._version[0] != id(con):
+            self.clear()
+            self._last_change = self._get_changes(con)[0]
+
+        elif self._version[1] != con.total_changes:
+
+            self._last_change, changes = self._get_changes(con)
+
+            # Tables whose triggers are missing, either because they were
+            # never tracked or because they were dropped, are discarded
+            # altogether
+            tracked = set(x[0] for x in con.cursor().execute(
+                "SELECT tbl_name FROM sqlite_temp_master "
+                "WHERE type='trigger' AND name LIKE 'matrix_delete_%'"))
+
+            for key in list(self.matrices):
+                if key[0] not in tracked or key in changes:
+                    self._discard(key)
+
+        self._version = (id(con), con.total_changes)
+
+    def _get_changes(self, con):
+        """Returns the alignments logged since the last check.
+
+        Parameters
+        ----------
+        con : sqlite3.Connection
+            Database Connection object.
+
+        Returns
+        -------
+        last_change : int
+            Last entry of the `matrix_changes` table.
+        changes : set
+            Set of (table name, aln_idx) tuples logged after the entry
+            in the `_last_change` attribute.
+        """
+
+        cur = con.cursor()
+
+        if not cur.execute("SELECT name FROM sqlite_temp_master "
+                           "WHERE type='table' AND "
+                           "name='matrix_changes'").fetchall():
+            return 0, set()
+
+        last_change, changes = self._last_change, set()
+
+        for change, table_name, aln_idx in cur.execute(
+                "SELECT change, name, aln_idx FROM temp.matrix_changes "
+                "WHERE change > ?", (self._last_change,)):
+            changes.add((table_name, aln_idx))
+            last_change = max(last_change, change)
+
+        return last_change, changes
+
+    def track(self, con, table_name):
+        """Logs the changes to a table in the `matrix_changes` table.
+
+        Creates temporary triggers that log the aln_idx of the rows that
+        are inserted, updated or deleted in the table, so that changes to
+        the table only discard the matrices of the modified alignments.
+        The stored matrices of the table are discarded. Since creating
+        triggers commits any pending transaction, this should be called
+        right after the table is created or replaced.
+
+        Parameters
+        ----------
+        con : sqlite3.Connection
+            Database Connection object. Only changes made through this
+            connection are logged.
+        table_name : str
+            Name of the database table. It must have an aln_idx column.
+        """
+
+        cur = con.cursor()
+
+        # Each change replaces the previous entry of the same alignment,
+        # so that the table holds at most one entry per alignment and the
+        # `change` column always increases
+        cur.execute("CREATE TEMP TABLE IF NOT EXISTS matrix_changes("
+                    "change INTEGER PRIMARY KEY AUTOINCREMENT, "
+                    "name TEXT, "
+                    "aln_idx INT, "
+                    "UNIQUE (name, aln_idx))")
+
+        self.untrack(con, table_name)
+
+        name = table_name.replace("'", "''")
+        for event, rows in [("insert", ["NEW"]), ("delete", ["OLD"]),
+                            ("update", ["OLD", "NEW"])]:
+            cur.execute(
+                "CREATE TEMP TRIGGER [matrix_{0}_{1}] "
+                "AFTER {2} ON main.[{1}] BEGIN {3} END".format(
+                    event, table_name, event.upper(), " ".join(
+                        "INSERT OR REPLACE INTO matrix_changes "
+                        "(name, aln_idx) VALUES ('{}', {}.aln_idx);".format(
+                            name, x) for x in rows)))
+
+        self.discard(table_name)
+
+    def untrack(self, con, table_name):
+        """Removes the triggers created by `track` for a table.
+
+        Parameters
+        ----------
+        con : sqlite3.Connection
+            Database Connection object.
+        table_name : str
+            Name of the database table.
+        """
+
+        cur = con.cursor()
+
+        for event in ["insert", "delete", "update"]:
+            cur.execute("DROP TRIGGER IF EXISTS temp.[matrix_{}_{}]".format(
+                event, table_name))
+
+    def _discard(self, key):
+        """Removes a matrix and its memory map file from the store.
+
+        Parameters
+        ----------
+        key : tuple
+            (table name, aln_idx) tuple of the matrix.
+        """
+
+        self.matrices.pop(key, None)
+
+        path = self._files.pop(key, None)
+        if path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def discard(self, table_name):
+        """Removes all matrices of a table from the store.
+
+        Parameters
+        ----------
+        table_name : str
+            Name of the database table.
+        """
+
+        for key in list(self.matrices):
+            if key[0] == table_name:
+                self._discard(key)
+
+    def add_source(self, table_name, aln_idx, project, index):
+        """Reads an alignment from a project file instead of the database.
+
+        The alignment must not have rows in the table. Its matrix is built
+        from the read-only memory map of the project file until the source
+        is removed with `remove_source`, which should be done when the
+        alignment is copied into the table.
+
+        Parameters
+        ----------
+        table_name : str
+            Name of the database table.
+        aln_idx : int
+            aln_idx of the alignment.
+        project : trifusion.process.project.ProjectFile
+            Project file with the alignment.
+        index : int
+            Index of the alignment in the project file.
+        """
+
+        self._discard((table_name, aln_idx))
+        self.sources[(table_name, aln_idx)] = (project, index)
+
+    def get_source(self, table_name, aln_idx):
+        """Returns the source of an alignment.
+
+        Parameters
+        ----------
+        table_name : str
+            Name of the database table.
+        aln_idx : int
+            aln_idx of the alignment.
+
+        Returns
+        -------
+        _ : tuple or None
+            (project, index) tuple provided to `add_source`, or None if the
+            alignment is read from the database.
+        """
+
+        return self.sources.get((table_name, aln_idx))
+
+    def get_sources(self, table_name):
+        """Returns the alignments of a table that have a source.
+
+        Parameters
+        ----------
+        table_name : str
+            Name of the database table.
+
+        Returns
+        -------
+        _ : list
+            Sorted list with the aln_idx of the alignments.
+        """
+
+        return sorted(x[1] for x in self.sources if x[0] == table_name)
+
+    def remove_source(self, table_name, aln_idx):
+        """Reads an alignment from the database again.
+
+        The matrix built from the source is discarded. The project file is
+        not closed, since other objects may still use its memory map, and
+        is released when it is no longer referenced.
+
+        Parameters
+        ----------
+        table_name : str
+            Name of the database table.
+        aln_idx : int
+            aln_idx of the alignment.
+        """
+
+        if self.sources.pop((table_name, aln_idx), None):
+            self._discard((table_name, aln_idx))
+
+    def clear_sources(self):
+        """Removes the sources of all alignments."""
+
+        for key in list(self.sources):
+            self.remove_source(*key)
+
+    def _build_matrix(self, rows, key):
+        """Creates an :class:`.AlignmentMatrix` from database rows.
+
+        Parameters
+        ----------
+        rows : list
+            List of (txId, taxon, seq) tuples, with the sequences as
+            retrieved from the database.
+        key : tuple
+            (table name, aln_idx) tuple of the matrix.
+
+        Returns
+        -------
+        _ : AlignmentMatrix
+        """
+
+        if rows:
+            txids, taxa, seqs = [list(x) for x in zip(*rows)]
+        else:
+            txids, taxa, seqs = [], [], []
+
+        # Rows packed with the same codec are used without unpacking them
+        joined = join_packed_sequences(seqs) if self.packed and \
+            not self.compress else None
+
+        if joined:
+            codec, nsites, matrix = joined
+            return self._store_matrix(txids, taxa, matrix, key, codec,
+                                      nsites)
+
+        return self._store_matrix(txids, taxa, encode_sequences(
+            [unpack_sequence(x) for x in seqs]), key)
+
+    def _source_matrix(self, key):
+        """Creates an :class:`.AlignmentMatrix` from the source of an
+        alignment.
+
+        Parameters
+        ----------
+        key : tuple
+            (table name, aln_idx) tuple of the matrix.
+
+        Returns
+        -------
+        _ : AlignmentMatrix
+        """
+
+        project, index = self.sources[key]
+        aln = project.alignments[index]
+
+        return self._store_matrix(list(aln["txids"]), list(aln["taxa"]),
+                                  project.get_matrix(index), key,
+                                  mapped=True)
+
+    def _store_matrix(self, txids, taxa, matrix, key, codec=None,
+                      nsites=None, mapped=False):
+        """Creates the :class:`.AlignmentMatrix` kept by the store.
+
+        Parameters
+        ----------
+        txids : list
+            List with the txId of each row.
+        taxa : list
+            List with the taxon name of each row.
+        matrix : numpy.ndarray
+            (ntaxa, nsites) array with uint8 dtype or, if `codec` is
+            provided, the matrix packed by `codec`.
+        key : tuple
+            (table name, aln_idx) tuple of the matrix.
+        codec : SequenceCodec, optional
+            Codec that packed `matrix`.
+        nsites : int, optional
+            Number of columns of the alignment, if `matrix` is packed.
+        mapped : bool, optional
+            If True, `matrix` is already a read-only memory map, which is
+            used instead of saving it to a new `.npy` file.
+
+        Returns
+        -------
+        _ : AlignmentMatrix
+        """
+
+        if codec is None:
+            nsites = matrix.shape[1]
+
+        if self.compress:
+            return CompressedMatrix(txids, taxa, matrix, self.compress)
+
+        if self.packed and not codec:
+            for codec in [dna_codec, protein_codec]:
+                packed = codec.encode(matrix)
+                if packed is not None:
+                    matrix, mapped = packed, False
+                    break
+            else:
+                codec = None
+
+        if self.memmap_dir and matrix.size and not mapped:
+
+            if not exists(self.memmap_dir):
+                os.makedirs(self.memmap_dir)
+
+            path = join(self.memmap_dir, "matrix{}.npy".format(self._counter))
+            self._counter += 1
+
+            np.save(path, matrix)
+            self._files[key] = path
+            matrix = np.load(path, mmap_mode="r")
+
+        if codec:
+            return PackedMatrix(txids, taxa, matrix, codec, nsites)
+
+        return AlignmentMatrix(txids, taxa, matrix)
+
+    def get_matrices(self, con, table_name, aln_idx_list):
+        """Returns the matrices of several alignments from a table.
+
+        Matrices that are not yet in the store are built from the source of
+        their alignment (see `add_source`) or fetched from the database
+        with a single query.
+
+        Parameters
+        ----------
+        con : sqlite3.Connection
+            Database Connection object.
+        table_name : str
+            Name of the database table.
+        aln_idx_list : list
+            List of the aln_idx of the alignments.
+
+        Returns
+        -------
+        matrices : OrderedDict
+            Maps each aln_idx to its :class:`.AlignmentMatrix`, in the same
+            order as `aln_idx_list`.
+        """
+
+        self._check_version(con)
+
+        missing = []
+        for x in aln_idx_list:
+            key = (table_name, x)
+            if key in self.sources and key not in self.matrices:
+                self.matrices[key] = self._source_matrix(key)
+            elif key not in self.matrices:
+                missing.append(x)
+
+        if missing:
+
+            rows = OrderedDict((x, []) for x in missing)
+
+            # A new cursor is used so that an ongoing query in any other
+            # cursor is not disrupted
+            for txid, tx, seq, aln_idx in con.cursor().execute(
+                    "SELECT txId, taxon, seq, aln_idx "
+                    "FROM [{}] "
+                    "WHERE aln_idx IN ({})".format(
+                        table_name, ", ".join([str(x) for x in missing]))):
+                rows[aln_idx].append((txid, tx, seq))
+
+            for aln_idx, r in rows.items():
+                self.matrices[(table_name, aln_idx)] = self._build_matrix(
+                    r, (table_name, aln_idx))
+
+        return OrderedDict((x, self.matrices[(table_name, x)])
+                           for x in aln_idx_list)
+
+    def get_matrix(self, con, table_name, aln_idx):
+        """Returns the matrix of a single alignment from a table.
+
+        Parameters
+        ----------
+        con : sqlite3.Connection
+            Database Connection object.
+        table_name : str
+            Name of the database table.
+        aln_idx : int
+            aln_idx of the alignment.
+
+        Returns
+        -------
+        _ : AlignmentMatrix
+        """
+
+        return self.get_matrices(con, table_name, [aln_idx])[aln_idx]
+
+    def clear(self):
+        """Removes all matrices and memory map files from the store."""
+
+        for key in list(self._files):
+            self._discard(key)
+
+        self.matrices = {}
+        self._version = None
+
+
+class ResultCache(object):
+    """Cache of results computed from the database.
+
+    Works as the :class:`.MatrixStore`, in that all cached results are
+    discarded whenever the database connection reports changes to the
+    database.
+
+    Attributes
+    ----------
+    data : dict
+        Maps keys to the cached results.
+    """
+
+    def __init__(self):
+
+        self.data = {}
+        self._version = None
+
+    def __eq__(self, other):
+        return isinstance(other, ResultCache) and self.data == other.data
+
+    def __ne__(self, other):
+        return not self == other
+
+    def _check_version(self, con):
+
+        version = (id(con), con.total_changes)
+
+        if version != self._version:
+            self.clear()
+            self._version = version
+
+    def is_current(self, con):
+        """Checks if the cached results match the state of the database.
+
+        Parameters
+        ----------
+        con : sqlite3.Connection
+            Database Connection object.
+
+        Returns
+        -------
+        _ : bool
+            True if the database has not changed since the cache was last
+            used.
+        """
+
+        return self._version == (id(con), con.total_changes)
+
+    def refresh(self, con):
+        """Keeps the cached results after changes to the database.
+
+        Should only be used after changes that do not affect any of the
+        cached results, such as the addition of new alignments.
+
+        Parameters
+        ----------
+        con : sqlite3.Connection
+            Database Connection object.
+        """
+
+        self._version = (id(con), con.total_changes)
+
+    def get(self, con, key):
+        """Returns a cached result, or None if it is not available.
+
+        Parameters
+        ----------
+        con : sqlite3.Connection
+            Database Connection object.
+        key : hashable
+            Key of the result.
+        """
+
+        self._check_version(con)
+
+        return self.data.get(key)
+
+    def set(self, con, key, value):
+        """Stores a result in the cache.
+
+        Parameters
+        ----------
+        con : sqlite3.Connection
+            Database Connection object.
+        key : hashable
+            Key of the result.
+        value : object
+            Result to be stored.
+        """
+
+        self._check_version(con)
+
+        self.data[key] = value
+
+    def clear(self):
+        """Removes all cached results."""
+
+        self.data = {}
+        self._version = None
+
+
+class TaxaPresence(object):
+    """Presence bitmap of taxa across alignments.
+
+    Keeps a boolean (ntaxa, nalignments) matrix where each element
+    indicates whether a taxon is present in an alignment. Rows are indexed
+    by taxon name and columns by the `aln_idx` of the alignments. Queries
+    on the taxa composition of alignments (e.g., the minimum taxa and
+    taxa filters and the gene occupancy plots) are then answered with
+    vectorized operations over the bitmap, without retrieving the
+    `taxa_idx` of each alignment from the database.
+
+    The bitmap grows as taxa and alignments are added, doubling its
+    capacity in each dimension when full.
+
+    Attributes
+    ----------
+    taxa : list
+        Taxon name of each row of the bitmap.
+    taxa_index : dict
+        Maps each taxon name to its row in the bitmap.
+    columns : dict
+        Maps the `aln_idx` of each alignment to its column in the bitmap.
+    bitmap : numpy.ndarray
+        Boolean array with the presence of each taxon in each alignment.
+        Only the first len(`taxa`) rows and `ncols` columns are used.
+    ncols : int
+        Number of columns of the bitmap that have been assigned to
+        alignments.
+    """
+
+    def __init__(self):
+
+        self.taxa = []
+        self.taxa_index = {}
+        self.columns = {}
+        self.bitmap = np.zeros((0, 0), dtype=bool)
+        self.ncols = 0
+
+    def __eq__(self, other):
+        return isinstance(other, TaxaPresence) and \
+            (self.taxa, self.columns) == (other.taxa, other.columns) and \
+            np.array_equal(self._used(), other._used())
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __contains__(self, aln_idx):
+        return aln_idx in self.columns
+
+    def _used(self):
+        return self.bitmap[:len(self.taxa), :self.ncols]
+
+    def _resize(self, nrows, ncols):
+        """Ensures that the bitmap has at least (nrows, ncols) elements.
+
+        Parameters
+        ----------
+        nrows : int
+            Minimum number of rows.
+        ncols : int
+            Minimum number of columns.
+        """
+
+        shape = self.bitmap.shape
+
+        if nrows <= shape[0] and ncols <= shape[1]:
+            return
+
+        bitmap = np.zeros((max(nrows, shape[0] * 2),
+                           max(ncols, shape[1] * 2)), dtype=bool)
+        bitmap[:shape[0], :shape[1]] = self.bitmap
+        self.bitmap = bitmap
+
+    def _get_rows(self, taxa, create=False):
+        """Returns the rows of a list of taxa.
+
+        Parameters
+        ----------
+        taxa : iterable
+            Taxon names.
+        create : bool
+            If True, rows are created for the taxa that are not yet in the
+            bitmap. Otherwise, these taxa are ignored.
+
+        Returns
+        -------
+        _ : numpy.ndarray
+            Array with the row of each taxon.
+        """
+
+        if create:
+            for taxon in taxa:
+                if taxon not in self.taxa_index:
+                    self.taxa_index[taxon] = len(self.taxa)
+                    self.taxa.append(taxon)
+            self._resize(len(self.taxa), self.ncols)
+
+        return np.array([self.taxa_index[x] for x in taxa
+                         if x in self.taxa_index], dtype=np.intp)
+
+    def _get_columns(self, aln_idx_list):
+        """Returns the columns of a list of alignments.
+
+        Parameters
+        ----------
+        aln_idx_list : list
+            List with the `aln_idx` of the alignments.
+
+        Returns
+        -------
+        _ : numpy.ndarray
+            Array with the column of each alignment.
+        """
+
+        return np.array([self.columns[x] for x in aln_idx_list],
+                        dtype=np.intp)
+
+    def add(self, aln_idx, taxa):
+        """Sets the taxa present in an alignment.
+
+        Parameters
+        ----------
+        aln_idx : int
+            `aln_idx` of the alignment. If it is already in the bitmap, its
+            taxa are replaced.
+        taxa : iterable
+            Names of the taxa present in the alignment.
+        """
+
+        if aln_idx not in self.columns:
+            self.columns[aln_idx] = self.ncols
+            self.ncols += 1
+            self._resize(len(self.taxa), self.ncols)
+
+        col = self.columns[aln_idx]
+        rows = self._get_rows(list(taxa), create=True)
+
+        self.bitmap[:, col] = False
+        self.bitmap[rows, col] = True
+
+    def remove(self, aln_idx_list):
+        """Removes alignments from the bitmap.
+
+        Parameters
+        ----------
+        aln_idx_list : list
+            List with the `aln_idx` of the alignments.
+        """
+
+        for aln_idx in aln_idx_list:
+            if aln_idx in self.columns:
+                self.bitmap[:, self.columns.pop(aln_idx)] = False
+
+    def discard_taxa(self, taxa, aln_idx_list):
+        """Marks taxa as absent from a set of alignments.
+
+        Parameters
+        ----------
+        taxa : list
+            Taxon names.
+        aln_idx_list : list
+            List with the `aln_idx` of the alignments.
+        """
+
+        rows = self._get_rows(taxa)
+        cols = self._get_columns(aln_idx_list)
+
+        self.bitmap[np.ix_(rows, cols)] = False
+
+    def retain_taxa(self, taxa, aln_idx_list):
+        """Marks all but the provided taxa as absent from a set of alignments.
+
+        Parameters
+        ----------
+        taxa : list
+            Taxon names that are kept.
+        aln_idx_list : list
+            List with the `aln_idx` of the alignments.
+        """
+
+        keep = np.zeros(self.bitmap.shape[0], dtype=bool)
+        keep[self._get_rows(taxa)] = True
+        cols = self._get_columns(aln_idx_list)
+
+        self.bitmap[np.ix_(~keep, cols)] = False
+
+    def rename(self, old_name, new_name, aln_idx_list):
+        """Renames a taxon in a set of alignments.
+
+        Parameters
+        ----------
+        old_name : str
+            Original taxon name.
+        new_name : str
+            New taxon name.
+        aln_idx_list : list
+            List with the `aln_idx` of the alignments where the taxon is
+            renamed.
+        """
+
+        if old_name not in self.taxa_index:
+            return
+
+        new_row = self._get_rows([new_name], create=True)[0]
+        old_row = self.taxa_index[old_name]
+        cols = self._get_columns(aln_idx_list)
+
+        self.bitmap[new_row, cols] |= self.bitmap[old_row, cols]
+        self.bitmap[old_row, cols] = False
+
+    def get_matrix(self, aln_idx_list, taxa):
+        """Returns the presence matrix of taxa in a set of alignments.
+
+        Parameters
+        ----------
+        aln_idx_list : list
+            List with the `aln_idx` of the alignments.
+        taxa : list
+            Taxon names. Taxa that are not in the bitmap are absent from
+            all alignments.
+
+        Returns
+        -------
+        matrix : numpy.ndarray
+            Boolean (len(taxa), len(aln_idx_list)) array.
+        """
+
+        cols = self._get_columns(aln_idx_list)
+        matrix = np.zeros((len(taxa), len(cols)), dtype=bool)
+
+        known = [p for p, x in enumerate(taxa) if x in self.taxa_index]
+        matrix[known] = self.bitmap[np.ix_(self._get_rows(taxa), cols)]
+
+        return matrix
+
+    def _get_query(self, aln_idx_list, taxa, exclude):
+        """Returns the presence matrix of the queried taxa.
+
+        Parameters
+        ----------
+        aln_idx_list : list
+            List with the `aln_idx` of the alignments.
+        taxa : list
+            Taxon names.
+        exclude : iterable
+            Taxon names that are ignored.
+
+        Returns
+        -------
+        _ : numpy.ndarray
+            Boolean array with one row for each unique taxon in `taxa`
+            that is not in `exclude`, and one column for each alignment.
+        """
+
+        exclude = set(exclude) if exclude else set()
+        taxa = [x for x in set(taxa) if x not in exclude]
+
+        return self.get_matrix(aln_idx_list, taxa)
+
+    def count_taxa(self, aln_idx_list, exclude=None):
+        """Returns the number of taxa present in each alignment.
+
+        Parameters
+        ----------
+        aln_idx_list : list
+            List with the `aln_idx` of the alignments.
+        exclude : iterable, optional
+            Taxon names that are not counted.
+
+        Returns
+        -------
+        _ : numpy.ndarray
+            Number of taxa of each alignment.
+        """
+
+        return self._get_query(aln_idx_list, self.taxa, exclude).sum(axis=0)
+
+    def count_alignments(self, aln_idx_list, taxa):
+        """Returns the number of alignments where each taxon is present.
+
+        Parameters
+        ----------
+        aln_idx_list : list
+            List with the `aln_idx` of the alignments.
+        taxa : list
+            Taxon names.
+
+        Returns
+        -------
+        _ : numpy.ndarray
+            Number of alignments of each taxon in `taxa`.
+        """
+
+        return self.get_matrix(aln_idx_list, taxa).sum(axis=1)
+
+    def contain_all(self, aln_idx_list, taxa, exclude=None):
+        """Checks which alignments contain all of the provided taxa.
+
+        Parameters
+        ----------
+        aln_idx_list : list
+            List with the `aln_idx` of the alignments.
+        taxa : list
+            Taxon names.
+        exclude : iterable, optional
+            Taxon names that are considered absent from all alignments.
+
+        Returns
+        -------
+        _ : numpy.ndarray
+            Boolean array, True for the alignments with all taxa.
+        """
+
+        return self.contain_at_least(aln_idx_list, taxa, len(set(taxa)),
+                                     exclude)
+
+    def contain_any(self, aln_idx_list, taxa, exclude=None):
+        """Checks which alignments contain at least one of the provided taxa.
+
+        Parameters
+        ----------
+        aln_idx_list : list
+            List with the `aln_idx` of the alignments.
+        taxa : list
+            Taxon names.
+        exclude : iterable, optional
+            Taxon names that are considered absent from all alignments.
+
+        Returns
+        -------
+        _ : numpy.ndarray
+            Boolean array, True for the alignments with any of the taxa.
+        """
+
+        return self.contain_at_least(aln_idx_list, taxa, 1, exclude)
+
+    def contain_at_least(self, aln_idx_list, taxa, k, exclude=None):
+        """Checks which alignments contain at least `k` of the provided taxa.
+
+        Parameters
+        ----------
+        aln_idx_list : list
+            List with the `aln_idx` of the alignments.
+        taxa : list
+            Taxon names.
+        k : int
+            Minimum number of taxa from `taxa` present in the alignment.
+        exclude : iterable, optional
+            Taxon names that are considered absent from all alignments.
+
+        Returns
+        -------
+        _ : numpy.ndarray
+            Boolean array, True for the alignments with at least `k` of the
+            taxa.
+        """
+
+        return self._get_query(aln_idx_list, taxa, exclude).sum(axis=0) >= k
+
+    def clear(self):
+        """Removes all taxa and alignments."""
+
+        self.__init__()
+
+
+def iter_row_lines(chunks, width):
+    """Generator over fixed width lines of a sequence given in chunks.
+
+    Parameters
+    ----------
+    chunks : iterable
+        Consecutive chunks of the sequence string, e.g., the characters of
+        a matrix row in each column block.
+    width : int
+        Number of characters of each line.
+
+    Yields
+    ------
+    line : str
+        Line with at most `width` characters. An empty sequence results in
+        a single empty line.
+    """
+
+    buf = ""
+    empty = True
+
+    for chunk in chunks:
+        buf += chunk
+        end = len(buf) - len(buf) % width
+
+        for i in xrange(0, end, width):
+            empty = False
+            yield buf[i:i + width]
+
+        buf = buf[end:]
+
+    if buf or empty:
+        yield buf
+
+
+class ColumnBlocks(object):
+    """Column blocks of an alignment that can be traversed several times.
+
+    When the alignment fits in a single block, it is kept in memory.
+    Otherwise, the blocks are written sequentially to a temporary file in
+    `temp_dir`, and read back from the file when requested, so that memory
+    usage stays bounded by the size of one block regardless of the
+    alignment size.
+
+    Parameters
+    ----------
+    blocks : iterable
+        Column blocks of the alignment, as (ntaxa, ncolumns) arrays with
+        uint8 dtype.
+    temp_dir : str
+        Directory where the temporary file is created.
+    spill : bool, optional
+        If False, the blocks are not stored and can only be traversed once,
+        by iterating over this object. This allows the same code to handle
+        layouts that require a single pass over the blocks (default is
+        True).
+
+    Attributes
+    ----------
+    block : numpy.ndarray
+        The single block of the alignment, when it is kept in memory.
+    path : str
+        Path to the temporary file, or None if the blocks are not stored
+        in a file.
+    shapes : list
+        List of (offset, ntaxa, ncolumns) tuples with the position in the
+        temporary file and the shape of each block.
+    """
+
+    def __init__(self, blocks, temp_dir, spill=True):
+
+        self.block = None
+        self.path = None
+        self.shapes = []
+
+        self._fh = None
+        self._blocks = None
+
+        if not spill:
+            self._blocks = iter(blocks)
+            return
+
+        blocks = iter(blocks)
+        first = next(blocks, None)
+        second = next(blocks, None)
+
+        if second is None:
+            self.block = first
+            return
+
+        fd, self.path = tempfile.mkstemp(prefix=".columnblocks",
+                                         dir=temp_dir)
+
+        offset = 0
+        with os.fdopen(fd, "wb") as fh:
+            for block in itertools.chain([first, second], blocks):
+                np.ascontiguousarray(block).tofile(fh)
+                self.shapes.append((offset,) + block.shape)
+                offset += block.size
+
+        self._fh = open(self.path, "rb")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __iter__(self):
+        """Generator over the column blocks.
+
+        Yields
+        ------
+        block : numpy.ndarray
+            (ntaxa, ncolumns) array with uint8 dtype.
+        """
+
+        if self._blocks is not None:
+            for block in self._blocks:
+                yield block
+
+        elif self.block is not None:
+            yield self.block
+
+        else:
+            for offset, ntaxa, ncol in self.shapes:
+                self._fh.seek(offset)
+                yield np.fromfile(self._fh, dtype=np.uint8,
+                                  count=ntaxa * ncol).reshape(ntaxa, ncol)
+
+    def iter_row(self, row):
+        """Generator over the chunks of a matrix row, one for each block.
+
+        Parameters
+        ----------
+        row : int
+            Index of the matrix row.
+
+        Yields
+        ------
+        chunk : str
+            Characters of the row in the current block.
+        """
+
+        if self.block is not None:
+            yield self.block[row].tostring()
+            return
+
+        for offset, _, ncol in self.shapes:
+            self._fh.seek(offset + row * ncol)
+            yield self._fh.read(ncol)
+
+    def close(self):
+        """Releases the blocks and removes the temporary file."""
+
+        self.block = None
+        self._blocks = None
+
+        if self._fh:
+            self._fh.close()
+            self._fh = None
+
+        if self.path and exists(self.path):
+            os.remove(self.path)
+        self.path = None
@@ -0,0 +1,857 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+#
+#  Copyright 2012 Unknown <diogo@arch>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+
+"""
+The `pipeline` module provides a lazy pipeline of the operations that
+modify the sequence data of each alignment of an
+:class:`~trifusion.process.sequence.AlignmentList`, such as the codon and
+missing data filters, `collapse` and `code_gaps`.
+
+When these operations are called one after the other, each of them reads
+the complete input table and writes a new table with the modified data.
+With the :class:`.AlignmentPipeline` class, the operations are registered
+first, as transforms of the sequence rows of a single alignment, and then
+executed with :meth:`.AlignmentPipeline.run` in a single pass over the
+input table. The rows of each alignment are read once, go through all
+transforms in memory and only the final rows are written to the output
+table::
+
+    aln_list.pipeline(table_in, table_out) \\
+        .filter_missing_data(25, 50) \\
+        .collapse(haplotypes_file="haps") \\
+        .code_gaps() \\
+        .run(pbar=pbar)
+
+Operations that depend on more than one alignment (e.g., concatenation)
+cannot be fused in the same pipeline and must be executed between
+pipelines.
+
+The transforms are also available as functions operating on a list of
+(txId, taxon, seq) rows of an alignment.
+"""
+
+import hashlib
+from collections import OrderedDict
+from os.path import join
+
+import numpy as np
+
+try:
+    from process.data import Partitions
+    from process.matrix import encode_sequences, decode_sequence, \
+        column_stats, pack_sequence
+except ImportError:
+    from trifusion.process.data import Partitions
+    from trifusion.process.matrix import encode_sequences, \
+        decode_sequence, column_stats, pack_sequence
+
+
+def filter_terminals(rows, missing):
+    """Replaces the gaps at the ends of the sequences with missing data.
+
+    Parameters
+    ----------
+    rows : list
+        List of (txId, taxon, seq) tuples of the alignment.
+    missing : str
+        Missing data symbol.
+
+    Returns
+    -------
+    _ : list
+        List of (txId, taxon, seq) tuples with the filtered sequences.
+    """
+
+    res = []
+
+    for txId, taxon, seq in rows:
+
+        start = len(seq) - len(seq.lstrip("-"))
+
+        # Condition where the sequence only has gaps
+        if start == len(seq):
+            res.append((txId, taxon, missing * len(seq)))
+            continue
+
+        end = len(seq.rstrip("-"))
+
+        res.append((txId, taxon, missing * start + seq[start:end] +
+                    missing * (len(seq) - end)))
+
+    return res
+
+
+def filter_columns(rows, gap_threshold, missing_threshold, ntaxa, gap="-",
+                   missing="n"):
+    """Removes the alignment columns with too much missing data.
+
+    Parameters
+    ----------
+    rows : list
+        List of (txId, taxon, seq) tuples of the alignment.
+    gap_threshold : int
+        Integer between 0 and 100 defining the percentage above which
+        a column with that gap percentage is removed.
+    missing_threshold : int
+        Integer between 0 and 100 defining the percentage above which
+        a column with that gap+missing percentage is removed.
+    ntaxa : int
+        Number of taxa used to compute the percentages.
+    gap : str
+        Gap symbol.
+    missing : str
+        Missing data symbol.
+
+    Returns
+    -------
+    _ : list
+        List of (txId, taxon, seq) tuples with the filtered sequences.
+    """
+
+    if not rows:
+        return rows
+
+    matrix = encode_sequences([x[2] for x in rows])
+    stats = column_stats(matrix, gap, missing)
+
+    gap_proportion = (stats.gaps / float(ntaxa)) * float(100)
+    missing_proportion = (stats.missing / float(ntaxa)) * float(100)
+
+    mask = (gap_proportion <= gap_threshold) & \
+        (gap_proportion + missing_proportion <= missing_threshold)
+
+    return [(txId, taxon, decode_sequence(row)) for (txId, taxon, _), row
+            in zip(rows, matrix[:, mask])]
+
+
+def filter_missing(rows, gap_threshold, missing_threshold, ntaxa, gap="-",
+                   missing="n"):
+    """Fused missing data filter.
+
+    Equivalent to `filter_terminals` followed by `filter_columns`, but
+    the alignment matrix is built once. The gaps at the ends of each
+    sequence are located from the gap mask of the matrix and replaced with
+    missing data, and the column proportions are computed from the same
+    matrix before the columns are removed.
+
+    Parameters
+    ----------
+    rows : list
+        List of (txId, taxon, seq) tuples of the alignment.
+    gap_threshold : int
+        Integer between 0 and 100 defining the percentage above which
+        a column with that gap percentage is removed.
+    missing_threshold : int
+        Integer between 0 and 100 defining the percentage above which
+        a column with that gap+missing percentage is removed.
+    ntaxa : int
+        Number of taxa used to compute the percentages.
+    gap : str
+        Gap symbol.
+    missing : str
+        Missing data symbol.
+
+    Returns
+    -------
+    _ : list
+        List of (txId, taxon, seq) tuples with the filtered sequences.
+    """
+
+    if not rows:
+        return rows
+
+    matrix = encode_sequences([x[2] for x in rows])
+    nsites = matrix.shape[1]
+
+    is_gap = matrix == ord(gap)
+    not_gap = ~is_gap
+
+    # Position of the first and after the last non gap character of each
+    # row. Rows with only gaps have start == nsites, so that the whole row
+    # is replaced
+    start = np.where(not_gap.any(axis=1), not_gap.argmax(axis=1), nsites)
+    end = nsites - not_gap[:, ::-1].argmax(axis=1)
+
+    sites = np.arange(nsites)
+    terminals = (sites < start[:, None]) | (sites >= end[:, None])
+
+    matrix[terminals] = ord(missing)
+    is_gap &= ~terminals
+
+    gap_proportion = (is_gap.sum(axis=0) / float(ntaxa)) * float(100)
+    missing_proportion = ((matrix == ord(missing)).sum(axis=0) /
+                          float(ntaxa)) * float(100)
+
+    mask = (gap_proportion <= gap_threshold) & \
+        (gap_proportion + missing_proportion <= missing_threshold)
+
+    return [(txId, taxon, decode_sequence(row)) for (txId, taxon, _), row
+            in zip(rows, matrix[:, mask])]
+
+
+def filter_codons(rows, position_list):
+    """Removes codon positions from the alignment.
+
+    Parameters
+    ----------
+    rows : list
+        List of (txId, taxon, seq) tuples of the alignment.
+    position_list : list
+        List of three bool elements that correspond to each codon
+        position. Positions set to False are removed.
+
+    Returns
+    -------
+    _ : list
+        List of (txId, taxon, seq) tuples with the filtered sequences.
+    """
+
+    positions = [p for p, x in enumerate(position_list[:3]) if x]
+
+    # Nothing to remove
+    if not rows or len(positions) == 3:
+        return rows
+
+    matrix = encode_sequences([x[2] for x in rows])
+    nsites = matrix.shape[1]
+
+    # The columns of each kept codon position are copied with a strided
+    # slice into their interleaved positions of the filtered matrix. When
+    # the last codon is incomplete, the first positions have one more
+    # column than the others, which is also true of the strided views of
+    # the filtered matrix
+    k = len(positions)
+    filtered = np.empty(
+        (matrix.shape[0], sum(len(xrange(p, nsites, 3)) for p in positions)),
+        dtype=np.uint8)
+
+    for j, p in enumerate(positions):
+        filtered[:, j::k] = matrix[:, p::3]
+
+    return [(txId, taxon, decode_sequence(row)) for (txId, taxon, _), row
+            in zip(rows, filtered)]
+
+
+def collapse(rows, haplotype_name="Hap", ignore_missing=False, gap="-",
+             missing="n"):
+    """Collapses the identical sequences of the alignment into haplotypes.
+
+    Sequences are grouped by their SHA-1 digest, and a sequence is only
+    assigned to an existing haplotype if it is also equal to the sequence
+    of that haplotype, so that a digest collision never merges different
+    sequences.
+
+    If `ignore_missing` is True, two sequences are also considered equal
+    when they only differ in positions where at least one of them has a
+    gap or missing data. Since this relation is not transitive, each
+    sequence is assigned to the first compatible haplotype, which keeps
+    the sequence of its first taxon. The sequences that are not identical
+    to a previous one are compared with all haplotypes at once, on the
+    encoded alignment matrix.
+
+    Parameters
+    ----------
+    rows : list
+        List of (txId, taxon, seq) tuples of the alignment.
+    haplotype_name : str
+        Prefix of the haplotype names. The final haplotype name will be
+        `haplotype_name` + <int>.
+    ignore_missing : bool
+        If True, differences in positions with gaps or missing data are
+        ignored.
+    gap : str
+        Gap symbol. Only used when `ignore_missing` is True.
+    missing : str
+        Missing data symbol. Only used when `ignore_missing` is True.
+
+    Returns
+    -------
+    res : list
+        List of (txId, haplotype, seq) tuples with one row for each
+        haplotype.
+    hap_dic : dict
+        Maps each haplotype name to the list of taxa with that sequence.
+    """
+
+    res = []
+
+    # Maps the digest of each unique sequence to the indexes, in res, of
+    # the haplotypes with that digest
+    digests = {}
+
+    # hap_dic will store the haplotype name as key and a list of
+    # the taxa with the same sequence as a list value
+    hap_dic = {}
+
+    if ignore_missing and rows:
+        matrix = encode_sequences([x[2] for x in rows])
+        mask = (matrix == ord(gap)) | (matrix == ord(missing))
+        # Rows of the matrix with the sequence of each haplotype
+        hap_rows = []
+
+    for p, (_, taxon, seq) in enumerate(rows):
+
+        key = hashlib.sha1(seq.encode("utf-8")).digest()
+
+        hap = None
+        for i in digests.get(key, ()):
+            if res[i][2] == seq:
+                hap = i
+                break
+
+        if hap is None and ignore_missing and hap_rows:
+            compatible = ((matrix[hap_rows] == matrix[p]) | mask[hap_rows] |
+                          mask[p]).all(axis=1)
+            if compatible.any():
+                hap = int(compatible.argmax())
+
+        if hap is None:
+
+            hap = len(res)
+            haplotype = "{}_{}".format(haplotype_name, hap + 1)
+            hap_dic[haplotype] = [taxon]
+            digests.setdefault(key, []).append(hap)
+
+            res.append((hap, unicode(haplotype), seq))
+
+            if ignore_missing:
+                hap_rows.append(p)
+
+        else:
+
+            hap_dic[res[hap][1]].append(taxon)
+
+    return res, hap_dic
+
+
+def collapse_alignment(args):
+    """Collapses the sequences of an alignment into haplotypes.
+
+    Worker function used to collapse alignments in a process pool.
+
+    Parameters
+    ----------
+    args : tuple
+        Tuple with the aln_idx of the alignment, its (txId, taxon, seq)
+        rows and a dictionary with the keyword arguments of
+        :func:`collapse`.
+
+    Returns
+    -------
+    aln_idx : int
+        aln_idx of the alignment.
+    res : list
+        List of (txId, haplotype, seq) tuples of the haplotypes.
+    hap_dic : dict
+        Maps each haplotype name to the list of taxa with that sequence.
+    """
+
+    aln_idx, rows, kwargs = args
+
+    res, hap_dic = collapse(rows, **kwargs)
+
+    return aln_idx, res, hap_dic
+
+
+def write_haplotypes(haplotypes):
+    """Writes the files mapping taxa to the haplotypes of `collapse`.
+
+    Each file is written with a single write of its complete contents.
+
+    Parameters
+    ----------
+    haplotypes : dict
+        Maps the path of each haplotype correspondence file to the
+        dictionary mapping each haplotype to the list of its taxa.
+    """
+
+    for path, hap_dic in haplotypes.items():
+
+        data = "".join("%s: %s\n" % (haplotype, "; ".join(taxa_list))
+                       for haplotype, taxa_list in sorted(hap_dic.items()))
+
+        with open(path, "w") as fh:
+            fh.write(data)
+
+
+def code_gaps(rows, gap="-"):
+    """Appends a binary coding of the indel events to each sequence.
+
+    Each unique indel span of the alignment is coded as a new character.
+    A sequence has state 1 when the span contains only gaps and is
+    flanked by non gap characters, "-" when the span contains only gaps
+    but is part of a larger indel, and 0 otherwise.
+
+    The indel spans of all sequences are obtained at once from the
+    run-length encoding of the gap mask of the alignment matrix, and the
+    state of every sequence for every span is computed with a cumulative
+    sum of the gap mask, so that the cost is linear on the size of the
+    alignment plus the size of the resulting binary matrix.
+
+    Parameters
+    ----------
+    rows : list
+        List of (txId, taxon, seq) tuples of the alignment.
+    gap : str
+        Gap symbol.
+
+    Returns
+    -------
+    res : list
+        List of (txId, taxon, seq) tuples with the coded sequences. The
+        indel characters follow the order in which the spans first appear
+        in the alignment.
+    ngaps : int
+        Number of indel characters appended to each sequence.
+    """
+
+    if not rows:
+        return rows, 0
+
+    matrix = encode_sequences([x[2] for x in rows])
+    mask = matrix == ord(gap)
+    nsites = mask.shape[1]
+
+    # Starts and ends of the gap runs of each sequence, from the changes
+    # of the zero padded mask. np.nonzero returns them sorted by sequence
+    # and position, which is the order in which they appear
+    changes = np.diff(np.pad(mask.view(np.int8), ((0, 0), (1, 1)),
+                             "constant"), axis=1)
+    rows_idx, starts = np.nonzero(changes == 1)
+    ends = np.nonzero(changes == -1)[1]
+
+    # Unique spans, hashed into a single integer and kept in order of
+    # first appearance
+    keys = starts * (nsites + 1) + ends
+    _, first = np.unique(keys, return_index=True)
+    first.sort()
+    starts, ends = starts[first], ends[first]
+
+    if not starts.size:
+        return list(rows), 0
+
+    # Number of gaps in each span for every sequence
+    cumsum = np.zeros((mask.shape[0], nsites + 1), dtype=np.int64)
+    np.cumsum(mask, axis=1, out=cumsum[:, 1:])
+    full = (cumsum[:, ends] - cumsum[:, starts]) == ends - starts
+
+    # Characters flanking each span. As in the original coder, the
+    # character before a span starting in the first position is the last
+    # character of the sequence
+    prev_gap = mask[:, starts - 1]
+    aft_gap = np.zeros(full.shape, dtype=bool)
+    inside = ends < nsites
+    aft_gap[:, inside] = mask[:, ends[inside]]
+
+    # The score 1 will only be given to spans that contain only gaps and
+    # are surrounded by non gaps. If there are gaps surrounding, then the
+    # score is "-"
+    states = np.full(full.shape, ord("0"), dtype=np.uint8)
+    states[full] = ord("-")
+    states[full & ~prev_gap & ~aft_gap] = ord("1")
+
+    return [(txId, taxon, seq + decode_sequence(state))
+            for (txId, taxon, seq), state in zip(rows, states)], \
+        starts.size
+
+
+class AlignmentPipeline(object):
+    """Lazy pipeline of operations over the alignments of an AlignmentList.
+
+    Operations are registered with the methods of this class, which can
+    be chained, and are only executed when `run` is called. Each operation
+    is a transform of the (txId, taxon, seq) rows of a single alignment,
+    and all of them are applied to an alignment before moving to the next
+    one, so that the input table is read once and only the final data is
+    written to the output table.
+
+    Parameters
+    ----------
+    aln_list : trifusion.process.sequence.AlignmentList
+        `AlignmentList` object with the alignments.
+    table_in : str, optional
+        Name of database table containing the alignment data. Defaults to
+        the master table.
+    table_out : str, optional
+        Name of database table where the final alignment data is
+        inserted. Defaults to `table_in`.
+
+    Attributes
+    ----------
+    aln_list : trifusion.process.sequence.AlignmentList
+        `AlignmentList` object with the alignments.
+    table_in : str
+        Name of the input database table.
+    table_out : str
+        Name of the output database table.
+    steps : list
+        List of the registered transforms, as (function, resize) tuples.
+        Each function receives an `Alignment` object and its rows and
+        returns the modified rows. `resize` is True for transforms that
+        change the length of the alignment, after which the partitions
+        are updated.
+    haplotypes : collections.OrderedDict
+        Maps the path of each haplotype correspondence file of the
+        `collapse` operations to its haplotypes. The files are written at
+        the end of `run`, so that a file shared by several alignments is
+        written only once, with the haplotypes of the last one.
+    """
+
+    temp_table = ".pipeline"
+
+    def __init__(self, aln_list, table_in=None, table_out=None):
+
+        self.aln_list = aln_list
+        self.table_in = table_in if table_in else aln_list.master_table
+        self.table_out = table_out if table_out else self.table_in
+
+        self.steps = []
+        self.haplotypes = OrderedDict()
+
+    def __len__(self):
+        return len(self.steps)
+
+    def filter_codon_positions(self, position_list):
+        """Registers the removal of codon positions.
+
+        Parameters
+        ----------
+        position_list : list
+            List of three bool elements that correspond to each codon
+            position. Ex. [True, True, True] will save all positions while
+            [True, True, False] will exclude the third codon position.
+
+        Returns
+        -------
+        self : AlignmentPipeline
+        """
+
+        self.steps.append((lambda aln, rows: filter_codons(rows,
+                                                           position_list),
+                           True))
+
+        return self
+
+    def filter_missing_data(self, gap_threshold, missing_threshold):
+        """Registers the missing data filter.
+
+        The gaps at the ends of each sequence are first replaced with
+        missing data, and then the columns with too much missing data are
+        removed.
+
+        Parameters
+        ----------
+        gap_threshold : int
+            Integer between 0 and 100 defining the percentage above which
+            a column with that gap percentage is removed.
+        missing_threshold : int
+            Integer between 0 and 100 defining the percentage above which
+            a column with that gap+missing percentage is removed.
+
+        Returns
+        -------
+        self : AlignmentPipeline
+        """
+
+        gap = self.aln_list.gap_symbol
+
+        self.steps.append(
+            (lambda aln, rows: filter_missing(
+                rows, gap_threshold, missing_threshold, len(aln.taxa_idx),
+                gap, aln.sequence_code[1]),
+             True))
+
+        return self
+
+    def collapse(self, write_haplotypes=True, haplotypes_file=None, dest=".",
+                 conversion_suffix="", haplotype_name="Hap",
+                 ignore_missing=False):
+        """Registers the collapse of identical sequences into haplotypes.
+
+        Parameters
+        ----------
+        write_haplotypes : bool
+            If True, a file mapping the taxa names name to their respective
+            haplotype name will be generated (default is True).
+        haplotypes_file : string
+            Name of the file mapping taxa names to their respective
+            haplotype. If it not provided, the file name will be determined
+            from `Alignment.sname`.
+        dest : string
+            Path of directory where `haplotypes_file` will be generated
+            (default is ".").
+        conversion_suffix : string
+            Suffix appended to the haplotypes file. Only used when
+            `haplotypes_file` is None.
+        haplotype_name : string
+            Prefix of the haplotype string (default is "Hap").
+        ignore_missing : bool
+            If True, sequences that only differ in positions with gaps or
+            missing data are collapsed (default is False). See
+            :func:`collapse`.
+
+        Returns
+        -------
+        self : AlignmentPipeline
+        """
+
+        gap = self.aln_list.gap_symbol
+
+        def step(aln, rows):
+
+            if ignore_missing:
+                rows, hap_dic = collapse(rows, haplotype_name, True, gap,
+                                         aln.sequence_code[1])
+            else:
+                rows, hap_dic = collapse(rows, haplotype_name)
+
+            if write_haplotypes:
+                self.add_haplotypes(aln, hap_dic, haplotypes_file, dest,
+                                    conversion_suffix)
+
+            return rows
+
+        self.steps.append((step, False))
+
+        return self
+
+    def add_haplotypes(self, aln, hap_dic, haplotypes_file=None, dest=".",
+                       conversion_suffix=""):
+        """Stores the haplotypes of an alignment to be written by `run`.
+
+        Parameters
+        ----------
+        aln : trifusion.process.sequence.Alignment
+            Collapsed alignment.
+        hap_dic : dict
+            Maps each haplotype name to the list of its taxa.
+        haplotypes_file : string
+            Name of the haplotype correspondence file, without extension.
+            If it not provided, the file name will be determined from
+            `Alignment.sname`.
+        dest : string
+            Path of directory where `haplotypes_file` will be generated.
+        conversion_suffix : string
+            Suffix appended to the haplotypes file. Only used when
+            `haplotypes_file` is None.
+        """
+
+        hf = haplotypes_file if haplotypes_file else \
+            aln.sname + conversion_suffix
+
+        self.haplotypes[join(dest, hf + ".haplotypes")] = hap_dic
+
+    def flush_haplotypes(self):
+        """Writes and clears the haplotypes stored by `add_haplotypes`."""
+
+        write_haplotypes(self.haplotypes)
+        self.haplotypes.clear()
+
+    def code_gaps(self):
+        """Registers the binary coding of indel events.
+
+        The indel characters are appended to the sequences and their range
+        is stored in the `restriction_range` attribute of the alignment.
+
+        Returns
+        -------
+        self : AlignmentPipeline
+        """
+
+        gap = self.aln_list.gap_symbol
+
+        def step(aln, rows):
+
+            rows, ngaps = code_gaps(rows, gap)
+
+            if ngaps:
+                aln.restriction_range = "{}-{}".format(
+                    int(aln.locus_length) + 1,
+                    int(aln.locus_length) + ngaps)
+                aln.locus_length += ngaps
+
+            return rows
+
+        self.steps.append((step, False))
+
+        return self
+
+    def run(self, ns=None, pbar=None):
+        """Executes the registered operations.
+
+        The rows of each active alignment are read from `table_in`,
+        passed through all registered transforms and inserted into a
+        temporary table, which replaces `table_out` at the end (see
+        `store`).
+
+        Parameters
+        ----------
+        ns : multiprocesssing.Manager.Namespace
+            A Namespace object used to communicate with the main thread
+            in TriFusion.
+        pbar : ProgressBar
+            A ProgressBar object used to log the progress of TriSeq
+            execution.
+        """
+
+        aln_list = self.aln_list
+
+        # Partitions are rebuilt after the last transform that changes the
+        # length of the alignments
+        resize = [i for i, (_, x) in enumerate(self.steps) if x]
+
+        # Attributes changed by the transforms, restored if the run fails
+        partitions = aln_list.partitions
+        lengths = [(aln, aln.locus_length, aln.restriction_range)
+                   for aln in aln_list.alignments.values()]
+
+        if resize:
+            aln_list.partitions = Partitions()
+
+        done = False
+        try:
+            self.store(self._iter_results(resize[-1] if resize else None),
+                       ns, pbar)
+            done = True
+        finally:
+            if not done:
+                aln_list.partitions = partitions
+                for aln, locus_length, restriction_range in lengths:
+                    aln.locus_length = locus_length
+                    aln.restriction_range = restriction_range
+
+    def _iter_results(self, last_resize):
+        """Generator over the rows of each alignment after all transforms.
+
+        Parameters
+        ----------
+        last_resize : int
+            Index of the last transform that changes the length of the
+            alignments, after which their partitions are updated. None if
+            no transform changes their length.
+
+        Yields
+        ------
+        aln_idx : int
+            aln_idx of the alignment.
+        rows : list
+            List of the final (txId, taxon, seq) rows of the alignment.
+        """
+
+        aln_list = self.aln_list
+
+        for aln_idx, rows in aln_list.iter_alignment_rows(self.table_in):
+
+            aln_obj = aln_list.alignment_idx[aln_idx]
+
+            for i, (step, _) in enumerate(self.steps):
+
+                rows = step(aln_obj, rows)
+
+                if i == last_resize and rows:
+                    aln_obj.locus_length = len(rows[0][2])
+                    aln_list.set_partition_from_alignment(aln_obj)
+
+            yield aln_idx, rows
+
+    def store(self, results, ns=None, pbar=None):
+        """Replaces `table_out` with the final rows of each alignment.
+
+        The rows are inserted into a temporary table, which replaces
+        `table_out` once all alignments are processed, and the stored
+        haplotypes are then written (see `flush_haplotypes`). Since
+        creating a table ends the current transaction, the temporary table
+        is dropped if anything fails, so that `table_out` is left
+        unchanged and later operations can create it again.
+
+        Parameters
+        ----------
+        results : iterable
+            Iterable of (aln_idx, rows) tuples, where rows is the list of
+            final (txId, taxon, seq) rows of the alignment.
+        ns : multiprocesssing.Manager.Namespace
+            A Namespace object used to communicate with the main thread
+            in TriFusion.
+        pbar : ProgressBar
+            A ProgressBar object used to log the progress of TriSeq
+            execution.
+        """
+
+        aln_list = self.aln_list
+
+        # Alignments read from a project file are copied into the database
+        # before any table is replaced
+        aln_list._materialize()
+
+        # The new data is committed once the output table is replaced
+        aln_list.db.begin()
+        try:
+            aln_list._set_pipes(ns, pbar, total=len(aln_list.alignments))
+
+            # A table left behind by a process that was killed
+            aln_list.cur.execute("DROP TABLE IF EXISTS [{}]".format(
+                self.temp_table))
+            aln_list._create_table(self.temp_table)
+
+            done = False
+            try:
+                self._insert(results, ns, pbar)
+
+                # Replace table_out with the final data
+                aln_list._replace_table(self.temp_table, self.table_out)
+                done = True
+            finally:
+                if not done:
+                    self.haplotypes.clear()
+                    aln_list.cur.execute("DROP TABLE IF EXISTS [{}]".format(
+                        self.temp_table))
+
+            self.flush_haplotypes()
+
+            aln_list._reset_pipes(ns)
+        finally:
+            aln_list.db.end()
+
+    def _insert(self, results, ns, pbar):
+        """Inserts the rows of each alignment into the temporary table.
+
+        See `store`.
+        """
+
+        aln_list = self.aln_list
+
+        # Create temporary cursor to edit database while querying
+        temp_cur = aln_list.con.cursor()
+        pack = aln_list._storage()
+
+        for c, (aln_idx, rows) in enumerate(results):
+
+            aln_list._update_pipes(ns, pbar, value=c + 1,
+                                   msg="Processing file {}".format(
+                                       aln_list.alignment_idx[aln_idx].name))
+
+            if pack:
+                rows = [(txId, tx, pack_sequence(seq, pack))
+                        for txId, tx, seq in rows]
+
+            temp_cur.executemany(
+                "INSERT INTO [{}] VALUES (?, ?, ?, ?)".format(
+                    self.temp_table),
+                [x + (aln_idx,) for x in rows])
@@ -0,0 +1,468 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+#
+#  Copyright 2012 Unknown <diogo@arch>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+
+"""
+The `project` module provides a versioned binary container for the data
+of an :class:`~trifusion.process.sequence.AlignmentList`, so that a
+project can be saved and reopened without parsing the alignment files
+again and without unpickling the `Alignment` objects.
+
+A project file has the following layout:
+
+  - A fixed size header (:data:`HEADER`) with the :data:`MAGIC` string,
+    the format :data:`VERSION` and the offset and length of the
+    metadata.
+  - The sequence data of each alignment, as a column-major (nsites,
+    ntaxa) block of uint8 values. Since columns are contiguous, a range
+    of columns of an alignment is a single contiguous region of the file.
+  - The metadata, encoded in JSON, with the attributes of the
+    `AlignmentList` and, for each alignment, its attributes and the
+    offset and shape of its sequence block.
+
+The :func:`write_project` function writes a project file atomically, and
+the :class:`.ProjectFile` class opens it with a memory map, so that only
+the metadata is read when the file is opened and the sequence blocks are
+read on demand.
+"""
+
+import os
+import json
+import mmap
+import struct
+import tempfile
+from os.path import dirname, basename
+
+import numpy as np
+
+from collections import OrderedDict
+
+try:
+    from process.data import Partitions
+    from process.matrix import encode_sequences, decode_sequence
+    from process.error_handling import InputError
+except ImportError:
+    from trifusion.process.data import Partitions
+    from trifusion.process.matrix import encode_sequences, decode_sequence
+    from trifusion.process.error_handling import InputError
+
+
+MAGIC = b"TFPROJ\r\n"
+"""Magic string at the start of every project file."""
+
+VERSION = 1
+"""Version of the project file format written by :func:`write_project`."""
+
+HEADER = struct.Struct("<8sH6xQQ")
+"""Header of a project file: magic string, format version, and offset and
+length, in bytes, of the metadata."""
+
+
+_containers = {"list": list, "tuple": tuple}
+"""Tags of the encoded sequence types and their constructors."""
+
+_mappings = {"dict": dict, "odict": OrderedDict}
+"""Tags of the encoded mapping types and their constructors."""
+
+
+def encode_value(obj):
+    """Encodes a value into a JSON serializable object.
+
+    JSON has no tuples and its objects only have string keys, so lists,
+    tuples, dictionaries and ordered dictionaries are encoded as single
+    key objects, whose key is the type tag and whose value is the list of
+    elements or of [key, value] pairs. Other values must be strings,
+    numbers, booleans or None.
+
+    Parameters
+    ----------
+    obj : object
+        Value to encode.
+
+    Returns
+    -------
+    _ : object
+        JSON serializable object, which :func:`decode_value` converts
+        back into `obj`.
+
+    Raises
+    ------
+    TypeError
+        If `obj` contains a value of a type that cannot be encoded.
+    """
+
+    if obj is None or isinstance(obj, (basestring, bool, int, long, float)):
+        return obj
+
+    if isinstance(obj, OrderedDict):
+        return {"odict": [[encode_value(k), encode_value(v)]
+                          for k, v in obj.items()]}
+
+    if isinstance(obj, dict):
+        return {"dict": [[encode_value(k), encode_value(v)]
+                         for k, v in obj.items()]}
+
+    if isinstance(obj, list):
+        return {"list": [encode_value(x) for x in obj]}
+
+    if isinstance(obj, tuple):
+        return {"tuple": [encode_value(x) for x in obj]}
+
+    raise TypeError("Values of type {} cannot be stored in a project "
+                    "file".format(type(obj).__name__))
+
+
+def decode_value(data):
+    """Decodes a value encoded by :func:`encode_value`.
+
+    The encoded data is only interpreted as the types listed in the type
+    tags, and anything else is rejected.
+
+    Parameters
+    ----------
+    data : object
+        Object decoded from JSON.
+
+    Returns
+    -------
+    _ : object
+        Decoded value.
+
+    Raises
+    ------
+    InputError
+        If `data` is not a valid encoded value.
+    """
+
+    if data is None or isinstance(data, (basestring, bool, int, long,
+                                         float)):
+        return data
+
+    if isinstance(data, dict) and len(data) == 1:
+
+        tag, items = list(data.items())[0]
+
+        if isinstance(items, list):
+
+            if tag in _containers:
+                return _containers[tag](decode_value(x) for x in items)
+
+            if tag in _mappings and all(isinstance(x, list) and len(x) == 2
+                                        for x in items):
+                # Keys must be hashable, so mappings and lists are not
+                # accepted as keys
+                keys = [decode_value(x[0]) for x in items]
+                if any(isinstance(x, (dict, list)) for x in keys):
+                    raise InputError("Invalid key in project file")
+                return _mappings[tag](
+                    (k, decode_value(x[1])) for k, x in zip(keys, items))
+
+    raise InputError("Invalid value in project file")
+
+
+def encode_partitions(partitions):
+    """Encodes a `Partitions` object into a JSON serializable object.
+
+    Parameters
+    ----------
+    partitions : trifusion.process.data.Partitions
+        Partitions to encode.
+
+    Returns
+    -------
+    _ : dict
+        Maps the name of each attribute of `partitions` to its value
+        encoded with :func:`encode_value`.
+    """
+
+    return dict((k, encode_value(v)) for k, v in vars(partitions).items())
+
+
+def decode_partitions(data):
+    """Creates a `Partitions` object from the output of
+    :func:`encode_partitions`.
+
+    Only the attributes that a new `Partitions` object has are restored,
+    and each must have the same type as in a new object.
+
+    Parameters
+    ----------
+    data : dict
+        Encoded attributes of the `Partitions` object.
+
+    Returns
+    -------
+    partitions : trifusion.process.data.Partitions
+        Restored partitions.
+
+    Raises
+    ------
+    InputError
+        If `data` is not a valid encoding of a `Partitions` object.
+    """
+
+    partitions = Partitions()
+    defaults = vars(partitions)
+
+    if not isinstance(data, dict) or set(data) != set(defaults):
+        raise InputError("Invalid partitions in project file")
+
+    for attr, value in data.items():
+
+        value = decode_value(value)
+        default = defaults[attr]
+
+        # partition_format is None until a partition file is read
+        if default is None:
+            valid = value is None or isinstance(value, basestring)
+        elif isinstance(default, int):
+            valid = isinstance(value, (int, long)) and \
+                not isinstance(value, bool)
+        else:
+            valid = type(value) is type(default)
+
+        if not valid:
+            raise InputError("Invalid partitions in project file")
+
+        setattr(partitions, attr, value)
+
+    return partitions
+
+
+def write_project(path, metadata, alignments):
+    """Writes a project file.
+
+    The data is written to a new temporary file in the same directory as
+    `path`, which is renamed to `path` once complete. An interrupted write
+    therefore never leaves a truncated project file, an existing project
+    file is only replaced by a complete one, and concurrent writes of the
+    same project do not share their temporary file.
+
+    Parameters
+    ----------
+    path : str
+        Path to the project file.
+    metadata : dict
+        JSON serializable dictionary with the attributes of the
+        `AlignmentList`.
+    alignments : iterable
+        Iterable of (aln_metadata, rows) tuples, one for each alignment,
+        where `aln_metadata` is a JSON serializable dictionary with the
+        attributes of the alignment and `rows` is a list of (txId, taxon,
+        seq) tuples. All sequences of an alignment must have the same
+        length.
+    """
+
+    fd, temp_path = tempfile.mkstemp(suffix=".tmp",
+                                     prefix="." + basename(path),
+                                     dir=dirname(path) or ".")
+    # mkstemp creates the file readable only by its owner. Give the
+    # project file the permissions of a regularly created file instead
+    umask = os.umask(0)
+    os.umask(umask)
+    os.chmod(temp_path, 0o666 & ~umask)
+
+    metadata = dict(metadata, version=VERSION, alignments=[])
+
+    try:
+        with os.fdopen(fd, "wb") as fh:
+
+            # Reserve space for the header, which is written when the offset
+            # of the metadata is known
+            fh.write(b"\0" * HEADER.size)
+
+            for aln_meta, rows in alignments:
+
+                if rows:
+                    txids, taxa, seqs = [list(x) for x in zip(*rows)]
+                else:
+                    txids, taxa, seqs = [], [], []
+
+                if len(set(len(x) for x in seqs)) > 1:
+                    raise InputError("Sequences of alignment {} have "
+                                     "different lengths".format(
+                                         aln_meta.get("path")))
+
+                matrix = encode_sequences(seqs)
+
+                metadata["alignments"].append(dict(
+                    aln_meta, txids=txids, taxa=taxa, offset=fh.tell(),
+                    ntaxa=matrix.shape[0], nsites=matrix.shape[1]))
+
+                fh.write(np.ascontiguousarray(matrix.T).tostring())
+
+            meta_offset = fh.tell()
+            meta_data = json.dumps(metadata).encode("utf-8")
+            fh.write(meta_data)
+
+            fh.seek(0)
+            fh.write(HEADER.pack(MAGIC, VERSION, meta_offset,
+                                 len(meta_data)))
+
+            fh.flush()
+            os.fsync(fh.fileno())
+
+        # os.rename does not replace existing files on Windows
+        if os.name == "nt" and os.path.exists(path):
+            os.remove(path)
+        os.rename(temp_path, path)
+
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+class ProjectFile(object):
+    """Reader of a project file.
+
+    The file is opened with a memory map and only its header and metadata
+    are read when the object is created. The sequence block of each
+    alignment is read when it is requested.
+
+    Parameters
+    ----------
+    path : str
+        Path to the project file.
+
+    Attributes
+    ----------
+    path : str
+        Path to the project file.
+    version : int
+        Format version of the project file.
+    metadata : dict
+        Attributes of the `AlignmentList`, as provided to
+        :func:`write_project`.
+    alignments : list
+        List of dictionaries with the attributes of each alignment, in the
+        order they were written. Besides the attributes provided to
+        :func:`write_project`, each dictionary contains the "txids",
+        "taxa", "offset", "ntaxa" and "nsites" of the alignment block.
+
+    Raises
+    ------
+    InputError
+        If the file is not a project file, if its format version is not
+        supported or if it is truncated.
+    """
+
+    def __init__(self, path):
+
+        self.path = path
+
+        self._fh = open(path, "rb")
+        self._mmap = None
+
+        try:
+            header = self._fh.read(HEADER.size)
+
+            if len(header) < HEADER.size:
+                raise InputError("{} is not a project file".format(path))
+
+            magic, self.version, meta_offset, meta_length = \
+                HEADER.unpack(header)
+
+            if magic != MAGIC:
+                raise InputError("{} is not a project file".format(path))
+
+            if self.version > VERSION:
+                raise InputError("Project file {} has an unsupported "
+                                 "version ({})".format(path, self.version))
+
+            size = os.fstat(self._fh.fileno()).st_size
+            if meta_offset + meta_length > size:
+                raise InputError("Project file {} is truncated".format(path))
+
+            self._mmap = mmap.mmap(self._fh.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+
+            self.metadata = json.loads(
+                self._mmap[meta_offset:meta_offset + meta_length].decode(
+                    "utf-8"))
+
+        except Exception:
+            self.close()
+            raise
+
+        self.alignments = self.metadata.pop("alignments")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return len(self.alignments)
+
+    def get_matrix(self, i):
+        """Returns the sequence matrix of an alignment.
+
+        Parameters
+        ----------
+        i : int
+            Index of the alignment in `alignments`.
+
+        Returns
+        -------
+        _ : numpy.ndarray
+            Read-only (ntaxa, nsites) uint8 view of the alignment block in
+            the memory map. Columns of the matrix are contiguous.
+        """
+
+        aln = self.alignments[i]
+
+        block = np.frombuffer(self._mmap, dtype=np.uint8,
+                              count=aln["ntaxa"] * aln["nsites"],
+                              offset=aln["offset"])
+
+        return block.reshape(aln["nsites"], aln["ntaxa"]).T
+
+    def iter_rows(self, i):
+        """Iterates over the rows of an alignment.
+
+        Parameters
+        ----------
+        i : int
+            Index of the alignment in `alignments`.
+
+        Yields
+        ------
+        txId : int
+            Taxon index of the row.
+        taxon : str
+            Taxon name.
+        seq : str
+            Sequence string.
+        """
+
+        aln = self.alignments[i]
+        matrix = self.get_matrix(i)
+
+        for p, (txId, taxon) in enumerate(zip(aln["txids"], aln["taxa"])):
+            yield txId, taxon, decode_sequence(matrix[p])
+
+    def close(self):
+        """Closes the memory map and the project file."""
+
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+        self._fh.close()
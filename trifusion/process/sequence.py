@@ -669,9 +669,13 @@ import re
 import os
 import pickle
 import sys
+import tempfile
+from cStringIO import StringIO
 from os.path import join, basename, splitext, exists
 from itertools import compress
-from threading import Lock
+from threading import RLock, local, current_thread, \
+    enumerate as enumerate_threads
+from multiprocessing import Pool
 import functools
 import sqlite3
 
@@ -683,18 +687,38 @@ try:
         iupac_rev, iupac_conv, Base
     from process.data import Partitions
     from process.data import PartitionException
+    from process.matrix import MatrixStore, AlignmentMatrix, \
+        ResultCache, ColumnBlocks, encode_sequences, column_stats, \
+        iter_row_lines, pairwise_similarity, column_counts, window_sums, \
+        TaxaPresence, count_sites, pack_sequence, unpack_sequence, \
+        register_sequence_functions
+    from process.cache import ParseCache, StatsMemo
+    from process.pipeline import AlignmentPipeline, collapse_alignment, \
+        write_haplotypes
+    from process.project import ProjectFile, write_project, \
+        encode_partitions, decode_partitions
     from process.error_handling import DuplicateTaxa, KillByUser, \
         InvalidSequenceType, InputError, EmptyAlignment, \
-        MultipleSequenceTypes, SingleAlignment
+        MultipleSequenceTypes, SingleAlignment, ArgumentError
 except ImportError:
     import trifusion.process as process
     from trifusion.process.base import dna_chars, aminoacid_table, iupac, \
         iupac_rev, iupac_conv, Base
     from trifusion.process.data import Partitions
     from trifusion.process.data import PartitionException
+    from trifusion.process.matrix import MatrixStore, AlignmentMatrix, \
+        ResultCache, ColumnBlocks, encode_sequences, column_stats, \
+        iter_row_lines, pairwise_similarity, column_counts, window_sums, \
+        TaxaPresence, count_sites, pack_sequence, unpack_sequence, \
+        register_sequence_functions
+    from trifusion.process.cache import ParseCache, StatsMemo
+    from trifusion.process.pipeline import AlignmentPipeline, \
+        collapse_alignment, write_haplotypes
+    from trifusion.process.project import ProjectFile, \
+        write_project, encode_partitions, decode_partitions
     from trifusion.process.error_handling import DuplicateTaxa, KillByUser, \
         InvalidSequenceType, InputError, EmptyAlignment, \
-        MultipleSequenceTypes, SingleAlignment
+        MultipleSequenceTypes, SingleAlignment, ArgumentError
 
 # import pickle
 # TODO: Create a SequenceSet class for sets of sequences that do not conform
@@ -708,146 +732,336 @@ except ImportError:
 # used to make the triage of files to either the Alignment or SequenceSet
 # classes
 
-# Lock mechanism to prevent concurrent access to sqlite database
-lock = Lock()
+# Lock mechanism that serializes the writes to the sqlite database. All
+# writes go through the single writer connection of `ConnectionManager`,
+# while reads use per-thread connections and do not acquire it. It is
+# re-entrant so that a snapshot can be requested while writing.
+lock = RLock()
 
 
-class LookupDatabase(object):
-    """Decorator handling hash lookup table with pre-calculated values.
+class ConnectionManager(object):
+    """Hands out the connections to a WAL-mode sqlite database.
 
-    This decorator class is used to decorate class methods that calculate
-    pairwise sequence similarity. To ensure proper functionality, the
-    decorated method should be called first with a single "connect" argument
-    and after finishing all calculations, with a single "disconnect" argument.
-    These special method callings are necessary to setup and close the
-    database storing the calculated values, respectively.
+    The database is set up in write-ahead logging (WAL) mode, where
+    readers do not block the writer and vice versa. A single writer
+    connection (`con`) is used for all modifications, serialized by the
+    module `lock`, while each thread (and process) that reads data gets
+    its own connection from `reader`. Since a query sees a snapshot of
+    the database from the moment it starts, generators that iterate over
+    a reader connection are not affected by the writes made while they
+    are consumed, and do not block them.
+
+    Reader connections only see the committed data. The writes are
+    committed at the end of each write operation (see
+    :func:`commit_writes`), so that an operation made of several writes
+    is a single transaction.
 
     Parameters
     ----------
-    func : function
-        Decorated function
-    
-    Attributes
-    ----------
-    func : function
-        Decorated function
-    con : None or sqlite.Connection
-        Connection object of the sqlite database
-    c : None or sqlite.Cursor
-        Cursor object of the sqlite database
-    
-    Notes
-    -----
-    The `con` and `c` attributes are initialized when the decorated function
-    is called with the single "connect" argument
-    (e.g. decorated_func("connect")). When the decorated function is called
-    with the single "disconnect" argument (e.g. decorated_func("disconnect")),
-    the database changes are committed, the sqlite Connection is closed and
-    the Cursor is reset.
+    path : str
+        Path to the sqlite database file.
+    con : sqlite3.Connection, optional
+        Existing connection to be used as the writer connection. If not
+        provided, a new connection to `path` is opened.
+    timeout : float
+        Number of seconds a connection waits for a lock on the database
+        to be released before raising an exception.
     """
 
-    def __init__(self, func):
+    def __init__(self, path, con=None, timeout=30.0):
 
-        self.func = func
-        self.con = None
-        self.c = None
+        self.path = path
+
+        self.timeout = timeout
+
+        self.con = con
+        """
+        Writer connection. All modifications to the database must be made
+        with this connection while holding the module `lock`.
+        """
+
+        # The journal mode is stored in the database file, so it only
+        # needs to be set by the connections opened here
+        if con is None:
+            self.con = self._connect()
+            self.con.execute("PRAGMA journal_mode=WAL")
+        else:
+            register_sequence_functions(con)
+
+        self._local = local()
+        """
+        Thread-local storage of the reader connections.
+        """
+
+        self._readers = {}
+        """
+        Maps the (pid, thread ident) of each reader connection to the
+        connection, so that connections of finished threads can be closed.
+        """
+
+    def _connect(self):
+        """Opens a new connection to the database.
+
+        Returns
+        -------
+        con : sqlite3.Connection
+            Connection to `path`.
+        """
+
+        con = sqlite3.connect(self.path, check_same_thread=False,
+                              timeout=self.timeout)
+        con.execute("PRAGMA synchronous = OFF")
+        register_sequence_functions(con)
+
+        return con
+
+    def reader(self):
+        """Returns the reader connection of the current thread.
+
+        The connection is opened the first time it is requested by a
+        thread or process, and the connections of the threads of the
+        current process that have finished are closed at that time.
+        Reader connections are only meant to query the alignment data
+        (writes to their temporary tables are the exception).
+
+        When the database has no file (for instance, for connections
+        provided by the user without a path), the writer connection is
+        returned instead.
+
+        Returns
+        -------
+        con : sqlite3.Connection
+            Reader connection of the current thread.
+        """
+
+        if not self.path:
+            return self.con
+
+        pid = os.getpid()
+
+        if getattr(self._local, "pid", None) != pid:
+            # Thread idents may be reused, so the connection of a finished
+            # thread with the same ident is also closed
+            ident = current_thread().ident
+            self._close_readers(set(x.ident for x in enumerate_threads()
+                                    if x.ident != ident))
+            self._local.con = self._connect()
+            self._local.pid = pid
+            self._readers[(pid, ident)] = self._local.con
+
+        return self._local.con
+
+    def _close_readers(self, keep=()):
+        """Closes the reader connections of the current process.
+
+        Connections inherited from a parent process are not closed, since
+        they are still used by it.
 
-    def __call__(self, *args):
-        """Wraps the call of `func`.
-        
-        When the decorated method is called, this code is wrapped around
-        its execution. It accepts an arbitrary number of positional arguments
-        but is is currently designed to decorate the `_get_similarity`
-        method of the `AlignmentList` class. There are three expected calling
-        modes:
-        
-            1. decorated_func("connect") : Initializes the Connection and
-            Cursor objects of the database
-            2. decorated_func(seq1, seq2, locus_lenght) : The typical main
-            execution of the method, providing the sequence1 and sequence2
-            strings along with the integer with their lenght
-            3. decorated_func("disconnect") : Commits changes to database
-            and closes Connection and Cursor objects.
-        
-        The path of this sqlite database is automatically obtained from
-        the `AlignmentList` attribute `sql_path`. We use the path to the
-        same directory, but with a different name for the database, "pw.db".
-        
         Parameters
         ----------
-        args : list
-            List of positional arguments for decorated method
-        
-        Notes
-        -----
-        When the decorated method is called normally (i.e., not with a
-        "connect" or "disconnect" argument"), it first creates an hash
-        of the argument list (excluding `self`). This hash is used to query
-        the database to check if a value for that combination of sequence
-        strings and sequence length has already been calculated. If yes,
-        the result is immediately  returned without executing the decorated
-        method. If no, the method is executed to perform calculations. The
-        result of this calculation is then stored in the database and the
-        result is returned.
-
+        keep : set, optional
+            Idents of the threads whose connections are kept open.
         """
 
-        c_args = args[1:3]
+        pid = os.getpid()
+
+        for key in list(self._readers):
+            if key[0] == pid and key[1] not in keep:
+                self._readers.pop(key).close()
 
-        # Initialize database connection.
-        if c_args[0] == "connect":
+    def begin(self):
+        """Marks the start of a write operation by the current thread.
 
-            # Get path to database based on the AlignmentList db
-            tmp_dir = os.path.dirname(args[0].sql_path)
+        Operations can be nested, and the writes are only committed when
+        the outermost operation ends (see `end`).
+        """
 
-            self.con = sqlite3.connect(join(tmp_dir, "pw.db"))
-            self.c = self.con.cursor()
-            self.c.execute("PRAGMA synchronous = OFF")
+        self._local.depth = getattr(self._local, "depth", 0) + 1
 
-            # Create table, if it does not yet exist
-            if not self.c.execute("SELECT name FROM sqlite_master WHERE type="
-                                  "'table' AND name='pw_table'").fetchall():
-                self.c.execute("CREATE TABLE pw_table (hash integer"
-                               ", seq_len integer"
-                               ", val float, "
-                               "effective_len float,"
-                               "PRIMARY KEY (hash, seq_len))")
+    def end(self):
+        """Marks the end of a write operation by the current thread.
 
-            return
+        When it is the outermost operation, the writes are committed, so
+        that they become visible to the reader connections.
+        """
+
+        self._local.depth -= 1
 
-        elif c_args[0] == "disconnect":
+        if not self._local.depth:
+            self.commit()
 
+    def commit(self):
+        """Commits the pending writes of the writer connection."""
+
+        try:
+            lock.acquire(True)
             self.con.commit()
-            self.con.close()
-            self.c = None
+        finally:
+            lock.release()
+
+    def close(self):
+        """Commits pending writes and closes all connections."""
+
+        self._close_readers()
+
+        self._readers = {}
+        self._local = local()
+
+        self.con.commit()
+        self.con.close()
+
+
+class SequenceWriter(object):
+    """Buffered writer of sequence rows into a database table.
+
+    Rows are accumulated in memory and inserted with a single
+    `executemany` call each time the buffer reaches `batch_size` rows,
+    and when `flush` is called. This avoids the per-row overhead of
+    executing one INSERT statement (and acquiring the database `lock`)
+    for every taxon.
+
+    Parameters
+    ----------
+    cur : sqlite3.Cursor
+        Cursor of the database connection.
+    table_name : str
+        Name of the table where rows will be inserted.
+    batch_size : int
+        Maximum number of buffered rows before they are written to
+        the database.
+    pack : str, optional
+        If provided, the sequence of each (txId, taxon, seq, aln_idx) row
+        is encoded with this method by
+        :func:`~trifusion.process.matrix.pack_sequence` before being
+        written.
+    """
+
+    def __init__(self, cur, table_name, batch_size=1000, pack=None):
+
+        self.cur = cur
+        self.table_name = table_name
+        self.batch_size = max(int(batch_size), 1)
+        self.pack = pack
+
+        self.rows = []
+        """
+        List of buffered row tuples that have not yet been written to
+        the database.
+        """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.flush()
+
+    def write(self, row):
+        """Adds a row to the buffer, flushing it when full.
+
+        Parameters
+        ----------
+        row : tuple
+            Tuple with the values of a single table row.
+        """
+
+        if self.pack:
+            row = row[:2] + (pack_sequence(row[2], self.pack),) + row[3:]
+
+        self.rows.append(row)
 
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Writes all buffered rows to the database."""
+
+        if not self.rows:
             return
 
-        if self.c:
+        statement = "INSERT INTO [{}] VALUES ({})".format(
+            self.table_name, ", ".join(["?"] * len(self.rows[0])))
 
-            h = hash(c_args)
-            self.c.execute("SELECT * FROM pw_table WHERE hash = ?"
-                           " AND seq_len = ?", (h, args[-2]))
-            vals = self.c.fetchone()
-            if vals:
-                return vals[2], vals[3]
-            else:
-                value = self.func(*args)
-                h = hash(c_args)
-                self.c.execute("INSERT INTO pw_table VALUES (?, ?, ?, ?)",
-                               (h, args[-2], value[0], value[1]))
-                return value
+        try:
+            lock.acquire(True)
+            self.cur.executemany(statement, self.rows)
+        finally:
+            lock.release()
 
-        else:
-            return self.func(*args)
+        self.rows = []
+
+    def discard(self):
+        """Drops all buffered rows without writing them."""
+
+        self.rows = []
+
+
+def commit_writes(func):
+    """Decorator of the methods that modify the database.
+
+    The writes of the decorated method are committed when it returns, so
+    that they become visible to the reader connections of the
+    :class:`ConnectionManager` of the object (`db`). When a decorated
+    method calls other decorated methods, the writes are committed only
+    once, when the outermost method returns, so that all of them are
+    made in a single transaction.
+
+    Parameters
+    ----------
+    func : function
+        Decorated method of an `Alignment` or `AlignmentList` object.
+
+    Returns
+    -------
+    wrapper : function
+        Decorated method.
+    """
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+
+        db = self.db
+
+        if db is None:
+            return func(self, *args, **kwargs)
+
+        db.begin()
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            db.end()
+
+    return wrapper
+
+
+def modifies_data(func):
+    """Decorator of the methods that modify the data of the alignments.
 
-    def __repr__(self):
-        """ Return the function's docstring. """
-        return self.func.__doc__
+    Works as `commit_writes`, but the alignments of the object that are
+    still read from a project file (see `AlignmentList.open_project`) are
+    first copied into the database, so that the decorated method finds
+    their rows there.
 
-    def __get__(self, obj, objtype):
-        """ Support instance methods """
-        return functools.partial(self.__call__, obj)
+    Parameters
+    ----------
+    func : function
+        Decorated method of an `Alignment` or `AlignmentList` object.
+
+    Returns
+    -------
+    wrapper : function
+        Decorated method.
+    """
+
+    committed = commit_writes(func)
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+
+        self._materialize()
+
+        return committed(self, *args, **kwargs)
+
+    return wrapper
 
 
 def check_data(func):
@@ -1217,6 +1431,16 @@ class Alignment(Base):
         to their index in the sqlite database table. This option should only
         be used when `input_alignment` is a database table name. Otherwise,
         it is automatically set during alignment parsing.
+    matrix_store : `trifusion.process.matrix.MatrixStore`, optional
+        If provided, sequence data is retrieved from this columnar store
+        instead of being queried directly from the database. Usually shared
+        with the parent `AlignmentList`.
+    batch_size : int, optional
+        Number of sequence rows buffered during parsing before they are
+        inserted into the database (default is 1000).
+    db : ConnectionManager, optional
+        If provided, alignment data is queried with the reader connections
+        of this object. Usually shared with the parent `AlignmentList`.
     
     Attributes
     ----------
@@ -1244,8 +1468,8 @@ class Alignment(Base):
         database. The index is not retrieved from the position of the taxon
         in `taxa_list` to prevent messing up when taxa are removed from the
         `Alignment` object.
-    shelved_taxa : list
-        List of ignored taxon names.
+    shelved_taxa : frozenset
+        Set of ignored taxon names.
     path : str
         Full path to alignment file.
     sname : str
@@ -1289,11 +1513,35 @@ class Alignment(Base):
     def __init__(self, input_alignment, input_format=None, partitions=None,
                  locus_length=None, sequence_code=None,
                  taxa_idx=None, sql_cursor=None, sql_con=None,
-                 db_idx=None, ignore_db_check=False, temp_dir=""):
+                 db_idx=None, ignore_db_check=False, temp_dir="",
+                 matrix_store=None, batch_size=1000, db=None):
 
         self.cur = sql_cursor
         self.con = sql_con
 
+        self.writer = SequenceWriter(
+            sql_cursor, "alignment_data", batch_size,
+            matrix_store.storage if matrix_store is not None else None)
+        """
+        :class:`SequenceWriter` object used by the alignment parsers to
+        insert sequence data into the database in batches of
+        `batch_size` rows.
+        """
+
+        self.matrix_store = matrix_store
+        """
+        Optional :class:`~trifusion.process.matrix.MatrixStore` object. When
+        set, sequence data is retrieved from uint8 matrices instead of
+        being queried from the database for each request.
+        """
+
+        self.db = db
+        """
+        Optional :class:`ConnectionManager` of the database. When set, the
+        alignment data is queried with the reader connection of the
+        current thread instead of the shared `cur`.
+        """
+
         if isinstance(partitions, Partitions):
             self._partitions = partitions
         else:
@@ -1333,10 +1581,10 @@ class Alignment(Base):
         wrong happens.
         """
 
-        self.shelved_taxa = []
+        self.shelved_taxa = frozenset()
         """
         Attribute that will store shelved taxa. When retrieving taxa from
-        the database, this list will be checked and present taxa will
+        the database, this set will be checked and present taxa will
         be ignored
         """
 
@@ -1442,11 +1690,117 @@ class Alignment(Base):
             sequence string.
         """
 
-        for tx, seq in self.cur.execute(
+        if self.matrix_store is not None:
+            for _, tx, seq in self.get_matrix().iter_rows(
+                    self.shelved_taxa):
+                yield tx, seq
+            return
+
+        for tx, seq in self._reader().execute(
                 "SELECT taxon,seq from alignment_data WHERE aln_idx=?",
                 (self.db_idx,)):
             if tx not in self.shelved_taxa:
-                yield tx, seq
+                yield tx, unpack_sequence(seq)
+
+    def _reader(self):
+        """Returns a cursor to query the alignment data.
+
+        If the alignment is still read from a project file, it is first
+        copied into the database (see `_materialize`).
+
+        Returns
+        -------
+        cur : sqlite3.Cursor
+            Cursor of the reader connection of the current thread, if
+            `db` is set, or a new cursor of `con` otherwise.
+        """
+
+        self._materialize()
+
+        if self.db is not None:
+            return self.db.reader().cursor()
+
+        return self.con.cursor()
+
+    def _materialize(self):
+        """Copies the alignment from its project file into the database.
+
+        Alignments restored by `AlignmentList.open_project` with a matrix
+        store are read from the memory map of the project file until they
+        are modified or queried from the database. Does nothing if the
+        alignment is already in the database.
+        """
+
+        if self.matrix_store is None:
+            return
+
+        source = self.matrix_store.get_source(self.master_table,
+                                              self.db_idx)
+
+        if source is None:
+            return
+
+        project, index = source
+
+        if self.db is not None:
+            self.db.begin()
+        try:
+            with SequenceWriter(self.cur, self.master_table,
+                                self.writer.batch_size,
+                                self.writer.pack) as writer:
+                for txId, taxon, seq in project.iter_rows(index):
+                    writer.write((txId, taxon, seq, self.db_idx))
+
+            self.matrix_store.remove_source(self.master_table, self.db_idx)
+        finally:
+            if self.db is not None:
+                self.db.end()
+
+    def get_matrix(self, table_name=None):
+        """Returns the uint8 matrix of the alignment.
+
+        Loads all rows of the alignment at once into a taxon-indexed
+        matrix, so that the sequences of several taxa can be accessed
+        without querying the database for each one. With any backend
+        other than "sql", the matrix is retrieved from the matrix store.
+        Otherwise, it is built from a single query over the (aln_idx,
+        txId) index of the table.
+
+        Parameters
+        ----------
+        table_name : str, optional
+            Name of the table from where the sequence data is fetched.
+            Defaults to the master table.
+
+        Returns
+        -------
+        _ : trifusion.process.matrix.AlignmentMatrix
+            Matrix object with the sequence data of the alignment,
+            including shelved taxa.
+        """
+
+        table_name = table_name if table_name else self.master_table
+
+        if self.matrix_store is not None:
+            try:
+                lock.acquire(True)
+                return self.matrix_store.get_matrix(self.con, table_name,
+                                                    self.db_idx)
+            finally:
+                lock.release()
+
+        rows = self._reader().execute(
+            "SELECT txId, taxon, seq FROM [{}] "
+            "WHERE aln_idx=?".format(table_name),
+            (self.db_idx,)).fetchall()
+
+        if rows:
+            txids, taxa, seqs = [list(x) for x in zip(*rows)]
+        else:
+            txids, taxa, seqs = [], [], []
+
+        return AlignmentMatrix(txids, taxa, encode_sequences(
+            [unpack_sequence(x) for x in seqs]))
 
     def _create_table(self, table_name, index=None, cur=None):
         """Creates a new table in the database.
@@ -1756,19 +2110,18 @@ class Alignment(Base):
 
         table_name = table_name if table_name else self.master_table
 
-        try:
-            # Locking mechanism necessary to avoid concurrency issues when
-            # accessing the database. This ensures that only one Cursor
-            # object is querying the database at any given time
-            lock.acquire(True)
-            for tx, seq in self.cur.execute(
-                    "SELECT taxon,seq "
-                    "FROM [{}] "
-                    "WHERE aln_idx=?".format(table_name), (self.db_idx, )):
-                if tx not in self.shelved_taxa:
-                    yield seq
-        finally:
-            lock.release()
+        if self.matrix_store is not None:
+            for _, _, seq in self.get_matrix(table_name).iter_rows(
+                    self.shelved_taxa):
+                yield seq
+            return
+
+        for tx, seq in self._reader().execute(
+                "SELECT taxon,seq "
+                "FROM [{}] "
+                "WHERE aln_idx=?".format(table_name), (self.db_idx, )):
+            if tx not in self.shelved_taxa:
+                yield unpack_sequence(seq)
 
     def iter_alignment(self, table_name):
         """Generator for (taxon, sequence) tuples.
@@ -1811,19 +2164,18 @@ class Alignment(Base):
 
         table_name = table_name if table_name else self.master_table
 
-        try:
-            # Locking mechanism necessary to avoid concurrency issues when
-            # accessing the database. This ensures that only one Cursor
-            # object is querying the database at any given time
-            lock.acquire(True)
-            for tx, seq in self.cur.execute(
-                    "SELECT taxon, seq "
-                    "FROM [{}] "
-                    "WHERE aln_idx=?".format(table_name), (self.db_idx,)):
-                if tx not in self.shelved_taxa:
-                    yield tx, seq
-        finally:
-            lock.release()
+        if self.matrix_store is not None:
+            for _, tx, seq in self.get_matrix(table_name).iter_rows(
+                    self.shelved_taxa):
+                yield tx, seq
+            return
+
+        for tx, seq in self._reader().execute(
+                "SELECT taxon, seq "
+                "FROM [{}] "
+                "WHERE aln_idx=?".format(table_name), (self.db_idx,)):
+            if tx not in self.shelved_taxa:
+                yield tx, unpack_sequence(seq)
 
     def get_sequence(self, taxon, table_name=None, ignore_shelved=False):
         """Returns the sequence string for a given taxon.
@@ -1870,32 +2222,23 @@ class Alignment(Base):
 
         taxon = unicode(taxon)
 
+        if self.matrix_store is not None:
+            if not ignore_shelved and taxon in self.shelved_taxa:
+                return
+            return self.get_matrix(table_name).get_sequence(taxon)
+
+        if not ignore_shelved and taxon in self.shelved_taxa:
+            return
+
         try:
-            # Locking mechanism necessary to avoid concurrency issues when
-            # accessing the database. This ensures that only one Cursor
-            # object is querying the database at any given time
-            lock.acquire(True)
-            try:
-                if ignore_shelved:
-                    seq = self.cur.execute(
-                        "SELECT seq "
-                        "FROM [{}] "
-                        "WHERE taxon=? "
-                        "AND aln_idx=?".format(table_name),
-                        (taxon, self.db_idx)).fetchone()[0]
-                    return seq
-                elif taxon not in self.shelved_taxa:
-                    seq = self.cur.execute(
-                        "SELECT seq "
-                        "FROM [{}] "
-                        "WHERE taxon=? "
-                        "AND aln_idx=?".format(table_name),
-                        (taxon, self.db_idx)).fetchone()[0]
-                    return seq
-            except TypeError:
-                raise KeyError
-        finally:
-            lock.release()
+            return unpack_sequence(self._reader().execute(
+                "SELECT seq "
+                "FROM [{}] "
+                "WHERE taxon=? "
+                "AND aln_idx=?".format(table_name),
+                (taxon, self.db_idx)).fetchone()[0])
+        except TypeError:
+            raise KeyError
 
     def shelve_taxa(self, lst):
         """Shelves taxa from `Alignment` methods.
@@ -1913,38 +2256,45 @@ class Alignment(Base):
             List with taxa names that should be ignored.
         """
 
-        self.shelved_taxa = [x for x in lst if x in self.taxa_idx]
+        # `taxa_idx` is retrieved from the database, so it is only
+        # fetched once
+        taxa_idx = self.taxa_idx
+        self.shelved_taxa = frozenset(x for x in lst if x in taxa_idx)
 
     def _insert_data(self, txId, taxon, seq):
-        """
+        """Buffers a sequence row for insertion into the database.
+
+        The row is added to `writer` and written to the database in
+        batches. The buffer is flushed at the end of `read_alignment`.
 
         Parameters
         ----------
-        txId
-        taxon
-        seq
-
-        Returns
-        -------
-
+        txId : int
+            Index of the taxon in the alignment.
+        taxon : str
+            Taxon name.
+        seq : str
+            Sequence string.
         """
+
         try:
+            taxon = unicode(taxon)
+        except UnicodeDecodeError:
+            reload(sys)
+            sys.setdefaultencoding("utf8")
+            taxon = unicode(taxon)
 
-            lock.acquire(True)
+        self.writer.write((txId, taxon, seq, self.db_idx))
 
-            try:
-                taxon = unicode(taxon)
-            except UnicodeDecodeError:
-                reload(sys)
-                sys.setdefaultencoding("utf8")
-                taxon = unicode(taxon)
+    def _reset_data(self):
+        """Drops sequence rows parsed so far for the current alignment.
 
-            self.cur.execute(
-                "INSERT INTO alignment_data VALUES (?, ?, ?, ?)",
-                (txId, taxon, seq, self.db_idx))
+        Used when a parser redirects to its interleave counterpart after
+        having already processed the first block of the alignment.
+        """
 
-        finally:
-            lock.release()
+        self.writer.discard()
+        self.remove_alignment()
 
     def _read_interleave_phylip(self, ntaxa):
         """ Alignment parser for interleave phylip format.
@@ -2215,8 +2565,7 @@ class Alignment(Base):
 
                     # Oh boy, this seems like an interleave phylip file.
                     # Redirect parsing to appropriate method
-                    # self.cur.execute("DELETE FROM [{}]".format(
-                    #     self.db_idx))
+                    self._reset_data()
                     size_list = self._read_interleave_phylip(taxa_num)
                     break
 
@@ -2436,11 +2785,17 @@ class Alignment(Base):
         fh.close()
 
         # Add temp table to master table
+        if self.writer.pack:
+            seq_query = "pack_seq(GROUP_CONCAT(seq, ''), '{}')".format(
+                self.writer.pack)
+        else:
+            seq_query = "GROUP_CONCAT(seq, '')"
+
         self.cur.execute(
             "INSERT INTO alignment_data (txId, taxon, seq, aln_idx) "
-            "SELECT txId, taxon, GROUP_CONCAT(seq, ''), {} "
+            "SELECT txId, taxon, {}, {} "
             "FROM [{}] "
-            "GROUP BY txId".format(self.db_idx, temp_table))
+            "GROUP BY txId".format(seq_query, self.db_idx, temp_table))
 
         self.cur.execute("DROP TABLE [{}]".format(temp_table))
 
@@ -2692,7 +3047,11 @@ class Alignment(Base):
             "stockholm": self._read_stockholm
         }
 
-        parsing_methods[self.input_format]()
+        try:
+            parsing_methods[self.input_format]()
+        finally:
+            # Write any remaining buffered rows to the database
+            self.writer.flush()
 
         # If the missing data symbol could not be evaluated during alignment
         # parsing, set the defaults
@@ -2706,12 +3065,17 @@ class Alignment(Base):
                                    " the alignment: {}".format(
                 "; ".join(duplicate_taxa)))
 
+    @commit_writes
     def remove_alignment(self):
         """Removes data from current alignment from the database"""
 
+        if self.matrix_store is not None:
+            self.matrix_store.remove_source(self.master_table, self.db_idx)
+
         self.cur.execute(
             "DELETE FROM alignment_data WHERE aln_idx=?", (self.db_idx,))
 
+    @modifies_data
     def remove_taxa(self, taxa_list_file, mode="remove"):
         """ Removes taxa from the `Alignment` object.
 
@@ -2777,6 +3141,7 @@ class Alignment(Base):
         if mode == "inverse":
             inverse(taxa_list)
 
+    @modifies_data
     def change_taxon_name(self, old_name, new_name):
         """Changes the name of a particular taxon.
 
@@ -2793,8 +3158,10 @@ class Alignment(Base):
         # Change in taxa_list
         if old_name in tx_idx:
             # Change in the database
-            self.cur.execute("UPDATE [{}] SET taxon=? WHERE txId=?".format(
-                self.db_idx), (new_name, tx_idx[old_name]))
+            self.cur.execute(
+                "UPDATE [{}] SET taxon=? WHERE txId=? AND aln_idx=?".format(
+                    self.master_table),
+                (new_name, tx_idx[old_name], self.db_idx))
             # Change in taxa_index
             tx_idx[new_name] = tx_idx[old_name]
             del tx_idx[old_name]
@@ -2845,18 +3212,201 @@ class Alignment(Base):
             self.partitions = partitions
 
 
-class AlignmentList(Base):
-    """Main interface for groups of `Alignment` objects.
+def parse_alignment(args):
+    """Parses an alignment file into an in-memory database.
 
-    The `AlignmentList` class can be seen as a group of `Alignment` objects
-    that is treated as a single cohesive data set. It is the main class
-    used to perform alignment operations on TriFusion and TriSeq programs,
-    even when there is only a single alignment.
+    Worker function used by :meth:`AlignmentList.add_alignment_files` to
+    parse alignment files in a process pool. The alignment is parsed into
+    a private in-memory sqlite database and its rows are returned together
+    with the `Alignment` object, stripped of its database references, so
+    that the parent process can write them into the shared database.
 
-    An instance can be created by simply providing a list of paths to
-    alignment files, which can be empty (and alignments added later). It
-    is recommended that the path to the sqlite database be specified
-    via the `sql_db` argument, but this is optional.
+    Parameters
+    ----------
+    args : tuple
+        Tuple with the path to the alignment file, the temporary directory
+        and the batch size of the parser writer.
+
+    Returns
+    -------
+    aln_obj : trifusion.process.sequence.Alignment
+        Parsed `Alignment` object without database Connection and Cursor.
+    rows : list
+        List of (txId, taxon, seq) tuples with the alignment data. Empty
+        if the parsing failed.
+    """
+
+    aln_path, temp_dir, batch_size = args
+
+    con = sqlite3.connect(":memory:")
+    cur = con.cursor()
+    cur.execute("CREATE TABLE alignment_data("
+                "txId INT,"
+                "taxon TEXT,"
+                "seq TEXT,"
+                "aln_idx INT)")
+
+    aln_obj = Alignment(aln_path, sql_cursor=cur, sql_con=con, db_idx=0,
+                        temp_dir=temp_dir, batch_size=batch_size)
+
+    if aln_obj.e:
+        rows = []
+    else:
+        rows = cur.execute(
+            "SELECT txId, taxon, seq FROM alignment_data").fetchall()
+
+    aln_obj.cur = aln_obj.con = aln_obj.writer = None
+    con.close()
+
+    return aln_obj, rows
+
+
+def count_alignment_sites(args):
+    """Counts the variable or informative sites of an alignment matrix.
+
+    Worker function used by :meth:`AlignmentList.get_site_counts` to
+    evaluate alignments in a process pool.
+
+    Parameters
+    ----------
+    args : tuple
+        Tuple with the aln_idx, the (ntaxa, nsites) matrix, the gap and
+        missing data symbols, the `informative` flag and the `limit` of
+        :func:`~trifusion.process.matrix.count_sites`.
+
+    Returns
+    -------
+    aln_idx : int
+        aln_idx of the alignment.
+    count : int
+        Number of variable or informative sites.
+    """
+
+    aln_idx, matrix, gap, missing, informative, limit = args
+
+    return aln_idx, count_sites(matrix, gap, missing, informative, limit)
+
+
+_write_list = None
+"""
+`AlignmentList` object used by the :func:`write_alignment` workers. It is
+set by :func:`init_writer` in each process of the pool.
+"""
+
+
+def dumps_detached(obj):
+    """Pickles an object without its database and matrix store handles.
+
+    Connections, cursors, `ConnectionManager`, `SequenceWriter` and
+    `MatrixStore` objects reachable from `obj` are pickled as references
+    that :func:`loads_detached` restores as None, so that the result can
+    be sent to other processes regardless of how they are started.
+
+    Parameters
+    ----------
+    obj : object
+        Object to pickle, usually an `AlignmentList`.
+
+    Returns
+    -------
+    _ : str
+        Pickled data.
+    """
+
+    handles = (sqlite3.Connection, sqlite3.Cursor, ConnectionManager,
+               SequenceWriter, MatrixStore)
+
+    fh = StringIO()
+    pickler = pickle.Pickler(fh, pickle.HIGHEST_PROTOCOL)
+    pickler.persistent_id = \
+        lambda x: "handle" if isinstance(x, handles) else None
+    pickler.dump(obj)
+
+    return fh.getvalue()
+
+
+def loads_detached(data):
+    """Unpickles an object pickled by :func:`dumps_detached`.
+
+    Parameters
+    ----------
+    data : str
+        Pickled data.
+
+    Returns
+    -------
+    _ : object
+        Unpickled object, with None in place of its handles.
+    """
+
+    unpickler = pickle.Unpickler(StringIO(data))
+    unpickler.persistent_load = lambda pid: None
+
+    return unpickler.load()
+
+
+def init_writer(data):
+    """Initializes a process of the pool used to write alignments.
+
+    The `AlignmentList` is restored from `data` without any handle of the
+    parent process, and opens its own connection to the database at
+    `sql_path`, which is set to be read-only. The matrix store is not
+    used by the workers, since each alignment is read only once.
+
+    Parameters
+    ----------
+    data : str
+        `AlignmentList` object with the alignments to write, pickled with
+        :func:`dumps_detached`.
+    """
+
+    global _write_list
+
+    aln_list = loads_detached(data)
+    aln_list.resume_database()
+    aln_list.cur.execute("PRAGMA query_only = ON")
+
+    _write_list = aln_list
+
+
+def write_alignment(args):
+    """Writes an alignment in several output formats.
+
+    Worker function used by :meth:`AlignmentList.write_to_file` to write
+    the output files of different alignments in a process pool.
+
+    Parameters
+    ----------
+    args : tuple
+        Tuple with the aln_idx of the alignment, the list of
+        (output format, output file) tuples and the keyword arguments of
+        `write_to_file`.
+
+    Returns
+    -------
+    aln_idx : int
+        aln_idx of the alignment.
+    """
+
+    aln_idx, output_files, kwargs = args
+
+    _write_list.write_alignment(aln_idx, output_files, **kwargs)
+
+    return aln_idx
+
+
+class AlignmentList(Base):
+    """Main interface for groups of `Alignment` objects.
+
+    The `AlignmentList` class can be seen as a group of `Alignment` objects
+    that is treated as a single cohesive data set. It is the main class
+    used to perform alignment operations on TriFusion and TriSeq programs,
+    even when there is only a single alignment.
+
+    An instance can be created by simply providing a list of paths to
+    alignment files, which can be empty (and alignments added later). It
+    is recommended that the path to the sqlite database be specified
+    via the `sql_db` argument, but this is optional.
 
     Individual alignment files can be provided when instantiating the class
     or added later, and each is processed and stored as an `Alignment` object.
@@ -2894,6 +3444,36 @@ class AlignmentList(Base):
         object (`db_cur`) to connect to an existing database.
     pbar : ProgressBar, optional
         A ProgressBar object used to log the progress of TriSeq execution.
+    backend : {"sql", "matrix", "memmap", "packed", "compressed"}, optional
+        Storage backend used to retrieve alignment data. "sql" (default)
+        queries the sqlite database for every request. "matrix" keeps each
+        alignment as a uint8 matrix in memory, loaded from the database
+        when first requested. "memmap" is the same as "matrix", but the
+        matrices are stored as `.npy` memory maps in the directory of the
+        sqlite database. "packed" is the same as "matrix", but the
+        matrices are packed with 4 bits per character for nucleotides and
+        5 bits per character for proteins (see
+        :class:`~trifusion.process.matrix.PackedMatrix`), and so are the
+        sequences written to the database (see
+        :func:`~trifusion.process.matrix.pack_sequence`). "compressed" is
+        the same as "matrix", but the matrices are kept in memory as zlib
+        compressed blocks of rows and columns (see
+        :class:`~trifusion.process.matrix.CompressedMatrix`), and each
+        sequence written to the database is compressed with zlib. Packed
+        and compressed sequences are decoded whenever they are read, so a
+        database can be used with any backend.
+    batch_size : int, optional
+        Number of sequence rows buffered by the alignment parsers before
+        they are inserted into the database with `executemany` (default
+        is 1000).
+    workers : int, optional
+        Number of processes used to parse alignment files (default is 1).
+    cache_dir : str, optional
+        Path to a directory used as a persistent cache of parsed alignment
+        files (see :class:`~trifusion.process.cache.ParseCache`) and of the
+        results of the statistics methods (see
+        :class:`~trifusion.process.cache.StatsMemo`). By default, no
+        persistent cache is used.
 
     Attributes
     ----------
@@ -2948,10 +3528,17 @@ class AlignmentList(Base):
         instance.
     partitions : trifusion.process.data.Partitions
         Partitions object that refers to the total `AlignmentList`.
+    matrix_store : trifusion.process.matrix.MatrixStore
+        Columnar store of the alignment data. Only set when `backend` is
+        not "sql".
+    db : ConnectionManager
+        Provides the writer connection (`con`) and the per-thread reader
+        connections of the database.
     """
 
     def __init__(self, alignment_list, sql_db=None, db_cur=None, db_con=None,
-                 pbar=None):
+                 pbar=None, backend="sql", batch_size=1000, workers=1,
+                 cache_dir=None):
 
         # Create connection and cursor for sqlite database
         # If `db_cur` and `db_con` are both provided, setup the database
@@ -2983,21 +3570,107 @@ class AlignmentList(Base):
         """Name of the table with the taxa_idx and partitions information
         for each Alignment object"""
 
-        if not db_cur and not db_con:
-            self.con = sqlite3.connect(self.sql_path, check_same_thread=False,
-                                       timeout=0.0)
+        if db_cur and db_con:
+            self.db = ConnectionManager(self.sql_path, con=db_con)
+        else:
+            self.db = ConnectionManager(self.sql_path)
+            self.con = self.db.con
             self.cur = self.con.cursor()
-            self.cur.execute("PRAGMA synchronous = OFF")
+        """
+        :class:`ConnectionManager` of the database, shared with all
+        `Alignment` objects. `con` is its writer connection.
+        """
+
+        if backend == "sql":
+            self.matrix_store = None
+        elif backend == "matrix":
+            self.matrix_store = MatrixStore()
+        elif backend == "memmap":
+            self.matrix_store = MatrixStore(memmap_dir=join(
+                os.path.dirname(self.sql_path) or ".", ".matrixstore"))
+        elif backend == "packed":
+            self.matrix_store = MatrixStore(packed=True)
+        elif backend == "compressed":
+            self.matrix_store = MatrixStore(compress="zlib")
+        else:
+            raise ArgumentError("Invalid storage backend: {}".format(backend))
+        """
+        Columnar :class:`~trifusion.process.matrix.MatrixStore` shared
+        with all `Alignment` objects. It is None when the "sql" backend
+        is used.
+        """
 
         if not self._table_exists(self.master_table):
             # Add master table for sequence data
             self._create_table(self.master_table,
-                               index=("main_idx", "aln_idx"))
-            # Add master table for taxa_idx and partition information
+                               index=("main_idx", "aln_idx, txId"))
+        elif self.matrix_store is not None:
+            self.matrix_store.track(self.con, self.master_table)
 
+        # Add master table for taxa_idx and partition information
         if not self._table_exists("aux"):
             self._create_aux_table()
 
+        self.column_stats_cache = ResultCache()
+        """
+        Cache of the per-column statistics of each alignment, populated by
+        `iter_column_stats`.
+        """
+
+        self.taxa_presence = TaxaPresence()
+        """
+        :class:`~trifusion.process.matrix.TaxaPresence` bitmap with the
+        presence of each taxon in each alignment, indexed by `aln_idx`. It
+        is used by the methods that only depend on the taxa composition of
+        the alignments.
+        """
+
+        self.summary_cache = ResultCache()
+        """
+        Cache of the summary statistics of each alignment, populated by
+        `get_summary_stats`. Keys are (table name, aln_idx, shelved taxa)
+        tuples and values are (nsites, taxa, var, inf, gap, missing)
+        tuples.
+        """
+
+        self.batch_size = batch_size
+        """
+        Number of sequence rows buffered by the alignment parsers before
+        they are inserted into the database with a single `executemany`
+        call.
+        """
+
+        self.block_size = 2 ** 26
+        """
+        Maximum number of alignment characters (taxa x columns) that are
+        kept in memory at once by the output writers. Alignments larger
+        than this are processed in blocks of columns (see
+        `iter_column_blocks`).
+        """
+
+        self.workers = workers
+        """
+        Number of processes used to parse alignment files in
+        `add_alignment_files` and to write alignments to their own files in
+        `write_to_file`. When larger than 1, files are parsed in a process
+        pool and their data is written into the database by this object.
+        """
+
+        self.parse_cache = ParseCache(cache_dir) if cache_dir else None
+        """
+        :class:`~trifusion.process.cache.ParseCache` object with the parsed
+        alignment files from previous runs. Only set when `cache_dir` is
+        provided.
+        """
+
+        self.stats_memo = StatsMemo(
+            store_path=join(cache_dir, "stats.db") if cache_dir else None)
+        """
+        :class:`~trifusion.process.cache.StatsMemo` object with the results
+        of the statistics methods. When `cache_dir` is provided, results
+        are also stored in that directory and reused by later runs.
+        """
+
         self.alignments = OrderedDict()
         """
         Stores the "active" `Alignment` objects for the current
@@ -3051,6 +3724,12 @@ class AlignmentList(Base):
         List with non active taxa
         """
 
+        self._shelved_table = {}
+        """
+        Maps the id of each database connection to the set of taxa stored
+        in its `shelved_taxa` temporary table. See `_shelved_condition`.
+        """
+
         self.path_list = []
         """
         List of `Alignment.path`
@@ -3095,14 +3774,18 @@ class AlignmentList(Base):
                            "snapp": "_snapp.nex"}
         """Dictionary that stores the suffix for each output format"""
 
+        self.block_formats = ["fasta", "phylip", "nexus"]
+        """
+        List of output formats written from column blocks, which can be
+        written in parallel by `write_to_file` (see `write_alignment`)
+        """
+
         self.temporary_tables = []
         """
         Lists the currently active tables. This is mainly used for the
         conversion of the consensus alignments into a single Alignment object
         """
 
-        self.interleave_data = False
-
         self.partition_data = False
         """
         Boolean attribute that is set to True when the partitioned data table
@@ -3136,6 +3819,48 @@ class AlignmentList(Base):
         """
         return iter(self.alignments.values())
 
+    def _reader(self):
+        """Returns a cursor of the reader connection of the current thread.
+
+        The alignments that are still read from a project file are first
+        copied into the database (see `_materialize`).
+
+        Returns
+        -------
+        cur : sqlite3.Cursor
+            Cursor of the reader connection provided by `db`.
+        """
+
+        self._materialize()
+
+        return self.db.reader().cursor()
+
+    def _materialize(self):
+        """Copies the alignments read from a project file into the database.
+
+        See `open_project` and :meth:`Alignment._materialize`.
+        """
+
+        if self.matrix_store is None:
+            return
+
+        for aln_idx in self.matrix_store.get_sources(self.master_table):
+            self.alignment_idx[aln_idx]._materialize()
+
+    def _storage(self):
+        """Returns the format of the sequences written to the database.
+
+        Returns
+        -------
+        _ : str or None
+            `method` argument of
+            :func:`~trifusion.process.matrix.pack_sequence`, or None if
+            the sequences are stored as TEXT.
+        """
+
+        if self.matrix_store is not None:
+            return self.matrix_store.storage
+
     def iter_alignments(self, table_name=None, include_txid=False):
 
         table_name = table_name if table_name else self.master_table
@@ -3149,26 +3874,76 @@ class AlignmentList(Base):
         except sqlite3.OperationalError:
             table_name = self.master_table
 
-        try:
-
-            lock.acquire(True)
-
-            for txId, taxon, seq, aln_idx in self.cur.execute(
-                    "SELECT txId, taxon, seq, aln_idx "
-                    "FROM [{}] "
-                    "WHERE aln_idx NOT IN ({}) AND "
-                    "aln_idx IN ({})".format(
-                        table_name,
-                        ", ".join([str(x) for x in self.shelved_idx]),
-                        ", ".join([str(x) for x in self.alignment_idx]))):
-                if taxon not in self.shelved_taxa:
+        if self.matrix_store is not None:
+            for aln_idx, matrix in self._iter_table_matrices(table_name):
+                for txId, taxon, seq in matrix.iter_rows(self.shelved_taxa):
                     if include_txid:
                         yield txId, taxon, seq, aln_idx
                     else:
                         yield taxon, seq, aln_idx
+            return
 
-        finally:
-            lock.release()
+        cur = self._reader()
+
+        cond_tx = self._shelved_condition(cur)
+
+        for txId, taxon, seq, aln_idx in cur.execute(
+                "SELECT txId, taxon, seq, aln_idx "
+                "FROM [{}] "
+                "WHERE aln_idx NOT IN ({}) AND "
+                "aln_idx IN ({}) AND {}".format(
+                    table_name,
+                    ", ".join([str(x) for x in self.shelved_idx]),
+                    ", ".join([str(x) for x in self.alignment_idx]),
+                    cond_tx)):
+            seq = unpack_sequence(seq)
+            if include_txid:
+                yield txId, taxon, seq, aln_idx
+            else:
+                yield taxon, seq, aln_idx
+
+    def iter_alignment_rows(self, table_name=None):
+        """Generator over the sequence rows of each active alignment.
+
+        Parameters
+        ----------
+        table_name : str, optional
+            Name of the table from where the sequence data is fetched.
+
+        Yields
+        ------
+        aln_idx : int
+            aln_idx of the alignment.
+        rows : list
+            List of (txId, taxon, seq) tuples of the active taxa.
+        """
+
+        for aln_idx, rows in itertools.groupby(
+                self.iter_alignments(table_name, include_txid=True),
+                key=lambda x: x[3]):
+            yield aln_idx, [x[:3] for x in rows]
+
+    def pipeline(self, table_in=None, table_out=None):
+        """Creates a lazy pipeline of operations over the active alignments.
+
+        See :class:`~trifusion.process.pipeline.AlignmentPipeline`.
+
+        Parameters
+        ----------
+        table_in : str, optional
+            Name of database table containing the alignment data. Defaults
+            to the master table.
+        table_out : str, optional
+            Name of database table where the final alignment data is
+            inserted. Defaults to `table_in`.
+
+        Returns
+        -------
+        _ : trifusion.process.pipeline.AlignmentPipeline
+            Pipeline without operations.
+        """
+
+        return AlignmentPipeline(self, table_in, table_out)
 
     def iter_columns(self, table_name=None, aln_idx=None, include_taxa=False,
                      group_by=None):
@@ -3184,127 +3959,767 @@ class AlignmentList(Base):
         except sqlite3.OperationalError as e:
             table_name = self.master_table
 
-        try:
+        # Columns from the matrix store. Custom grouping columns are
+        # only available through the database query
+        if self.matrix_store is not None and not group_by:
+            for idx, matrix in self._iter_table_matrices(table_name,
+                                                         aln_idx):
+                taxa, _ = matrix.active(self.shelved_taxa)
+                # Alignments with only shelved taxa are ignored
+                if not taxa:
+                    continue
+                for col in matrix.iter_columns(self.shelved_taxa):
+                    if include_taxa:
+                        yield taxa, col, idx
+                    else:
+                        yield col, idx
+            return
 
-            lock.acquire(True)
+        cur = self._reader()
 
-            query = "SELECT " \
-                    "{tx} " \
-                    "GROUP_CONCAT(substr(seq, {pos}, 100000)), " \
-                    "{idx} " \
-                    "FROM [{tb}] " \
-                    "WHERE {cond} " \
-                    "AND {cond_tx} " \
-                    "GROUP BY {idx}"
+        query = "SELECT " \
+                "{tx} " \
+                "GROUP_CONCAT(substr(unpack_seq(seq), {pos}, 100000)), " \
+                "{idx} " \
+                "FROM [{tb}] " \
+                "WHERE {cond} " \
+                "AND {cond_tx} " \
+                "GROUP BY {idx}"
 
-            group_idx = group_by if group_by else "aln_idx"
+        group_idx = group_by if group_by else "aln_idx"
 
-            if aln_idx:
-                cond = "aln_idx={} ".format(aln_idx)
-            else:
-                shelved = ", ".join([str(x) for x in self.shelved_idx])
-                cond = "aln_idx NOT in ({})".format(shelved)
+        if aln_idx:
+            cond = "aln_idx={} ".format(aln_idx)
+        else:
+            shelved = ", ".join([str(x) for x in self.shelved_idx])
+            cond = "aln_idx NOT in ({})".format(shelved)
+
+        cond_tx = self._shelved_condition(cur)
 
-            cond_tx = "taxon NOT IN ({})".format(", ".join(
-                ["'{}'".format(x) for x in self.shelved_taxa]))
+        if include_taxa:
+            tx_query = "GROUP_CONCAT(taxon),"
+        else:
+            tx_query = ""
 
+        for p in xrange(0, self.size, 100000):
             if include_taxa:
-                tx_query = "GROUP_CONCAT(taxon),"
+                for res in ((z, x.split(","), y) for z, x, y in
+                            cur.execute(
+                                query.format(pos=p,
+                                             tb=table_name,
+                                             cond=cond,
+                                             cond_tx=cond_tx,
+                                             tx=tx_query,
+                                             idx=group_idx))):
+                    for col in itertools.izip(*res[1]):
+                        yield res[0].split(","), col, res[2]
             else:
-                tx_query = ""
-
-            for p in xrange(0, self.size, 100000):
-                if include_taxa:
-                    for res in ((z, x.split(","), y) for z, x, y in
-                                self.cur.execute(
-                                    query.format(pos=p,
-                                                 tb=table_name,
-                                                 cond=cond,
-                                                 cond_tx=cond_tx,
-                                                 tx=tx_query,
-                                                 idx=group_idx))):
-                        for col in itertools.izip(*res[1]):
-                            yield res[0].split(","), col, res[2]
-                else:
-                    for res in ((x.split(","), y) for x, y in self.cur.execute(
-                            query.format(pos=p,
-                                         tb=table_name,
-                                         cond=cond,
-                                         cond_tx=cond_tx,
-                                         tx=tx_query,
-                                         idx=group_idx))):
-                        for col in itertools.izip(*res[0]):
-                            yield col, res[1]
-
-        finally:
-            lock.release()
-
-    def _create_aux_table(self, cur=None):
-        """Creates an auxiliary table in the database
+                for res in ((x.split(","), y) for x, y in cur.execute(
+                        query.format(pos=p,
+                                     tb=table_name,
+                                     cond=cond,
+                                     cond_tx=cond_tx,
+                                     tx=tx_query,
+                                     idx=group_idx))):
+                    for col in itertools.izip(*res[0]):
+                        yield col, res[1]
+
+    def _iter_table_matrices(self, table_name, aln_idx=None, idx_list=None):
+        """Generator over the matrices of the active alignments in a table.
 
         Parameters
         ----------
         table_name : str
-            Name of the table to be created.
+            Name of the database table. Must exist in the database.
+        aln_idx : int, optional
+            If provided, only the matrix of this alignment is returned.
+        idx_list : list, optional
+            If provided, only the matrices of these alignments are returned.
+
+        Yields
+        ------
+        aln_idx : int
+            aln_idx of the alignment.
+        matrix : trifusion.process.matrix.AlignmentMatrix
+            Matrix object with the complete alignment data, including
+            shelved taxa.
         """
 
-        if not cur:
-            cur = self.cur
+        if idx_list is None:
+            idx_list = self._get_active_idx(aln_idx)
 
-        cur.execute("CREATE TABLE aux("
-                    "aln_idx INT,"
-                    "taxa_idx TEXT,"
-                    "partitions TEXT)")
+        if not idx_list:
+            return
 
-        cur.execute("CREATE INDEX aux_idx ON aux(aln_idx)")
+        if self.matrix_store is not None:
+            try:
+                lock.acquire(True)
+                matrices = self.matrix_store.get_matrices(
+                    self.con, table_name, idx_list)
+            finally:
+                lock.release()
+
+            for idx, matrix in matrices.items():
+                if len(matrix):
+                    yield idx, matrix
+            return
 
-    def _create_table(self, table_name, index=None, cur=None, add_cols=None):
-        """Creates a new table in the database.
+        # Without a matrix store, matrices are built on the fly, one
+        # alignment at a time
+        rows, prev_idx = [], None
 
-        Convenience method that creates a new table in the sqlite database.
-        It accepts a custom Cursor object, which overrides the `cur`
-        attribute. Optionally, an index can also be specified.
+        for txId, taxon, seq, idx in self._reader().execute(
+                "SELECT txId, taxon, seq, aln_idx "
+                "FROM [{}] "
+                "WHERE aln_idx IN ({})".format(
+                    table_name, ", ".join([str(x) for x in idx_list]))):
+
+            # This happens when the alignment changes during the
+            # iteration
+            if idx != prev_idx and rows:
+                yield prev_idx, AlignmentMatrix(*self._split_rows(rows))
+                rows = []
+
+            prev_idx = idx
+            rows.append((txId, taxon, seq))
+
+        if rows:
+            yield prev_idx, AlignmentMatrix(*self._split_rows(rows))
+
+    @staticmethod
+    def _split_rows(rows):
+        """Converts (txId, taxon, seq) rows into `AlignmentMatrix` arguments.
 
         Parameters
         ----------
-        table_name : str
-            Name of the table to be created.
-        index : list, optional
-            Provide a list with [<name of index>, <columns to be indexed>].
-            (e.g., ["concindex", "txId"]).
-        cur : sqlite3.Cursor, optional
-            Custom Cursor object used to query the database.
-        """
-
-        if not cur:
-            cur = self.cur
+        rows : list
+            List of (txId, taxon, seq) tuples.
 
-        if add_cols:
-            cols = "".join([", " + x for x in add_cols])
-        else:
-            cols = ""
+        Returns
+        -------
+        txids : list
+        taxa : list
+        matrix : numpy.ndarray
+        """
 
-        cur.execute("CREATE TABLE [{}]("
-                    "txId INT, "
-                    "taxon TEXT, "
-                    "seq TEXT, "
-                    "aln_idx INT"
-                    "{})".format(table_name, cols))
+        txids, taxa, seqs = zip(*rows)
 
-        if index:
-            cur.execute("CREATE INDEX {} ON [{}]({})".format(
-                index[0], table_name, index[1]))
+        return list(txids), list(taxa), encode_sequences(
+            [unpack_sequence(x) for x in seqs])
 
-    def _table_exists(self, table_name, cur=None):
-        """ Checks if a table exists in the database.
+    def iter_matrices(self, table_name=None, aln_idx=None):
+        """Generator over the uint8 matrices of the active alignments.
 
-        Convenience method that checks if a table exists in the database.
-        It accepts a custom Cursor object, which overrides the `cur`
-        attribute.
+        Each alignment is provided as a (ntaxa, nsites) uint8 matrix
+        with the shelved taxa already removed, so that column-wise
+        operations can be performed with array slicing. When the
+        `AlignmentList` uses a backend other than "sql", matrices are
+        retrieved from the `matrix_store`. Otherwise, they are built from
+        the database, one alignment at a time.
 
         Parameters
         ----------
-        table_name : str
+        table_name : str, optional
+            Name of the table from where the sequence data is fetched.
+            If the table does not exist or is empty, the master table is
+            used.
+        aln_idx : int, optional
+            If provided, only the matrix of this alignment is returned.
+
+        Yields
+        ------
+        aln_idx : int
+            aln_idx of the alignment.
+        taxa : list
+            List of active taxa, in the same order as the matrix rows.
+        matrix : numpy.ndarray
+            (ntaxa, nsites) array with uint8 dtype.
+        """
+
+        table_name = self._get_table_name(table_name)
+
+        for idx, matrix in self._iter_table_matrices(table_name, aln_idx):
+            taxa, m = matrix.active(self.shelved_taxa)
+            # Alignments with only shelved taxa are ignored
+            if taxa:
+                yield idx, taxa, m
+
+    def iter_column_blocks(self, table_name=None, block_size=None,
+                           multiple=1, aln_idx=None):
+        """Generator over the column blocks of the active alignments.
+
+        Retrieves the data of each active alignment as consecutive blocks
+        of columns, so that alignments much larger than the available memory
+        can be processed. Without a matrix store, the first block of every
+        alignment is fetched with a single query over the table, and further
+        blocks (only needed for alignments with more than `block_size`
+        characters) are fetched with `substr`, one query per block.
+
+        Parameters
+        ----------
+        table_name : str, optional
+            Name of database table containing the alignment data.
+        block_size : int, optional
+            Maximum number of characters (taxa x columns) in each block.
+            Defaults to the `block_size` attribute.
+        multiple : int, optional
+            The number of columns of each block, except for the last one, is
+            a multiple of this value.
+        aln_idx : int, optional
+            If provided, only the alignment with this aln_idx is retrieved.
+
+        Yields
+        ------
+        aln_idx : int
+            aln_idx of the alignment.
+        taxa : list
+            List of active taxa, in the same order as the block rows.
+        blocks : generator
+            Generator over the column blocks of the alignment, as
+            (ntaxa, ncolumns) arrays with uint8 dtype.
+        """
+
+        def get_columns(ntaxa):
+            return max(multiple, block_size // max(ntaxa, 1) //
+                       multiple * multiple)
+
+        block_size = block_size if block_size else self.block_size
+        table_name = self._get_table_name(table_name)
+
+        if self.matrix_store is not None:
+            for idx, matrix in self._iter_table_matrices(table_name,
+                                                         aln_idx):
+                mask = matrix.row_mask(self.shelved_taxa)
+                taxa = [tx for tx, m in zip(matrix.taxa, mask) if m]
+                # Alignments with only shelved taxa are ignored
+                if not taxa:
+                    continue
+                ncol = get_columns(len(taxa))
+                # Columns are retrieved one block at a time, so that
+                # packed or compressed matrices only decode the columns
+                # of the current block
+                yield idx, taxa, (
+                    matrix.get_columns(i, i + ncol, self.shelved_taxa)
+                    for i in xrange(0, max(matrix.nsites, 1), ncol))
+            return
+
+        idx_list = self._get_active_idx(aln_idx)
+
+        if not idx_list:
+            return
+
+        # The same number of columns is used for all alignments, so that
+        # their first blocks can be retrieved with a single query
+        ncol = get_columns(max(len(self.alignment_idx[x].taxa_idx)
+                               for x in idx_list))
+
+        shelved = set(self.shelved_taxa)
+        rows, prev_idx = [], None
+
+        for taxon, seq, length, idx in self._reader().execute(
+                "SELECT taxon, CAST(substr(unpack_seq(seq), 1, ?) AS BLOB), "
+                "length(unpack_seq(seq)), aln_idx "
+                "FROM [{}] "
+                "WHERE aln_idx IN ({})".format(
+                    table_name, ", ".join([str(x) for x in idx_list])),
+                (ncol,)):
+
+            # This happens when the alignment changes during the
+            # iteration
+            if idx != prev_idx and rows:
+                taxa = [x[0] for x in rows]
+                yield prev_idx, taxa, self._iter_sql_blocks(
+                    table_name, prev_idx, rows, ncol)
+                rows = []
+
+            prev_idx = idx
+
+            if taxon not in shelved:
+                rows.append((taxon, str(seq), length))
+
+        if rows:
+            taxa = [x[0] for x in rows]
+            yield prev_idx, taxa, self._iter_sql_blocks(
+                table_name, prev_idx, rows, ncol)
+
+    def _iter_sql_blocks(self, table_name, aln_idx, rows, ncol):
+        """Generator over the column blocks of an alignment in the database.
+
+        Parameters
+        ----------
+        table_name : str
+            Name of database table containing the alignment data.
+        aln_idx : int
+            aln_idx of the alignment.
+        rows : list
+            List of (taxon, first block sequence, sequence length) tuples
+            of the active taxa.
+        ncol : int
+            Number of columns in each block.
+
+        Yields
+        ------
+        block : numpy.ndarray
+            (ntaxa, ncolumns) array with uint8 dtype.
+        """
+
+        yield encode_sequences([x[1] for x in rows])
+
+        cur = self._reader()
+
+        for start in xrange(ncol, max(x[2] for x in rows), ncol):
+            seqs = dict((x, str(y)) for x, y in cur.execute(
+                "SELECT taxon, CAST(substr(unpack_seq(seq), ?, ?) AS BLOB) "
+                "FROM [{}] "
+                "WHERE aln_idx=?".format(table_name),
+                (start + 1, ncol, aln_idx)))
+
+            yield encode_sequences([seqs[x[0]] for x in rows])
+
+    def iter_column_stats(self, table_name=None, aln_idx=None,
+                          idx_list=None):
+        """Generator over the per-column statistics of the active alignments.
+
+        Computes the number of gaps, missing data, character states and
+        informative character states of every column of each active
+        alignment with the vectorized
+        :func:`~trifusion.process.matrix.column_stats` kernel. This is the
+        single source of column statistics for the summary statistics,
+        the variation filters, the column filter and the segregating
+        sites plots and outliers. Results are cached per (table name,
+        aln_idx) and set of shelved taxa, so that the alignment data is
+        scanned only once until the database is modified.
+
+        Parameters
+        ----------
+        table_name : str, optional
+            Name of the table from where the sequence data is fetched.
+            If the table does not exist or is empty, the master table is
+            used.
+        aln_idx : int, optional
+            If provided, only the statistics of this alignment are returned.
+        idx_list : list, optional
+            If provided, only the statistics of these alignments are
+            returned.
+
+        Yields
+        ------
+        aln_idx : int
+            aln_idx of the alignment.
+        stats : trifusion.process.matrix.ColumnStats
+            Per-column statistics of the alignment.
+        """
+
+        table_name = self._get_table_name(table_name)
+        if idx_list is None:
+            idx_list = self._get_active_idx(aln_idx)
+        shelved = frozenset(self.shelved_taxa)
+
+        # Results are kept locally as well, since the cache may be
+        # invalidated if the database is changed during the iteration
+        results = {}
+        for idx in idx_list:
+            res = self.column_stats_cache.get(self.con,
+                                              (table_name, idx, shelved))
+            if res is not None:
+                results[idx] = res
+
+        missing = [x for x in idx_list if x not in results]
+        computed = self._iter_table_matrices(table_name, idx_list=missing)
+
+        for idx in idx_list:
+
+            # Compute the statistics of all alignments until the current
+            # one is reached
+            if idx not in results and idx in missing:
+                for cidx, matrix in computed:
+                    # Packed matrices are processed as character codes,
+                    # without being decoded
+                    taxa, m = matrix.active(self.shelved_taxa, codes=True)
+                    # Alignments with only shelved taxa are ignored
+                    if taxa:
+                        results[cidx] = column_stats(
+                            m, *matrix.code_symbols(
+                                self.gap_symbol,
+                                self.alignment_idx[cidx].sequence_code[1]))
+                        self.column_stats_cache.set(
+                            self.con, (table_name, cidx, shelved),
+                            results[cidx])
+                    if cidx == idx:
+                        break
+
+                # Release the database query once all statistics have
+                # been computed
+                if idx == missing[-1]:
+                    computed.close()
+
+            if idx in results:
+                yield idx, results[idx]
+
+    def iter_similarity(self, table_name=None, aln_idx=None):
+        """Generator over the pairwise similarity of the active alignments.
+
+        Computes the number of identical sites and the effective length
+        between all pairs of active taxa of each active alignment with the
+        vectorized :func:`~trifusion.process.matrix.pairwise_similarity`
+        kernel. Each alignment is read and encoded only once, regardless of
+        the number of taxa, and the results are memoized in `stats_memo`.
+        This is the single source of pairwise comparisons for the sequence
+        similarity and segregation plots and outliers.
+
+        Parameters
+        ----------
+        table_name : str, optional
+            Name of the table from where the sequence data is fetched.
+            If the table does not exist or is empty, the master table is
+            used.
+        aln_idx : int, optional
+            If provided, only the results of this alignment are returned.
+
+        Yields
+        ------
+        aln_idx : int
+            aln_idx of the alignment.
+        taxa : list
+            List of active taxa, in the same order as the rows and columns
+            of the result matrices.
+        sim : numpy.ndarray
+            (ntaxa, ntaxa) array with the number of identical sites
+            between each pair of taxa.
+        ef_len : numpy.ndarray
+            (ntaxa, ntaxa) array with the number of sites without gaps or
+            missing data in both taxa of each pair.
+        """
+
+        for idx, taxa, m in self.iter_matrices(table_name, aln_idx):
+
+            missing = self.alignment_idx[idx].sequence_code[1]
+
+            # Results are memoized by the contents of the alignment, so
+            # that they are shared by alignments with the same data
+            key = self.stats_memo.get_key("similarity", m, self.gap_symbol,
+                                          missing)
+            res = self.stats_memo.get(key)
+
+            if res is None:
+                res = pairwise_similarity(m, self.gap_symbol, missing)
+                self.stats_memo.set(key, res)
+
+            yield (idx, taxa) + res
+
+        self.stats_memo.flush()
+
+    def _get_column_counts(self, aln_obj):
+        """Returns the per-column character counts of an alignment.
+
+        Counts are memoized in `stats_memo`, so that the sliding window
+        plots of an alignment can be recomputed with other window sizes
+        without scanning the alignment again.
+
+        Parameters
+        ----------
+        aln_obj : Alignment
+            Alignment object.
+
+        Returns
+        -------
+        ntaxa : int
+            Number of active taxa of the alignment.
+        alphabet : numpy.ndarray
+            Byte values of the characters present in the alignment.
+        counts : numpy.ndarray
+            (len(alphabet), nsites) array with the number of occurrences
+            of each character in each column.
+        """
+
+        matrix = aln_obj.get_matrix()
+        taxa, m = matrix.active(self.shelved_taxa, codes=True)
+
+        # Counts of character codes depend on the codec of the matrix
+        key = self.stats_memo.get_key("column_counts", m,
+                                      getattr(matrix.codec, "symbols", None))
+        res = self.stats_memo.get(key)
+
+        if res is None:
+            alphabet, counts = column_counts(m)
+            res = matrix.symbol_values(alphabet), counts
+            self.stats_memo.set(key, res)
+
+        return (len(taxa),) + res
+
+    @staticmethod
+    def _get_window(aln_obj, window_size, window_step=None):
+        """Converts the window size and step of a plot into columns.
+
+        Parameters
+        ----------
+        aln_obj : Alignment
+            Alignment object.
+        window_size : int or float
+            Size of the sliding window. Values between 0 and 1 are
+            interpreted as a proportion of the alignment length.
+        window_step : int or float, optional
+            Distance between the start of consecutive windows, with the
+            same interpretation as `window_size`. Defaults to the window
+            size, i.e., non-overlapping windows.
+
+        Returns
+        -------
+        window : int
+            Number of columns of each window.
+        step : int
+            Number of columns between the start of consecutive windows.
+        """
+
+        def get_columns(val):
+            if 0 < val < 1:
+                return int(val * aln_obj.locus_length)
+            else:
+                return int(val)
+
+        window = get_columns(window_size)
+        step = get_columns(window_step) if window_step else window
+
+        return window, step
+
+    @staticmethod
+    def _get_pair_pos(taxa, taxa_pos):
+        """Maps the pairs of taxa of an alignment to global positions.
+
+        Parameters
+        ----------
+        taxa : list
+            List of taxa of the alignment, in the same order as the rows
+            of its pairwise matrices.
+        taxa_pos : dict
+            Maps each taxon name to its global position.
+
+        Returns
+        -------
+        rows : tuple
+            Indices of each pair of taxa in the pairwise matrices of the
+            alignment, in the same order as `itertools.combinations`.
+        cols : tuple
+            Global positions of each pair of taxa, with the lowest
+            position first.
+        """
+
+        pos = np.array([taxa_pos[tx] for tx in taxa], dtype=np.intp)
+        rows = np.triu_indices(len(taxa), 1)
+        pos1, pos2 = pos[rows[0]], pos[rows[1]]
+
+        return rows, (np.minimum(pos1, pos2), np.maximum(pos1, pos2))
+
+    def _get_active_idx(self, aln_idx=None):
+        """Returns the aln_idx of the active alignments.
+
+        Parameters
+        ----------
+        aln_idx : int, optional
+            If provided, a list with only this aln_idx is returned.
+
+        Returns
+        -------
+        _ : list
+            List of aln_idx.
+        """
+
+        if aln_idx:
+            return [aln_idx]
+
+        return [x for x in self.alignment_idx if x not in self.shelved_idx]
+
+    def _get_table_name(self, table_name=None):
+        """Returns the name of the table from which data is retrieved.
+
+        If the table does not exist or is empty, fallback to the master
+        table.
+
+        Parameters
+        ----------
+        table_name : str, optional
+            Name of the database table.
+
+        Returns
+        -------
+        table_name : str
+            Name of the database table.
+        """
+
+        table_name = table_name if table_name else self.master_table
+
+        try:
+            if not self.cur.execute(
+                    "SELECT * FROM [{}]".format(table_name)).fetchone():
+                table_name = self.master_table
+        except sqlite3.OperationalError:
+            table_name = self.master_table
+
+        return table_name
+
+    def _create_aux_table(self, cur=None):
+        """Creates an auxiliary table in the database
+
+        Parameters
+        ----------
+        table_name : str
+            Name of the table to be created.
+        """
+
+        if not cur:
+            cur = self.cur
+
+        cur.execute("CREATE TABLE aux("
+                    "aln_idx INT,"
+                    "taxa_idx TEXT,"
+                    "partitions TEXT)")
+
+        cur.execute("CREATE INDEX aux_idx ON aux(aln_idx)")
+
+    def _shelved_condition(self, cur):
+        """Returns the SQL condition that excludes the shelved taxa.
+
+        The shelved taxa are stored in the `shelved_taxa` temporary table
+        of the connection of `cur`, so that they are excluded by the
+        query itself with a single sub-query instead of being filtered
+        for each row. The table is only rebuilt when the shelved taxa
+        change or when the connection does not have it yet (for
+        instance, a new reader connection). Temporary tables are private
+        to each connection, so rebuilding it does not modify the
+        database.
+
+        Parameters
+        ----------
+        cur : sqlite3.Cursor
+            Cursor of the connection that will execute the query.
+
+        Returns
+        -------
+        cond : str
+            Condition for the WHERE clause of a query over the `taxon`
+            column.
+        """
+
+        if not self.shelved_taxa:
+            return "1"
+
+        shelved = frozenset(self.shelved_taxa)
+        con = cur.connection
+
+        # The cursor is only used to update the table, so that the
+        # queries of the cursor provided are not reset
+        temp_cur = con.cursor()
+
+        if shelved != self._shelved_table.get(id(con)) or \
+                not temp_cur.execute(
+                    "SELECT name FROM sqlite_temp_master "
+                    "WHERE type='table' AND name='shelved_taxa'").fetchone():
+
+            # The writer connection shares the result caches, which are
+            # refreshed since the alignment data is not modified
+            caches = [x for x in [self.column_stats_cache,
+                                  self.summary_cache]
+                      if x.is_current(self.con)]
+
+            temp_cur.execute("CREATE TEMP TABLE IF NOT EXISTS shelved_taxa("
+                             "taxon TEXT PRIMARY KEY)")
+            temp_cur.execute("DELETE FROM temp.shelved_taxa")
+            temp_cur.executemany("INSERT INTO temp.shelved_taxa VALUES (?)",
+                                 ((x,) for x in shelved))
+            # Ends the transaction of the temporary table, so that the
+            # next queries of the connection see the latest snapshot
+            con.commit()
+            self._shelved_table[id(con)] = shelved
+
+            for cache in caches:
+                cache.refresh(self.con)
+
+        return "taxon NOT IN (SELECT taxon FROM temp.shelved_taxa)"
+
+    def _create_table(self, table_name, index=None, cur=None, add_cols=None):
+        """Creates a new table in the database.
+
+        Convenience method that creates a new table in the sqlite database.
+        It accepts a custom Cursor object, which overrides the `cur`
+        attribute. Optionally, an index can also be specified.
+
+        Parameters
+        ----------
+        table_name : str
+            Name of the table to be created.
+        index : list, optional
+            Provide a list with [<name of index>, <columns to be indexed>].
+            (e.g., ["concindex", "txId"]).
+        cur : sqlite3.Cursor, optional
+            Custom Cursor object used to query the database.
+        """
+
+        if not cur:
+            cur = self.cur
+
+        if add_cols:
+            cols = "".join([", " + x for x in add_cols])
+        else:
+            cols = ""
+
+        cur.execute("CREATE TABLE [{}]("
+                    "txId INT, "
+                    "taxon TEXT, "
+                    "seq TEXT, "
+                    "aln_idx INT"
+                    "{})".format(table_name, cols))
+
+        if index:
+            cur.execute("CREATE INDEX {} ON [{}]({})".format(
+                index[0], table_name, index[1]))
+
+        # Changes to the new table only discard the stored matrices of the
+        # modified alignments
+        if self.matrix_store is not None:
+            self.matrix_store.track(cur.connection, table_name)
+
+    def _replace_table(self, table_name, table_out):
+        """Replaces a table in the database with another table.
+
+        If `table_out` exists, it is dropped and `table_name` is renamed to
+        `table_out`. When `table_out` is the master table, its (aln_idx,
+        txId) index is restored.
+
+        Parameters
+        ----------
+        table_name : str
+            Name of the table with the new data.
+        table_out : str
+            Name of the table that is replaced.
+        """
+
+        if self._table_exists(table_out):
+            self.cur.execute("DROP TABLE [{}]".format(table_out))
+
+        # The triggers of the renamed table would still log its old name
+        if self.matrix_store is not None:
+            self.matrix_store.untrack(self.con, table_name)
+
+        self.cur.execute("ALTER TABLE [{}] RENAME TO [{}]".format(
+            table_name, table_out))
+
+        if table_out == self.master_table:
+            self.cur.execute("CREATE INDEX main_idx ON [{}](aln_idx, txId)"
+                             .format(table_out))
+
+        if self.matrix_store is not None:
+            self.matrix_store.track(self.con, table_out)
+
+    def _table_exists(self, table_name, cur=None):
+        """ Checks if a table exists in the database.
+
+        Convenience method that checks if a table exists in the database.
+        It accepts a custom Cursor object, which overrides the `cur`
+        attribute.
+
+        Parameters
+        ----------
+        table_name : str
             Name of the table.
         cur: sqlite3.Cursor, optional
             Custom Cursor object used to query the database.
@@ -3501,6 +4916,8 @@ class AlignmentList(Base):
 
     def save_state(self, filepath):
 
+        # The state only refers to the database
+        self._materialize()
         self.close_database()
         with open(filepath, "wb") as fh:
             pickle.dump(self.__dict__, fh)
@@ -3515,32 +4932,218 @@ class AlignmentList(Base):
 
         self.resume_database()
 
-    def close_database(self):
-
-        self.con.commit()
-        self.con.close()
-        self.con = self.cur = None
-
-        for aln in self.all_alignments.values():
-            aln.cur = None
-            aln.con = None
+    def save_project(self, path):
+        """Saves the alignments to a binary project file.
 
-    def resume_database(self):
-        """Reconnects to the sqlite database.
+        All alignments, including the shelved ones, are written to a
+        project file (see :mod:`~trifusion.process.project`) with the
+        original sequence data, taxa index and partitions of each
+        alignment and the attributes of the `AlignmentList` needed to
+        restore it with `open_project`. The file is written atomically.
 
-        The connection to the database can be closes or even severed when
-        passing objects between threads. This methods allows the
-        reconnection of the database for the `AlignmentList` and
-        *all* (even the shelved ones) `Alignment` objects.
+        Parameters
+        ----------
+        path : str
+            Path to the project file.
         """
 
-        self.con = sqlite3.connect(self.sql_path, check_same_thread=False,
-                                   timeout=0.0)
-        self.cur = self.con.cursor()
+        # Alignments that are still read from a project file are not
+        # copied into the database
+        cur = self.db.reader().cursor()
 
-        for aln in self.all_alignments.values():
-            aln.cur = self.cur
-            aln.con = self.con
+        def iter_alignments():
+            for aln in self.all_alignments.values():
+
+                source = self.matrix_store.get_source(
+                    self.master_table, aln.db_idx) \
+                    if self.matrix_store is not None else None
+
+                if source:
+                    rows = list(source[0].iter_rows(source[1]))
+                else:
+                    rows = [(txId, taxon, unpack_sequence(seq))
+                            for txId, taxon, seq in cur.execute(
+                                "SELECT txId, taxon, seq FROM [{}] "
+                                "WHERE aln_idx=?".format(self.master_table),
+                                (aln.db_idx,))]
+
+                aln_meta = {
+                    "path": aln.path,
+                    "input_format": aln.input_format,
+                    "sequence_code": aln.sequence_code,
+                    "locus_length": aln.locus_length,
+                    "taxa_idx": list(aln.taxa_idx.items()),
+                    "partitions": encode_partitions(aln.partitions),
+                    "restriction_range": aln.restriction_range,
+                    "shelved_taxa": sorted(aln.shelved_taxa),
+                    "active": aln.path in self.alignments}
+
+                yield aln_meta, rows
+
+        metadata = {
+            "taxa_names": self.taxa_names,
+            "shelved_taxa": sorted(self.shelved_taxa),
+            "partitions": encode_partitions(self.partitions),
+            "gap_symbol": self.gap_symbol,
+            "bad_alignments": self.bad_alignments,
+            "non_alignments": self.non_alignments,
+            "duplicate_alignments": self.duplicate_alignments}
+
+        write_project(path, metadata, iter_alignments())
+
+    @commit_writes
+    def open_project(self, path):
+        """Restores the alignments from a binary project file.
+
+        Clears the current alignments and loads those of a project file
+        written by `save_project`. The `Alignment` objects are created with
+        their stored taxa index and partitions, without parsing the
+        original alignment files.
+
+        With a matrix store, the memory map of the project file becomes
+        the read-only source of the alignment matrices (see
+        :meth:`~trifusion.process.matrix.MatrixStore.add_source`), and
+        each alignment is only copied into the database when it is first
+        modified or queried from the database (see `_materialize`).
+        Otherwise, the sequence data is inserted in the database.
+
+        Parameters
+        ----------
+        path : str
+            Path to the project file.
+
+        Raises
+        ------
+        InputError
+            If `path` is not a valid project file.
+        """
+
+        project = ProjectFile(path)
+        lazy = self.matrix_store is not None
+        sources = []
+        done = False
+
+        try:
+
+            metadata = project.metadata
+
+            # The metadata is validated before the current alignments are
+            # cleared
+            try:
+                partitions = decode_partitions(metadata["partitions"])
+                aln_data = [(decode_partitions(x["partitions"]),
+                             OrderedDict(x["taxa_idx"]))
+                            for x in project.alignments]
+            except (KeyError, TypeError, ValueError):
+                raise InputError("Project file {} has invalid "
+                                 "metadata".format(path))
+
+            self.clear_alignments()
+
+            for i, aln_meta in enumerate(project.alignments):
+
+                part, taxa_idx = aln_data[i]
+
+                aln_obj = Alignment(
+                    aln_meta["path"], input_format=aln_meta["input_format"],
+                    partitions=part,
+                    locus_length=aln_meta["locus_length"],
+                    sequence_code=tuple(aln_meta["sequence_code"]),
+                    taxa_idx=taxa_idx,
+                    sql_cursor=self.cur, sql_con=self.con,
+                    db_idx=self._idx, ignore_db_check=True,
+                    temp_dir=os.path.dirname(self.sql_path),
+                    matrix_store=self.matrix_store,
+                    batch_size=self.batch_size, db=self.db)
+
+                aln_obj.restriction_range = aln_meta["restriction_range"]
+                aln_obj.shelved_taxa = frozenset(aln_meta["shelved_taxa"])
+
+                if lazy:
+                    self.matrix_store.add_source(self.master_table,
+                                                 self._idx, project, i)
+                    sources.append(self._idx)
+                else:
+                    with aln_obj.writer as writer:
+                        for txId, taxon, seq in project.iter_rows(i):
+                            writer.write((txId, taxon, seq, self._idx))
+
+                if aln_obj.sequence_code[0] not in self.sequence_code:
+                    self.sequence_code.append(aln_obj.sequence_code[0])
+
+                self.taxa_presence.add(self._idx, taxa_idx)
+
+                self.all_alignments[aln_obj.path] = aln_obj
+                self.path_list.append(aln_obj.path)
+                self.alignment_idx[self._idx] = aln_obj
+                self._idx += 1
+
+                if aln_meta["active"]:
+                    self.alignments[aln_obj.path] = aln_obj
+                else:
+                    self.shelved_idx.append(aln_obj.db_idx)
+
+            done = True
+
+        finally:
+            # The project file remains open while it is the source of the
+            # alignments
+            if not done:
+                for aln_idx in sources:
+                    self.matrix_store.remove_source(self.master_table,
+                                                    aln_idx)
+            if not done or not sources:
+                project.close()
+
+        self.con.commit()
+
+        self.partitions.__dict__.update(vars(partitions))
+        self.taxa_names = metadata["taxa_names"]
+        self.shelved_taxa = metadata["shelved_taxa"]
+        self.gap_symbol = metadata["gap_symbol"]
+        self.bad_alignments = metadata["bad_alignments"]
+        self.non_alignments = metadata["non_alignments"]
+        self.duplicate_alignments = metadata["duplicate_alignments"]
+
+        self.size = sum((x.locus_length for x in self.alignments.values()))
+
+    def close_database(self):
+
+        if self.matrix_store is not None:
+            self.matrix_store.clear()
+        self.column_stats_cache.clear()
+        self.summary_cache.clear()
+        self.stats_memo.close()
+
+        self.db.close()
+        self.db = self.con = self.cur = None
+
+        for aln in self.all_alignments.values():
+            aln.cur = None
+            aln.con = None
+            aln.db = None
+
+    def resume_database(self):
+        """Reconnects to the sqlite database.
+
+        The connection to the database can be closes or even severed when
+        passing objects between threads. This methods allows the
+        reconnection of the database for the `AlignmentList` and
+        *all* (even the shelved ones) `Alignment` objects.
+        """
+
+        self.db = ConnectionManager(self.sql_path)
+        self.con = self.db.con
+        self.cur = self.con.cursor()
+        self._shelved_table = {}
+
+        if self.matrix_store is not None:
+            self.matrix_store.track(self.con, self.master_table)
+
+        for aln in self.all_alignments.values():
+            aln.cur = self.cur
+            aln.con = self.con
+            aln.db = self.db
 
     def set_database_connections(self, cur, con):
         """Provides Connection and Cursor to `Alignment` objects.
@@ -3558,10 +5161,12 @@ class AlignmentList(Base):
 
         self.cur = cur
         self.con = con
+        self.db = ConnectionManager(self.sql_path, con=con)
 
         for aln in self.all_alignments.values():
             aln.cur = cur
             aln.con = con
+            aln.db = self.db
 
     def get_tables(self):
         """Return list with `db_idx` of *all* `Alignment` objects.
@@ -3576,12 +5181,14 @@ class AlignmentList(Base):
         return [x.table_name for x in
                 self.all_alignments.values()]
 
+    @commit_writes
     def remove_aux_tables(self):
 
         self.cur.execute(
             "DELETE FROM aux WHERE aln_idx NOT IN ({})".format(
                 ", ".join([str(x) for x in xrange(self._idx + 1)])))
 
+    @commit_writes
     def remove_tables(self, preserve_tables=None, trash_tables=None):
         """Drops tables from the database.
 
@@ -3611,6 +5218,7 @@ class AlignmentList(Base):
         for tb in [x[0] for x in tables if x[0] not in preserved_tables]:
             self.cur.execute("DROP TABLE [{}]".format(tb))
 
+    @commit_writes
     def clear_alignments(self):
         """Clears all attributes and data from the `AlignmentList` object."""
 
@@ -3622,6 +5230,14 @@ class AlignmentList(Base):
         self.cur.execute("DELETE FROM [{}]".format(self.master_table))
         self.cur.execute("DELETE FROM aux")
 
+        if self.matrix_store is not None:
+            self.matrix_store.clear_sources()
+            self.matrix_store.clear()
+        self.column_stats_cache.clear()
+        self.summary_cache.clear()
+        self.stats_memo.clear()
+        self.taxa_presence.clear()
+
         # Remove temporary json auxiliary files from Alignment objects
         for aln in self.all_alignments.values():
             aln.rm_aux_data()
@@ -3634,6 +5250,7 @@ class AlignmentList(Base):
         self.non_alignments = []
         self.taxa_names = []
         self.shelved_taxa = []
+        self._shelved_table = {}
         self.shelved_idx = []
         self.path_list = []
         self._idx = 1
@@ -3773,20 +5390,17 @@ class AlignmentList(Base):
         # Activate only taxa specified by taxa_list
         elif taxa_list:
 
-            for tx in self.taxa_names + self.shelved_taxa:
-                if tx not in taxa_list and tx in self.taxa_names:
-                    try:
-                        self.taxa_names.remove(tx)
-                        self.shelved_taxa.append(tx)
-                    except ValueError:
-                        pass
+            active = set(taxa_list)
 
-                elif tx in taxa_list and tx in self.shelved_taxa:
-                    try:
-                        self.taxa_names.append(tx)
-                        self.shelved_taxa.remove(tx)
-                    except ValueError:
-                        pass
+            # Taxa that change state are appended to the end of the
+            # other list
+            shelve = [x for x in self.taxa_names if x not in active]
+            activate = [x for x in self.shelved_taxa if x in active]
+
+            self.taxa_names = [x for x in self.taxa_names
+                               if x in active] + activate
+            self.shelved_taxa = [x for x in self.shelved_taxa
+                                 if x not in active] + shelve
 
         # Update individual Alignment objects
         for aln_obj in self.alignments.values():
@@ -3842,6 +5456,29 @@ class AlignmentList(Base):
 
         return full_taxa
 
+    def _get_presence_idx(self):
+        """Returns the `aln_idx` of the active alignments.
+
+        Active alignments that are not yet in `taxa_presence` (e.g.,
+        alignments provided as `Alignment` objects) are added to it from
+        their `taxa_idx`.
+
+        Returns
+        -------
+        aln_idx_list : list
+            List with the `Alignment.db_idx` of the active alignments, in
+            the order of `alignments`.
+        """
+
+        aln_idx_list = []
+
+        for aln in self.alignments.values():
+            if aln.db_idx not in self.taxa_presence:
+                self.taxa_presence.add(aln.db_idx, aln.taxa_idx)
+            aln_idx_list.append(aln.db_idx)
+
+        return aln_idx_list
+
     def _get_filename_list(self):
         """Returns list with the `Alignment.name` of alignments.
 
@@ -3896,6 +5533,7 @@ class AlignmentList(Base):
 
         self.size = self.partitions.counter
 
+    @commit_writes
     def add_alignments(self, alignment_obj_list, ignore_paths=False):
         """Add a list of `Alignment` objects to the current `AlignmentList`.
 
@@ -3938,6 +5576,7 @@ class AlignmentList(Base):
                         self.sequence_code.append(aln.sequence_code[0])
 
                     aln.store_aux_data()
+                    self.taxa_presence.add(aln.db_idx, aln.taxa_idx)
 
                     self.alignments[aln.path] = aln
                     self.set_partition_from_alignment(aln)
@@ -3947,6 +5586,7 @@ class AlignmentList(Base):
                     self.sequence_code = aln.sequence_code
 
                 aln.store_aux_data()
+                self.taxa_presence.add(aln.db_idx, aln.taxa_idx)
 
                 self.alignments[aln.name] = aln
                 self.set_partition_from_alignment(aln)
@@ -3954,8 +5594,9 @@ class AlignmentList(Base):
 
         self.taxa_names = self._get_taxa_list()
 
+    @commit_writes
     def add_alignment_files(self, file_name_list, pbar=None,
-                            ns=None):
+                            ns=None, workers=None):
         """Adds a list of alignment files to the current `AlignmentList`.
 
         Adds a list of alignment paths to the current `AlignmentList`. Each
@@ -3964,6 +5605,13 @@ class AlignmentList(Base):
         correct and compliant with the other members of the `AlignmentList`
         object.
 
+        When more than one worker is used, the files are parsed in a
+        process pool (see :func:`parse_alignment`) and the returned data is
+        written into the database by the current process, in the same order
+        as `file_name_list`. When the `parse_cache` is enabled, the cached
+        data of the files is loaded first, and only the remaining files
+        are parsed.
+
         Parameters
         ----------
         file_name_list : list
@@ -3973,6 +5621,9 @@ class AlignmentList(Base):
             in TriFusion.
         pbar : ProgressBar
             A ProgressBar object used to log the progress of TriSeq execution.
+        workers : int, optional
+            Number of processes used to parse the alignment files. Defaults
+            to the `workers` attribute.
         """
 
         # Check for duplicates among current file list
@@ -3991,58 +5642,174 @@ class AlignmentList(Base):
         if pbar:
             pbar.max_value = len(file_name_list)
 
-        for p, aln_path in enumerate(file_name_list):
+        if not workers:
+            workers = self.workers
+
+        temp_dir = os.path.dirname(self.sql_path)
+
+        # Load the cached data of the input files before parsing any file,
+        # so that storing new entries cannot evict them. Only files without
+        # a valid cache entry are parsed
+        cached = {}
+        if self.parse_cache:
+            keys = dict((x, self.parse_cache.get_key(x))
+                        for x in file_name_list)
+            for aln_path in file_name_list:
+                payload = self.parse_cache.get(keys[aln_path])
+                if payload is not None:
+                    cached[aln_path] = payload
+            parse_list = [x for x in file_name_list if x not in cached]
+            cache_keys = frozenset(keys.values())
+        else:
+            parse_list = file_name_list
+
+        # New alignments do not change the data of the loaded ones, so
+        # their cached statistics remain valid
+        caches = [x for x in [self.column_stats_cache, self.summary_cache]
+                  if x.is_current(self.con)]
+
+        pool = None
+        if workers > 1 and len(parse_list) > 1:
+            pool = Pool(workers)
+            # Results are paired with the path of their file, and collected
+            # as the files of file_name_list are processed, ensuring a
+            # deterministic assignment of aln_idx values
+            parsed = itertools.izip(parse_list, pool.imap(
+                parse_alignment,
+                [(x, temp_dir, self.batch_size) for x in parse_list],
+                chunksize=max(1, len(parse_list) // (workers * 4))))
+            # Results received before their file is processed
+            pending = {}
 
-            # Progress bar update for command line version
-            if pbar:
-                pbar.update(p + 1)
+        try:
+            for p, aln_path in enumerate(file_name_list):
 
-            if ns:
-                ns.progress += 1
-                ns.m = "Processing file {}".format(
-                    basename(aln_path))
-
-                if ns.stop:
-                    raise KillByUser("Child thread killed by user")
-
-            aln_obj = Alignment(aln_path, sql_cursor=self.cur,
-                                db_idx=self._idx, sql_con=self.con,
-                                temp_dir=os.path.dirname(self.sql_path))
-
-            if aln_obj.e:
-                aln_obj.remove_alignment()
-
-            if isinstance(aln_obj.e, InputError):
-                self.bad_alignments.append(aln_obj.path)
-            elif isinstance(aln_obj.e, AlignmentUnequalLength):
-                self.non_alignments.append(aln_obj.path)
-            elif isinstance(aln_obj.e, EmptyAlignment):
-                self.bad_alignments.append(aln_obj.path)
-            else:
+                # Progress bar update for command line version
+                if pbar:
+                    pbar.update(p + 1)
 
-                # Get seq code
-                if aln_obj.sequence_code[0] not in self.sequence_code:
-                    self.sequence_code.append(aln_obj.sequence_code[0])
-                # Check for multiple sequence types. If True,
-                # raise Exception
-                # elif self.sequence_code[0] != aln_obj.sequence_code[0]:
-                #     raise MultipleSequenceTypes("Multiple sequence "
-                #         "types detected: {} and {}".format(
-                #             self.sequence_code[0],
-                #             aln_obj.sequence_code[0]))
+                if ns:
+                    ns.progress += 1
+                    ns.m = "Processing file {}".format(
+                        basename(aln_path))
+
+                    if ns.stop:
+                        raise KillByUser("Child thread killed by user")
+
+                if aln_path in cached:
+                    payload = cached.pop(aln_path)
+                else:
+                    if pool:
+                        while aln_path not in pending:
+                            path, res = next(parsed)
+                            pending[path] = res
+                        payload = pending.pop(aln_path)
+                    elif self.parse_cache:
+                        payload = parse_alignment(
+                            (aln_path, temp_dir, self.batch_size))
+                    else:
+                        payload = None
 
-                self.taxa_names.extend([x for x in aln_obj._taxa_idx.keys()
-                                        if x not in self.taxa_names])
-                self.set_partition_from_alignment(aln_obj,
-                                                  use_private_attr=True)
+                    if self.parse_cache:
+                        self.parse_cache.set(keys[aln_path], payload,
+                                             keep=cache_keys)
 
-                aln_obj.store_aux_data()
+                if payload is not None:
+                    aln_obj = self._load_parsed_alignment(*payload)
+                else:
+                    aln_obj = Alignment(
+                        aln_path, sql_cursor=self.cur, db_idx=self._idx,
+                        sql_con=self.con, temp_dir=temp_dir,
+                        matrix_store=self.matrix_store,
+                        db=self.db,
+                        batch_size=self.batch_size)
+
+                self._register_alignment(aln_obj)
+        finally:
+            if pool:
+                pool.terminate()
 
-                self.all_alignments[aln_obj.path] = aln_obj
-                self.alignments[aln_obj.path] = aln_obj
-                self.path_list.append(aln_obj.path)
-                self.alignment_idx[self._idx] = aln_obj
-                self._idx += 1
+            for cache in caches:
+                cache.refresh(self.con)
+
+    def _load_parsed_alignment(self, aln_obj, rows):
+        """Writes an alignment parsed in a worker process to the database.
+
+        Parameters
+        ----------
+        aln_obj : trifusion.process.sequence.Alignment
+            `Alignment` object returned by :func:`parse_alignment`.
+        rows : list
+            List of (txId, taxon, seq) tuples with the alignment data.
+
+        Returns
+        -------
+        aln_obj : trifusion.process.sequence.Alignment
+            `Alignment` object connected to the database of the current
+            `AlignmentList`.
+        """
+
+        aln_obj.cur = self.cur
+        aln_obj.con = self.con
+        aln_obj.matrix_store = self.matrix_store
+        aln_obj.db = self.db
+        aln_obj.db_idx = self._idx
+        aln_obj.writer = SequenceWriter(self.cur, self.master_table,
+                                        self.batch_size, self._storage())
+
+        with aln_obj.writer as writer:
+            for txId, taxon, seq in rows:
+                writer.write((txId, taxon, seq, self._idx))
+
+        return aln_obj
+
+    def _register_alignment(self, aln_obj):
+        """Adds a newly parsed `Alignment` object to the `AlignmentList`.
+
+        Alignments with parsing errors are removed from the database and
+        stored in the `bad_alignments` or `non_alignments` lists.
+
+        Parameters
+        ----------
+        aln_obj : trifusion.process.sequence.Alignment
+            Parsed `Alignment` object.
+        """
+
+        if aln_obj.e:
+            aln_obj.remove_alignment()
+
+        if isinstance(aln_obj.e, InputError):
+            self.bad_alignments.append(aln_obj.path)
+        elif isinstance(aln_obj.e, AlignmentUnequalLength):
+            self.non_alignments.append(aln_obj.path)
+        elif isinstance(aln_obj.e, EmptyAlignment):
+            self.bad_alignments.append(aln_obj.path)
+        else:
+
+            # Get seq code
+            if aln_obj.sequence_code[0] not in self.sequence_code:
+                self.sequence_code.append(aln_obj.sequence_code[0])
+            # Check for multiple sequence types. If True,
+            # raise Exception
+            # elif self.sequence_code[0] != aln_obj.sequence_code[0]:
+            #     raise MultipleSequenceTypes("Multiple sequence "
+            #         "types detected: {} and {}".format(
+            #             self.sequence_code[0],
+            #             aln_obj.sequence_code[0]))
+
+            self.taxa_names.extend([x for x in aln_obj._taxa_idx.keys()
+                                    if x not in self.taxa_names])
+            self.set_partition_from_alignment(aln_obj,
+                                              use_private_attr=True)
+            self.taxa_presence.add(self._idx, aln_obj._taxa_idx)
+
+            aln_obj.store_aux_data()
+
+            self.all_alignments[aln_obj.path] = aln_obj
+            self.alignments[aln_obj.path] = aln_obj
+            self.path_list.append(aln_obj.path)
+            self.alignment_idx[self._idx] = aln_obj
+            self._idx += 1
 
     def retrieve_alignment(self, name):
         """Return `Alignment` object with a given `name`.
@@ -4094,18 +5861,22 @@ class AlignmentList(Base):
 
         output_handle.close()
 
-    def concatenate(self, table_in="", table_out="", ns=None, pbar=None):
-        """Concatenates alignments into a single `Alignment` object.
+    def _fill_concatenation(self, matrix, taxa_idx, table_in, ns, pbar):
+        """Fills the matrix of a concatenation with the alignment data.
 
-        Concatenates multiple sequence alignments creating a single `Alignment`
-        object and the auxiliary Partitions object defining the _partitions
-        of the concatenated alignment
+        Each alignment is assigned the next range of columns, which is
+        filled with its missing data symbol before the sequences of its
+        taxa are written. See `concatenate`.
 
         Parameters
         ----------
+        matrix : numpy.ndarray
+            (taxa, sites) uint8 matrix, with at least as many columns as
+            the sum of the lengths of the active alignments.
+        taxa_idx : dict
+            Maps each taxon name to its row in `matrix`.
         table_in : string
-            Name of database table containing the alignment data that is
-            used for this operation.
+            Name of database table containing the alignment data.
         ns : multiprocesssing.Manager.Namespace
             A Namespace object used to communicate with the main thread
             in TriFusion.
@@ -4114,70 +5885,12 @@ class AlignmentList(Base):
 
         Returns
         -------
-        concatenated_alignment : trifusion.process.sequence.Alignment
-            The `Alignment` object with the concatenated data and _partitions.
-
-        Notes
-        -----
-        Since sqlite queries are quite expensive, the previous approach
-        of querying the sequence for each taxa AND alignment table was
-        dropped. In this approach, sqlite will do all the heavy lifting.
-        First, a temporary table with the same definition as all alignment
-        tables is populated with data from all taxa and alignments. It is
-        important that and index is created on the new txId column, which
-        will redifine the txId of individual alignments according to the
-        global `taxa_names` attribute. In the first procedure, there
-        will be only one query per alignment. When the temporary table is
-        complete, some sql operations are used to group sequences from each
-        taxon for all alignments and then concatenated them, all in a single
-        query. This query returns the concatenated sequences, corrected txId
-        and taxon information, ready to populate the final concatenation
-        table. This approach is an order o magnitude faster than the
-        previous one where thousands of queries could be performed.
-        """
-
-        def fill_missing_taxa(aln, cur):
-            """Inserts missing sequences from current alignment in database
-
-            Given an :class:`.Alignment` object, this will check for the
-            taxa that are present in the overall
-            :attr:`.AlignmentList.taxa_names` attribute, but not in the
-            individual alignment. For each of those taxa, insert missing
-            data sequences in the database.
-
-            Parameters
-            ----------
-            aln : trifusion.process.sequence.Alignment
-                :class:`.Alignment` object.
-            cur : sqlite3.Cursor
-                Cursor object of the sqlite database.
-            """
-
-            # Get list of missing taxa in the provided alignment
-            missing_tx = set(self.taxa_names) - set(aln_obj.taxa_idx.keys())
-            # missing_tx = []
-
-            for tx in missing_tx:
-                # Insert missing data in database
-                cur.execute(
-                    "INSERT INTO [{}] VALUES (?, ?, ?, ?)".format(
-                        temp_table),
-                    (taxa_idx[tx],
-                     tx,
-                     aln_obj.sequence_code[1] * aln_obj.locus_length,
-                     1))
-
-        # Create table temporary table and create an index
-        temp_table = ".concatenation"
-        self._create_table(temp_table, index=["concidex", "txId"])
-
-        # Variables that will store the taxa_list and _taxa_idx that will be
-        # provided when instantiating the Alignment object
-        taxa_idx = dict((tx, idx) for idx, tx in enumerate(self.taxa_names))
-
-        # Create new cursor to insert data into database while the main
-        # cursor returns the query
-        conc_cur = self.con.cursor()
+        aln_obj : trifusion.process.sequence.Alignment
+            Last concatenated alignment, or None if there are no active
+            alignments.
+        locus_length : int
+            Number of columns of the concatenation.
+        """
 
         # Defining empty alignment object
         aln_obj = None
@@ -4185,6 +5898,9 @@ class AlignmentList(Base):
         self._set_pipes(ns, pbar, total=len(self.alignments))
         c = 1
 
+        # Start and end columns of the current alignment
+        start = end = 0
+
         prev_idx = ""
         for taxon, seq, aln_idx in self.iter_alignments(table_in):
 
@@ -4196,58 +5912,112 @@ class AlignmentList(Base):
                                    msg="Preparing concatenation data")
                 c += 1
 
-                # If prev_idx is already defined, it means this is the second
-                # alignment during the iteration. In that case, fill the table
-                # with missing data from the previous alignment.
-                if prev_idx:
-                    fill_missing_taxa(aln_obj, conc_cur)
-
                 prev_idx = aln_idx
                 aln_obj = self.alignment_idx[prev_idx]
 
-            # Add data to temporary table
-            conc_cur.execute("INSERT INTO [{}] VALUES (?, ?, ?, ?)".format(
-                    temp_table), (taxa_idx[taxon], taxon, seq, 1))
+                # Fill the columns of the alignment with missing data. The
+                # sequences of the taxa present in the alignment will
+                # overwrite their rows
+                start, end = end, end + aln_obj.locus_length
+                matrix[:, start:end] = ord(aln_obj.sequence_code[1])
 
-        # Perform the fill missing taxa routine for the last alignment
-        # Or when there is only one active alignment.
-        if aln_idx:
-            aln_obj = self.alignment_idx[aln_idx]
-            fill_missing_taxa(aln_obj, conc_cur)
+            matrix[taxa_idx[taxon], start:start + len(seq)] = \
+                np.frombuffer(str(seq), dtype=np.uint8)
 
-        # Setup final table that will have the concatenation
-        table_out = table_out if table_out else self.master_table
-        if self._table_exists(table_out):
-            self.cur.execute("DROP TABLE [{}]".format(table_out))
-        self._create_table(table_out, index=["conc_idx", "aln_idx"])
+        return aln_obj, end
 
-        # Reset progress information for next loop
-        self._reset_pipes(ns)
-        self._set_pipes(ns, pbar, total=len(self.taxa_names))
-
-        # Here is where sqlite will do the heavy lifting of grouping sequences
-        # from the same taxon across all alignments and then concatenating
-        # them. It is important that the column that will be grouped has
-        # an index (for performance and memory reasons). While seqs are
-        # grouped by txId, the GROUP_CONCAT() method is used to return
-        # concatenated strings.
-        for p, (idx, tx, seq, aln_idx) in enumerate(conc_cur.execute(
-                "SELECT txId, taxon, GROUP_CONCAT(seq, ''), aln_idx "
-                "FROM [{}] "
-                "GROUP BY txId".format(temp_table))):
+    @modifies_data
+    def concatenate(self, table_in="", table_out="", ns=None, pbar=None):
+        """Concatenates alignments into a single `Alignment` object.
 
-            self._update_pipes(ns, pbar, value=p + 1,
-                               msg="Concatenating taxon {}".format(tx))
+        Concatenates multiple sequence alignments creating a single `Alignment`
+        object and the auxiliary Partitions object defining the _partitions
+        of the concatenated alignment
+
+        Parameters
+        ----------
+        table_in : string
+            Name of database table containing the alignment data that is
+            used for this operation.
+        ns : multiprocesssing.Manager.Namespace
+            A Namespace object used to communicate with the main thread
+            in TriFusion.
+        pbar : ProgressBar
+            A ProgressBar object used to log the progress of TriSeq execution.
 
-            self.cur.execute("INSERT INTO [{}] VALUES (?, ?, ?, ?)".format(
-                table_out), (idx, tx, seq, aln_idx))
+        Returns
+        -------
+        concatenated_alignment : trifusion.process.sequence.Alignment
+            The `Alignment` object with the concatenated data and _partitions.
 
-        # Variable that will store the length of the concatenated alignment
-        # and provided it when initializing the Alignment object
-        locus_length = len(seq)
+        Notes
+        -----
+        The concatenation is performed in a single pass over the alignment
+        data, without intermediate database tables. The concatenated
+        alignment is assembled in a (taxa, sites) uint8 matrix, which is
+        memory mapped to a temporary file in the directory of the database
+        so that it does not need to fit in memory. Each alignment is
+        assigned a column range, which is filled with its missing data
+        symbol before the sequences of its taxa are written. Finally, the
+        matrix rows are inserted into `table_out`, one taxon at a time.
+        """
 
-        # DROP the temporary table
-        self.cur.execute("DROP TABLE [{}]".format(temp_table))
+        # Variables that will store the taxa_list and _taxa_idx that will be
+        # provided when instantiating the Alignment object
+        taxa_idx = dict((tx, idx) for idx, tx in enumerate(self.taxa_names))
+
+        # Upper bound of the concatenated alignment length. Alignments with
+        # no active taxa are not yielded by iter_alignments and do not
+        # contribute columns to the concatenation
+        total_length = sum(aln.locus_length for idx, aln in
+                           self.alignment_idx.items()
+                           if idx not in self.shelved_idx)
+
+        # Each concatenation has its own file, so that AlignmentList
+        # objects sharing a directory do not overwrite each other
+        temp_file = None
+        shape = (len(self.taxa_names), total_length)
+        if shape[0] and shape[1]:
+            fd, temp_file = tempfile.mkstemp(
+                suffix=".npy", prefix=".concatenation",
+                dir=os.path.dirname(self.sql_path) or ".")
+            os.close(fd)
+            matrix = np.lib.format.open_memmap(temp_file, mode="w+",
+                                               dtype=np.uint8, shape=shape)
+        else:
+            matrix = np.zeros(shape, dtype=np.uint8)
+
+        # The matrix is removed even if the concatenation fails, since its
+        # file can be as large as the alignment data
+        try:
+            aln_obj, locus_length = self._fill_concatenation(
+                matrix, taxa_idx, table_in, ns, pbar)
+
+            # Setup final table that will have the concatenation
+            table_out = table_out if table_out else self.master_table
+            if self._table_exists(table_out):
+                self.cur.execute("DROP TABLE [{}]".format(table_out))
+            self._create_table(table_out, index=["conc_idx", "aln_idx"])
+
+            # Reset progress information for next loop
+            self._reset_pipes(ns)
+            self._set_pipes(ns, pbar, total=len(self.taxa_names))
+
+            with SequenceWriter(self.cur, table_out, self.batch_size,
+                                self._storage()) as writer:
+                for idx, tx in enumerate(self.taxa_names):
+
+                    self._update_pipes(ns, pbar, value=idx + 1,
+                                       msg="Concatenating taxon {}".format(
+                                           tx))
+
+                    writer.write((idx, tx,
+                                  matrix[idx, :locus_length].tostring(), 1))
+        finally:
+            # Remove the temporary matrix file
+            del matrix
+            if temp_file and os.path.exists(temp_file):
+                os.remove(temp_file)
 
         self._correct_partitions()
 
@@ -4264,7 +6034,9 @@ class AlignmentList(Base):
                         sequence_code=seq_type,
                         locus_length=locus_length,
                         db_idx=self._idx,
-                        temp_dir=os.path.dirname(self.sql_path))
+                        temp_dir=os.path.dirname(self.sql_path),
+                        matrix_store=self.matrix_store,
+                        db=self.db)
 
         # Reset alignment_idx attribute to reflect the single concatenated
         # alignment
@@ -4317,14 +6089,17 @@ class AlignmentList(Base):
         filtered_alns = []
         active_alns = []
 
+        # Number of taxa of each alignment, from the presence bitmap
+        taxa_count = self.taxa_presence.count_taxa(self._get_presence_idx())
+        min_count = (float(min_taxa) / 100.) * len(self.taxa_names)
+
         for p, (k, aln_obj) in enumerate(list(self.alignments.items())):
 
             self._update_pipes(
                 ns, pbar, value=p + 1, msg="Evaluating file {}".format(
                     basename(aln_obj.name)))
 
-            if len(aln_obj.taxa_idx) < \
-                    (float(min_taxa) / 100.) * len(self.taxa_names):
+            if taxa_count[p] < min_count:
                 filtered_alns.append(aln_obj.path)
                 self.filtered_alignments["By minimum taxa"] += 1
             else:
@@ -4357,11 +6132,6 @@ class AlignmentList(Base):
             A ProgressBar object used to log the progress of TriSeq execution.
         """
 
-        def _update_taxa_names(tx_list):
-
-            self.taxa_names.extend([x for x in tx_list if x not in 
-                                    self.taxa_names])
-
         self._set_pipes(ns, pbar, total=len(self.alignments))
 
         self.filtered_alignments["By taxa"] = 0
@@ -4379,9 +6149,20 @@ class AlignmentList(Base):
                 taxa_list = self.read_basic_csv(file_handle)
             except IOError:
                 pass
-        
-        taxa_list = set(taxa_list)
-        self.taxa_names = []
+
+        aln_idx_list = self._get_presence_idx()
+
+        # Filter alignments that do not contain at least all taxa in
+        # taxa_list
+        if filter_mode.lower() == "contain":
+            keep = self.taxa_presence.contain_all(
+                aln_idx_list, taxa_list, exclude=self.shelved_taxa)
+        # Filter alignments that contain the taxa in taxa list
+        elif filter_mode.lower() == "exclude":
+            keep = ~self.taxa_presence.contain_any(
+                aln_idx_list, taxa_list, exclude=self.shelved_taxa)
+        else:
+            keep = np.ones(len(aln_idx_list), dtype=bool)
 
         # Stores Alignment.path to be filtered
         filtered_alns = []
@@ -4390,31 +6171,23 @@ class AlignmentList(Base):
 
         for p, (k, aln_obj) in enumerate(list(self.alignments.items())):
 
-            aln_tx = set(aln_obj.taxa_idx.keys()) - set(self.shelved_taxa)
-
             self._update_pipes(
                 ns, pbar, value=p + 1, msg="Filtering file {}".format(
                     basename(aln_obj.name)))
 
-            # Filter alignments that do not contain at least all taxa in
-            # taxa_list
-            if filter_mode.lower() == "contain":
-                if not taxa_list.issubset(aln_tx):
-                    filtered_alns.append(aln_obj.path)
-                    self.filtered_alignments["By taxa"] += 1
-                else:
-                    active_alns.append(aln_obj.path)
-                    _update_taxa_names(aln_tx)
-
-            # Filter alignments that contain the taxa in taxa list
-            if filter_mode.lower() == "exclude":
-                if any((x for x in taxa_list
-                        if x in aln_tx)):
-                    filtered_alns.append(aln_obj.path)
-                    self.filtered_alignments["By taxa"] += 1
-                else:
-                    active_alns.append(aln_obj.path)
-                    _update_taxa_names(aln_tx)
+            if keep[p]:
+                active_alns.append(aln_obj.path)
+            else:
+                filtered_alns.append(aln_obj.path)
+                self.filtered_alignments["By taxa"] += 1
+
+        # The taxa of the remaining alignments, excluding the shelved taxa
+        shelved = set(self.shelved_taxa)
+        present = self.taxa_presence.get_matrix(
+            [x for x, y in zip(aln_idx_list, keep) if y],
+            self.taxa_presence.taxa).any(axis=1)
+        self.taxa_names = [x for x, y in zip(self.taxa_presence.taxa, present)
+                           if y and x not in shelved]
 
         # Update _partitions
         self.partitions.remove_partition(file_list=filtered_alns)
@@ -4423,6 +6196,7 @@ class AlignmentList(Base):
 
         self._reset_pipes(ns)
 
+    @modifies_data
     def filter_codon_positions(self, position_list, table_in=None,
                                table_out=None, ns=None, pbar=None):
         """Filters codon positions in each `Alignment` object.
@@ -4457,322 +6231,239 @@ class AlignmentList(Base):
         Alignment.filter_codon_positions
         """
 
-        def index(length, pos):
-            """
-            index generator
-            """
-            for _ in range(0, length, 3):
-                for j in pos:
-                    if j:
-                        yield 1
-                    else:
-                        yield 0
+        self.pipeline(table_in, table_out).filter_codon_positions(
+            position_list).run(ns, pbar)
 
-        # Create temporary table
-        temp_table = ".codonfilter"
-        self._create_table(temp_table)
+    @modifies_data
+    def filter_missing_data(self, gap_threshold, missing_threshold,
+                            table_in=None, table_out=None, ns=None,
+                            pbar=None, use_main_table=False):
+        """Filters missing data in each `Alignment` object.
 
-        # Set progress pipes
-        self._set_pipes(ns, pbar, total=len(self.alignments))
-        c = 1
+        The gaps at the ends of each sequence are replaced with missing
+        data and the columns with too much missing data are removed, in a
+        single pass over the alignment matrix of each `Alignment` object
+        in the `alignments` attribute.
 
-        # Reset _partitions
-        self.partitions = Partitions()
+        Parameters
+        ----------
+        gap_threshold : int
+            Integer between 0 and 100 defining the percentage above which
+            a column with that gap percentage is removed.
+        missing_threshold : int
+            Integer between 0 and 100 defining the percentage above which
+            a column with that gap+missing percentage is removed.
+        table_in : string
+            Name of database table containing the alignment data that is
+            used for this operation.
+        table_out : string
+            Name of database table where the final alignment will be inserted.
+            Defaults to `table_in`.
+        use_main_table : bool
+            If True, both `table_in` and `table_out` are ignore and the main
+            table `Alignment.db_idx` is used as the input and output
+            table (default is False).
+        ns : multiprocesssing.Manager.Namespace
+            A Namespace object used to communicate with the main thread
+            in TriFusion.
+        pbar : ProgressBar
+            A ProgressBar object used to log the progress of TriSeq execution.
 
-        # Create out table if does not exist
-        if not self._table_exists(table_out):
-            self._create_table(table_out)
+        See Also
+        --------
+        Alignment.filter_missing_data
+        """
 
-        # Set temporary cursor to perform database changes while querying
-        temp_cur = self.con.cursor()
-
-        # Defining empty alignment object
-        aln_obj = None
-
-        prev_idx = ""
-        for txId, taxon, seq, aln_idx in self.iter_alignments(
-                table_in, include_txid=True):
-
-            # This happens when the alignment changes during the iteration.
-            if aln_idx != prev_idx:
-
-                # Update the partition size of the last alignment
-                if prev_idx:
-                    aln_obj.locus_length = len(final_seq)
-                    self.set_partition_from_alignment(aln_obj)
-
-                aln_obj = self.alignment_idx[aln_idx]
-
-                # Update progress
-                self._update_pipes(ns, pbar, value=c,
-                                   msg="Filtering file {}".format(
-                                       aln_obj.name))
-                c += 1
-
-                prev_idx = aln_idx
-
-            # Use itertools.compress to remove positions of the string
-            # based on position list
-            final_seq = "".join(list(itertools.compress(
-                seq, index(aln_obj.locus_length, position_list))))
-
-            # Add data to
-            temp_cur.execute(
-                "INSERT INTO [{}] VALUES (?, ?, ?, ?)".format(temp_table),
-                (txId, taxon, final_seq, aln_idx))
-
-        # Perform partition correction on the last loop element
-        if aln_obj:
-            aln_obj.locus_length = len(final_seq)
-            self.set_partition_from_alignment(aln_obj)
-        
-        # If a previous table_out exist, replace with this new one
-        if self._table_exists(table_out):
-            self.cur.execute("DROP TABLE [{}];".format(table_out))
+        if use_main_table:
+            table_in = table_out = self.master_table
 
-        # Replace table_out with collapsed table
-        self.cur.execute("ALTER TABLE [{}] RENAME TO [{}]".format(
-            temp_table, table_out))
+        self.pipeline(table_in, table_out).filter_missing_data(
+            gap_threshold, missing_threshold).run(ns, pbar)
 
-        self._reset_pipes(ns)
+    def get_site_counts(self, min_val, max_val, informative=False,
+                        table_in=None, workers=None, ns=None, pbar=None):
+        """Tests the number of variable or informative sites of alignments.
 
-    def _filter_terminals(self, table_in, table_out, ns=None):
-        """
+        Counts the variable (or informative) sites of each active alignment
+        and tests whether they are within the [`min_val`, `max_val`] range.
+        The counts are taken from the cached column statistics when
+        available. Otherwise, each alignment is scanned in blocks of
+        columns with :func:`~trifusion.process.matrix.count_sites`, which
+        stops as soon as the result of the test is known: when `max_val`
+        is exceeded or, if there is no upper bound, when `min_val` is
+        reached. In that case, the count is the number of sites found
+        until the scan stopped. Alignments can be scanned in parallel by
+        `workers` processes.
 
         Parameters
         ----------
-        table_in
-        table_out
-        ns
+        min_val : int
+            Minimum number of sites for the alignment to pass. Can be None,
+            in which case there is no lower bound.
+        max_val : int
+            Maximum number of sites for the alignment to pass. Can be None,
+            in which case there is no upper bound.
+        informative : bool
+            If True, the informative sites are counted. Otherwise, the
+            variable sites are counted.
+        table_in : string
+            Name of database table containing the alignment data that is
+            used for this operation.
+        workers : int, optional
+            Number of worker processes. Defaults to the `workers`
+            attribute.
+        ns : multiprocesssing.Manager.Namespace
+            A Namespace object used to communicate with the main thread
+            in TriFusion.
+        pbar : ProgressBar
+            A ProgressBar object used to log the progress of TriSeq execution.
 
         Returns
         -------
-
-        """
+        passed : collections.OrderedDict
+            Maps the `Alignment.path` of each active alignment to True if
+            it passed the test.
+        counts : collections.OrderedDict
+            Maps the `Alignment.path` of each active alignment to its
+            number of variable or informative sites.
+        """
+
+        table_name = self._get_table_name(table_in)
+        shelved = frozenset(self.shelved_taxa)
+        idx_list = self._get_active_idx()
+        workers = workers or self.workers
+
+        # The scan of an alignment stops once its count is higher than limit
+        if max_val is not None:
+            limit = max_val
+        elif min_val is not None:
+            limit = min_val - 1
+        else:
+            limit = -1
 
         # Set progress pipes
-        self._set_pipes(ns, None, total=len(self.alignments))
-
-        # Create temporary table
-        temp_table = ".filterterminals"
-        self._create_table(temp_table)
-
-        # Create temporary cursor to edit database while querying
-        temp_cur = self.con.cursor()
-
-        prev_idx = ""
-        c = 1
-        for txId, taxon, seq, aln_idx in self.iter_alignments(
-                table_in, include_txid=True):
-
-            # This happens when the alignment changes during the iteration
-            if aln_idx != prev_idx:
-
-                # Update progress
-                self._update_pipes(ns, None, value=c,
-                                   msg="Filtering terminals")
-                c += 1
-
-                prev_idx = aln_idx
-
-                aln = self.alignment_idx[aln_idx]
-
-            # Condition where the sequence only has gaps
-            if not seq.strip("-"):
-                seq = aln.sequence_code[1] * len(seq)
-                temp_cur.execute(
-                    "INSERT INTO [{}] VALUES (?, ?, ?, ?)".format(
-                        temp_table), (txId, taxon, seq, aln_idx))
+        self._set_pipes(ns, pbar, total=len(idx_list))
+
+        counts = {}
+        for idx in idx_list:
+            stats = self.column_stats_cache.get(self.con,
+                                                (table_name, idx, shelved))
+            if stats is not None:
+                counts[idx] = stats.informative_sites if informative \
+                    else stats.variable_sites
+
+        missing = [x for x in idx_list if x not in counts]
+
+        def iter_args():
+            for idx, matrix in self._iter_table_matrices(table_name,
+                                                         idx_list=missing):
+                # Packed matrices are processed as character codes,
+                # without being decoded
+                taxa, m = matrix.active(self.shelved_taxa, codes=True)
+                # Alignments with only shelved taxa are ignored
+                if taxa:
+                    yield (idx, np.asarray(m)) + tuple(matrix.code_symbols(
+                        self.gap_symbol,
+                        self.alignment_idx[idx].sequence_code[1])) + \
+                        (informative, limit)
+
+        pool = None
+        if workers > 1 and len(missing) > 1:
+            pool = Pool(workers)
 
-                continue
-
-            seq = list(seq)
-            counter, reverse_counter = 0, -1
-
-            while seq[counter] == "-":
-                seq[counter] = aln.sequence_code[1]
-                counter += 1
-
-            while seq[reverse_counter] == "-":
-                seq[reverse_counter] = aln.sequence_code[1]
-                reverse_counter -= 1
-
-            temp_cur.execute(
-                "INSERT INTO [{}] VALUES (?, ?, ?, ?)".format(temp_table),
-                (txId, taxon, "".join(seq), aln_idx))
-
-        # Check if input and output tables are the same. If they are,
-        # drop the old table and replace with this new one
-        if self._table_exists(table_out):
-            self.cur.execute("DROP TABLE [{}]".format(table_out))
-
-        self.cur.execute("ALTER TABLE [{}] "
-                         "RENAME TO [{}]".format(temp_table, table_out))
-
-    def _filter_columns(self, gap_threshold, missing_threshold, table_in,
-                        table_out, ns=None, pbar=None):
-
-        # Create pipes
-        self._set_pipes(ns, pbar, total=self.size)
-
-        # Create temporary table
-        temp_table = ".filtercolumns"
-        self._create_table(temp_table)
-
-        # Stores the binary lists that will be used to compress the final
-        # sequences
-        filtered_res = {}
-
-        # Create temporary cursor to edit database while querying
-        temp_cur = self.con.cursor()
-
-        aln_obj = None
-
-        prev_idx = ""
-        for p, (column, aln_idx) in enumerate(self.iter_columns(table_in)):
-
-            # This happes when the alignment changes during the iteration
-            if aln_idx != prev_idx:
-
-                # Add the binary list from the previous alignment
-                if prev_idx:
-                    filtered_res[prev_idx] = filtered_cols
-                
-                aln_obj = self.alignment_idx[aln_idx]
-                taxa_number = len(aln_obj.taxa_idx)
-
-                # Reset binary list for next alignment
-                filtered_cols = []
-
-                prev_idx = aln_idx
-
-                # Update progress
-                self._update_pipes(ns, pbar, value=p + 1, 
-                                   msg="Filtering columns")
-
-            cadd = column.count
-            
-            # Calculating metrics
-            gap_proportion = (float(cadd("-")) /
-                              taxa_number) * float(100)
-            missing_proportion = (float(cadd(aln_obj.sequence_code[1])) /
-                                  taxa_number) * float(100)
-            total_missing_proportion = gap_proportion + missing_proportion
-
-            if gap_proportion <= gap_threshold and \
-                    total_missing_proportion <= missing_threshold:
-
-                filtered_cols.append(1)
-
-            else:
-                filtered_cols.append(0)
-
-        # Add binary list from last alignment
-        if aln_obj:
-            filtered_res[aln_idx] = filtered_cols
-
-        self._set_pipes(ns, pbar, total=len(self.alignments))
-        c = 1
-
-        aln_obj = None
-
-        # Now we compress the sequences with the binary lists from the
-        # previous iteration
-        prev_idx = ""
-        for p, (txId, taxon, seq, aln_idx) in enumerate(
-                self.iter_alignments(table_in, include_txid=True)):
-
-            if prev_idx != aln_idx:
-
-                if prev_idx:
-                    # Update partition size
-                    aln_obj.locus_length = len(final_seq)
-                    self.set_partition_from_alignment(aln_obj)
-
-                self._update_pipes(ns, pbar, value=c,
-                                   msg="Compressing sequences")
-                c += 1
-
-                aln_obj = self.alignment_idx[aln_idx]
-
-                prev_idx = aln_idx
-
-            final_seq = "".join(compress(seq, filtered_res[aln_idx]))
+        try:
+            args = iter_args()
+            c = len(counts)
+            while True:
+                # Matrices are sent to the workers in chunks, so that only
+                # a few are held in memory at once
+                chunk = list(itertools.islice(args, max(1, workers * 4)))
+                if not chunk:
+                    break
 
-            temp_cur.execute(
-                "INSERT INTO [{}] VALUES (?, ?, ?, ?)".format(temp_table),
-                (txId, taxon, final_seq, aln_idx))
+                if pool:
+                    res = pool.map(count_alignment_sites, chunk)
+                else:
+                    res = [count_alignment_sites(x) for x in chunk]
 
-        if aln_obj:
-            aln_obj.locus_length = len(final_seq)
-            self.set_partition_from_alignment(aln_obj)
-            
-        # Update size
-        self.size = sum((x.locus_length for x in self.alignments.values()))
+                for idx, count in res:
+                    c += 1
+                    self._update_pipes(ns, pbar, value=c,
+                                       msg="Filtering file {}".format(
+                                           self.alignment_idx[idx].name))
+                    counts[idx] = count
+        finally:
+            if pool:
+                pool.terminate()
 
-        # Check if input and output tables are the same. If they are,
-        # it means that the output table already exists and is being
-        # updated
-        if self._table_exists(table_out):
-            self.cur.execute("DROP TABLE [{}];".format(table_out))
+        passed = OrderedDict()
+        site_counts = OrderedDict()
 
-        self.cur.execute("ALTER TABLE [{}] RENAME TO [{}]".format(
-            temp_table, table_out))
+        for idx in idx_list:
+            path = self.alignment_idx[idx].path
+            site_counts[path] = counts.get(idx, 0)
+            passed[path] = idx in counts and self._test_range(
+                counts[idx], min_val, max_val) == "save"
 
         self._reset_pipes(ns)
 
-    def filter_missing_data(self, gap_threshold, missing_threshold,
-                            table_in=None, table_out=None, ns=None,
-                            pbar=None, use_main_table=False):
-        """Filters missing data in each `Alignment` object.
+        return passed, site_counts
 
-        This wraps the execution of `filter_missing_data` method for
-        each `Alignment` object in the `alignments` attribute.
+    def _filter_by_sites(self, min_val, max_val, informative, filter_name,
+                         table_in=None, workers=None, ns=None, pbar=None):
+        """Shelves the alignments outside a range of variable sites.
 
         Parameters
         ----------
-        gap_threshold : int
-            Integer between 0 and 100 defining the percentage above which
-            a column with that gap percentage is removed.
-        missing_threshold : int
-            Integer between 0 and 100 defining the percentage above which
-            a column with that gap+missing percentage is removed.
+        min_val : int
+            Minimum number of sites for the alignment to pass.
+        max_val : int
+            Maximum number of sites for the alignment to pass.
+        informative : bool
+            If True, the informative sites are counted. Otherwise, the
+            variable sites are counted.
+        filter_name : str
+            Key of `filtered_alignments` with the number of filtered
+            alignments.
         table_in : string
-            Name of database table containing the alignment data that is
-            used for this operation.
-        table_out : string
-            Name of database table where the final alignment will be inserted
-            (default is "filter").
-        use_main_table : bool
-            If True, both `table_in` and `table_out` are ignore and the main
-            table `Alignment.db_idx` is used as the input and output
-            table (default is False).
+            Name of database table containing the alignment data.
+        workers : int, optional
+            Number of worker processes.
         ns : multiprocesssing.Manager.Namespace
             A Namespace object used to communicate with the main thread
             in TriFusion.
         pbar : ProgressBar
             A ProgressBar object used to log the progress of TriSeq execution.
 
-        See Also
-        --------
-        Alignment.filter_missing_data
+        Returns
+        -------
+        passed : collections.OrderedDict
+            See `get_site_counts`.
+        counts : collections.OrderedDict
+            See `get_site_counts`.
         """
 
-        if use_main_table:
-            table_in = table_out = self.master_table
+        passed, counts = self.get_site_counts(
+            min_val, max_val, informative=informative, table_in=table_in,
+            workers=workers, ns=ns, pbar=pbar)
 
-        # Reset _partitions
-        self.partitions = Partitions()
+        # Stores the active Alignment.path after the filter
+        active_alns = [x for x, y in passed.items() if y]
 
-        self._filter_terminals(table_in, table_out, ns)
+        self.filtered_alignments[filter_name] = \
+            len(self.alignments) - len(active_alns)
 
-        self._filter_columns(gap_threshold, missing_threshold,
-                             table_in, table_out, ns)
+        # Update _partitions
+        filtered_alns = [x.path for x in self.alignments.values()
+                         if not passed.get(x.path)]
+        self.partitions.remove_partition(file_list=filtered_alns)
+        # Update active files
+        self.update_active_alignments(active_alns)
 
-        self._reset_pipes(ns)
+        return passed, counts
 
     def filter_segregating_sites(self, min_val, max_val, table_in=None,
-                                 ns=None, pbar=None):
+                                 ns=None, pbar=None, workers=None):
         """Filters `Alignment` objects according to segregating sites number.
 
         Filters `alignments` according to whether or not their number
@@ -4797,106 +6488,27 @@ class AlignmentList(Base):
             in TriFusion.
         pbar : ProgressBar
             A ProgressBar object used to log the progress of TriSeq execution.
+        workers : int, optional
+            Number of worker processes used to count the sites. Defaults
+            to the `workers` attribute.
+
+        Returns
+        -------
+        passed : collections.OrderedDict
+            Maps the `Alignment.path` of each evaluated alignment to True
+            if it passed the filter.
+        counts : collections.OrderedDict
+            Maps the `Alignment.path` of each evaluated alignment to its
+            number of segregating sites. See `get_site_counts`.
 
         See Also
         --------
         Alignment.filter_segregating_sites
         """
 
-        # Set progress pipes
-        self._set_pipes(ns, pbar, total=len(self.alignments))
-
-        # Stores the active Alignment.path after the fileter
-        active_alns = []
-
-        prev_idx = ""
-        c = 1
-        res = None
-        collect = False
-        for column, aln_idx in self.iter_columns(table_in):
-
-            # This happens when the alignment changes during the iteration.
-            if prev_idx != aln_idx:
-
-                aln = self.alignment_idx[aln_idx]
-
-                missing_symbols = [aln.sequence_code[1], "-"]
-
-                if prev_idx:
-                    # Get the range result from the previous alignment
-                    # Collect the result if collect has not been flagged
-                    # (which means the alignment processing reached the
-                    # end of the sequence) OR when the collect AND result
-                    # are not None, which means that the early collect
-                    # was set in the last nucleotide
-                    if not collect or (collect and res):
-                        res = self._test_range(s, min_val, max_val)
-                        if res == "save":
-                            active_alns.append(
-                                self.alignment_idx[prev_idx].path)
-
-                        res = False
-
-                    collect = False
-
-                # Reset variable sites counter
-                s = 0
-
-                # Update progress
-                self._update_pipes(ns, pbar, value=c,
-                                   msg="Filtering file {}".format(
-                                       self.alignment_idx[aln_idx].name))
-
-                prev_idx = aln_idx
-
-                c += 1
-
-            # The collect flag is set to True when the result of the
-            # current alignment is known before finishing it.
-            if collect:
-                # Save the result for the current alignment
-                if res == "save":
-                    active_alns.append(self.alignment_idx[aln_idx].path)
-
-                res = False
-                continue
-
-            v = len([x for x in set(column) if x not in missing_symbols])
-
-            # Skip column without variation
-            if v == 1:
-                continue
-
-            if v > 1:
-                s += 1
-
-            # Add these tests so that the method may exit earlier if the
-            # conditions are met, precluding the analysis of the entire
-            # alignment
-            if min_val and v >= min_val and max_val is None:
-                res = "save"
-                collect = True
-
-            if max_val and v > max_val:
-                res = "shelve"
-                collect = True
-
-        if not collect or (collect and res):
-            res = self._test_range(s, min_val, max_val)
-            if res == "save":
-                active_alns.append(self.alignment_idx[aln_idx].path)
-
-        self.filtered_alignments["By variable sites"] = \
-            len(self.alignments) - len(active_alns)
-
-        # Update _partitions
-        filtered_alns = [x.path for x in self.alignments.values()
-                         if x.path not in active_alns]
-        self.partitions.remove_partition(file_list=filtered_alns)
-        # Update active files
-        self.update_active_alignments(active_alns)
-
-        self._reset_pipes(ns)
+        return self._filter_by_sites(min_val, max_val, False,
+                                     "By variable sites", table_in,
+                                     workers, ns, pbar)
 
     @staticmethod
     def _test_range(s, min_val, max_val):
@@ -4927,7 +6539,7 @@ class AlignmentList(Base):
             return "shelve"
 
     def filter_informative_sites(self, min_val, max_val, table_in=None,
-                                 ns=None, pbar=None):
+                                 ns=None, pbar=None, workers=None):
         """Filters `Alignment` objects according to informative sites number.
 
         Filters `alignments` according to whether or not their number
@@ -4952,104 +6564,29 @@ class AlignmentList(Base):
             in TriFusion.
         pbar : ProgressBar
             A ProgressBar object used to log the progress of TriSeq execution.
+        workers : int, optional
+            Number of worker processes used to count the sites. Defaults
+            to the `workers` attribute.
 
-        See Also
-        --------
-        Alignment.filter_informative_sites
-        """
-
-        # Set progress pipes
-        self._set_pipes(ns, pbar, total=len(self.alignments))
-
-        # Stores the active Alignment.path after the fileter
-        active_alns = []
-
-        prev_idx = ""
-        c = 1
-        res = None
-        collect = False
-        for column, aln_idx in self.iter_columns(table_in):
-
-            # This happens when the alignment changes during the iteration.
-            if prev_idx != aln_idx:
-
-                aln = self.alignment_idx[aln_idx]
-
-                missing_symbols = [aln.sequence_code[1], "-"]
-
-                if prev_idx:
-                    # Get the range result from the previous alignment
-                    if not collect or (collect and res):
-                        res = self._test_range(s, min_val, max_val)
-                        if res == "save":
-                            active_alns.append(
-                                self.alignment_idx[prev_idx].path)
-
-                        res = False
-                    
-                    collect = False
-
-                # Reset informative sites counter
-                s = 0
-                
-                self._update_pipes(ns, pbar, value=c,
-                                   msg="Filtering file {}".format(
-                                       self.alignment_idx[aln_idx].name))
-                c += 1
-
-                prev_idx = aln_idx
-
-            # The collect flag is set to True when the result of the
-            # current alignment is known before finishing it.
-            if collect:
-                # Save the result for the current alignment
-                if res == "save":
-                    active_alns.append(self.alignment_idx[aln_idx].path)
-
-                res = False
-                continue
-
-            column = Counter(column)
-
-            # Skip columns without variation
-            if len(column) == 1:
-                continue
-
-            # Remove missing data
-            for sym in missing_symbols:
-                del column[sym]
-
-            if len([x for x in column.values() if x >= 2]) >= 2:
-                s += 1
-
-            # Add these tests so that the method may exit earlier if the
-            # conditions are met, precluding the analysis of the entire
-            # alignment
-            if min_val and s >= min_val and max_val is None:
-                res = "save"
-                collect = True
-
-            if max_val and s > max_val:
-                res = "shelve"
-                collect = True
-
-        if not collect or (collect and res):
-            res = self._test_range(s, min_val, max_val)
-            if res == "save":
-                active_alns.append(self.alignment_idx[aln_idx].path)
-
-        self.filtered_alignments["By informative sites"] = \
-            len(self.alignments) - len(active_alns)
+        Returns
+        -------
+        passed : collections.OrderedDict
+            Maps the `Alignment.path` of each evaluated alignment to True
+            if it passed the filter.
+        counts : collections.OrderedDict
+            Maps the `Alignment.path` of each evaluated alignment to its
+            number of informative sites. See `get_site_counts`.
 
-        # Update _partitions
-        filtered_alns = [x.path for x in self.alignments.values()
-                         if x.path not in active_alns]
-        self.partitions.remove_partition(file_list=filtered_alns)
-        # Update active files
-        self.update_active_alignments(active_alns)
+        See Also
+        --------
+        Alignment.filter_informative_sites
+        """
 
-        self._reset_pipes(ns)
+        return self._filter_by_sites(min_val, max_val, True,
+                                     "By informative sites", table_in,
+                                     workers, ns, pbar)
 
+    @commit_writes
     def remove_taxa(self, taxa_list, mode="remove"):
         """Removes the specified taxa.
 
@@ -5090,8 +6627,11 @@ class AlignmentList(Base):
         for alignment_obj in list(self.alignments.values()):
             alignment_obj.remove_taxa(taxa_list, mode=mode)
 
+        aln_idx_list = self._get_presence_idx()
+
         # Updates taxa names
         if mode == "remove":
+            self.taxa_presence.discard_taxa(taxa_list, aln_idx_list)
             for tx in taxa_list:
                 try:
                     self.taxa_names.remove(tx)
@@ -5099,18 +6639,24 @@ class AlignmentList(Base):
                     # TODO: log a warning
                     pass
         elif mode == "inverse":
+            self.taxa_presence.retain_taxa(taxa_list, aln_idx_list)
             self.taxa_names = [tx for tx in taxa_list if tx in self.taxa_names]
 
+    @commit_writes
     def change_taxon_name(self, old_name, new_name):
         """Changes the name of a taxon. """
 
         for alignment_obj in list(self.alignments.values()):
             alignment_obj.change_taxon_name(old_name, new_name)
 
+        self.taxa_presence.rename(old_name, new_name,
+                                  self._get_presence_idx())
+
         # update taxa names
         self.taxa_names = [new_name if x == old_name else x
                            for x in self.taxa_names]
 
+    @commit_writes
     def remove_file(self, filename_list):
         """Removes alignments.
 
@@ -5133,6 +6679,14 @@ class AlignmentList(Base):
         self.alignments = OrderedDict(
             (p, aln) for p, aln in self.alignments.items()
             if p not in filename_list)
+        removed = [idx for idx, aln in self.alignment_idx.items()
+                   if aln.path in filename_list]
+
+        self.taxa_presence.remove(removed)
+
+        if self.matrix_store is not None:
+            for aln_idx in removed:
+                self.matrix_store.remove_source(self.master_table, aln_idx)
         self.alignment_idx = OrderedDict(
             (idx, aln) for idx, aln in self.alignment_idx.items()
             if aln.path not in filename_list
@@ -5174,8 +6728,6 @@ class AlignmentList(Base):
             List of `Alignment` objects.
         """
 
-        selected_alignments = []
-
         # taxa_list may be a file name (string) or a list containing the name
         # of the taxa. If taxa_list is a file name this code will parse the
         # csv file and return a list of the taxa. Otherwise, the taxa_list
@@ -5186,28 +6738,27 @@ class AlignmentList(Base):
         except EnvironmentError:
             pass
 
-        for alignment_obj in self.alignments.values():
-
-            alignment_taxa = alignment_obj.taxa_idx.keys()
-
-            # Selected only the alignments with the exact same taxa
-            if mode == "strict":
-                if set(taxa_list) == set(alignment_taxa):
-                    selected_alignments.append(alignment_obj)
-
-            # Selected alignments that include the specified taxa
-            if mode == "inclusive":
-                if set(taxa_list) - set(alignment_taxa) == set():
-                    selected_alignments.append(alignment_obj)
+        aln_idx_list = self._get_presence_idx()
+        presence = self.taxa_presence
+
+        # Selected only the alignments with the exact same taxa
+        if mode == "strict":
+            selected = presence.contain_all(aln_idx_list, taxa_list) & \
+                (presence.count_taxa(aln_idx_list) == len(set(taxa_list)))
+        # Selected alignments that include the specified taxa
+        elif mode == "inclusive":
+            selected = presence.contain_all(aln_idx_list, taxa_list)
+        elif mode == "relaxed":
+            selected = presence.contain_any(aln_idx_list, taxa_list)
+        else:
+            selected = np.zeros(len(aln_idx_list), dtype=bool)
 
-            if mode == "relaxed":
-                for taxon in taxa_list:
-                    if taxon in alignment_taxa:
-                        selected_alignments.append(alignment_obj)
-                        continue
+        selected_alignments = list(compress(self.alignments.values(),
+                                            selected))
 
         return selected_alignments
 
+    @modifies_data
     def code_gaps(self, table_out="gaps", table_in=None, use_main_table=False,
                   pbar=None, ns=None):
         """Code gaps in each `Alignment` object.
@@ -5238,142 +6789,10 @@ class AlignmentList(Base):
         Alignment.code_gaps
         """
 
-        def gap_listing(sequence):
-            """ Function that parses a sequence string and returns the
-            position of indel events. The returned list is composed of
-            tuples with the span of each indel """
-
-            gap = "-+"
-            gap_list = []
-
-            for gobj in re.finditer(gap, sequence):
-                
-                gap_list.append((gobj.start(), gobj.end()))
-            
-            return gap_list
-
-        def gap_binary_generator(sequence, gap_list, ns):
-            """ This function contains the algorithm to construct the binary
-             state block for the indel events """
-
-            binary_states = []
-
-            for span in gap_list:
-
-                self._check_killswitch(ns)
-
-                substr = sequence[span[0]:span[1]]
-
-                # Check if the entire span is only gaps
-                if set(substr) == {"-"}:
-
-                    if span[0] < 0:
-                        prev = "n"
-                    else:
-                        prev = sequence[span[0] - 1]
-
-                    try:
-                        aft = sequence[span[1]]
-                    except IndexError:
-                        aft = "n"
-
-                    # Check if the boundary positions of the span are gaps
-                    # or not. The score 1 will only be given to spans that
-                    # contain only gaps and are surrounded by non gaps.
-                    # If there are gaps surrounding, then the score is "-"
-                    if prev != "-" and aft != "-":
-                        binary_states.append("1")
-                    else:
-                        binary_states.append("-")
-
-                else:
-                    binary_states.append("0")
-
-            sequence = "".join([sequence, "".join(binary_states)])
-
-            return sequence
-
         if use_main_table:
             table_in = table_out = self.master_table
 
-        # Set progress pipes
-        self._set_pipes(ns, pbar, total=len(self.alignments))
-
-        # Storage of gaps positions for each alignment
-        master_gaps = {}
-
-        # Get the complete gap positions for each alignment and store it in
-        # the master_gaps dict
-        prev_idx = ""
-        for taxon, seq, aln_idx in self.iter_alignments(table_in):
-
-            if prev_idx != aln_idx:
-
-                if prev_idx:
-                    master_gaps[prev_idx] = complete_gap_list
-
-                complete_gap_list = []
-
-                prev_idx = aln_idx
-
-            current_list = gap_listing(seq)
-            complete_gap_list += [gap for gap in current_list if gap not in
-                                  complete_gap_list]
-
-        if aln_idx:
-            master_gaps[aln_idx] = complete_gap_list
-
-        # Create temporary table
-        temp_table = ".codegaps"
-        self._create_table(temp_table)
-        c = 1
-
-        # Create temporary cursor for database
-        temp_cur = self.con.cursor()
-
-        prev_idx = ""
-        for txId, taxon, seq, aln_idx in self.iter_alignments(
-                table_in, include_txid=True):
-
-            if prev_idx != aln_idx:
-
-                if prev_idx:
-                    if len(master_gaps[prev_idx]):
-                        aln_obj.restriction_range = "{}-{}".format(
-                            int(aln_obj.locus_length) + 1,
-                            len(master_gaps[prev_idx]) +
-                            int(aln_obj.locus_length))
-                        aln_obj.locus_length += len(master_gaps[prev_idx])
-
-                aln_obj = self.alignment_idx[aln_idx]
-
-                self._update_pipes(ns, pbar, value=c)
-                c += 1
-
-                prev_idx = aln_idx
-
-            final_seq = gap_binary_generator(seq, master_gaps[aln_idx], ns)
-
-            temp_cur.execute(
-                "INSERT INTO [.codegaps] VALUES (?, ?, ?, ?)",
-                (txId, taxon, final_seq, aln_idx))
-
-        if prev_idx:
-            if len(master_gaps[aln_idx]):
-                aln_obj.restriction_range = "{}-{}".format(
-                    int(aln_obj.locus_length) + 1,
-                    len(master_gaps[aln_idx]) +
-                    int(aln_obj.locus_length))
-                aln_obj.locus_length += len(master_gaps[prev_idx])
-
-        if self._table_exists(table_out):
-            self.cur.execute("DROP TABLE [{}];".format(table_out))
-
-        # Replace table_out with collapsed table
-        self.cur.execute("ALTER TABLE [.codegaps] RENAME TO [{}]".format(
-            table_out))
-
-        self._reset_pipes(ns)
+        self.pipeline(table_in, table_out).code_gaps().run(ns, pbar)
 
     @staticmethod
     def write_loci_correspondence(hap_dict, output_file, dest="./"):
@@ -5390,21 +6809,20 @@ class AlignmentList(Base):
             Path to directory where the `output_file` will be written.
         """
 
-        output_handle = open(join(dest, output_file + ".haplotypes"), "w")
-
-        for haplotype, taxa_list in sorted(hap_dict.items()):
-            output_handle.write("%s: %s\n" % (haplotype, "; ".join(taxa_list)))
-
-        output_handle.close()
+        write_haplotypes({join(dest, output_file + ".haplotypes"): hap_dict})
 
+    @modifies_data
     def collapse(self,  write_haplotypes=True, haplotypes_file=None,
                  dest=".", conversion_suffix="", haplotype_name="Hap",
-                 table_in=None, table_out="collapsed", use_main_table=False,
-                 ns=None, pbar=None):
+                 ignore_missing=False, table_in=None, table_out="collapsed",
+                 use_main_table=False, workers=None, ns=None, pbar=None):
         """Collapses equal sequences for each `Alignment` object.
 
         This wraps the execution of `collapse` method for
-        each `Alignment` object in the `alignments` attribute.
+        each `Alignment` object in the `alignments` attribute. Alignments
+        can be collapsed in parallel by `workers` processes, and the
+        haplotype correspondence files are written once all alignments
+        are collapsed.
 
         Parameters
         ----------
@@ -5425,6 +6843,10 @@ class AlignmentList(Base):
         haplotype_name : string
             Prefix of the haplotype string. The final haplotype name will be
             `haplotype_name` + <int> (default is "Hap").
+        ignore_missing : bool
+            If True, sequences that only differ in positions with gaps or
+            missing data are collapsed (default is False). See
+            :func:`~trifusion.process.pipeline.collapse`.
         table_in : string
             Name of database table containing the alignment data that is
             used for this operation.
@@ -5435,6 +6857,9 @@ class AlignmentList(Base):
             If True, both `table_in` and `table_out` are ignore and the main
             table `Alignment.db_idx` is used as the input and output
             table (default is False).
+        workers : int, optional
+            Number of worker processes. Defaults to the `workers`
+            attribute.
         ns : multiprocesssing.Manager.Namespace
             A Namespace object used to communicate with the main thread
             in TriFusion.
@@ -5449,92 +6874,51 @@ class AlignmentList(Base):
         if use_main_table:
             table_out = table_in = self.master_table
 
-        # Set progress pipes
-        self._set_pipes(ns, pbar, total=len(self.alignments))
-        c = 1
-
-        # Create temporary table
-        temp_table = ".collapsed"
-        self._create_table(temp_table)
-
-        # Set temporary cursor to perform database changes while querying
-        temp_cur = self.con.cursor()
-
-        prev_idx = ""
-        for taxon, seq, aln_idx in self.iter_alignments(table_in):
+        pipeline = self.pipeline(table_in, table_out)
+        workers = workers or self.workers
 
-            # This happens when the alignment changes during the iteration.
-            if aln_idx != prev_idx:
+        if workers <= 1 or len(self.alignments) <= 1:
+            pipeline.collapse(write_haplotypes, haplotypes_file, dest,
+                              conversion_suffix, haplotype_name,
+                              ignore_missing).run(ns, pbar)
+            return
 
-                self._update_pipes(ns, pbar, value=c)
-                c += 1
+        def iter_args():
+            for aln_idx, rows in self.iter_alignment_rows(pipeline.table_in):
+                kwargs = {"haplotype_name": haplotype_name}
+                if ignore_missing:
+                    kwargs.update(
+                        ignore_missing=True, gap=self.gap_symbol,
+                        missing=self.alignment_idx[aln_idx].sequence_code[1])
+                yield aln_idx, rows, kwargs
+
+        def iter_results(pool):
+            args = iter_args()
+            while True:
+                # Alignments are sent to the workers in chunks, so that only
+                # a few are held in memory at once
+                chunk = list(itertools.islice(args, workers * 4))
+                if not chunk:
+                    break
 
-                if prev_idx:
-                    # Write the haplotypes file for the previous alignment
+                for aln_idx, rows, hap_dic in pool.map(collapse_alignment,
+                                                       chunk):
                     if write_haplotypes:
-                        if not haplotypes_file:
-                            hf = aln_obj.sname + conversion_suffix
-                        else:
-                            hf = haplotypes_file
-
-                        self.write_loci_correspondence(hap_dic, hf, dest)
-
-                aln_obj = self.alignment_idx[aln_idx]
-
-                # Dict that will store the hashes of each sequence. It will
-                # be used to check if the current sequence has already been
-                # processed. The value will be the haplotype
-                hash_list = {}
-
-                # hap_dic will store the haplotype name as key and a list of
-                # the taxa with the same sequence as a list value
-                hap_dic = {}
-                hap_counter = 0
-
-                prev_idx = aln_idx
-
-            cur_hash = hash(seq)
-            
-            if cur_hash not in hash_list:
-
-                # Create name for new haplotype and update other haplotype
-                # related variables
-                haplotype = "{}_{}".format(haplotype_name, hap_counter + 1)
-                hash_list[cur_hash] = haplotype
-                hap_dic[haplotype] = [taxon]
-
-                # Add data to table
-                temp_cur.execute(
-                    "INSERT INTO [.collapsed] VALUES (?, ?, ?, ?)",
-                    (hap_counter, unicode(haplotype), seq, aln_idx))
-
-                hap_counter += 1
-
-            else:
-
-                hap_dic[hash_list[cur_hash]].append(taxon)
-
-        # Write haplotypes for the last alignment
-        if aln_obj:
-            if write_haplotypes:
-                if not haplotypes_file:
-                    hf = aln_obj.sname + conversion_suffix
-                else:
-                    hf = haplotypes_file
-                self.write_loci_correspondence(hap_dic, hf, dest)
+                        pipeline.add_haplotypes(self.alignment_idx[aln_idx],
+                                                hap_dic, haplotypes_file,
+                                                dest, conversion_suffix)
+                    yield aln_idx, rows
 
-        # The collapse operation is special in the sense that the former taxon
-        # names are no longer valid. Therefore, we drop the previous table and
-        # populate a new one with the collapsed data
-        if self._table_exists(table_out):
-            self.cur.execute("DROP TABLE [{}];".format(table_out))
-
-        # Replace table_out with collapsed table
-        self.cur.execute("ALTER TABLE [.collapsed] RENAME TO [{}]".format(
-            table_out))
+        pool = Pool(workers)
 
-        self._reset_pipes(ns)
+        # The pipeline replaces the output table, or drops its temporary
+        # table if anything fails
+        try:
+            pipeline.store(iter_results(pool), ns, pbar)
+        finally:
+            pool.terminate()
 
+    @modifies_data
     def consensus(self, consensus_type, single_file=False, table_in=None,
                   table_out=None, use_main_table=False, ns=None,
                   pbar=None):
@@ -5607,7 +6991,9 @@ class AlignmentList(Base):
                     sequence_code=self.sequence_code,
                     locus_length=seq_len,
                     db_idx=self._idx,
-                    temp_dir=os.path.dirname(self.sql_path))
+                    temp_dir=os.path.dirname(self.sql_path),
+                    matrix_store=self.matrix_store,
+                    db=self.db)
                 idx_storage[fidx] = aln
                 aln_storage[aln_name] = aln
 
@@ -5771,13 +7157,8 @@ class AlignmentList(Base):
                     add_to_database(0, "consensus", final_seq,
                                     final_idx, aln_name)
 
-        if self._table_exists(table_out):
-            self.cur.execute("DROP TABLE [{}];".format(table_out))
-
         # Replace table_out with collapsed table
-        self.cur.execute(
-            "ALTER TABLE [{}] RENAME TO [{}]".format(
-                temp_table, table_out))
+        self._replace_table(temp_table, table_out)
 
         if single_file:
             self.size = size[0]
@@ -5788,7 +7169,9 @@ class AlignmentList(Base):
                             sequence_code=self.sequence_code,
                             locus_length=self.size,
                             db_idx=self._idx,
-                            temp_dir=os.path.dirname(self.sql_path))
+                            temp_dir=os.path.dirname(self.sql_path),
+                            matrix_store=self.matrix_store,
+                            db=self.db)
             self.alignment_idx = OrderedDict()
             self.alignment_idx[1] = aln
             self.taxa_names = taxa_idx.keys()
@@ -5800,6 +7183,7 @@ class AlignmentList(Base):
 
         self._reset_pipes(ns)
 
+    @modifies_data
     def reverse_concatenate(self, aln_name=None, table_in=None,
                             table_out=None, pbar=None, ns=None):
         """Reverse a concatenated file according to the _partitions.
@@ -5838,7 +7222,9 @@ class AlignmentList(Base):
                                     partitions=part,
                                     ignore_db_check=True,
                                     db_idx=self._idx,
-                                    temp_dir=os.path.dirname(self.sql_path))
+                                    temp_dir=os.path.dirname(self.sql_path),
+                                    matrix_store=self.matrix_store,
+                                    db=self.db)
 
             return current_aln
 
@@ -6015,6 +7401,7 @@ class AlignmentList(Base):
         self.alignments = alns
         self.all_alignments = alns
         self.alignment_idx = rev_aln_idx
+        self.taxa_presence.clear()
         self.partitions = p
 
     def _get_part_names(self, get_type=False):
@@ -6038,65 +7425,7 @@ class AlignmentList(Base):
 
         return part_map
 
-    def _get_interleave_data(self, table_name=None, ns=None,
-                             pbar=None):
-
-        if self.cur.execute(
-                "SELECT name FROM sqlite_master WHERE type='table' AND"
-                " name='.interleavedata'").fetchall():
-
-            self.cur.execute("DELETE FROM [.interleavedata]")
-
-        else:
-            self.cur.execute("CREATE TABLE [.interleavedata]("
-                             "taxon TEXT,"
-                             "seq TEXT,"
-                             "slice INT,"
-                             "aln_idx INT)")
-            self.cur.execute("CREATE INDEX interindex ON "
-                            "[.interleavedata](aln_idx, slice)")
-
-        temp_cur = self.con.cursor()
-
-        self._set_pipes(ns, pbar, total=len(self.alignments))
-        c = 1
-
-        prev_file = ""
-        for taxon, seq, aln_idx in self.iter_alignments(
-                table_name=table_name):
-
-            if aln_idx != prev_file:
-                prev_file = aln_idx
-                aln_obj = self.alignment_idx[aln_idx]
-
-                self._update_pipes(ns, pbar, value=c,
-                                   msg="Creating interleave data for file "
-                                       "{}".format(aln_obj.name))
-                c += 1
-                
-            counter = 0
-
-            for i in xrange(90, aln_obj.locus_length, 90):
-
-                temp_cur.execute("INSERT INTO [.interleavedata] VALUES "
-                                 " (?, ?, ?, ?)", (taxon, seq[counter:i], i,
-                                                   aln_idx))
-                counter = i
-
-            try:
-                if aln_obj.locus_length % 90:
-                    i += 1
-                    temp_cur.execute("INSERT INTO [.interleavedata] VALUES "
-                                     " (?, ?, ?, ?)",
-                                     (taxon, seq[counter:], i, aln_idx))
-            except UnboundLocalError:
-                temp_cur.execute("INSERT INTO [.interleavedata] VALUES "
-                                 " (?, ?, ?, ?)", (taxon, seq, 0, aln_idx))
-
-        self._reset_pipes(ns)
-
-        return True
-
+    @modifies_data
     def _get_partition_data(self, table_name, ns=None, pbar=None,
                             overide_table=False, seq_types=None):
         """
@@ -6257,125 +7586,291 @@ class AlignmentList(Base):
         self.partitions.partitions = \
             self.partitions.sort_partitions(sort_types=True)
 
-        aln = self.alignments.values()[0]
+        aln = self.alignments.values()[0]
+
+        aln.partitions = self.partitions
+
+    def _get_output_path(self, aln_file, output_dir, suffix):
+        """Returns the path of the output file of an alignment.
+
+        The output directory is created if it does not exist.
+
+        Parameters
+        ----------
+        aln_file : int
+            aln_idx of the alignment.
+        output_dir : str
+            Directory of the output file. If None, the file is written in
+            the same directory as the input alignment.
+        suffix : str
+            Suffix appended to the alignment name, including the extension.
+
+        Returns
+        -------
+        output_file : str
+            Path to the output file.
+        """
+
+        output_file = self.alignment_idx[aln_file].sname + suffix
+        if output_dir:
+            output_file = join(output_dir, output_file)
+            if not exists(output_dir):
+                os.makedirs(output_dir)
+
+        return output_file
+
+    @staticmethod
+    def _check_output_file(output_file, ns):
+        """Checks whether an output file can be written.
+
+        When the file already exists and TriFusion's `Namespace` is
+        provided, the user is prompted to skip or overwrite the file.
+
+        Parameters
+        ----------
+        output_file : str
+            Path to the output file.
+        ns : multiprocesssing.Manager.Namespace
+            A Namespace object used to communicate with the main thread
+            in TriFusion.
+
+        Returns
+        -------
+        _ : bool
+            False if the file is to be skipped.
+        """
+
+        if exists(output_file):
+
+            # File exists, issue a warning through the appropriate pipe
+            if ns:
+                if not ns.apply_all:
+                    ns.file_dialog = output_file
+                    while not ns.status:
+                        pass
+
+            # When the dialog has been close, check if the file is to be
+            # skipped or overwritten
+            if ns:
+                if ns.status == "skip":
+                    ns.status = None
+                    return False
+
+        # Reset pipes, if any
+        if ns:
+            ns.status = None
+
+        return True
+
+    def _setup_newfile(self, fh, aln_file, output_dir, suffix, output_file,
+                       ns):
+
+        # Close previous file object, if exists
+        if fh:
+            fh.close()
+
+        # Get path/file name of alignment/partition
+        if suffix and not output_file:
+            output_file = self._get_output_path(aln_file, output_dir, suffix)
+
+        if not self._check_output_file(output_file, ns):
+            return None, None
+
+        # Return new file object
+        fh = open(output_file, "w")
+
+        return fh, output_file
+
+    @staticmethod
+    def _write_row(fh, blocks, row, upper_case=False, width=None):
+        """Writes the sequence of a taxon from the column blocks.
+
+        The sequence is written one block at a time, without building the
+        complete sequence string, and terminated with a new line.
+
+        Parameters
+        ----------
+        fh : file
+            File object where the sequence is written.
+        blocks : trifusion.process.matrix.ColumnBlocks
+            Column blocks of the alignment.
+        row : int
+            Index of the taxon in the blocks.
+        upper_case : bool, optional
+            If True, the sequence is converted to upper case.
+        width : int, optional
+            If provided, the sequence is split into lines with `width`
+            characters.
+        """
+
+        if width:
+            for line in iter_row_lines(blocks.iter_row(row), width):
+                fh.write("{}\n".format(line.upper() if upper_case else line))
+        else:
+            for chunk in blocks.iter_row(row):
+                fh.write(chunk.upper() if upper_case else chunk)
+            fh.write("\n")
+
+    @staticmethod
+    def _write_interleave(fh, blocks, names, upper_case=False,
+                          repeat_names=False):
+        """Writes the column blocks of an alignment in interleave format.
+
+        Each block is split into groups of 90 columns, separated by an
+        empty line. Blocks must contain a multiple of 90 columns, except
+        for the last one.
+
+        Parameters
+        ----------
+        fh : file
+            File object where the alignment is written.
+        blocks : iterable
+            Column blocks of the alignment, as (ntaxa, ncolumns) arrays
+            with uint8 dtype.
+        names : list
+            List of the formatted taxon names, in the same order as the
+            block rows.
+        upper_case : bool, optional
+            If True, the sequences are converted to upper case.
+        repeat_names : bool, optional
+            If True, taxon names are written in every group of columns.
+            Otherwise, they are only written in the first group.
+        """
+
+        first = True
+
+        for block in blocks:
+            for j in xrange(0, max(block.shape[1], 1), 90):
+
+                if not first:
+                    fh.write("\n")
+
+                for i, name in enumerate(names):
+                    seq = block[i, j:j + 90].tostring()
+
+                    if upper_case:
+                        seq = seq.upper()
 
-        aln.partitions = self.partitions
+                    if first or repeat_names:
+                        fh.write("{} {}\n".format(name, seq))
+                    else:
+                        fh.write("{}\n".format(seq))
 
-    def _setup_newfile(self, fh, aln_file, output_dir, suffix, output_file,
-                       ns):
+                first = False
 
-        # Close previous file object, if exists
-        if fh:
-            fh.close()
+    def _write_matrix(self, fh, names, blocks, interleave=False,
+                      upper_case=False, repeat_names=False):
+        """Writes the sequences of an alignment preceded by the taxon names.
 
-        # Get path/file name of alignment/partition
-        if suffix and not output_file:
-            output_file = self.alignment_idx[aln_file].sname + suffix
-            if output_dir:
-                output_file = join(output_dir, output_file)
-                if not exists(output_dir):
-                    os.makedirs(output_dir)
+        Parameters
+        ----------
+        fh : file
+            File object where the alignment is written.
+        names : list
+            List of the formatted taxon names, in the same order as the
+            block rows.
+        blocks : trifusion.process.matrix.ColumnBlocks
+            Column blocks of the alignment. In the interleave layout, they
+            only need to be traversed once.
+        interleave : bool, optional
+            If True, the sequences are written in interleave layout.
+        upper_case : bool, optional
+            If True, the sequences are converted to upper case.
+        repeat_names : bool, optional
+            If True, taxon names are written in every group of columns of
+            the interleave layout.
+        """
+
+        if interleave:
+            self._write_interleave(fh, blocks, names, upper_case,
+                                   repeat_names)
         else:
-            output_file = output_file
+            for i, name in enumerate(names):
+                fh.write("{} ".format(name))
+                self._write_row(fh, blocks, i, upper_case)
 
-        if exists(output_file):
+    def _write_fasta_alignment(self, fh, output_file, aln_obj, taxa, blocks,
+                               **kwargs):
+        """Writes an alignment in fasta format.
 
-            # File exists, issue a warning through the appropriate pipe
-            if ns:
-                if not ns.apply_all:
-                    ns.file_dialog = output_file
-                    while not ns.status:
-                        pass
+        Parameters
+        ----------
+        fh : file
+            File object where the alignment is written.
+        output_file : str
+            Path to the output file.
+        aln_obj : trifusion.process.sequence.Alignment
+            `Alignment` object of the alignment.
+        taxa : list
+            List of active taxa, in the same order as the block rows.
+        blocks : trifusion.process.matrix.ColumnBlocks
+            Column blocks of the alignment.
+        kwargs
+            Keyword arguments of `write_to_file`.
+        """
 
-            # When the dialog has been close, check if the file is to be
-            # skipped or overwritten
-            if ns:
-                if ns.status == "skip":
-                    ns.status = None
-                    return None, None
+        ld_hat = kwargs.get("ld_hat", False)
+        interleave = kwargs.get("interleave", False)
+        upper_case = kwargs.get("upper_case", None)
 
-        # Reset pipes, if any
-        if ns:
-            ns.status = None
+        # If LD HAT sub format has been specificed, write the first
+        # line containing the number of sequences, sites and
+        # genotype phase
+        if ld_hat:
+            fh.write("{} {} {}\n".format(
+                len(aln_obj.taxa_idx), aln_obj.locus_length, "2"))
 
-        # Return new file object
-        fh = open(output_file, "w")
+        for i, taxon in enumerate(taxa):
 
-        return fh, output_file
+            if ld_hat:
+                # Truncate sequence name to 30 characters and limit
+                # each sequence line to 2000 characters
+                fh.write(">%s\n" % (taxon[:30]))
+                self._write_row(fh, blocks, i, upper_case, 2000)
+            elif interleave:
+                fh.write(">{}\n".format(taxon))
+                self._write_row(fh, blocks, i, upper_case, 90)
+            else:
+                fh.write(">{}\n".format(taxon))
+                self._write_row(fh, blocks, i, upper_case)
 
     def _write_fasta(self, suffix, output_file, **kwargs):
 
-        ld_hat = kwargs.get("ld_hat", False)
-        interleave = kwargs.get("interleave", False)
         output_dir = kwargs.pop("output_dir", None)
         table_name = kwargs.get("table_name", self.master_table)
         ns = kwargs.get("ns_pipe", None)
         pbar = kwargs.get("pbar", None)
-        upper_case = kwargs.get("upper_case", None)
 
         # File object that will be used to write sequence data
         fh = None
 
-        # Stores the string of the last file
-        prev_file = ""
+        temp_dir = os.path.dirname(self.sql_path) or "."
 
         self._set_pipes(ns, pbar, total=len(self.alignments), ignore_sa=True)
         c = 1
-        
-        for taxon, seq, aln_idx in self.iter_alignments(table_name):
-
-            # Convert sequence data to upper case if option is specified
-            if upper_case:
-                seq = seq.upper()
 
-            if aln_idx != prev_file:
-                prev_file = aln_idx
-                fh, _ = self._setup_newfile(
-                    fh, aln_idx, output_dir, suffix, output_file, ns)
-
-                # Get Alignment object containing info of the current alignment
-                aln_obj = self.alignment_idx[aln_idx]
-
-                self._update_pipes(ns, pbar, value=c, ignore_sa=True,
-                                   msg="Writing Fasta file "
-                                       "{}".format(aln_obj.name))
-                c += 1
+        for aln_idx, taxa, blocks in self.iter_column_blocks(table_name):
 
-                # If fh is set to None, the current file is set to skip
-                if not fh:
-                    continue
+            fh, _ = self._setup_newfile(
+                fh, aln_idx, output_dir, suffix, output_file, ns)
 
-                # Do stuff at the beginning of the file, before inserting
-                # Sequence data
+            # Get Alignment object containing info of the current alignment
+            aln_obj = self.alignment_idx[aln_idx]
 
-                # If LD HAT sub format has been specificed, write the first
-                # line containing the number of sequences, sites and
-                # genotype phase
-                if ld_hat:
-                    fh.write("{} {} {}\n".format(
-                        len(aln_obj.taxa_idx), aln_obj.locus_length, "2"))
+            self._update_pipes(ns, pbar, value=c, ignore_sa=True,
+                               msg="Writing Fasta file "
+                                   "{}".format(aln_obj.name))
+            c += 1
 
-            # Skip row if fh is not set (skipping files)
+            # If fh is set to None, the current file is set to skip
             if not fh:
                 continue
 
-            if ld_hat:
-                # Truncate sequence name to 30 characters
-                fh.write(">%s\n" % (taxon[:30]))
-                # Limit each sequence line to 2000 characters
-                if len(seq) > 2000:
-                    for i in range(0, len(seq), 2000):
-                        fh.write("%s\n" % (seq[i:i + 2000]))
-            elif interleave:
-                fh.write(">{}\n".format(taxon))
-                counter = 0
-                for i in range(90, aln_obj.locus_length, 90):
-                    fh.write("{}\n".format(seq[counter:i]))
-                    counter = i
-
-                fh.write("{}\n".format(seq[counter:]))
-            else:
-                fh.write(">{}\n{}\n".format(taxon, seq))
+            # Sequences are written one taxon at a time, so the column
+            # blocks need to be traversed once per taxon
+            with ColumnBlocks(blocks, temp_dir) as blocks:
+                self._write_fasta_alignment(fh, None, aln_obj, taxa, blocks,
+                                            **kwargs)
 
         # When all files are skipeed, fh remains None
         if fh:
@@ -6453,129 +7948,90 @@ class AlignmentList(Base):
 
             partition_file.close()
 
-    def _write_phylip(self, suffix, output_file, **kwargs):
+    def _write_phylip_alignment(self, fh, output_file, aln_obj, taxa,
+                                blocks, **kwargs):
+        """Writes an alignment in phylip format.
+
+        Parameters
+        ----------
+        fh : file
+            File object where the alignment is written.
+        output_file : str
+            Path to the output file, used to name the partition file.
+        aln_obj : trifusion.process.sequence.Alignment
+            `Alignment` object of the alignment.
+        taxa : list
+            List of active taxa, in the same order as the block rows.
+        blocks : trifusion.process.matrix.ColumnBlocks
+            Column blocks of the alignment.
+        kwargs
+            Keyword arguments of `write_to_file`.
+        """
 
-        # Get relevant keyword arguments
         interleave = kwargs.get("interleave", False)
         tx_space_phy = kwargs.get("tx_space_phy", 40)
         cut_space_phy = kwargs.get("cut_space_phy", 39)
         phy_truncate_names = kwargs.get("phy_truncate_names", False)
         partition_file = kwargs.get("partition_file", None)
         model_phylip = kwargs.get("model_phylip", None)
-        table_name = kwargs.get("table_name", None)
-        ns = kwargs.get("ns_pipe", None)
-        pbar = kwargs.get("pbar", None)
-        output_dir = kwargs.get("output_dir", None)
         upper_case = kwargs.get("upper_case", None)
 
-        # File object that will be used to write sequence data
-        fh = None
-
-        # Stores the string of the last file
-        prev_file = ""
-
         # Change taxa space if phy_truncate_names option is set to True
         if phy_truncate_names:
             cut_space_phy = 10
 
-        if interleave:
-
-            if not self.interleave_data:
-                self.interleave_data = self._get_interleave_data(
-                        table_name, ns, pbar)
-
-            self._set_pipes(ns, pbar, total=len(self.alignments))
-            c = 1
-
-            for taxon, seq, p, aln_idx in self.cur.execute(
-                "SELECT taxon, seq, slice, aln_idx from [.interleavedata] "
-                "ORDER BY aln_idx, slice"):
-                
-                if upper_case:
-                    seq = seq.upper()
-
-                if prev_file != aln_idx:
-                    fh, of = self._setup_newfile(
-                        fh, aln_idx, output_dir, suffix, output_file, ns)
-                    prev_file = aln_idx
-
-                    aln_obj = self.alignment_idx[aln_idx]
-                    
-                    self._update_pipes(ns, pbar, value=c,
-                                       msg="Writing Phylip file "
-                                           "{}".format(aln_obj.name))
-                    c += 1
-
-                    if not fh:
-                        continue
-                    
-                    self._write_phylip_partitions(aln_obj, partition_file,
-                                                  of, model_phylip)
-
-                    fh.write("{} {}\n".format(
-                        len(aln_obj.taxa_idx) - len(aln_obj.shelved_taxa),
-                        aln_obj.locus_length))
-
-                    write_tx = True
-                    prev = 90
-
-                if not fh:
-                    continue
+        self._write_phylip_partitions(aln_obj, partition_file,
+                                      output_file, model_phylip)
 
-                if p != prev:
-                    fh.write("\n")
-                    prev = p
-                    write_tx = False
+        fh.write("{} {}\n".format(
+            len(aln_obj.taxa_idx) - len(aln_obj.shelved_taxa),
+            aln_obj.locus_length))
 
-                if write_tx:
-                    fh.write("{} {}\n".format(
-                        taxon[:cut_space_phy].ljust(tx_space_phy),
-                        seq))
-                else:
-                    fh.write("{}\n".format(seq))
+        names = [x[:cut_space_phy].ljust(tx_space_phy) for x in taxa]
 
-        else:
+        self._write_matrix(fh, names, blocks, interleave, upper_case)
 
-            self._set_pipes(ns, pbar, total=len(self.alignments))
-            c = 1
+    def _write_phylip(self, suffix, output_file, **kwargs):
 
-            for taxon, seq, aln_idx in self.iter_alignments(table_name):
-                
-                if upper_case:
-                    seq = seq.upper()
+        # Get relevant keyword arguments
+        interleave = kwargs.get("interleave", False)
+        table_name = kwargs.get("table_name", None)
+        ns = kwargs.get("ns_pipe", None)
+        pbar = kwargs.get("pbar", None)
+        output_dir = kwargs.get("output_dir", None)
 
-                if aln_idx != prev_file:
-                    prev_file = aln_idx
-                    fh, of = self._setup_newfile(
-                        fh, aln_idx, output_dir, suffix, output_file, ns)
+        # File object that will be used to write sequence data
+        fh = None
 
-                    if not fh:
-                        continue
+        temp_dir = os.path.dirname(self.sql_path) or "."
 
-                    aln_obj = self.alignment_idx[aln_idx]
+        self._set_pipes(ns, pbar, total=len(self.alignments))
+        c = 1
 
-                    self._update_pipes(ns, pbar, value=c,
-                                       msg="Writing Phylip file "
-                                           "{}".format(aln_obj.name))
-                    c += 1
+        # Blocks must contain whole lines of the interleave format
+        for aln_idx, taxa, blocks in self.iter_column_blocks(table_name,
+                                                             multiple=90):
 
-                    self._write_phylip_partitions(aln_obj, partition_file,
-                                                  of, model_phylip)
+            fh, of = self._setup_newfile(
+                fh, aln_idx, output_dir, suffix, output_file, ns)
 
-                    # Get Alignment object containing info of the current
-                    # alignment
-                    aln_obj = self.alignment_idx[aln_idx]
+            if not fh:
+                continue
 
-                    fh.write("{} {}\n".format(
-                        len(aln_obj.taxa_idx) - len(aln_obj.shelved_taxa),
-                        aln_obj.locus_length))
+            # Get Alignment object containing info of the current alignment
+            aln_obj = self.alignment_idx[aln_idx]
 
-                if not fh:
-                    continue
+            self._update_pipes(ns, pbar, value=c,
+                               msg="Writing Phylip file "
+                                   "{}".format(aln_obj.name))
+            c += 1
 
-                fh.write("{} {}\n".format(
-                    taxon[:cut_space_phy].ljust(tx_space_phy),
-                    seq))
+            # The sequential layout traverses the column blocks once per
+            # taxon
+            with ColumnBlocks(blocks, temp_dir,
+                              spill=not interleave) as blocks:
+                self._write_phylip_alignment(fh, of, aln_obj, taxa, blocks,
+                                             **kwargs)
 
         # When all files are skipeed, fh remains None
         if fh:
@@ -6739,9 +8195,26 @@ class AlignmentList(Base):
                     "yes" if interleave else "no",
                     gap))
 
-    def _write_nexus(self, suffix, output_file, **kwargs):
+    def _write_nexus_alignment(self, fh, output_file, aln_obj, taxa, blocks,
+                               **kwargs):
+        """Writes an alignment in nexus format.
+
+        Parameters
+        ----------
+        fh : file
+            File object where the alignment is written.
+        output_file : str
+            Path to the output file.
+        aln_obj : trifusion.process.sequence.Alignment
+            `Alignment` object of the alignment.
+        taxa : list
+            List of active taxa, in the same order as the block rows.
+        blocks : trifusion.process.matrix.ColumnBlocks
+            Column blocks of the alignment.
+        kwargs
+            Keyword arguments of `write_to_file`.
+        """
 
-        # Get relevant keyword arguments
         interleave = kwargs.get("interleave", False)
         tx_space_nex = kwargs.get("tx_space_nex", 40)
         cut_space_nex = kwargs.get("cut_space_nex", 39)
@@ -6749,136 +8222,65 @@ class AlignmentList(Base):
         use_charset = kwargs.get("use_charset", True)
         use_nexus_models = kwargs.get("use_nexus_models", True)
         outgroup_list = kwargs.get("outgroup_list", None)
-        table_name = kwargs.get("table_name", None)
-        output_dir = kwargs.get("output_dir", None)
-        ns = kwargs.get("ns_pipe", None)
-        pbar = kwargs.get("pbar", None)
         upper_case = kwargs.get("upper_case", None)
 
-        # File object that will be used to write sequence data
-        fh = None
-
-        # Stores the string of the last file
-        prev_file = ""
-
-        if interleave:
-
-            if not self.interleave_data:
-                self.interleave_data = self._get_interleave_data(
-                        table_name, ns, pbar)
-
-            self._set_pipes(ns, pbar, total=len(self.alignments))
-            c = 1
-
-            for taxon, seq, p, aln_idx in self.cur.execute(
-                    "SELECT taxon, seq, slice, aln_idx "
-                    "FROM [.interleavedata] "
-                    "ORDER BY aln_idx, slice"):
-
-                if upper_case:
-                    seq = seq.upper()
-
-                if aln_idx != prev_file:
-
-                    if fh:
-                        fh.write(";\n\tend;")
-
-                        self._write_nexus_partitions(aln_obj, use_charset, fh,
-                                                     aln_parts,
-                                                     use_nexus_models,
-                                                     outgroup_list)
-
-                    prev_file = aln_idx
-                    fh, of = self._setup_newfile(
-                        fh, aln_idx, output_dir, suffix, output_file, ns)
-
-                    if not fh:
-                        continue
-
-                    aln_obj = self.alignment_idx[aln_idx]
-                    aln_parts = aln_obj.partitions
-
-                    self._update_pipes(ns, pbar, value=c,
-                                       msg="Writing Nexus file "
-                                           "{}".format(aln_obj.name))
-                    c += 1
-
-                    self._write_nexus_header(aln_obj, fh, gap, interleave)
-
-                    prev = 90
+        self._write_nexus_header(aln_obj, fh, gap, interleave)
 
-                if not fh:
-                    continue
-
-                if p != prev:
-                    fh.write("\n")
-                    prev = p
-
-                fh.write("{} {}\n".format(
-                    taxon[:cut_space_nex].ljust(tx_space_nex),
-                    seq))
-
-            if fh:
-                fh.write(";\n\tend;")
-                self._write_nexus_partitions(aln_obj, use_charset, fh,
-                                             aln_parts,
-                                             use_nexus_models,
-                                             outgroup_list)
-
-        else:
-
-            self._set_pipes(ns, pbar, total=len(self.alignments))
-            c = 1
+        names = [x[:cut_space_nex].ljust(tx_space_nex) for x in taxa]
 
-            for taxon, seq, aln_idx in self.iter_alignments(table_name):
+        self._write_matrix(fh, names, blocks, interleave, upper_case,
+                           repeat_names=True)
 
-                if upper_case:
-                    seq = seq.upper()
+        fh.write(";\n\tend;")
+        self._write_nexus_partitions(aln_obj, use_charset, fh,
+                                     aln_obj.partitions, use_nexus_models,
+                                     outgroup_list)
 
-                if aln_idx != prev_file:
+    def _write_nexus(self, suffix, output_file, **kwargs):
 
-                    if fh:
-                        fh.write(";\n\tend;")
+        # Get relevant keyword arguments
+        interleave = kwargs.get("interleave", False)
+        table_name = kwargs.get("table_name", None)
+        output_dir = kwargs.get("output_dir", None)
+        ns = kwargs.get("ns_pipe", None)
+        pbar = kwargs.get("pbar", None)
 
-                        self._write_nexus_partitions(aln_obj, use_charset, fh,
-                                                     aln_parts,
-                                                     use_nexus_models,
-                                                     outgroup_list)
+        # File object that will be used to write sequence data
+        fh = None
 
-                    prev_file = aln_idx
-                    fh, of = self._setup_newfile(
-                        fh, aln_idx, output_dir, suffix, output_file, ns)
+        temp_dir = os.path.dirname(self.sql_path) or "."
 
-                    if not fh:
-                        continue
+        self._set_pipes(ns, pbar, total=len(self.alignments))
+        c = 1
 
-                    aln_obj = self.alignment_idx[aln_idx]
-                    aln_parts = aln_obj.partitions
+        # Blocks must contain whole lines of the interleave format
+        for aln_idx, taxa, blocks in self.iter_column_blocks(table_name,
+                                                             multiple=90):
 
-                    self._update_pipes(ns, pbar, value=c,
-                                       msg="Writing Nexus file "
-                                           "{}".format(aln_obj.name))
-                    c += 1
+            fh, of = self._setup_newfile(
+                fh, aln_idx, output_dir, suffix, output_file, ns)
 
-                    self._write_nexus_header(aln_obj, fh, gap, interleave)
+            if not fh:
+                continue
 
-                if not fh:
-                    continue
+            aln_obj = self.alignment_idx[aln_idx]
 
-                fh.write("{} {}\n".format(taxon[:cut_space_nex].ljust(
-                    tx_space_nex), seq))
+            self._update_pipes(ns, pbar, value=c,
+                               msg="Writing Nexus file "
+                                   "{}".format(aln_obj.name))
+            c += 1
 
-            if fh:
-                fh.write(";\n\tend;")
-                self._write_nexus_partitions(aln_obj, use_charset, fh,
-                                             aln_parts,
-                                             use_nexus_models,
-                                             outgroup_list)
+            # The sequential layout traverses the column blocks once per
+            # taxon
+            with ColumnBlocks(blocks, temp_dir,
+                              spill=not interleave) as blocks:
+                self._write_nexus_alignment(fh, of, aln_obj, taxa, blocks,
+                                            **kwargs)
 
         # When all files are skiped, fh remains None
         if fh:
             fh.close()
-    
+
     def _write_snapp(self, suffix, output_file, **kwargs):
         
         ns = kwargs.get("ns_pipe", None)
@@ -7236,6 +8638,112 @@ class AlignmentList(Base):
                 taxon[:cut_space_phy].ljust(tx_space_phy),
                 seq))
 
+    def write_alignment(self, aln_idx, output_files, **kwargs):
+        """Writes an alignment in several output formats.
+
+        The data of the alignment is read only once, and the output files
+        of all formats are written from the same column blocks. Only the
+        formats in `block_formats` are supported.
+
+        Parameters
+        ----------
+        aln_idx : int
+            aln_idx of the alignment.
+        output_files : list
+            List of (output format, output file) tuples.
+        kwargs
+            Keyword arguments of `write_to_file`.
+        """
+
+        write_methods = {
+            "fasta": self._write_fasta_alignment,
+            "phylip": self._write_phylip_alignment,
+            "nexus": self._write_nexus_alignment
+        }
+
+        table_name = kwargs.get("table_name", None)
+        temp_dir = os.path.dirname(self.sql_path) or "."
+
+        for _, taxa, blocks in self.iter_column_blocks(
+                table_name, multiple=90, aln_idx=aln_idx):
+
+            aln_obj = self.alignment_idx[aln_idx]
+
+            with ColumnBlocks(blocks, temp_dir) as blocks:
+                for fmt, output_file in output_files:
+                    with open(output_file, "w") as fh:
+                        write_methods[fmt](fh, output_file, aln_obj, taxa,
+                                           blocks, **kwargs)
+
+    def _write_parallel(self, output_format, suffix, workers, **kwargs):
+        """Writes the active alignments to their own files in a process pool.
+
+        The alignments are distributed across `workers` processes (see
+        :func:`write_alignment`), and each process writes all output formats
+        of an alignment from a single read of its data. Existing output
+        files are checked before the pool is started, since TriFusion
+        may prompt the user to skip or overwrite them.
+
+        Parameters
+        ----------
+        output_format : list
+            List of output formats, all of them in `block_formats`.
+        suffix : str
+            Suffix appended to the alignment names, without the extension.
+        workers : int
+            Number of processes.
+        kwargs
+            Keyword arguments of `write_to_file`.
+        """
+
+        ns = kwargs.pop("ns_pipe", None)
+        pbar = kwargs.pop("pbar", None)
+        output_dir = kwargs.get("output_dir", None)
+
+        tasks = []
+        for aln_idx in self._get_active_idx():
+
+            output_files = []
+            for fmt in output_format:
+                output_file = self._get_output_path(
+                    aln_idx, output_dir, suffix + self.format_ext[fmt])
+                if self._check_output_file(output_file, ns):
+                    output_files.append((fmt, output_file))
+
+            if output_files:
+                tasks.append((aln_idx, output_files, kwargs))
+
+        if not tasks:
+            return
+
+        # Workers use their own connections and no matrix store, so the
+        # alignments read from a project file are copied into the database
+        # and any pending changes must be visible to them
+        self._materialize()
+        self.con.commit()
+
+        self._set_pipes(ns, pbar, total=len(tasks), ignore_sa=True)
+
+        pool = Pool(min(workers, len(tasks)), initializer=init_writer,
+                    initargs=(dumps_detached(self),))
+
+        try:
+            for p, aln_idx in enumerate(pool.imap_unordered(
+                    write_alignment, tasks,
+                    chunksize=max(1, len(tasks) // (workers * 4)))):
+
+                self._update_pipes(ns, pbar, value=p + 1, ignore_sa=True,
+                                   msg="Writing file {}".format(
+                                       self.alignment_idx[aln_idx].name))
+
+            pool.close()
+            pool.join()
+
+        finally:
+            pool.terminate()
+
+        self._reset_pipes(ns)
+
     def write_to_file(self, output_format, conversion_suffix="",
                       output_suffix="", *args, **kwargs):
         """Writes `Alignment` objects into files.
@@ -7308,6 +8816,11 @@ class AlignmentList(Base):
             names and sequence length per line accordingly.
         use_nexus_models : bool
             If True, writes the _partitions charset block in nexus format.
+        workers : int
+            Number of processes used to write the output files. When larger
+            than 1 and there are several active alignments, the files in the
+            `block_formats` output formats are written in a process pool.
+            Defaults to the `workers` attribute.
         ns_pipe : multiprocesssing.Manager.Namespace
             A Namespace object used to communicate with the main thread
             in TriFusion.
@@ -7321,6 +8834,7 @@ class AlignmentList(Base):
         """
 
         output_file = kwargs.pop("output_file", None)
+        workers = kwargs.pop("workers", None) or self.workers
         table_name = kwargs.get("table_name", self.master_table)
 
         write_methods = {
@@ -7344,6 +8858,21 @@ class AlignmentList(Base):
             self.partition_data = self._get_partition_data(
                 table_name, overide_table=True, seq_types=seq_types)
 
+        # Alignments are written to their own files, which can be done
+        # in parallel
+        block_formats = [x for x in output_format if x in self.block_formats]
+        if workers > 1 and len(self.alignments) > 1 and block_formats:
+
+            if output_file:
+                kwargs["output_dir"] = output_file
+
+            self._write_parallel(block_formats,
+                                 conversion_suffix + output_suffix,
+                                 workers, **kwargs)
+
+            output_format = [x for x in output_format
+                             if x not in block_formats]
+
         for fmt in output_format:
 
             filename = None
@@ -7422,7 +8951,12 @@ class AlignmentList(Base):
     def get_summary_stats(self, active_alignments=None, ns=None):
         """Calculates summary statistics for the 'active' alignments.
 
-        Creates/Updates summary statistics for the active alignments.
+        Creates/Updates summary statistics for the active alignments. The
+        statistics of each alignment are cached in `summary_cache` by
+        table, aln_idx and set of shelved taxa, so that only alignments
+        without cached statistics are processed and changing the active
+        alignments only aggregates the cached values. The
+        `summary_gene_table` is rebuilt from all cached values.
 
         Parameters
         ----------
@@ -7441,38 +8975,48 @@ class AlignmentList(Base):
             List with overall summary statistics for creating .csv tables.
         """
 
-        def add_data():
-            # Get values for current alignment for average calculations
-            self.summary_stats["avg_gaps"].append(cur_gap)
-            self.summary_stats["avg_missing"].append(cur_missing)
-            self.summary_stats["avg_var"].append(cur_var)
-            self.summary_stats["avg_inf"].append(cur_inf)
-
-            if not any(self.summary_gene_table["genes"] == aln.name):
-                # Get row information for current gene in dict format
-                row_info = (aln.name,
-                            aln.locus_length,
-                            len(aln.taxa_idx),
-                            cur_var,
-                            cur_inf,
-                            cur_gap,
-                            cur_missing)
-                # Create DataFrame from dict
-                row_dt = pd.DataFrame(
-                    [row_info], index=[c],
-                    columns=self.summary_gene_table.columns)
-                # Add row DF to main DF
-                self.summary_gene_table = pd.concat(
-                    [self.summary_gene_table,
-                     row_dt])
-
         # Update active alignments if they changed since last update
         if active_alignments and \
                 active_alignments != list(self.alignments.keys()):
             self.update_active_alignments(active_alignments)
 
-        self._set_pipes(ns, None, total=len(self.alignments))
-        c = -1
+        table_name = self._get_table_name()
+        shelved = frozenset(self.shelved_taxa)
+        idx_list = self._get_active_idx()
+
+        # Results are kept locally as well, since the cache may be
+        # invalidated if the database is changed
+        rows = OrderedDict()
+        for idx in idx_list:
+            row = self.summary_cache.get(self.con, (table_name, idx, shelved))
+            if row is not None:
+                rows[idx] = row
+
+        missing = [x for x in idx_list if x not in rows]
+
+        self._set_pipes(ns, None, total=len(missing))
+        c = 0
+
+        for aln_idx, stats in self.iter_column_stats(idx_list=missing):
+
+            self._check_killswitch(ns)
+
+            self._update_pipes(ns, None, value=c)
+            c += 1
+
+            aln = self.alignment_idx[aln_idx]
+
+            # Columns with only missing data have no states and are not
+            # variable nor informative
+            rows[aln_idx] = (aln.locus_length,
+                             len(aln.taxa_idx),
+                             stats.variable_sites,
+                             stats.informative_sites,
+                             stats.gap_sites,
+                             stats.missing_sites)
+
+            self.summary_cache.set(self.con, (table_name, aln_idx, shelved),
+                                   rows[aln_idx])
 
         # Set table header for summary_stats
         table = [["Genes", "Taxa", "Alignment length", "Gaps",
@@ -7492,66 +9036,22 @@ class AlignmentList(Base):
         # Get number of taxa
         self.summary_stats["taxa"] = len(self.taxa_names)
 
-        # Get statistics that require iteration over alignments
-        prev_idx = ""
-        for col, aln_idx in self.iter_columns():
-
-            self._check_killswitch(ns)
-
-            if prev_idx != aln_idx:
-
-                if prev_idx:
-                    add_data()
-
-                self._update_pipes(ns, None, value=c)
-                c += 1
-
-                # Get current alignment
-                aln = self.alignment_idx[aln_idx]
-                self.summary_stats["seq_len"] += aln.locus_length
-
-                cur_gap, cur_missing = 0, 0
-                cur_var, cur_inf = 0, 0
+        # Aggregate the statistics of the active alignments, in the same
+        # order as the alignments
+        active = np.array([rows[x] for x in idx_list if x in rows],
+                          dtype=np.int64).reshape(-1, 6)
+        nsites, _, var, inf, gap, missing = active.T
 
-                prev_idx = aln_idx
-
-                if ns:
-                    if ns.stop:
-                        raise KillByUser("")
-
-            col = Counter(col)
-
-            # Get missing data and gaps
-            if aln.sequence_code[1] in col:
-                self.summary_stats["missing"] += 1
-                cur_missing += 1
-            if self.gap_symbol in col:
-                self.summary_stats["gaps"] += 1
-                cur_gap += 1
-
-            # Get variability information
-            # Filter missing data
-            for i in [aln.sequence_code[1], self.gap_symbol]:
-                del col[i]
-
-            # If it's only missing data, ignore
-            if col:
-                # Get variable sites
-                if len(col) > 1:
-                    self.summary_stats["variable"] += 1
-                    cur_var += 1
-
-                # If any of the remaining sites is present in more than two
-                # taxa score the site as informative
-                if len([x for x in col.values() if x >= 2]) >= 2:
-                    self.summary_stats["informative"] += 1
-                    cur_inf += 1
-        if aln_idx:
-            add_data()
+        self.summary_stats["seq_len"] = int(nsites.sum())
+        self.summary_stats["missing"] = int(missing.sum())
+        self.summary_stats["gaps"] = int(gap.sum())
+        self.summary_stats["variable"] = int(var.sum())
+        self.summary_stats["informative"] = int(inf.sum())
 
         # Get average values
-        for k in ["avg_gaps", "avg_missing", "avg_var", "avg_inf"]:
-            self.summary_stats[k] = round(np.mean(self.summary_stats[k]))
+        for k, vals in [("avg_gaps", gap), ("avg_missing", missing),
+                        ("avg_var", var), ("avg_inf", inf)]:
+            self.summary_stats[k] = round(np.mean(vals))
 
         # Get percentage values for missing data
         total = self.summary_stats["seq_len"] * self.summary_stats["taxa"]
@@ -7570,8 +9070,39 @@ class AlignmentList(Base):
         # Complete table information
         table.append([self.summary_stats[x] for x in tl])
 
+        self._build_gene_table(table_name, shelved)
+
         return dict(self.summary_stats), table
 
+    def _build_gene_table(self, table_name, shelved):
+        """Builds the `summary_gene_table` from the cached statistics.
+
+        The table has one row for each alignment with cached statistics
+        for the given table and set of shelved taxa, including alignments
+        that are not active.
+
+        Parameters
+        ----------
+        table_name : str
+            Name of the database table.
+        shelved : frozenset
+            Set of shelved taxa.
+        """
+
+        idx_list = [x for x in self.alignment_idx if
+                    (table_name, x, shelved) in self.summary_cache.data]
+
+        data = np.array([self.summary_cache.data[(table_name, x, shelved)]
+                         for x in idx_list], dtype=np.int64).reshape(-1, 6)
+
+        columns = self.summary_gene_table.columns
+        self.summary_gene_table = pd.DataFrame(
+            OrderedDict([("genes", [self.alignment_idx[x].name
+                                    for x in idx_list])] +
+                        [(x, data[:, p]) for p, x in
+                         enumerate(columns[1:])]),
+            columns=columns)
+
     @check_data
     def gene_occupancy(self, ns=None):
         """Create data for gene occupancy plot.
@@ -7593,17 +9124,12 @@ class AlignmentList(Base):
             "title": str with title
         """
 
-        data = []
-
-        for alignment in self.alignments.values():
-            if ns:
-                if ns.stop:
-                    raise KillByUser()
-
-            data.append([1 if x in alignment.taxa_idx else 0
-                         for x in self.taxa_names])
+        if ns:
+            if ns.stop:
+                raise KillByUser()
 
-        data = np.transpose(data)
+        data = self.taxa_presence.get_matrix(
+            self._get_presence_idx(), self.taxa_names).astype(int)
 
         return {"data": data,
                 "ax_names": ["Genes", "Taxa"],
@@ -7821,19 +9347,11 @@ class AlignmentList(Base):
             "table_header": list with headers of table
         """
 
-        data_storage = OrderedDict((taxon, 0) for taxon in self.taxa_names)
-
-        self._set_pipes(ns, None, total=len(self.alignments))
-        c = 1
-
-        for aln in self.alignments.values():
+        aln_idx_list = self._get_presence_idx()
+        missing = len(aln_idx_list) - self.taxa_presence.count_alignments(
+            aln_idx_list, self.taxa_names)
 
-            self._update_pipes(ns, None, value=c)
-            c += 1
-
-            for key in data_storage:
-                if key not in aln.taxa_idx:
-                    data_storage[key] += 1
+        data_storage = OrderedDict(zip(self.taxa_names, missing.tolist()))
 
         # Sort data in descending order of missing genes
         data_storage = OrderedDict(sorted(data_storage.items(), reverse=True,
@@ -7989,77 +9507,70 @@ class AlignmentList(Base):
                 "table_header": [ax_xlabel, "Frequency"]}
 
     @check_data
-    def sequence_conservation_gnp(self, gene_name, window_size, ns=None):
-        """
+    def sequence_conservation_gnp(self, gene_name, window_size, ns=None,
+                                  window_step=None):
+        """Creates data for the sliding window of ranked variant proportions.
 
+        For each column of the alignment, the proportion of each character
+        state (ignoring gaps and missing data) is ranked from the most to
+        the least frequent. The plot data is the average of each rank over
+        the columns of each window.
+
+        Parameters
+        ----------
+        gene_name : str
+            `Alignment.name` from an alignment
+        window_size : int
+            Size of sliding window.
+        ns : multiprocesssing.Manager.Namespace
+            A Namespace object used to communicate with the main thread
+            in TriFusion.
+        window_step : int, optional
+            Distance between the start of consecutive windows. Defaults to
+            `window_size`.
+
+        Returns
+        -------
+        _ : dict
+            "data": `numpy.array` with data for plotting,
+
+            "labels": list, label for xticks,
+
+            "ax_names": 2 element list with axis labels [x, y]
         """
 
         aln_obj = self.retrieve_alignment(gene_name)
-        missing_chars = [aln_obj.sequence_code[1], self.gap_symbol, "?"]
-
-        if 0 < window_size < 1:
-            step = int(window_size * aln_obj.locus_length)
-        else:
-            step = int(window_size)
+        missing_chars = [aln_obj.sequence_code[1], self.gap_symbol, "?",
+                         "\x00"]
 
-        labels = []
+        window, step = self._get_window(aln_obj, window_size, window_step)
 
         nchars = len(dna_chars) if aln_obj.sequence_code[0] == "DNA" else \
             len([x for x in aminoacid_table.keys() if x != "x"])
-        
-        data_storage = OrderedDict((x, []) for x in range(nchars))
-        # Temp storage that will store the values for each window
-        temp_data = OrderedDict((x, []) for x in range(nchars))
 
         self._set_pipes(ns, None, total=aln_obj.locus_length, ignore_sa=True)
 
-        for p, col in enumerate(self.iter_columns(aln_idx=aln_obj.db_idx)):
-
-            self._update_pipes(ns, None, value=p)
+        _, alphabet, counts = self._get_column_counts(aln_obj)
 
-            char_counts = Counter(
-                [x.lower() for x in col[0] if x not in missing_chars]
-            ).most_common()
-            total = float(sum([x[1] for x in char_counts]))
+        # Merge upper and lower case characters
+        chars = [chr(x).lower() for x in alphabet]
+        valid = sorted(set(x for x, y in zip(chars, alphabet)
+                           if chr(y) not in missing_chars))
+        merged = np.zeros((max(len(valid), nchars), counts.shape[1]))
+        for x, y, c in zip(chars, alphabet, counts):
+            if chr(y) not in missing_chars:
+                merged[valid.index(x)] += c
 
-            # Add data for current window
-            for i in range(nchars):
-                try:
-                    temp_data[i].append(float(char_counts[i][1]) / total)
-                except IndexError:
-                    temp_data[i].append(0)
-
-            # At the end of each window perform the average over the values
-            if p % step == 0 and (p or step == 1):
-                # Get average value for previous window
-                for k, val in temp_data.items():
-                    # If variant rank is empty, add 0 to array
-                    if val:
-                        mean_val = float(sum(val)) / float(len(val))
-                    else:
-                        mean_val = 0
-                    data_storage[k].append(mean_val)
-
-                # Reset temp_data for next window
-                temp_data = OrderedDict((x, []) for x in range(nchars))
+        # Proportion of each variant, ranked from the most to the least
+        # frequent, in each column
+        ranked = -np.sort(-merged, axis=0)[:nchars]
+        total = merged.sum(axis=0)
+        ranked /= np.maximum(total, 1)
 
-                # Add label for current window based on the starting position
-                labels.append("{}".format(p))
+        starts, ends, sums = window_sums(ranked, window, step)
 
-        # Get average for last window, if any
-        if any(temp_data.values()):
-            for k, val in temp_data.items():
-                # If variant rank is empty, add 0 to array
-                if val:
-                    mean_val = float(sum(val)) / float(len(val))
-                else:
-                    mean_val = 0
-                data_storage[k].append(mean_val)
-
-            # Add label for current window based on the starting position
-            labels.append("{}".format(p))
-
-        data = np.array(data_storage.values())
+        data = sums / (ends - starts)
+        labels = ["{}".format(x) for x in starts]
 
         return {"data": data,
                 "labels": labels,
@@ -8068,48 +9579,69 @@ class AlignmentList(Base):
 
     @check_data
     def characters_proportion_gene(self, gene_name, window_size,
-                                   proportions=False, ns=None):
-        """
+                                   proportions=False, ns=None,
+                                   window_step=None):
+        """Creates data for the sliding window of character counts.
+
+        Parameters
+        ----------
+        gene_name : str
+            `Alignment.name` from an alignment
+        window_size : int
+            Size of sliding window.
+        proportions : bool
+            If True, use proportions instead of absolute values.
+        ns : multiprocesssing.Manager.Namespace
+            A Namespace object used to communicate with the main thread
+            in TriFusion.
+        window_step : int, optional
+            Distance between the start of consecutive windows. Defaults to
+            `window_size`.
+
+        Returns
+        -------
+        _ : dict
+            "data": `numpy.array` with data for plotting,
+
+            "labels": list, label for xticks,
+
+            "legend": list, names of the characters,
+
+            "ax_names": 2 element list with axis labels [x, y],
+
+            "table_header": list with headers of table
         """
 
         aln_obj = self.retrieve_alignment(gene_name)
 
-        if 0 < window_size < 1:
-            step = int(window_size * aln_obj.locus_length)
-        else:
-            step = int(window_size)
-
-        labels = []
+        window, step = self._get_window(aln_obj, window_size, window_step)
 
         chars = dna_chars if aln_obj.sequence_code[0] == "DNA" else \
             list(aminoacid_table.keys())
-        data_storage = OrderedDict((x, []) for x in chars)
 
         self._set_pipes(ns, None, total=aln_obj.locus_length, ignore_sa=True)
 
-        for i in range(0, aln_obj.locus_length, step):
+        _, alphabet, counts = self._get_column_counts(aln_obj)
 
-            self._update_pipes(ns, None, value=i)
-
-            seqs = np.array([[y for y in x[i:i + step]] for x in
-                             aln_obj.iter_sequences()])
-            char_counts = Counter([o.lower() for j in seqs for o in j
-                                   if 0 != aln_obj.sequence_code[1] and
-                                   o != self.gap_symbol and o != "?"])
+        # Counts of each character, ignoring case, and of all characters
+        # except gaps
+        char_counts = np.zeros((len(chars) + 1, counts.shape[1]),
+                               dtype=np.int64)
+        for x, c in zip(alphabet, counts):
+            x = chr(x)
+            if x in [self.gap_symbol, "?", "\x00"]:
+                continue
+            char_counts[-1] += c
+            if x.lower() in chars:
+                char_counts[chars.index(x.lower())] += c
 
-            total = float(sum(char_counts.values()))
-            labels.append("{}_{}".format(i, i + step))
+        starts, ends, sums = window_sums(char_counts, window, step)
 
-            for k, val in data_storage.items():
-                if k in char_counts:
-                    if proportions:
-                        val.append(float(char_counts[k]) / total)
-                    else:
-                        val.append(float(char_counts[k]))
-                else:
-                    val.append(0)
+        data = sums[:-1].astype(float)
+        if proportions:
+            data /= np.maximum(sums[-1], 1)
 
-        data = np.array(data_storage.values())
+        labels = ["{}_{}".format(x, x + window) for x in starts]
 
         ax_xlabel = "Nucleotide" if self.sequence_code[0] == "DNA" \
             else "Amino acid"
@@ -8118,7 +9650,7 @@ class AlignmentList(Base):
                 "labels": labels,
                 "legend": chars,
                 "ax_names": ["Gene position", ax_xlabel + " counts"],
-                "table_header": [""] + list(data_storage.keys())}
+                "table_header": [""] + list(chars)}
 
     @check_data
     def characters_proportion(self, ns=None):
@@ -8256,51 +9788,6 @@ class AlignmentList(Base):
                 "ax_names": ["Taxa", ax_ylabel],
                 "table_header": ["Taxon"] + legend}
 
-    @LookupDatabase
-    def _get_similarity(self, seq1=None, seq2=None, aln_len=None, aln=None):
-        """Gets the similarity between two strings and the effective length.
-
-        Compares two sequences and calculates the number of similarities.
-        This comparison ignores columns with missing data, so the final
-        sequence length that is actually compared has to be adjusted.
-
-        Parameters
-        ----------
-        seq1, seq2 : str
-            Sequence strings.
-        aln_len : int
-            Original lenght of `seq1` and `seq2`.
-
-        Returns
-        -------
-        sim : float
-            Number of pairwise similarities.
-        ef_len : float
-            Effective sequence length, without missing data.
-
-        Notes
-        -----
-        To avoid performing the calculations between identical string pairs,
-        this method is decorated with a class that stores the calculation
-        result of new string pairs in a database, and fetches that result
-        when the same string pair appears later on.
-        """
-
-        seq1 = np.array(list(seq1))
-        seq2 = np.array(list(seq2))
-
-        ef_len_ = (seq1 != aln.sequence_code[1]) & \
-            (seq1 != self.gap_symbol) & \
-            (seq2 != aln.sequence_code[1]) & \
-            (seq2 != self.gap_symbol)
-
-        sim_ = (seq1 == seq2) & ef_len_
-
-        sim = np.count_nonzero(sim_)
-        ef_len = np.count_nonzero(ef_len_)
-
-        return float(sim), float(ef_len)
-
     @check_data
     def sequence_similarity(self, ns=None):
         """Creates data for average sequence similarity plot.
@@ -8319,35 +9806,25 @@ class AlignmentList(Base):
             "ax_names": 2 element list with axis labels [x, y]
         """
 
-        self._get_similarity("connect")
-
         data = []
 
         self._set_pipes(ns, None, total=len(self.alignments))
         c = 1
 
-        for aln in self.alignments.values():
+        for _, taxa, sim, ef_len in self.iter_similarity():
 
             self._update_pipes(ns, None, value=c)
             c += 1
 
-            aln_similarities = []
-
-            for seq1, seq2 in itertools.combinations(aln.iter_sequences(), 2):
-
-                self._check_killswitch(ns)
-
-                sim, total_len = self._get_similarity(seq1, seq2,
-                                                      aln.locus_length,
-                                                      aln)
-
-                if total_len:
-                    aln_similarities.append(sim / total_len)
+            self._check_killswitch(ns)
 
-            if aln_similarities:
-                data.append(np.mean(aln_similarities) * 100)
+            # Pairs of taxa, in the same order as itertools.combinations
+            i, j = np.triu_indices(len(taxa), 1)
+            sim, ef_len = sim[i, j], ef_len[i, j]
+            mask = ef_len > 0
 
-        self._get_similarity("disconnect")
+            if mask.any():
+                data.append(np.mean(sim[mask] / ef_len[mask]) * 100)
 
         return {"data": data,
                 "ax_names": ["Similarity (%)", "Frequency"]}
@@ -8375,50 +9852,45 @@ class AlignmentList(Base):
         self._set_pipes(ns, None, total=len(self.alignments))
         c = 1
 
-        self._get_similarity("connect")
-
-        # Create matrix for parwise comparisons
-        data = [np.empty((len(self.taxa_names), 0)).tolist() for _ in
-                range(len(self.taxa_names))]
-
         taxa_pos = OrderedDict((x, y) for y, x in enumerate(self.taxa_names))
 
-        for aln in self.alignments.values():
+        # Sum and number of the pairwise comparisons of each species pair
+        totals = np.zeros((len(taxa_pos), len(taxa_pos)))
+        counts = np.zeros((len(taxa_pos), len(taxa_pos)))
+
+        for _, taxa, sim, ef_len in self.iter_similarity():
 
             self._update_pipes(ns, None, value=c)
             c += 1
 
-            for tx1, tx2 in itertools.combinations(taxa_pos.keys(), 2):
-
-                self._check_killswitch(ns)
+            self._check_killswitch(ns)
 
-                try:
-                    seq1, seq2 = aln.get_sequence(tx1), aln.get_sequence(tx2)
-                except KeyError:
-                    continue
+            rows, cols = self._get_pair_pos(taxa, taxa_pos)
+            sim, ef_len = sim[rows], ef_len[rows]
+            mask = ef_len > 0
 
-                sim, l = self._get_similarity(seq1, seq2, aln.locus_length,
-                                              aln)
-                if l:
-                    data[taxa_pos[tx1]][taxa_pos[tx2]].append(sim / l)
+            cols = tuple(x[mask] for x in cols)
+            totals[cols] += sim[mask] / ef_len[mask]
+            counts[cols] += 1
 
-        data = np.array([[np.mean(y) if y else 0. for y in x] for x in data])
+        data = np.where(counts, totals / np.maximum(counts, 1), 0.)
         mask = np.tri(data.shape[0], k=0)
         data = np.ma.array(data, mask=mask)
 
-        self._get_similarity("disconnect")
-
         return {"data": data,
                 "color_label": "Pairwise sequence similarity",
                 "labels": list(taxa_pos)}
 
     @check_data
-    def sequence_similarity_gene(self, gene_name, window_size, ns=None):
+    def sequence_similarity_gene(self, gene_name, window_size, ns=None,
+                                 window_step=None):
         """Creates data for sliding window sequence similarity for alignment.
 
         Retrieves an alignment using `gene_name` and calculates the
-        average pair-wise sequence similarity along the alignment length
-        using a sliding window approach.
+        pair-wise sequence similarity along the alignment length
+        using a sliding window approach. The similarity of each window is
+        the proportion of identical pairs of characters among all pairs
+        of characters without gaps or missing data in the same column.
 
         Parameters
         ----------
@@ -8429,13 +9901,16 @@ class AlignmentList(Base):
         ns : multiprocesssing.Manager.Namespace
             A Namespace object used to communicate with the main thread
             in TriFusion.
+        window_step : int, optional
+            Distance between the start of consecutive windows. Defaults to
+            `window_size`.
 
         Returns
         -------
         _ : dict
             "data": `numpy.array` with data for plotting,
 
-            "window_size": int, size of sliding window,
+            "window_size": int, distance between consecutive windows,
 
             "ax_names": 2 element list with axis labels [x, y],
 
@@ -8446,39 +9921,30 @@ class AlignmentList(Base):
 
         aln_obj = self.retrieve_alignment(gene_name)
 
-        if 0 < window_size < 1:
-            step = int(window_size * aln_obj.locus_length)
-        else:
-            step = int(window_size)
+        window, step = self._get_window(aln_obj, window_size, window_step)
 
         data = []
         
         self._set_pipes(ns, None, total=aln_obj.locus_length, ignore_sa=True)
 
-        for i in range(0, aln_obj.locus_length, step):
-
-            self._update_pipes(ns, None, value=i)
-
-            window_similarities = []
+        ntaxa, alphabet, counts = self._get_column_counts(aln_obj)
 
-            seqs = np.array([[y for y in x[i:i + step]] for x in
-                             aln_obj.iter_sequences()])
+        if ntaxa > 1:
 
-            for seq1, seq2 in itertools.combinations(seqs, 2):
+            valid = ~np.in1d(alphabet, [ord(self.gap_symbol),
+                                        ord(aln_obj.sequence_code[1]), 0])
+            counts = counts[valid].astype(np.int64)
+            nvalid = counts.sum(axis=0)
 
-                self._check_killswitch(ns)
+            # Number of identical and of comparable pairs of characters in
+            # each column
+            pairs = np.vstack([(counts * (counts - 1) // 2).sum(axis=0),
+                               nvalid * (nvalid - 1) // 2])
 
-                s, t = self._get_similarity("".join(seq1), "".join(seq2),
-                                            step, aln_obj)
-                if t:
-                    sim = s / t
-                else:
-                    sim = 0
-
-                window_similarities.append(sim * 100)
+            _, _, (identical, total) = window_sums(pairs, window, step)
 
-            if window_similarities:
-                data.append(np.mean(window_similarities))
+            data = np.where(total, identical * 100. / np.maximum(total, 1),
+                            0.).tolist()
 
         return {"data": data,
                 "title": "Sequence similarity sliding window for gene\n %s"
@@ -8525,29 +9991,17 @@ class AlignmentList(Base):
 
         data = []
 
-        prev_idx = ""
-        for column, aln_idx in self.iter_columns():
-
-            if prev_idx != aln_idx:
-                
-                if prev_idx:
-                    add_data()
-
-                self._update_pipes(ns, None, value=c)
-                c += 1
-
-                aln = self.alignment_idx[aln_idx]
+        for aln_idx, stats in self.iter_column_stats():
 
-                segregating_sites = 0
+            self._update_pipes(ns, None, value=c)
+            c += 1
 
-                prev_idx = aln_idx
+            aln = self.alignment_idx[aln_idx]
 
-            # Remove gaps and missing characters
-            column = set([x for x in column if x != aln.sequence_code[1]
-                          and x != self.gap_symbol])
+            # Variable columns, excluding gaps and missing characters
+            segregating_sites = stats.variable_sites
 
-            if len(column) > 1:
-                segregating_sites += 1
+            add_data()
 
         if proportions:
             ax_names = ["Segregating sites", "Percentage"]
@@ -8586,49 +10040,36 @@ class AlignmentList(Base):
         self._set_pipes(ns, None, total=len(self.alignments))
         c = 1
 
-        self._get_similarity("connect")
-
-        # Create matrix for parwise comparisons
-        data = [np.empty((len(self.taxa_names), 0)).tolist() for _ in
-                range(len(self.taxa_names))]
-
         taxa_pos = OrderedDict((x, y) for y, x in enumerate(self.taxa_names))
 
-        for aln in self.alignments.values():
+        # Sum and number of the pairwise comparisons of each species pair
+        totals = np.zeros((len(taxa_pos), len(taxa_pos)))
+        counts = np.zeros((len(taxa_pos), len(taxa_pos)))
+
+        for _, taxa, sim, ef_len in self.iter_similarity():
 
             self._update_pipes(ns, None, value=c)
             c += 1
 
-            for tx1, tx2 in itertools.combinations(taxa_pos.keys(), 2):
-
-                self._check_killswitch(ns)
-
-                try:
-                    seq1, seq2 = aln.get_sequence(tx1), aln.get_sequence(tx2)
-                except KeyError:
-                    continue
+            self._check_killswitch(ns)
 
-                s, t = self._get_similarity(seq1, seq2, aln.locus_length,
-                                            aln)
-                if t:
-                    aln_diff = t - s
-                else:
-                    aln_diff = 0
+            rows, cols = self._get_pair_pos(taxa, taxa_pos)
 
-                data[taxa_pos[tx1]][taxa_pos[tx2]].append(aln_diff)
+            # Pairs without an effective length have no segregating sites
+            totals[cols] += ef_len[rows] - sim[rows]
+            counts[cols] += 1
 
-        data = np.array([[np.mean(y) if y else 0. for y in x] for x in data])
+        data = np.where(counts, totals / np.maximum(counts, 1), 0.)
         mask = np.tri(data.shape[0], k=0)
         data = np.ma.array(data, mask=mask)
 
-        self._get_similarity("disconnect")
-
         return {"data": data,
                 "labels": list(taxa_pos),
                 "color_label": "Segregating sites"}
 
     @check_data
-    def sequence_segregation_gene(self, gene_name, window_size, ns=None):
+    def sequence_segregation_gene(self, gene_name, window_size, ns=None,
+                                  window_step=None):
         """Create data for a sliding window analysis of segregating sites.
 
         Retrieves an alignment using `gene_name` and calculates the
@@ -8644,13 +10085,16 @@ class AlignmentList(Base):
         ns : multiprocesssing.Manager.Namespace
             A Namespace object used to communicate with the main thread
             in TriFusion.
+        window_step : int, optional
+            Distance between the start of consecutive windows. Defaults to
+            `window_size`.
 
         Returns
         -------
         _ : dict
             "data": `numpy.array` with data for plotting,
 
-            "window_size": int, size of sliding window,
+            "window_size": int, distance between consecutive windows,
 
             "ax_names": 2 element list with axis labels [x, y],
 
@@ -8661,36 +10105,20 @@ class AlignmentList(Base):
 
         aln_obj = self.retrieve_alignment(gene_name)
 
-        if 0 < window_size < 1:
-            step = int(window_size * aln_obj.locus_length)
-        else:
-            step = int(window_size)
-
-        data = []
+        window, step = self._get_window(aln_obj, window_size, window_step)
 
         self._set_pipes(ns, None, total=aln_obj.locus_length, ignore_sa=True)
 
-        for i in range(0, aln_obj.locus_length, step):
-
-            self._update_pipes(ns, None, value=i)
-
-            segregating_sites = 0
+        _, alphabet, counts = self._get_column_counts(aln_obj)
 
-            seqs = np.array([[y for y in x[i:i + step]] for x in
-                             aln_obj.iter_sequences()])
+        valid = ~np.in1d(alphabet, [ord(self.gap_symbol),
+                                    ord(aln_obj.sequence_code[1]), 0])
 
-            for column in zip(*seqs):
+        # Columns with more than one character state
+        segregating = (counts[valid] > 0).sum(axis=0) > 1
 
-                self._check_killswitch(ns)
-
-                column = set([x for x in column
-                              if x != aln_obj.sequence_code[1]
-                              and x != "-"])
-
-                if len(column) > 1:
-                    segregating_sites += 1
-
-            data.append(segregating_sites)
+        _, _, data = window_sums(segregating, window, step)
+        data = data.tolist()
 
         return {"data": data,
                 "title": "Number of segregating sites sliding window for "
@@ -8915,18 +10343,9 @@ class AlignmentList(Base):
             "real_bin_num":
         """
 
-        self._set_pipes(ns, None, total=len(self.alignments))
-        c = 1
-
-        data = []
-
-        for aln in self.alignments.values():
-
-            self._update_pipes(ns, None, value=c)
-            c += 1
-
-            # Get number of taxa
-            data.append(len(aln.taxa_idx))
+        # Get number of taxa of each alignment
+        data = self.taxa_presence.count_taxa(
+            self._get_presence_idx()).tolist()
 
         return {"data": data,
                 "title": "Distribution of taxa frequency",
@@ -9216,36 +10635,15 @@ class AlignmentList(Base):
         data_points = []
         data_labels = []
 
-        prev_idx = ""
-        for column, aln_idx in self.iter_columns():
-
-            if prev_idx != aln_idx:
-
-                if prev_idx:
-                    # Get proportion of segregating sites for current alignment
-                    data_points.append(float(segregating_sites) /
-                                       float(aln.locus_length))
-                    data_labels.append(aln.name)
-
-                self._update_pipes(ns, None, value=c)
-                c += 1
-
-                aln = self.alignment_idx[aln_idx]
-
-                missing_symbols = [aln.sequence_code[1], self.gap_symbol]
-
-                segregating_sites = 0
-                
-                prev_idx = aln_idx
+        for aln_idx, stats in self.iter_column_stats():
 
-            column = list(x for x in set(column) if x not in missing_symbols)
+            self._update_pipes(ns, None, value=c)
+            c += 1
 
-            if len(column) > 1:
-                segregating_sites += 1
+            aln = self.alignment_idx[aln_idx]
 
-        if prev_idx:
             # Get proportion of segregating sites for current alignment
-            data_points.append(float(segregating_sites) /
+            data_points.append(float(stats.variable_sites) /
                                float(aln.locus_length))
             data_labels.append(aln.name)
 
@@ -9294,55 +10692,41 @@ class AlignmentList(Base):
         self._set_pipes(ns, None, total=len(self.alignments))
         c = 1
 
-        self._get_similarity("connect")
+        taxa_pos = OrderedDict((x, y) for y, x in enumerate(self.taxa_names))
 
-        data = OrderedDict((tx, []) for tx in self.taxa_names)
+        # Sum and number of the pairwise comparisons of each taxon
+        totals = np.zeros(len(taxa_pos))
+        counts = np.zeros(len(taxa_pos))
 
-        for aln in self.alignments.values():
+        for _, taxa, sim, ef_len in self.iter_similarity():
 
             self._update_pipes(ns, None, value=c)
             c += 1
 
-            for tx1, tx2 in itertools.combinations(data.keys(), 2):
-
-                self._check_killswitch(ns)
-
-                try:
-                    seq1, seq2 = aln.get_sequence(tx1), aln.get_sequence(tx2)
-                except KeyError:
-                    continue
-
-                s, t_len = self._get_similarity(seq1, seq2, aln.locus_length,
-                                                aln)
-
-                if t_len:
-                    s_data = (t_len - s) / t_len
-                else:
-                    s_data = 0
+            self._check_killswitch(ns)
 
-                data[tx1].append(s_data)
-                data[tx2].append(s_data)
+            rows, cols = self._get_pair_pos(taxa, taxa_pos)
+            sim, ef_len = sim[rows], ef_len[rows]
 
-        for tx, vals in data.items():
-            data[tx] = np.mean(vals)
+            s_data = np.zeros(ef_len.size)
+            mask = ef_len > 0
+            s_data[mask] = (ef_len[mask] - sim[mask]) / ef_len[mask]
 
-        # Prepara data for plotting
-        data_points = []
-        data_labels = []
-        for tx, vals in data.items():
-            data_points.append(vals)
-            data_labels.append(tx)
+            for pos in cols:
+                totals += np.bincount(pos, s_data, minlength=len(taxa_pos))
+                counts += np.bincount(pos, minlength=len(taxa_pos))
 
-        data_points = np.asarray(data_points)
-        data_labels = np.asarray(data_labels)
+        # Prepara data for plotting. Taxa without comparisons have no
+        # defined value
+        data_points = np.full(len(taxa_pos), np.nan)
+        np.divide(totals, counts, out=data_points, where=counts > 0)
+        data_labels = np.asarray(list(taxa_pos))
 
         # Get outliers
         outliers_points = data_points[self._mad_based_outlier(data_points)]
         # Get outlier taxa
         outlier_labels = list(data_labels[self._mad_based_outlier(data_points)])
 
-        self._get_similarity("disconnect")
-
         return {"data": data_points,
                 "title": "Sequence variation outlier taxa detection",
                 "outliers": outliers_points,
@@ -2,16 +2,25 @@
 # -*- coding: utf-8 -*-
 
 import os
+import json
 import shutil
+import sqlite3
+import threading
 import unittest
 from os.path import join
 from collections import OrderedDict
 from data_files import *
 
 try:
-    from process.sequence import AlignmentList, Alignment
+    from process.sequence import AlignmentList, Alignment, lock
+    from process.cache import ParseCache
+    from process.error_handling import InputError
+    from process.project import HEADER, MAGIC, VERSION
 except ImportError:
-    from trifusion.process.sequence import AlignmentList, Alignment
+    from trifusion.process.sequence import AlignmentList, Alignment, lock
+    from trifusion.process.cache import ParseCache
+    from trifusion.process.error_handling import InputError
+    from trifusion.process.project import HEADER, MAGIC, VERSION
 
 temp_dir = ".temp"
 sql_db = ".temp/sequencedb"
@@ -251,6 +260,111 @@ class LoadAlignmentsTest(unittest.TestCase):
 
         self.assertEqual(len(non_ascii_tx), 1)
 
+    def test_load_batch_size(self):
+
+        self.aln_obj = AlignmentList(dna_data_fas, sql_db=sql_db,
+                                     batch_size=1)
+        aln_obj = AlignmentList(dna_data_fas, sql_db=sql_db + "2")
+
+        s = list(aln_obj.iter_alignments())
+        aln_obj.clear_alignments()
+        aln_obj.con.close()
+
+        self.assertEqual(list(self.aln_obj.iter_alignments()), s)
+
+    def test_load_parallel(self):
+
+        files = dna_data_fas[:3] + bad_file + dna_data_fas[3:]
+        self.aln_obj = AlignmentList(files, sql_db=sql_db, workers=2)
+        aln_obj = AlignmentList(files, sql_db=sql_db + "2")
+
+        s = [list(aln_obj.iter_alignments()), aln_obj.alignment_idx.keys(),
+             aln_obj.bad_alignments]
+        aln_obj.clear_alignments()
+        aln_obj.con.close()
+
+        self.assertEqual([list(self.aln_obj.iter_alignments()),
+                          self.aln_obj.alignment_idx.keys(),
+                          self.aln_obj.bad_alignments], s)
+
+    def test_load_cache(self):
+
+        cache_dir = join(temp_dir, "cache")
+        files = dna_data_fas[:3] + bad_file + dna_data_fas[3:]
+
+        aln_obj = AlignmentList(files, sql_db=sql_db + "2",
+                                cache_dir=cache_dir)
+        s = [list(aln_obj.iter_alignments()), aln_obj.bad_alignments]
+        aln_obj.clear_alignments()
+        aln_obj.con.close()
+
+        self.aln_obj = AlignmentList(files, sql_db=sql_db,
+                                     cache_dir=cache_dir)
+
+        self.assertEqual([list(self.aln_obj.iter_alignments()),
+                          self.aln_obj.bad_alignments,
+                          len(self.aln_obj.parse_cache.entries)],
+                         s + [len(files)])
+
+    def test_load_cache_small(self):
+
+        cache_dir = join(temp_dir, "cache")
+        files = dna_data_fas[:4]
+
+        aln_obj = AlignmentList(files[:2], sql_db=sql_db + "2",
+                                cache_dir=cache_dir)
+        aln_obj.clear_alignments()
+        aln_obj.con.close()
+
+        aln_obj = AlignmentList(files, sql_db=sql_db + "3")
+        s = [list(aln_obj.iter_alignments()), aln_obj.alignment_idx.keys()]
+        aln_obj.clear_alignments()
+        aln_obj.con.close()
+
+        # Storing the entries of the parsed files would evict the entries
+        # of the cached ones
+        self.aln_obj = AlignmentList([], sql_db=sql_db, cache_dir=cache_dir)
+        self.aln_obj.parse_cache.max_size = 1
+        self.aln_obj.add_alignment_files(list(files), workers=2)
+
+        self.assertEqual([list(self.aln_obj.iter_alignments()),
+                          self.aln_obj.alignment_idx.keys(),
+                          len(self.aln_obj.parse_cache.entries)],
+                         s + [4])
+
+    def test_cache_eviction(self):
+
+        cache = ParseCache(join(temp_dir, "cache"), max_size=1600)
+
+        for i in range(3):
+            cache.set(str(i), "x" * 500)
+        cache.get("0")
+        cache.set("3", "x" * 500, keep=["1"])
+
+        self.assertEqual([cache.entries.keys(), cache.get("2")],
+                         [["1", "0", "3"], None])
+
+    def test_cache_eviction_lru(self):
+
+        cache = ParseCache(join(temp_dir, "cache"), max_size=1600)
+
+        for i in range(3):
+            cache.set(str(i), "x" * 500)
+        cache.get("0")
+        cache.set("3", "x" * 500)
+
+        self.assertEqual([cache.entries.keys(), cache.get("1")],
+                         [["2", "0", "3"], None])
+
+    def test_load_interleave_phy_rows(self):
+
+        self.aln_obj = AlignmentList(phylip_interleave, sql_db=sql_db)
+
+        n = self.aln_obj.cur.execute(
+            "SELECT COUNT(*) FROM alignment_data").fetchone()[0]
+
+        self.assertEqual(n, len(self.aln_obj.taxa_names))
+
 
 class AlignmentManipulationTest(unittest.TestCase):
 
@@ -279,7 +393,158 @@ class AlignmentManipulationTest(unittest.TestCase):
                                                          "locus_length",
                                                          "partitions",
                                                          "cur",
-                                                         "con"]))
+                                                         "con",
+                                                         "db"]))
+
+    def test_reader_connections(self):
+
+        cons = []
+
+        t = threading.Thread(target=lambda: cons.append(
+            self.aln_obj.db.reader()))
+        t.start()
+        t.join()
+
+        cons.extend([self.aln_obj.db.reader(), self.aln_obj.db.reader()])
+        mode = self.aln_obj.cur.execute("PRAGMA journal_mode").fetchone()[0]
+
+        self.assertEqual([cons[0] is cons[1], cons[1] is cons[2],
+                          self.aln_obj.con in cons, mode],
+                         [False, True, False, "wal"])
+
+    def test_reader_finished_threads(self):
+
+        cons = []
+
+        for _ in range(4):
+            t = threading.Thread(target=lambda: cons.append(
+                self.aln_obj.db.reader()))
+            t.start()
+            t.join()
+
+        closed = 0
+        for con in cons:
+            try:
+                con.execute("SELECT 1")
+            except sqlite3.ProgrammingError:
+                closed += 1
+
+        # Each new thread closes the connections of the previous ones
+        self.assertEqual([closed, len(self.aln_obj.db._readers) <= 2],
+                         [3, True])
+
+    def test_reader_no_commit(self):
+
+        db = self.aln_obj.db
+        query = "SELECT COUNT(*) FROM alignment_data"
+        total = db.reader().execute(query).fetchone()[0]
+
+        db.begin()
+        self.aln_obj.cur.execute(
+            "INSERT INTO alignment_data VALUES (0, 'test', 'acgt', 0)")
+
+        # Reading does not commit the write operation in progress
+        counts = [db.reader().execute(query).fetchone()[0],
+                  db.reader().execute(query).fetchone()[0]]
+
+        db.end()
+        counts.append(db.reader().execute(query).fetchone()[0])
+
+        self.assertEqual(counts, [total, total, total + 1])
+
+    def test_write_during_read(self):
+
+        def write():
+            with lock:
+                cur = self.aln_obj.con.cursor()
+                cur.execute("CREATE TABLE test_write(val INT)")
+                cur.execute("INSERT INTO test_write VALUES (1)")
+                self.aln_obj.con.commit()
+
+        rows = self.aln_obj.iter_alignments()
+        n = len([next(rows)])
+
+        # The open query of the generator does not block the writer
+        t = threading.Thread(target=write)
+        t.start()
+        t.join(10)
+        alive = t.is_alive()
+
+        n += len(list(rows))
+        total = self.aln_obj.cur.execute(
+            "SELECT COUNT(*) FROM alignment_data").fetchone()[0]
+
+        self.assertEqual([alive, n], [False, total])
+
+    def test_project_roundtrip(self):
+
+        def get_state():
+            return [sorted(self.aln_obj.iter_alignments()),
+                    self.aln_obj.taxa_names,
+                    list(self.aln_obj.alignments),
+                    list(self.aln_obj.all_alignments),
+                    self.aln_obj.partitions.partitions,
+                    [(x.taxa_idx, x.partitions.partitions, x.locus_length)
+                     for x in self.aln_obj.all_alignments.values()]]
+
+        self.aln_obj.update_taxa_names(self.aln_obj.taxa_names[2:])
+        self.aln_obj.update_active_alignments(
+            list(self.aln_obj.alignments)[1:])
+        data = get_state()
+
+        project = join(temp_dir, "project.tfp")
+        self.aln_obj.save_project(project)
+        self.aln_obj.clear_alignments()
+        self.aln_obj.open_project(project)
+
+        self.assertEqual(get_state(), data)
+
+    def test_project_temp_file(self):
+
+        project = join(temp_dir, "project.tfp")
+        self.aln_obj.save_project(project)
+        self.aln_obj.save_project(project)
+
+        self.assertEqual([x for x in os.listdir(temp_dir)
+                          if x.endswith(".tmp")], [])
+
+    def test_project_bad_file(self):
+
+        project = join(temp_dir, "project.tfp")
+        with open(project, "wb") as fh:
+            fh.write("not a project file" * 4)
+
+        self.assertRaises(InputError, self.aln_obj.open_project, project)
+
+    def test_project_tampered_metadata(self):
+
+        project = join(temp_dir, "project.tfp")
+        self.aln_obj.save_project(project)
+
+        with open(project, "rb") as fh:
+            data = fh.read()
+
+        meta_offset, meta_length = HEADER.unpack(data[:HEADER.size])[2:]
+        metadata = json.loads(data[meta_offset:meta_offset + meta_length])
+
+        for field in [
+                "__import__('os').mkdir('pwned') or {}",
+                {"partitions": {"set": [1]}},
+                dict(metadata["partitions"], counter="1")]:
+
+            metadata["partitions"] = field
+            meta_data = json.dumps(metadata)
+
+            with open(project, "wb") as fh:
+                fh.write(HEADER.pack(MAGIC, VERSION, meta_offset,
+                                     len(meta_data)))
+                fh.write(data[HEADER.size:meta_offset])
+                fh.write(meta_data)
+
+            self.assertRaises(InputError, self.aln_obj.open_project, project)
+
+        self.assertFalse(os.path.exists("pwned"))
+        self.assertEqual(len(self.aln_obj.alignments), 7)
 
     def test_update_act_anls(self):
 
@@ -422,6 +687,18 @@ class AlignmentManipulationTest(unittest.TestCase):
 
         self.assertEqual(len(self.aln_obj.alignments), 1)
 
+    def test_concatenation_shelved_taxa(self):
+
+        self.aln_obj.update_taxa_names(self.aln_obj.taxa_names[2:])
+        self.aln_obj.concatenate()
+
+        lengths = set(len(seq) for _, seq, _ in
+                      self.aln_obj.iter_alignments())
+
+        self.assertEqual([lengths, os.path.exists(
+            join(temp_dir, ".concatenation.npy"))],
+                         [{self.aln_obj.partitions.counter}, False])
+
 
 class LoadBadAlignmentsTest(unittest.TestCase):
 
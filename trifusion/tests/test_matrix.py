@@ -0,0 +1,559 @@
+#!/usr/bin/python2
+
+import os
+import shutil
+import unittest
+import numpy as np
+from data_files import *
+
+try:
+    from process.sequence import AlignmentList
+    from process.matrix import encode_sequences, decode_sequence, \
+        column_stats, iter_row_lines, ColumnBlocks, pairwise_similarity, \
+        column_counts, window_sums, dna_codec, protein_codec, \
+        CompressedMatrix, TaxaPresence, count_sites, pack_sequence, \
+        unpack_sequence, join_packed_sequences
+    from process.error_handling import *
+except ImportError:
+    from trifusion.process.sequence import AlignmentList
+    from trifusion.process.matrix import encode_sequences, \
+        decode_sequence, column_stats, iter_row_lines, ColumnBlocks, \
+        pairwise_similarity, column_counts, window_sums, dna_codec, \
+        protein_codec, CompressedMatrix, TaxaPresence, count_sites, \
+        pack_sequence, unpack_sequence, join_packed_sequences
+    from trifusion.process.error_handling import *
+
+temp_dir = ".temp"
+sql_db = ".temp/sequencedb"
+
+
+class MatrixStoreTest(unittest.TestCase):
+
+    def setUp(self):
+
+        if not os.path.exists(temp_dir):
+            os.makedirs(temp_dir)
+
+        self.aln_obj = AlignmentList(dna_data_fas, sql_db=sql_db,
+                                     backend="matrix")
+        self.sql_obj = AlignmentList(dna_data_fas, sql_db=sql_db + "2")
+
+    def tearDown(self):
+
+        for obj in [self.aln_obj, self.sql_obj]:
+            obj.clear_alignments()
+            obj.con.close()
+        shutil.rmtree(temp_dir)
+
+    def test_encode_decode(self):
+
+        m = encode_sequences(["acgt", "ac-n"])
+
+        self.assertEqual([m.shape, decode_sequence(m[1])],
+                         [(2, 4), "ac-n"])
+
+    def test_column_stats(self):
+
+        m = encode_sequences(["aaca-n", "aacg-n", "tcca-n", "tcgn-a"])
+        stats = column_stats(m, "-", "n", block_size=8)
+
+        self.assertEqual([list(stats.gaps), list(stats.missing),
+                          list(stats.states), list(stats.inf_states)],
+                         [[0, 0, 0, 0, 4, 0], [0, 0, 0, 1, 0, 3],
+                          [2, 2, 2, 2, 0, 1], [2, 2, 1, 1, 0, 0]])
+
+    def test_column_stats_cache(self):
+
+        s1 = list(self.sql_obj.iter_column_stats())
+        s2 = list(self.sql_obj.iter_column_stats())
+
+        self.assertTrue(all(x[1] is y[1] for x, y in zip(s1, s2)))
+
+    def test_column_stats_backends(self):
+
+        s1 = [(x, y.variable_sites, y.informative_sites) for x, y in
+              self.aln_obj.iter_column_stats()]
+        s2 = [(x, y.variable_sites, y.informative_sites) for x, y in
+              self.sql_obj.iter_column_stats()]
+
+        self.assertEqual(s1, s2)
+
+    def test_count_sites(self):
+
+        m = encode_sequences(["aaccgt-n", "acccga-n", "acgcgtaa",
+                              "acgcgaaa"])
+
+        # With block_size=4, each block has a single column
+        self.assertEqual(
+            [count_sites(m), count_sites(m, informative=True),
+             count_sites(m, block_size=4),
+             count_sites(m, limit=1, block_size=4),
+             count_sites(m, informative=True, limit=0, block_size=4)],
+            [3, 2, 3, 2, 1])
+
+    def test_pairwise_similarity(self):
+
+        m = encode_sequences(["aaca-n", "aacg-n", "tcca-n", "tcgn-a"])
+        sim, ef_len = pairwise_similarity(m, "-", "n", block_size=8)
+
+        self.assertEqual([sim.tolist(), ef_len.tolist()],
+                         [[[4, 3, 2, 0], [3, 4, 1, 0], [2, 1, 4, 2],
+                           [0, 0, 2, 4]],
+                          [[4, 4, 4, 3], [4, 4, 4, 3], [4, 4, 4, 3],
+                           [3, 3, 3, 4]]])
+
+    def test_column_counts(self):
+
+        m = encode_sequences(["aaca-n", "aacg-n", "tcca-n", "tcgn-a"])
+        alphabet, counts = column_counts(m, block_size=8)
+
+        self.assertEqual([alphabet.tostring(), counts.tolist()],
+                         ["-acgnt", [[0, 0, 0, 0, 4, 0], [2, 2, 0, 2, 0, 1],
+                                     [0, 2, 3, 0, 0, 0], [0, 0, 1, 1, 0, 0],
+                                     [0, 0, 0, 1, 0, 3], [2, 0, 0, 0, 0, 0]]])
+
+    def test_window_sums(self):
+
+        starts, ends, sums = window_sums(np.arange(7), 3, 2)
+
+        self.assertEqual([starts.tolist(), ends.tolist(), sums.tolist()],
+                         [[0, 2, 4, 6], [3, 5, 7, 7], [3, 9, 15, 6]])
+
+    def test_similarity_backends(self):
+
+        s1 = [(x, y, z.tolist(), w.tolist()) for x, y, z, w in
+              self.aln_obj.iter_similarity()]
+        s2 = [(x, y, z.tolist(), w.tolist()) for x, y, z, w in
+              self.sql_obj.iter_similarity()]
+
+        self.assertEqual(s1, s2)
+
+    def test_get_matrix_backends(self):
+
+        for aln1, aln2 in zip(self.aln_obj.alignments.values(),
+                              self.sql_obj.alignments.values()):
+            m1, m2 = aln1.get_matrix(), aln2.get_matrix()
+            self.assertEqual([m1.taxa, m1.matrix.tolist()],
+                             [m2.taxa, m2.matrix.tolist()])
+
+    def test_master_index(self):
+
+        self.sql_obj.filter_missing_data(25, 50, use_main_table=True)
+
+        cols = [x[2] for x in self.sql_obj.cur.execute(
+            "PRAGMA index_info(main_idx)")]
+
+        self.assertEqual(cols, ["aln_idx", "txId"])
+
+    def test_invalid_backend(self):
+
+        self.assertRaises(ArgumentError, AlignmentList, [],
+                          sql_db=sql_db + "3", backend="foo")
+
+    def test_iter_alignments(self):
+
+        self.assertEqual(list(self.aln_obj.iter_alignments()),
+                         list(self.sql_obj.iter_alignments()))
+
+    def test_iter_columns(self):
+
+        self.assertEqual(list(self.aln_obj.iter_columns()),
+                         list(self.sql_obj.iter_columns()))
+
+    def test_get_sequence(self):
+
+        aln = self.aln_obj.alignments.values()[0]
+        sql_aln = self.sql_obj.alignments.values()[0]
+
+        self.assertEqual(aln.get_sequence("130a_RAD_original"),
+                         sql_aln.get_sequence("130a_RAD_original"))
+
+    def test_shelved_taxa(self):
+
+        taxa = ["1285_RAD_original", "130a_RAD_original"]
+
+        self.aln_obj.update_taxa_names(taxa)
+        self.sql_obj.update_taxa_names(taxa)
+
+        self.assertEqual(list(self.aln_obj.iter_columns()),
+                         list(self.sql_obj.iter_columns()))
+
+    def test_shelved_taxa_quotes(self):
+
+        fh = os.path.join(temp_dir, "quotes.fas")
+        with open(fh, "w") as f:
+            f.write(">sp'a\nacgt\n>spb\naggt\n>spc\nacgn\n")
+
+        aln = AlignmentList([fh], sql_db=sql_db + "3")
+
+        try:
+            aln.update_taxa_names(["spb", "spc"])
+            s = [list(aln.iter_columns()),
+                 [x[0] for x in aln.iter_alignments()]]
+
+            aln.update_taxa_names(["sp'a", "spc"])
+            s.append(sorted(x[0] for x in aln.iter_alignments()))
+
+            aln.update_taxa_names(all_taxa=True)
+            s.append(len(list(aln.iter_alignments())))
+        finally:
+            aln.clear_alignments()
+            aln.con.close()
+
+        self.assertEqual(s, [[(("a", "a"), 1), (("g", "c"), 1),
+                              (("g", "g"), 1), (("t", "n"), 1)],
+                             ["spb", "spc"], ["sp'a", "spc"], 3])
+
+    def test_store_invalidation(self):
+
+        self.aln_obj.remove_taxa(["1285_RAD_original"])
+        self.sql_obj.remove_taxa(["1285_RAD_original"])
+
+        self.assertEqual(list(self.aln_obj.iter_alignments()),
+                         list(self.sql_obj.iter_alignments()))
+
+    def test_store_tracked_changes(self):
+
+        alns = self.aln_obj.alignments.values()
+        tx = alns[0].taxa_idx.keys()[0]
+        before = [aln.get_matrix() for aln in alns]
+
+        # Changes to other tables keep all matrices
+        self.aln_obj.cur.execute("UPDATE aux SET partitions=partitions")
+        s = [aln.get_matrix() is m for aln, m in zip(alns, before)]
+
+        # Changes to a single alignment only discard its matrix
+        alns[0].change_taxon_name(tx, "new_taxon")
+        s.extend(aln.get_matrix() is m for aln, m in zip(alns, before))
+
+        self.assertEqual(
+            [s, "new_taxon" in alns[0].get_matrix().taxa,
+             tx in alns[0].get_matrix().taxa],
+            [[True] * len(alns) + [False] + [True] * (len(alns) - 1),
+             True, False])
+
+    def test_iter_matrices(self):
+
+        s = [(idx, len(taxa), m.shape[1]) for idx, taxa, m in
+             self.sql_obj.iter_matrices()]
+
+        self.assertEqual(s, [(1, 24, 85), (2, 20, 85), (3, 20, 85),
+                             (4, 20, 85), (5, 20, 85), (6, 4, 85),
+                             (7, 4, 85)])
+
+    def test_sequence_codec(self):
+
+        dna = encode_sequences(["acgtn-rykmswbdhva", "aaaaaaaaaaaaaaaac"])
+        prot = encode_sequences(["mkv*x-?", "acdefgh"])
+
+        p = [dna_codec.encode(dna), protein_codec.encode(prot)]
+
+        self.assertEqual(
+            [p[0].shape, p[1].shape,
+             decode_sequence(dna_codec.decode(p[0], 17)[0]),
+             decode_sequence(protein_codec.decode(p[1], 7)[0]),
+             list(dna_codec.codes(p[0], 17)[1, -2:]),
+             dna_codec.encode(prot)],
+            [(2, 9), (2, 5), "acgtn-rykmswbdhva", "mkv*x-?", [1, 2], None])
+
+    def test_packed_backend(self):
+
+        aln_obj = AlignmentList(dna_data_fas, sql_db=sql_db + "5",
+                                backend="packed")
+
+        aln = aln_obj.alignments.values()[0]
+        s = [list(aln_obj.iter_alignments()),
+             aln.get_sequence("1285_RAD_original"),
+             aln_obj.get_summary_stats()]
+        aln_obj.clear_alignments()
+        aln_obj.con.close()
+
+        aln = self.sql_obj.alignments.values()[0]
+        self.assertEqual(s, [list(self.sql_obj.iter_alignments()),
+                             aln.get_sequence("1285_RAD_original"),
+                             self.sql_obj.get_summary_stats()])
+
+    def test_pack_sequence(self):
+
+        seqs = ["acgtn-ac", "mkv*x-?", "acgt01", u"acgt", "acgtn-ag"]
+        packed = [pack_sequence(x) for x in seqs]
+        codec, nsites, m = join_packed_sequences([packed[0], packed[4]])
+
+        self.assertEqual(
+            [[type(x).__name__ for x in packed],
+             [unpack_sequence(x) for x in packed],
+             unpack_sequence(pack_sequence("acgtn-ac", "zlib")),
+             [codec is dna_codec, nsites, m.shape],
+             join_packed_sequences(packed[:2]), pack_sequence("")],
+            [["buffer", "buffer", "str", "buffer", "buffer"], seqs,
+             "acgtn-ac", [True, 8, (2, 4)], None, ""])
+
+    def database_sizes(self, backend):
+        """Loads a large alignment with `backend` and with "sql", and
+        returns the size of both databases, the types of the stored
+        sequences and the data read from each database."""
+
+        # Alignment large enough for the sequences to dominate the size
+        # of the database
+        path = os.path.join(temp_dir, "large.fas")
+        rng = np.random.RandomState(0)
+        with open(path, "w") as fh:
+            for i in xrange(50):
+                fh.write(">taxon{}\n{}\n".format(i, "".join(
+                    rng.choice(list("acgtn-"), 4000))))
+
+        aln_obj = AlignmentList([path], sql_db=sql_db + backend,
+                                backend=backend)
+        sql_obj = AlignmentList([path], sql_db=sql_db + "sql")
+
+        sizes = []
+        for obj in [aln_obj, sql_obj]:
+            obj.con.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            sizes.append(sum(os.path.getsize(obj.sql_path + x)
+                             for x in ["", "-wal"]
+                             if os.path.exists(obj.sql_path + x)))
+
+        types = aln_obj.cur.execute(
+            "SELECT DISTINCT typeof(seq) FROM alignment_data").fetchall()
+
+        # The stored rows are also decoded when they are read without
+        # the matrix store
+        aln_obj.matrix_store = None
+        for aln in aln_obj.alignments.values():
+            aln.matrix_store = None
+
+        s = []
+        for obj in [aln_obj, sql_obj]:
+            s.append([list(obj.iter_alignments()),
+                      obj.alignments.values()[0].get_sequence("taxon7"),
+                      [(i, t, np.hstack(list(b)).tolist()) for i, t, b in
+                       obj.iter_column_blocks(block_size=2000)],
+                      list(obj.iter_columns())])
+            obj.clear_alignments()
+            obj.con.close()
+
+        return sizes, types, s
+
+    def test_packed_database(self):
+
+        sizes, types, s = self.database_sizes("packed")
+
+        self.assertEqual([sizes[0] < sizes[1] * 0.6, types, s[0]],
+                         [True, [(u"blob",)], s[1]])
+
+    def test_compressed_database(self):
+
+        sizes, types, s = self.database_sizes("compressed")
+
+        self.assertEqual([sizes[0] < sizes[1] * 0.6, types, s[0]],
+                         [True, [(u"blob",)], s[1]])
+
+    def test_compressed_matrix(self):
+
+        m = encode_sequences(["acgtnacgtnacg", "--gtnacgtnaaa",
+                              "acgtnacgtnacc"])
+        c = CompressedMatrix([0, 1, 2], ["a", "b", "c"], m, "bz2",
+                             block_size=12, block_rows=2)
+
+        # Records the row group of each decompressed block
+        groups = []
+        get_block = c._get_block
+        c._get_block = lambda g, i: groups.append(g) or get_block(g, i)
+
+        self.assertEqual(
+            [[len(x) for x in c.blocks], list(c.row_offsets),
+             list(c.offsets), c.get_sequence("c"), groups[:],
+             (c.matrix == m).all(), c.get_sequence("b"),
+             [decode_sequence(x) for x in c.get_columns(3, 9, ["b"])],
+             [decode_sequence(x) for x in c.get_columns(0, 4, ["a", "b"])],
+             groups[-1], c.get_columns(20, 30).shape,
+             [x[1] for x in c.iter_rows(["a"])]],
+            [[3, 3], [0, 2, 3], [0, 6, 12, 13], "acgtnacgtnacc", [1, 1, 1],
+             True, "--gtnacgtnaaa", ["tnacgt", "tnacgt"], ["acgt"], 1,
+             (3, 0), ["b", "c"]])
+
+    def test_compressed_backend(self):
+
+        aln_obj = AlignmentList(dna_data_fas, sql_db=sql_db + "6",
+                                backend="compressed")
+        aln_obj.update_taxa_names(aln_obj.taxa_names[2:])
+        self.sql_obj.update_taxa_names(self.sql_obj.taxa_names[2:])
+
+        # The number of columns of each block depends on the backend, so
+        # the blocks of each alignment are joined
+        s = [[(idx, taxa, np.hstack(list(blocks)).tolist())
+              for idx, taxa, blocks in obj.iter_column_blocks(block_size=200)]
+             for obj in [aln_obj, self.sql_obj]]
+        s.append(list(aln_obj.iter_alignments()))
+        aln_obj.clear_alignments()
+        aln_obj.con.close()
+
+        self.assertEqual(s[:2] + [s[2]],
+                         [s[1], s[1], list(self.sql_obj.iter_alignments())])
+
+    def test_taxa_presence(self):
+
+        p = TaxaPresence()
+        p.add(1, ["a", "b", "c"])
+        p.add(2, ["b", "d"])
+        p.add(3, ["a", "d"])
+        p.rename("d", "e", [2])
+        p.discard_taxa(["a"], [3])
+        idx = [1, 2, 3]
+
+        self.assertEqual(
+            [p.get_matrix(idx, ["a", "e", "x"]).astype(int).tolist(),
+             p.count_taxa(idx).tolist(),
+             p.count_taxa(idx, exclude=["b"]).tolist(),
+             p.count_alignments(idx, ["b", "d"]).tolist(),
+             p.contain_all(idx, ["b", "e"]).tolist(),
+             p.contain_any(idx, ["c", "d"]).tolist(),
+             p.contain_at_least(idx, ["a", "b", "c", "e"], 2).tolist(),
+             p.contain_all(idx, ["b"], exclude=["b"]).tolist()],
+            [[[1, 0, 0], [0, 1, 0], [0, 0, 0]],
+             [3, 2, 1],
+             [2, 1, 1],
+             [2, 1],
+             [False, True, False],
+             [True, False, True],
+             [True, True, False],
+             [False, False, False]])
+
+    def test_taxa_presence_updates(self):
+
+        obj = self.sql_obj
+        obj.remove_taxa(obj.taxa_names[:2])
+        obj.change_taxon_name(obj.taxa_names[0], "renamed")
+        obj.remove_file([list(obj.alignments)[0]])
+
+        taxa = obj.taxa_names + ["missing"]
+        data = [[x in aln.taxa_idx for aln in obj.alignments.values()]
+                for x in taxa]
+
+        self.assertEqual(obj.taxa_presence.get_matrix(
+            obj._get_presence_idx(), taxa).tolist(), data)
+
+    def test_memmap_backend(self):
+
+        aln_obj = AlignmentList(dna_data_fas, sql_db=sql_db + "4",
+                                backend="memmap")
+
+        s = list(aln_obj.iter_alignments())
+        aln_obj.clear_alignments()
+        aln_obj.con.close()
+
+        self.assertEqual(s, list(self.sql_obj.iter_alignments()))
+
+    def open_project(self):
+
+        project = os.path.join(temp_dir, "project.tfp")
+        self.sql_obj.save_project(project)
+
+        self.aln_obj.clear_alignments()
+        self.aln_obj.open_project(project)
+
+    def count_rows(self):
+
+        return self.aln_obj.cur.execute(
+            "SELECT COUNT(*) FROM alignment_data").fetchone()[0]
+
+    def test_project_sources(self):
+
+        self.open_project()
+
+        s = [list(self.aln_obj.iter_alignments()),
+             self.aln_obj.alignments.values()[0].get_sequence(
+                 "130a_RAD_original"),
+             [(x, y, z.tolist(), w.tolist()) for x, y, z, w in
+              self.aln_obj.iter_similarity()]]
+
+        self.assertEqual(s, [list(self.sql_obj.iter_alignments()),
+                             self.sql_obj.alignments.values()[0].get_sequence(
+                                 "130a_RAD_original"),
+                             [(x, y, z.tolist(), w.tolist()) for x, y, z, w
+                              in self.sql_obj.iter_similarity()]])
+        self.assertEqual(
+            [self.count_rows(),
+             len(self.aln_obj.matrix_store.get_sources("alignment_data"))],
+            [0, 7])
+
+    def test_project_sources_modified(self):
+
+        self.open_project()
+
+        taxa = self.sql_obj.taxa_names[:3]
+        self.aln_obj.remove_taxa(taxa)
+        self.sql_obj.remove_taxa(taxa)
+
+        self.assertEqual(
+            [sorted(self.aln_obj.iter_alignments()),
+             self.aln_obj.matrix_store.get_sources("alignment_data")],
+            [sorted(self.sql_obj.iter_alignments()), []])
+        self.assertNotEqual(self.count_rows(), 0)
+
+    def test_project_sources_removed(self):
+
+        self.open_project()
+
+        self.aln_obj.remove_file([list(self.aln_obj.alignments)[0]])
+        n = len(self.aln_obj.matrix_store.get_sources("alignment_data"))
+        self.aln_obj.clear_alignments()
+
+        self.assertEqual([n, self.aln_obj.matrix_store.sources], [6, {}])
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+
+class ColumnBlocksTest(unittest.TestCase):
+
+    def setUp(self):
+
+        if not os.path.exists(temp_dir):
+            os.makedirs(temp_dir)
+
+        self.seqs = ["acgtnacgtnacg", "--gtnacgtnaaa", "acgtnacgtnacc"]
+        matrix = encode_sequences(self.seqs)
+        self.blocks = [matrix[:, i:i + 5] for i in range(0, 13, 5)]
+
+    def tearDown(self):
+
+        shutil.rmtree(temp_dir)
+
+    def test_iter_row_lines(self):
+
+        self.assertEqual(list(iter_row_lines(["acg", "tnacg", "t"], 4)),
+                         ["acgt", "nacg", "t"])
+        self.assertEqual(list(iter_row_lines(["acg", "t"], 2)),
+                         ["ac", "gt"])
+        self.assertEqual(list(iter_row_lines([], 2)), [""])
+
+    def test_single_block(self):
+
+        with ColumnBlocks(self.blocks[:1], temp_dir) as blocks:
+            self.assertIsNone(blocks.path)
+            self.assertEqual(list(blocks.iter_row(1)), ["--gtn"])
+
+    def test_spilled_blocks(self):
+
+        with ColumnBlocks(iter(self.blocks), temp_dir) as blocks:
+            self.assertTrue(os.path.exists(blocks.path))
+            for i, seq in enumerate(self.seqs):
+                self.assertEqual("".join(blocks.iter_row(i)), seq)
+                # Rows can be read more than once
+                self.assertEqual("".join(blocks.iter_row(i)), seq)
+
+        self.assertEqual(os.listdir(temp_dir), [])
+
+    def test_iter_blocks(self):
+
+        with ColumnBlocks(iter(self.blocks), temp_dir) as blocks:
+            for _ in range(2):
+                for b1, b2 in zip(blocks, self.blocks):
+                    self.assertTrue((b1 == b2).all())
+
+        with ColumnBlocks(iter(self.blocks), temp_dir, spill=False) as blocks:
+            self.assertIsNone(blocks.path)
+            self.assertEqual(len(list(blocks)), 3)
+            self.assertEqual(list(blocks), [])
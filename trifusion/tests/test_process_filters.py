@@ -10,9 +10,13 @@ from data_files import *
 try:
     from process.sequence import AlignmentList
     from process.error_handling import *
+    from process.pipeline import filter_terminals, filter_columns, \
+        filter_missing, filter_codons
 except ImportError:
     from trifusion.process.sequence import AlignmentList
     from trifusion.process.error_handling import *
+    from trifusion.process.pipeline import filter_terminals, \
+        filter_columns, filter_missing, filter_codons
 
 temp_dir = ".temp"
 sql_db = ".temp/sequencedb"
@@ -47,7 +51,7 @@ class AlignmentMissingFiltersTest(unittest.TestCase):
         for aln in self.aln_obj:
             s.append(aln.locus_length)
 
-        self.assertEqual(s, [42, 43])
+        self.assertEqual(s, [44, 46])
 
     def test_filter_and_concat(self):
 
@@ -60,7 +64,24 @@ class AlignmentMissingFiltersTest(unittest.TestCase):
 
         self.aln_obj.concatenate(table_in="master_out")
 
-        self.assertEqual(self.aln_obj.size, 85)
+        self.assertEqual(self.aln_obj.size, 90)
+
+    def test_filter_fused(self):
+
+        self.aln_obj.add_alignment_files(
+            ["trifusion/tests/data/missing_data.phy",
+             "trifusion/tests/data/missing_data2.phy"]
+        )
+
+        s = []
+        for aln_idx, rows in self.aln_obj.iter_alignment_rows():
+            ntaxa = len(self.aln_obj.alignment_idx[aln_idx].taxa_idx)
+            for gap, missing in [(25, 50), (0, 0), (100, 100), (50, 10)]:
+                s.append(filter_missing(rows, gap, missing, ntaxa) ==
+                         filter_columns(filter_terminals(rows, "n"), gap,
+                                        missing, ntaxa))
+
+        self.assertEqual(s, [True] * 8)
 
     def test_no_filters(self):
 
@@ -285,6 +306,17 @@ class AlignmentCodonFilters(unittest.TestCase):
 
         self.assertEqual(s, ["atg" * 16] * 10)
 
+    def test_codon_filter_incomplete_codon(self):
+
+        rows = [(0, "a", "acgtacgt"), (1, "b", "tgcatgca")]
+
+        s = [[x[2] for x in filter_codons(rows, position_list)]
+             for position_list in [[True, True, False], [False, True, True],
+                                   [False, False, True], [False] * 3]]
+
+        self.assertEqual(s, [["actagt", "tgatca"], ["cgact", "gctga"],
+                             ["gc", "cg"], ["", ""]])
+
 
 class AlignmentVariationFilters(unittest.TestCase):
 
@@ -349,6 +381,28 @@ class AlignmentVariationFilters(unittest.TestCase):
 
         self.assertEqual(len(self.aln_obj.alignments), 1)
 
+    def test_variation_counts(self):
+
+        self.aln_obj.add_alignment_files(variable_data)
+
+        stats = [(x.variable_sites, x.informative_sites) for _, x in
+                 self.aln_obj.iter_column_stats()]
+
+        _, var = self.aln_obj.get_site_counts(None, None)
+        _, inf = self.aln_obj.get_site_counts(None, None, informative=True)
+
+        self.assertEqual(zip(var.values(), inf.values()), stats)
+
+    def test_variation_workers(self):
+
+        self.aln_obj.add_alignment_files(variable_data)
+
+        res = self.aln_obj.get_site_counts(1, 3, workers=2)
+        passed, _ = self.aln_obj.filter_segregating_sites(1, 3)
+
+        self.assertEqual([passed, res[0], len(self.aln_obj.alignments)],
+                         [res[0], passed, 1])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -5,6 +5,9 @@ import shutil
 import unittest
 from data_files import *
 
+import sqlite3
+
+from trifusion.process import sequence
 from trifusion.process.sequence import AlignmentList, Alignment
 from trifusion.process.base import Base
 
@@ -88,6 +91,75 @@ class ProcessWriteMultisTest(unittest.TestCase):
         self.assertEqual(header_line, ref_header)
 
 
+class ProcessWriteParallelTest(unittest.TestCase):
+
+    def setUp(self):
+
+        if not os.path.exists(temp_dir):
+            os.makedirs(temp_dir)
+
+        self.aln_obj = AlignmentList(dna_data_fas, sql_db=sql_db)
+        self.aln_obj.update_taxa_names(self.aln_obj.taxa_names[2:])
+
+    def tearDown(self):
+
+        self.aln_obj.con.close()
+        shutil.rmtree(temp_dir)
+
+    def test_write_parallel(self):
+
+        formats = ["fasta", "phylip", "nexus", "stockholm"]
+
+        for interleave in [False, True]:
+
+            out = {}
+            for workers in [1, 2]:
+                out[workers] = os.path.join(temp_dir, str(workers))
+                self.aln_obj.write_to_file(formats, output_file=out[workers],
+                                           interleave=interleave,
+                                           workers=workers)
+
+            files = sorted(os.listdir(out[1]))
+            self.assertEqual(len(files), len(dna_data_fas) * len(formats))
+            self.assertEqual(files, sorted(os.listdir(out[2])))
+
+            for fl in files:
+                with open(os.path.join(out[1], fl)) as fh1, \
+                        open(os.path.join(out[2], fl)) as fh2:
+                    self.assertEqual(fh1.read(), fh2.read())
+
+            shutil.rmtree(out[1])
+            shutil.rmtree(out[2])
+
+    def test_write_detached(self):
+
+        out = os.path.join(temp_dir, "out")
+        self.aln_obj.write_to_file(["fasta"], output_file=out)
+
+        # Initialize a writer in this process, as done by the pool workers
+        sequence.init_writer(sequence.dumps_detached(self.aln_obj))
+        writer = sequence._write_list
+
+        handles = [writer.con, writer.db]
+        for aln in writer.all_alignments.values():
+            handles.extend([aln.con, aln.cur, aln.db])
+        self.assertFalse(set(map(id, handles)) & set(
+            map(id, [self.aln_obj.con, self.aln_obj.cur, self.aln_obj.db])))
+
+        self.assertRaises(sqlite3.OperationalError, writer.cur.execute,
+                          "DELETE FROM alignment_data")
+
+        for aln_idx, aln in writer.alignment_idx.items():
+            output_file = os.path.join(temp_dir, aln.sname + ".fas")
+            sequence.write_alignment((aln_idx, [("fasta", output_file)], {}))
+
+            with open(output_file) as fh1, \
+                    open(os.path.join(out, aln.sname + ".fas")) as fh2:
+                self.assertEqual(fh1.read(), fh2.read())
+
+        writer.db.close()
+
+
 class ProcessWriteTest(unittest.TestCase):
 
     def setUp(self):
@@ -150,6 +222,32 @@ class ProcessWriteTest(unittest.TestCase):
         self.assertEqual(x.autofinder(self.output_file + ".phy")[0],
                          "phylip")
 
+    def test_write_column_blocks(self):
+
+        formats = {"fasta": ".fas", "phylip": ".phy", "nexus": ".nex"}
+
+        for interleave in [False, True]:
+
+            self.aln_obj.block_size = 2 ** 26
+            self.aln_obj.write_to_file(list(formats),
+                                       output_file=self.output_file,
+                                       interleave=interleave)
+            ref = dict((fmt, open(self.output_file + ext).read())
+                       for fmt, ext in formats.items())
+
+            # Force several column blocks per alignment
+            self.aln_obj.block_size = 100
+            self.aln_obj.write_to_file(list(formats),
+                                       output_file=self.output_file,
+                                       interleave=interleave)
+
+            for fmt, ext in formats.items():
+                self.assertEqual(open(self.output_file + ext).read(),
+                                 ref[fmt])
+
+        self.assertFalse([x for x in os.listdir(temp_dir)
+                          if x.startswith(".columnblocks")])
+
     def test_write_stockholm(self):
 
         self.aln_obj.write_to_file(["stockholm"],
@@ -7,6 +7,8 @@ from data_files import *
 
 from trifusion.process.sequence import AlignmentList
 from trifusion.process.data import Partitions, Zorro
+from trifusion.process.pipeline import code_gaps, collapse, \
+    AlignmentPipeline
 
 temp_dir = ".temp"
 sql_db = ".temp/sequencedb"
@@ -176,6 +178,28 @@ class SeconaryOpsTest(unittest.TestCase):
 
         self.assertEqual(s, 7)
 
+    def test_concatenation_failure(self):
+
+        self.aln_obj.add_alignment_files(dna_data_fas)
+        iter_alignments = self.aln_obj.iter_alignments
+
+        def unknown_taxon(*args, **kwargs):
+            for taxon, seq, aln_idx in iter_alignments(*args, **kwargs):
+                yield taxon + "_unknown", seq, aln_idx
+
+        # The matrix file is removed even if the concatenation fails
+        self.aln_obj.iter_alignments = unknown_taxon
+        self.assertRaises(KeyError, self.aln_obj.concatenate)
+        s = [x for x in os.listdir(temp_dir) if x.endswith(".npy")]
+
+        del self.aln_obj.iter_alignments
+        self.aln_obj.concatenate()
+
+        self.assertEqual(
+            [s, [x for x in os.listdir(temp_dir) if x.endswith(".npy")],
+             len(list(self.aln_obj.iter_alignments()))],
+            [[], [], len(self.aln_obj.taxa_names)])
+
     def test_reverse_concatenate(self):
 
         self.aln_obj.add_alignment_files(concatenated_small_phy)
@@ -245,6 +269,168 @@ class SeconaryOpsTest(unittest.TestCase):
 
         self.assertEqual(s, 2)
 
+
+class PipelineTest(unittest.TestCase):
+
+    def setUp(self):
+
+        if not os.path.exists(temp_dir):
+            os.makedirs(temp_dir)
+        os.makedirs("test_pipeline")
+
+        self.aln_obj = AlignmentList(dna_data_fas, sql_db=sql_db)
+        self.ref_obj = AlignmentList(dna_data_fas, sql_db=sql_db + "2")
+
+    def tearDown(self):
+
+        for obj in [self.aln_obj, self.ref_obj]:
+            obj.clear_alignments()
+            obj.con.close()
+        shutil.rmtree(temp_dir)
+        shutil.rmtree("test_pipeline")
+
+    def get_data(self, aln_list):
+
+        return [(aln.locus_length, sorted(aln.iter_sequences()))
+                for aln in aln_list]
+
+    def test_pipeline_equals_sequential(self):
+
+        self.ref_obj.filter_codon_positions(
+            [True, False, True], table_in=self.ref_obj.master_table,
+            table_out=self.ref_obj.master_table)
+        self.ref_obj.filter_missing_data(25, 50, use_main_table=True)
+        self.ref_obj.collapse(dest="test_pipeline", use_main_table=True,
+                              haplotypes_file="ref")
+        self.ref_obj.code_gaps(use_main_table=True)
+
+        self.aln_obj.pipeline().filter_codon_positions(
+            [True, False, True]).filter_missing_data(25, 50).collapse(
+            dest="test_pipeline", haplotypes_file="test").code_gaps().run()
+
+        self.assertEqual(self.get_data(self.aln_obj),
+                         self.get_data(self.ref_obj))
+        self.assertEqual(self.aln_obj.size, self.ref_obj.size)
+        self.assertEqual(self.aln_obj.partitions.partitions,
+                         self.ref_obj.partitions.partitions)
+
+        with open(os.path.join("test_pipeline", "ref.haplotypes")) as fh1, \
+                open(os.path.join("test_pipeline",
+                                  "test.haplotypes")) as fh2:
+            self.assertEqual(fh1.read(), fh2.read())
+
+    def test_pipeline_table_out(self):
+
+        self.aln_obj.pipeline(table_out="pipe").filter_codon_positions(
+            [True, True, False]).run()
+
+        self.assertEqual(len(list(self.aln_obj.iter_alignments("pipe"))),
+                         len(list(self.aln_obj.iter_alignments())))
+        self.assertFalse(self.aln_obj._table_exists(".pipeline"))
+
+        for _, seq, _ in self.aln_obj.iter_alignments("pipe"):
+            self.assertEqual(len(seq), 57)
+
+    def test_pipeline_failed_step(self):
+
+        def fail(aln, rows):
+            raise KeyError(aln.name)
+
+        data = self.get_data(self.aln_obj)
+        pipeline = self.aln_obj.pipeline().filter_codon_positions(
+            [True, False, True]).collapse(dest="test_pipeline",
+                                          haplotypes_file="failed")
+        pipeline.steps.append((fail, False))
+
+        self.assertRaises(KeyError, pipeline.run)
+        s = [self.get_data(self.aln_obj) == data,
+             bool(self.aln_obj._table_exists(".pipeline")),
+             os.path.exists(os.path.join("test_pipeline",
+                                         "failed.haplotypes"))]
+
+        # Later operations must still be able to create the temporary
+        # table
+        for obj in [self.aln_obj, self.ref_obj]:
+            obj.filter_missing_data(25, 50, use_main_table=True)
+            obj.collapse(dest="test_pipeline", use_main_table=True)
+
+        self.assertEqual(
+            s + [self.get_data(self.aln_obj) == self.get_data(self.ref_obj),
+                 self.aln_obj.partitions.partitions ==
+                 self.ref_obj.partitions.partitions],
+            [True, False, False, True, True])
+
+    def test_code_gaps_edges(self):
+
+        rows, ngaps = code_gaps([(1, "t1", "--acg-t"), (2, "t2", "a-acgtt")])
+
+        self.assertEqual(ngaps, 3)
+        self.assertEqual(rows, [(1, "t1", "--acg-t11-"),
+                                (2, "t2", "a-acgtt001")])
+
+    def test_code_gaps_no_gaps(self):
+
+        rows = [(1, "t1", "acgt"), (2, "t2", "acgt")]
+
+        self.assertEqual(code_gaps(rows), (rows, 0))
+
+    def test_collapse_ignore_missing(self):
+
+        rows = [(0, "t1", "acgt"), (1, "t2", "ac-t"), (2, "t3", "nngt"),
+                (3, "t4", "acga"), (4, "t5", "acgt")]
+
+        res, hap_dic = collapse(rows)
+
+        self.assertEqual([x[2] for x in res], ["acgt", "ac-t", "nngt",
+                                               "acga"])
+        self.assertEqual(hap_dic["Hap_1"], ["t1", "t5"])
+
+        res, hap_dic = collapse(rows, ignore_missing=True)
+
+        self.assertEqual(res, [(0, "Hap_1", "acgt"), (1, "Hap_2", "acga")])
+        self.assertEqual(hap_dic, {"Hap_1": ["t1", "t2", "t3", "t5"],
+                                   "Hap_2": ["t4"]})
+
+    def test_collapse_workers(self):
+
+        self.ref_obj.collapse(dest="test_pipeline", use_main_table=True)
+        self.aln_obj.collapse(dest="test_pipeline", use_main_table=True,
+                              conversion_suffix="_w", workers=2)
+
+        self.assertEqual(self.get_data(self.aln_obj),
+                         self.get_data(self.ref_obj))
+
+        for aln in self.aln_obj:
+            with open(os.path.join("test_pipeline", aln.sname +
+                                   ".haplotypes")) as fh1, \
+                    open(os.path.join("test_pipeline", aln.sname +
+                                      "_w.haplotypes")) as fh2:
+                self.assertEqual(fh1.read(), fh2.read())
+
+    def test_collapse_workers_failure(self):
+
+        def fail(*args, **kwargs):
+            raise KeyError("fail")
+
+        add_haplotypes = AlignmentPipeline.add_haplotypes
+        AlignmentPipeline.add_haplotypes = fail
+        try:
+            self.assertRaises(KeyError, self.aln_obj.collapse,
+                              dest="test_pipeline", use_main_table=True,
+                              workers=2)
+        finally:
+            AlignmentPipeline.add_haplotypes = add_haplotypes
+
+        s = bool(self.aln_obj._table_exists(".pipeline"))
+
+        self.ref_obj.collapse(dest="test_pipeline", use_main_table=True)
+        self.aln_obj.collapse(dest="test_pipeline", use_main_table=True,
+                              conversion_suffix="_w", workers=2)
+
+        self.assertEqual([s, self.get_data(self.aln_obj)],
+                         [False, self.get_data(self.ref_obj)])
+
+
 # class MultipleSeconaryOpsTest(unittest.TestCase):
 #
 #     def test_sequential_secondary_operations_concat(self):
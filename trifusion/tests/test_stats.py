@@ -5,15 +5,18 @@ import unittest
 from data_files import *
 from os.path import join
 import shutil
+import numpy as np
 
 try:
     from process.sequence import AlignmentList
     from process.error_handling import *
     from process.data import Partitions
+    from process.cache import StatsMemo
 except ImportError:
     from trifusion.process.sequence import AlignmentList
     from trifusion.process.error_handling import *
     from trifusion.process.data import Partitions
+    from trifusion.process.cache import StatsMemo
 
 temp_dir = ".temp"
 sql_db = ".temp/sequencedb"
@@ -36,6 +39,46 @@ class SeconaryOpsTest(unittest.TestCase):
         self.aln_obj.con.close()
         shutil.rmtree(temp_dir)
 
+    def test_summary_stats_cached(self):
+
+        self.aln_obj.update_active_alignments(dna_data_fas[:3])
+        self.aln_obj.get_summary_stats()
+        rows = dict(self.aln_obj.summary_cache.data)
+
+        self.aln_obj.update_active_alignments(dna_data_fas)
+        self.aln_obj.get_summary_stats()
+
+        self.assertEqual(
+            [len(rows), len(self.aln_obj.summary_cache.data),
+             all(self.aln_obj.summary_cache.data[x] is y
+                 for x, y in rows.items())],
+            [3, 7, True])
+
+    def test_summary_stats_add_files(self):
+
+        aln_obj = AlignmentList(dna_data_fas[:3], sql_db=sql_db + "2")
+        aln_obj.get_summary_stats()
+        rows = dict(aln_obj.summary_cache.data)
+
+        aln_obj.add_alignment_files(dna_data_fas[3:])
+        sum_table, _ = aln_obj.get_summary_stats()
+        cached = all(aln_obj.summary_cache.data[x] is y
+                     for x, y in rows.items())
+        aln_obj.clear_alignments()
+        aln_obj.con.close()
+
+        self.assertEqual([sum_table, cached],
+                         [self.aln_obj.get_summary_stats()[0], True])
+
+    def test_gene_table(self):
+
+        self.aln_obj.get_summary_stats()
+        table, _ = self.aln_obj.get_gene_table_stats(
+            active_alignments=dna_data_fas[:2])
+
+        self.assertEqual([len(self.aln_obj.summary_gene_table), len(table)],
+                         [7, 2])
+
     def test_summary_stats_all(self):
 
         sum_table, table_data = self.aln_obj.get_summary_stats()
@@ -249,6 +292,26 @@ class SeconaryOpsTest(unittest.TestCase):
         self.assertTrue(self.aln_obj.sequence_similarity_gene(
             join(data_path, "BaseConc1.fas"), 10))
 
+    def test_sequence_similarity_gene_overlap(self):
+
+        gene = join(data_path, "BaseConc1.fas")
+        data = self.aln_obj.sequence_similarity_gene(gene, 10)["data"]
+        overlap = self.aln_obj.sequence_similarity_gene(
+            gene, 10, window_step=5)
+
+        self.assertEqual([overlap["data"][::2], overlap["window_size"]],
+                         [data, 5])
+
+    def test_sequence_segregation_gene_overlap(self):
+
+        gene = join(data_path, "BaseConc2.fas")
+        data = self.aln_obj.sequence_segregation_gene(gene, 10)["data"]
+        overlap = self.aln_obj.sequence_segregation_gene(
+            gene, 10, window_step=5)["data"]
+
+        self.assertEqual([len(overlap), overlap[::2]],
+                         [len(range(0, 85, 5)), data])
+
     def test_sequence_conservation(self):
 
         self.assertTrue(self.aln_obj.sequence_conservation_gnp(
@@ -314,5 +377,78 @@ class SeconaryOpsTest(unittest.TestCase):
         self.assertTrue(self.aln_obj.outlier_sequence_size_sp())
 
 
+class StatsMemoTest(unittest.TestCase):
+
+    def setUp(self):
+
+        if not os.path.exists(temp_dir):
+            os.makedirs(temp_dir)
+
+        self.cache_dir = join(temp_dir, "cache")
+        self.aln_obj = AlignmentList(dna_data_fas, sql_db=sql_db,
+                                     cache_dir=self.cache_dir)
+
+    def tearDown(self):
+
+        self.aln_obj.clear_alignments()
+        self.aln_obj.con.close()
+        shutil.rmtree(temp_dir)
+
+    def test_memo_hits(self):
+
+        s1 = self.aln_obj.sequence_similarity()
+        stats = [self.aln_obj.stats_memo.hits, self.aln_obj.stats_memo.misses]
+        s2 = self.aln_obj.sequence_similarity()
+
+        self.assertEqual([s1, self.aln_obj.stats_memo.hits,
+                          self.aln_obj.stats_memo.misses],
+                         [s2, stats[0] + len(dna_data_fas), stats[1]])
+
+    def test_memo_store(self):
+
+        s1 = self.aln_obj.sequence_similarity()
+
+        aln_obj = AlignmentList(dna_data_fas, sql_db=sql_db + "2",
+                                cache_dir=self.cache_dir)
+        s2 = aln_obj.sequence_similarity()
+        stats = [aln_obj.stats_memo.hits, aln_obj.stats_memo.misses]
+        aln_obj.clear_alignments()
+        aln_obj.con.close()
+
+        self.assertEqual([s1, stats], [s2, [len(dna_data_fas), 0]])
+
+    def test_memo_eviction(self):
+
+        memo = StatsMemo(max_size=200)
+
+        for i in range(3):
+            memo.set(memo.get_key("test", i), np.zeros(10))
+        memo.get(memo.get_key("test", 1))
+        memo.set(memo.get_key("test", 3), np.zeros(10))
+
+        self.assertEqual(
+            [memo.get(memo.get_key("test", i)) is not None
+             for i in range(4)], [False, True, False, True])
+
+    def test_memo_store_eviction(self):
+
+        store = join(temp_dir, "memo.db")
+        memo = StatsMemo(max_size=0, store_path=store, max_store_size=700,
+                         commit_interval=3600)
+
+        for i in range(3):
+            memo.set(memo.get_key("test", i), np.zeros(10))
+        memo.get(memo.get_key("test", 0))
+        memo.set(memo.get_key("test", 3), np.zeros(10))
+        memo.close()
+
+        memo = StatsMemo(max_size=0, store_path=store)
+        res = [memo.get(memo.get_key("test", i)) is not None
+               for i in range(4)]
+        memo.close()
+
+        self.assertEqual(res, [True, False, True, True])
+
+
 if __name__ == "__main__":
     unittest.main()